@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoordinateAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'coordinate_app'
+
+    def ready(self) -> None:
+        # Load the gazetteer while the worker starts rather than on its first lookup.
+        if getattr(settings, "GAZETTEER", {}).get("PRELOAD", True):
+            from .gazetteer import get_gazetteer
+            get_gazetteer()
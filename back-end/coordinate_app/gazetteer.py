@@ -0,0 +1,208 @@
+"""An offline, in-memory gazetteer of cities loaded from a GeoNames style cities file.
+
+Cities are held in parallel arrays (one slot per city) and indexed per country code by
+a sorted array of normalized names. Sorted names work as a flattened trie: every name
+that starts with a prefix sits in one contiguous run, found with two binary searches,
+so exact and prefix lookups stay in process and well under a millisecond.
+
+Classes:
+    Gazetteer
+
+Methods:
+    normalize(city, country_code) -> tuple[str, str]
+    get_gazetteer() -> Gazetteer
+"""
+
+import logging
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "PATH": Path(__file__).resolve().parent / "data" / "cities.txt",
+    "INDEX_ALTERNATE_NAMES": True,
+    "PRELOAD": True,
+}
+
+# Columns of the GeoNames cities files (https://download.geonames.org/export/dump/).
+NAME, ASCII_NAME, ALTERNATE_NAMES, LATITUDE, LONGITUDE = 1, 2, 3, 4, 5
+COUNTRY_CODE, ADMIN1, POPULATION = 8, 10, 14
+
+
+def normalize(city: str, country_code: str) -> tuple[str, str]:
+    """Builds the lookup key of a city, e.g. ("  New   YORK", "us") -> ("new york", "US").
+
+    Args:
+        city (str): The city name as typed.
+        country_code (str): The two letter country code.
+
+    Returns:
+        tuple[str, str]: The case folded city name with its whitespace collapsed, and
+        the upper case country code.
+    """
+
+    city = " ".join(unicodedata.normalize("NFKC", city).casefold().split())
+    return city, country_code.strip().upper()
+
+
+class Gazetteer:
+    """Cities in compact parallel arrays with a sorted name index per country.
+
+    Attributes:
+        names: list[str]
+            Each city's name.
+        regions: list[str]
+            Each city's first-level administrative division code, e.g. "GA".
+        countries: list[str]
+            Each city's country code.
+        latitudes: array
+            Each city's latitude.
+        longitudes: array
+            Each city's longitude.
+        populations: array
+            Each city's population, used to rank cities that share a name.
+
+    Methods:
+        load(path, alternate_names) -> Gazetteer
+        find(city, country_code) -> dict | None
+        search(prefix, country_code, limit) -> list[dict]
+    """
+
+    def __init__(self) -> None:
+        self.names = []
+        self.regions = []
+        self.countries = []
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        self.populations = array("q")
+        self._index = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path, alternate_names: bool = True) -> "Gazetteer":
+        """Reads a tab separated GeoNames cities file; lines starting with # are skipped.
+
+        Args:
+            path (str | Path): The cities file.
+            alternate_names (bool): Whether to index each city's alternate names too.
+
+        Returns:
+            Gazetteer: The loaded gazetteer.
+        """
+
+        gazetteer = cls()
+        keys = {}
+        with open(path, encoding="utf-8") as cities:
+            for line in cities:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                columns = line.rstrip("\n").split("\t")
+                slot = len(gazetteer.names)
+                gazetteer.names.append(columns[NAME])
+                gazetteer.regions.append(columns[ADMIN1])
+                gazetteer.countries.append(columns[COUNTRY_CODE].upper())
+                gazetteer.latitudes.append(float(columns[LATITUDE]))
+                gazetteer.longitudes.append(float(columns[LONGITUDE]))
+                gazetteer.populations.append(int(columns[POPULATION] or 0))
+                spellings = {columns[NAME], columns[ASCII_NAME]}
+                if alternate_names and columns[ALTERNATE_NAMES]:
+                    spellings.update(columns[ALTERNATE_NAMES].split(","))
+                country_keys = keys.setdefault(columns[COUNTRY_CODE].upper(), set())
+                for spelling in spellings:
+                    key = normalize(spelling, "")[0]
+                    if key:
+                        country_keys.add((key, slot))
+        for country, pairs in keys.items():
+            pairs = sorted(pairs)
+            gazetteer._index[country] = ([key for key, _ in pairs],
+                                         array("l", (slot for _, slot in pairs)))
+        return gazetteer
+
+    def _range(self, prefix: str, country_code: str, exact: bool) -> list[int]:
+        """Gets the slots of the cities whose names match a normalized prefix."""
+
+        if country_code not in self._index:
+            return []
+        names, slots = self._index[country_code]
+        start = bisect_left(names, prefix)
+        end = bisect_left(names, prefix + "\0") if exact else \
+            bisect_left(names, prefix + "\U0010ffff", start)
+        return list(dict.fromkeys(slots[start:end]))
+
+    def _city(self, slot: int) -> dict:
+        return {"city": self.names[slot], "region": self.regions[slot],
+                "country": self.countries[slot], "latitude": self.latitudes[slot],
+                "longitude": self.longitudes[slot]}
+
+    def find(self, city: str, country_code: str) -> dict | None:
+        """Gets the most populous city with exactly this name in the country.
+
+        Args:
+            city (str): The city name.
+            country_code (str): The two letter country code.
+
+        Returns:
+            dict | None: The city's "city", "region", "country", "latitude" and
+            "longitude", or None if the gazetteer doesn't have it.
+        """
+
+        key, country_code = normalize(city, country_code)
+        slots = self._range(key, country_code, exact=True)
+        if not slots:
+            return None
+        return self._city(max(slots, key=self.populations.__getitem__))
+
+    def search(self, prefix: str, country_code: str, limit: int = 10) -> list[dict]:
+        """Gets the cities in the country whose names start with a prefix, largest first.
+
+        Args:
+            prefix (str): The start of the city name as typed so far.
+            country_code (str): The two letter country code.
+            limit (int): The most cities returned.
+
+        Returns:
+            list[dict]: The cities' "city", "region", "country", "latitude" and "longitude".
+        """
+
+        key, country_code = normalize(prefix, country_code)
+        if not key:
+            return []
+        slots = self._range(key, country_code, exact=False)
+        slots.sort(key=lambda slot: (-self.populations[slot], self.names[slot]))
+        return [self._city(slot) for slot in slots[:limit]]
+
+
+_gazetteer = None
+_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """Gets the process wide Gazetteer, loading settings.GAZETTEER["PATH"] on first use.
+
+    A missing or unreadable file is logged and leaves the gazetteer empty, so every
+    lookup falls back to the geocoding provider.
+
+    Returns:
+        Gazetteer: The shared gazetteer.
+    """
+
+    global _gazetteer
+    if _gazetteer is None:
+        with _lock:
+            if _gazetteer is None:
+                config = {**DEFAULT_CONFIG, **getattr(settings, "GAZETTEER", {})}
+                try:
+                    _gazetteer = Gazetteer.load(
+                        config["PATH"], config["INDEX_ALTERNATE_NAMES"])
+                except (OSError, ValueError, IndexError) as e:
+                    logger.warning("Couldn't load the gazetteer from %s: %s",
+                                   config["PATH"], e)
+                    _gazetteer = Gazetteer()
+    return _gazetteer
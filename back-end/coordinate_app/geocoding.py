@@ -0,0 +1,173 @@
+"""Resolves city names to coordinates through the gazetteer and a persistent cache.
+
+A lookup is answered by the first layer that has the city: the offline gazetteer,
+an in-process LRU, then the Geocode table, then OpenWeatherMap. Provider answers are
+written through to the table and the LRU, including "not found" answers, so a city
+is only ever sent to the provider once. Negative entries are re-checked after
+NEGATIVE_TTL seconds.
+
+Classes:
+    LRUCache
+    Geocoder
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from weather_app.client import get_async_client
+from .gazetteer import get_gazetteer, normalize
+from .models import Geocode
+
+DEFAULT_CONFIG = {
+    "LRU_SIZE": 2048,
+    "NEGATIVE_TTL": 7 * 86400,
+}
+
+_MISSING = object()
+
+
+class LRUCache:
+    """A thread safe least-recently-used mapping with a fixed number of entries.
+
+    Attributes:
+        maxsize: int
+            The most entries kept; the least recently used one is dropped beyond it.
+
+    Methods:
+        get(key) -> object
+        put(key, value) -> None
+        clear() -> None
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Gets an entry and marks it as the most recently used."""
+
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value) -> None:
+        """Stores an entry, dropping the least recently used one when full."""
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Geocoder:
+    """Looks cities up in the gazetteer, the LRU, the Geocode table, then OpenWeatherMap.
+
+    Attributes:
+        config: dict
+            DEFAULT_CONFIG overridden by settings.GEOCODE_CACHE.
+        lru: LRUCache
+            The in-process cache in front of the table.
+
+    Methods:
+        alookup(city, country_code) -> dict | None
+        stored(key) -> dict | None
+        store(key, response) -> dict | None
+    """
+
+    def __init__(self, config: dict | None = None) -> None:
+        self.config = {**DEFAULT_CONFIG,
+                       **getattr(settings, "GEOCODE_CACHE", {}), **(config or {})}
+        self.lru = LRUCache(int(self.config["LRU_SIZE"]))
+
+    async def alookup(self, city: str, country_code: str) -> dict | None:
+        """Gets a city's name, country, latitude and longitude.
+
+        Args:
+            city (str): The city name.
+            country_code (str): The two letter country code.
+
+        Raises:
+            UpstreamError: The city isn't cached and OpenWeatherMap couldn't be reached.
+
+        Returns:
+            dict | None: The "city", "country", "latitude" and "longitude", or None if
+            the city isn't known.
+        """
+
+        key = normalize(city, country_code)
+        found = get_gazetteer().find(*key)
+        if found is not None:
+            return {name: found[name] for name in ("city", "country", "latitude", "longitude")}
+        result = self.lru.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+        result = await sync_to_async(self.stored)(key)
+        if result is _MISSING:
+            response = await get_async_client().geocode(city.strip(), key[1])
+            result = await sync_to_async(self.store)(key, response)
+        self.lru.put(key, result)
+        return result
+
+    def stored(self, key: tuple[str, str]):
+        """Reads a city from the Geocode table.
+
+        Args:
+            key (tuple[str, str]): The normalized city name and country code.
+
+        Returns:
+            dict | None | object: The stored coordinates, None for a current negative
+            entry, or _MISSING when the city has to be asked for upstream.
+        """
+
+        geocode = Geocode.objects.filter(city_key=key[0], country_code=key[1]).first()
+        if geocode is None:
+            return _MISSING
+        if not geocode.found:
+            expires = geocode.fetched_at + \
+                timedelta(seconds=self.config["NEGATIVE_TTL"])
+            return None if expires > timezone.now() else _MISSING
+        return self._result(geocode)
+
+    def store(self, key: tuple[str, str], response: dict | None) -> dict | None:
+        """Writes an OpenWeatherMap answer through to the Geocode table.
+
+        Args:
+            key (tuple[str, str]): The normalized city name and country code.
+            response (dict | None): The provider's answer, or None if it doesn't know the city.
+
+        Returns:
+            dict | None: The stored coordinates, or None for a negative entry.
+        """
+
+        if response is None:
+            defaults = {"found": False, "city": "", "country": "",
+                        "latitude": None, "longitude": None}
+        else:
+            defaults = {"found": True, "city": response['name'],
+                        "country": response['sys']['country'],
+                        "latitude": response['coord']['lat'],
+                        "longitude": response['coord']['lon']}
+        geocode, _ = Geocode.objects.update_or_create(
+            city_key=key[0], country_code=key[1], defaults=defaults)
+        return self._result(geocode) if geocode.found else None
+
+    def _result(self, geocode: Geocode) -> dict:
+        return {"city": geocode.city, "country": geocode.country,
+                "latitude": geocode.latitude, "longitude": geocode.longitude}
+
+
+geocoder = Geocoder()
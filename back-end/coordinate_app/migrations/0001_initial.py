@@ -0,0 +1,32 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Geocode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city_key', models.CharField(max_length=100)),
+                ('country_code', models.CharField(max_length=2)),
+                ('found', models.BooleanField(default=True)),
+                ('city', models.CharField(blank=True, default='', max_length=100)),
+                ('country', models.CharField(blank=True, default='', max_length=2)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='geocode',
+            constraint=models.UniqueConstraint(fields=('city_key', 'country_code'), name='unique geocode per city and country'),
+        ),
+    ]
@@ -1,3 +1,57 @@
+"""All models within the Coordinate app.
+
+Classes:
+    Geocode
+"""
+
 from django.db import models
 
-# Create your models here.
+
+class Geocode(models.Model):
+    """A city's coordinates as resolved by the geocoding provider.
+
+    Rows are keyed by the normalized city name and country code, so every spelling
+    that normalizes the same shares one lookup. A row with found set to False records
+    that the provider doesn't know the city.
+
+    Extends:
+        Model (class): The django Model class.
+
+    Attributes:
+        city_key: str
+            The normalized city name.
+        country_code: str
+            The upper case two letter country code.
+        found: bool
+            Whether the provider knows the city.
+        city: str
+            The city's name as the provider spells it.
+        country: str
+            The country code the provider answered with.
+        latitude: float | None
+            The city's latitude.
+        longitude: float | None
+            The city's longitude.
+        fetched_at: datetime
+            When the provider was last asked.
+    """
+
+    city_key = models.CharField(max_length=100)
+    country_code = models.CharField(max_length=2)
+    found = models.BooleanField(default=True)
+    city = models.CharField(max_length=100, blank=True, default="")
+    country = models.CharField(max_length=2, blank=True, default="")
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['city_key', 'country_code'], name='unique geocode per city and country')
+        ]
+
+    def __str__(self) -> str:
+        if not self.found:
+            return f"{self.city_key}, {self.country_code}: Not found"
+        return f"{self.city}, {self.country}: Lat: {self.latitude} | Lon: {self.longitude}"
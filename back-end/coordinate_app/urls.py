@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import A_coordinate
+from .views import A_coordinate, City_search
 
 urlpatterns = [
-    path('city/<str:city>/country/<str:country_code>/', A_coordinate.as_view(), name="a_coordinate")
+    path('city/<str:city>/country/<str:country_code>/', A_coordinate.as_view(), name="a_coordinate"),
+    path('search/', City_search.as_view(), name="city_search")
 ]
\ No newline at end of file
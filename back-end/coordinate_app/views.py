@@ -1,27 +1,66 @@
-from user_app.views import TokenReq
+from user_app.views import TokenReq, AsyncTokenReq
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
-from dotenv import load_dotenv
-import requests
-import os
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_502_BAD_GATEWAY,
+)
 import json
+from weather_app.client import UpstreamError
+from .gazetteer import get_gazetteer, normalize
+from .geocoding import geocoder
+from .models import Geocode
 
+# The longest city name that fits the Geocode table's key.
+CITY_KEY_LENGTH = Geocode._meta.get_field("city_key").max_length
 
-class A_coordinate(TokenReq):
 
-    def get(self, request, city, country_code):
-        load_dotenv()
-        endpoint = f"""https://api.openweathermap.org/data/2.5/weather?q={
-            city},{country_code}&appid={os.environ['OPENWX_KEY']}"""
-        response = requests.get(endpoint)
-        if response.status_code == 404:
+class A_coordinate(AsyncTokenReq):
+
+    async def get(self, request, city, country_code):
+        city_key, _ = normalize(city, country_code)
+        if not city_key or len(city_key) > CITY_KEY_LENGTH or len(country_code.strip()) != 2:
+            return Response({'Error': f'A city name of at most {CITY_KEY_LENGTH} characters and a two letter country code are required.'},
+                            status=HTTP_400_BAD_REQUEST)
+        try:
+            client_response = await geocoder.alookup(city, country_code)
+        except UpstreamError:
+            return Response({'Error': 'The geocoding provider is unavailable. Try again shortly.'},
+                            status=HTTP_502_BAD_GATEWAY)
+        if client_response is None:
             return Response(json.dumps({'Error': 'City within country not found'}), status=HTTP_404_NOT_FOUND)
-        responseJSON = response.json()
-        print(responseJSON)
-        client_response = {
-            "city": responseJSON['name'],
-            "country": responseJSON['sys']['country'],
-            "latitude": responseJSON['coord']['lat'],
-            "longitude": responseJSON['coord']['lon']
-        }
         return Response(client_response, status=HTTP_200_OK)
+
+
+class City_search(TokenReq):
+    """The view that holds the method to suggest cities as a name is typed.
+
+    Extends:
+        TokenReq (class): The class that enables the view with proper authentication and permissions.
+
+    Methods:
+        get(request) -> Response
+    """
+
+    def get(self, request) -> Response:
+        """Gets the cities of a country whose names start with the text typed so far.
+
+        Args:
+            request (HttpRequest): The request with the "q" prefix, the "country" code,
+            and an optional "limit" of at most 50 cities, in its query string.
+
+        Returns:
+            Response: The matching cities, largest first, and proper HTTP status code.
+        """
+
+        prefix = request.query_params.get('q', '')
+        country_code = request.query_params.get('country', '')
+        if not prefix.strip() or len(country_code.strip()) != 2:
+            return Response({'Error': 'Both a city prefix (q) and a two letter country code are required.'},
+                            status=HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({'Error': 'The limit must be a number.'}, status=HTTP_400_BAD_REQUEST)
+        return Response(get_gazetteer().search(prefix, country_code, limit), status=HTTP_200_OK)
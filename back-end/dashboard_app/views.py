@@ -0,0 +1,122 @@
+"""Views that serve everything the Workflow page shows in one response.
+
+Classes:
+    Dashboard
+
+Methods:
+    dashboard_records(user) -> dict
+    station_choices(kind, records) -> list[list[tuple[str, float | None]]]
+"""
+
+import asyncio
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+from airport_app.serializers import AirportSerializer
+from list_app.serializers import ListSerializer
+from named_locations_app.serializers import Named_locationSerializer
+from user_app.views import AsyncTokenReq
+from weather_app.services import aget_first_reports, nearest_stations
+from weather_app.views import set_cache_headers
+
+KINDS = ("metar", "taf")
+
+
+def dashboard_records(user) -> dict:
+    """Gets and serializes the User's Airports, Named Locations and Lists with their Tasks.
+
+    Each table is read with one query, and every List's Tasks with one more.
+
+    Args:
+        user (User): The User whose records to get.
+
+    Returns:
+        dict: The serialized "airports", "named_locations" and "lists".
+    """
+
+    return {
+        "airports": AirportSerializer(user.airports.order_by("icao_code"), many=True).data,
+        "named_locations": Named_locationSerializer(
+            user.named_locations.order_by("city"), many=True).data,
+        "lists": ListSerializer(
+            user.lists.prefetch_related("tasks").order_by("id"), many=True).data,
+    }
+
+
+def station_choices(kind: str, records: dict) -> list[list[tuple[str, float | None]]]:
+    """Gets the stations that can report for each Airport then Named Location.
+
+    Args:
+        kind (str): "metar" or "taf", the reports the stations have to issue.
+        records (dict): The serialized records from dashboard_records.
+
+    Returns:
+        list[list[tuple[str, float | None]]]: The ICAO codes to choose from with their
+        distances in kilometres, nearest first, of each place. An Airport only has its
+        own code, with no distance.
+    """
+
+    choices = [[(airport["icao_code"].upper(), None)] for airport in records["airports"]]
+    choices += [[(station.icao, distance) for station, distance in nearest_stations(
+                    kind, float(location["latitude"]), float(location["longitude"]))]
+                for location in records["named_locations"]]
+    return choices
+
+
+class Dashboard(AsyncTokenReq):
+    """The view that holds the method to get the whole Workflow page in one request.
+
+    Extends:
+        AsyncTokenReq (class): The class that enables the async view with proper
+        authentication and permissions.
+
+    Methods:
+        get(request) -> Response
+    """
+
+    async def get(self, request: HttpRequest) -> Response:
+        """Gets the User's Airports, Named Locations and Lists, and the weather at each place.
+
+        Every Airport and Named Location has a "weather" with its "metar" and "taf",
+        each the "station" it came from, the "distance_km" to it (None for an Airport's
+        own station) and the "raw" report, or None if no station has one. Named
+        Locations take the nearest catalogued station with a report. Reports come from
+        the weather cache, and the misses of all places are fetched in one combined
+        upstream call per kind, the METARs and TAFs concurrently. When the provider is
+        down the records are still sent, with the places' errors.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication.
+
+        Returns:
+            Response: The "airports", "named_locations" and "lists", any per station
+            "errors" per kind, and proper HTTP status code.
+        """
+
+        records = await sync_to_async(dashboard_records)(request.user)
+        choices = {kind: station_choices(kind, records) for kind in KINDS}
+        results = await asyncio.gather(*(
+            aget_first_reports(kind, [[code for code, _ in stations]
+                                      for stations in choices[kind]])
+            for kind in KINDS))
+        places = records["airports"] + records["named_locations"]
+        for place in places:
+            place["weather"] = {}
+        for kind, (codes, lookup) in zip(KINDS, results):
+            for place, stations, code in zip(places, choices[kind], codes):
+                distance = dict(stations).get(code)
+                place["weather"][kind] = None if code is None else {
+                    "station": code,
+                    "distance_km": None if distance is None else round(distance, 1),
+                    "raw": lookup.entries[code]["raw"],
+                }
+        client_response = {"airports": records["airports"],
+                           "named_locations": records["named_locations"],
+                           "lists": records["lists"]}
+        errors = {kind: lookup.errors for kind, (_, lookup) in zip(KINDS, results)
+                  if lookup.errors}
+        if errors:
+            client_response["errors"] = errors
+        return set_cache_headers(Response(client_response, status=HTTP_200_OK),
+                                 *(lookup for _, lookup in results))
@@ -5,12 +5,15 @@ from .views import (
     All_briefs,
     A_brief,
     All_hazards,
-    A_hazard
+    A_hazard,
+    Flight_route_weather
 )
 
 urlpatterns = [
     path('', All_flights.as_view(), name="all_flights"),
     path('<int:flight_id>/', A_flight.as_view(), name="a_flight"),
+    path('<int:flight_id>/route-weather/', Flight_route_weather.as_view(),
+         name="flight_route_weather"),
     path('<int:flight_id>/briefs/', All_briefs.as_view(), name="all_briefs"),
     path('<int:flight_id>/briefs/<int:brief_id>/',
          A_brief.as_view(), name="a_brief"),
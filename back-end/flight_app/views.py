@@ -6,11 +6,22 @@ from rest_framework.status import (
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_502_BAD_GATEWAY,
 )
+import asyncio
 import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from .models import Flight, Brief, Hazard
 from .serializers import FlightSerializer, BriefSerializer, HazardSerializer
-from user_app.views import TokenReq
+from user_app.views import TokenReq, AsyncTokenReq
+from weather_app.prewarm import DEFAULT_CONFIG as PREWARM_CONFIG
+from weather_app.services import aget_reports, route_stations, UNAVAILABLE
+from weather_app.stations import DEFAULT_CONFIG as STATIONS_CONFIG
+from weather_app.views import set_cache_headers
+
+MAX_CORRIDOR_KM = 500
 
 
 class All_flights(TokenReq):
@@ -149,3 +160,82 @@ class A_hazard(TokenReq):
         hazard = get_object_or_404(Hazard, id=hazard_id)
         hazard.delete()
         return Response(status=HTTP_204_NO_CONTENT)
+
+
+class Flight_route_weather(AsyncTokenReq):
+    """The view that holds the method to get the weather along a Flight's route.
+
+    Extends:
+        AsyncTokenReq (class): The class that enables the async view with proper
+        authentication and permissions.
+
+    Methods:
+        get(request, flight_id) -> Response
+    """
+
+    async def get(self, request, flight_id: int) -> Response:
+        """Gets the METARs and TAFs of the catalogued stations along a Flight's route.
+
+        The route is the great-circle track from the Flight's origin to its destination.
+        The stations within the corridor either side of it are found in the station
+        catalogue's spatial index, and their reports come from the weather cache, with
+        the misses fetched concurrently in upstream calls of at most
+        WEATHER_PREWARM["BATCH_SIZE"] stations, like the prewarmer's, so a long route
+        neither builds an overlong URL nor fails whole when one call does.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication,
+            optionally with a "width_km" query parameter (1-500) for the corridor's
+            width either side of the track, WEATHER_STATIONS["CORRIDOR_KM"] by default.
+            flight_id (int): The Flight's id.
+
+        Returns:
+            Response: The "origin", "destination", track "distance_km", "corridor_km",
+            and the "stations" in order along the track, each with how far "along_km"
+            and "off_track_km" it is and its "metar" and "taf" (None if it has none),
+            any per station "errors" per kind, and proper HTTP status code.
+        """
+
+        flight = await sync_to_async(get_object_or_404)(request.user.flights, id=flight_id)
+        width = request.query_params.get("width_km")
+        if width is not None and not (width.isdigit() and 1 <= int(width) <= MAX_CORRIDOR_KM):
+            return Response({'Error': f'Send width_km between 1 and {MAX_CORRIDOR_KM}.'},
+                            status=HTTP_400_BAD_REQUEST)
+        origin, destination = flight.origin.upper(), flight.destination.upper()
+        width = int(width) if width is not None else {
+            **STATIONS_CONFIG, **getattr(settings, "WEATHER_STATIONS", {})}["CORRIDOR_KM"]
+        stations = route_stations(origin, destination, width)
+        if stations is None:
+            return Response(
+                {'Error': 'The origin or destination is not in the station catalogue.'},
+                status=HTTP_404_NOT_FOUND)
+        batch_size = int({**PREWARM_CONFIG,
+                          **getattr(settings, "WEATHER_PREWARM", {})}["BATCH_SIZE"])
+        metars, tafs = await asyncio.gather(*(
+            aget_reports(kind, [station.icao for station, _, _ in stations
+                                if getattr(station, kind)], batch_size)
+            for kind in ("metar", "taf")))
+        if not metars.entries and not tafs.entries \
+                and UNAVAILABLE in {*metars.errors.values(), *tafs.errors.values()}:
+            return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+        client_response = {
+            "origin": origin,
+            "destination": destination,
+            "distance_km": round(max(along for _, along, _ in stations), 1),
+            "corridor_km": width,
+            "stations": [{
+                "icao": station.icao,
+                "name": station.name,
+                "along_km": round(along, 1),
+                "off_track_km": round(off, 1),
+                "metar": metars.entries[station.icao]['raw']
+                if station.icao in metars.entries else None,
+                "taf": tafs.entries[station.icao]['raw']
+                if station.icao in tafs.entries else None,
+            } for station, along, off in stations],
+        }
+        errors = {kind: lookup.errors
+                  for kind, lookup in (("metar", metars), ("taf", tafs)) if lookup.errors}
+        if errors:
+            client_response["errors"] = errors
+        return set_cache_headers(Response(client_response, status=HTTP_200_OK), metars, tafs)
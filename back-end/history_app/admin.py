@@ -0,0 +1,4 @@
+from django.contrib import admin
+from .models import Observation, Forecast, ObservationRollup
+
+admin.site.register([Observation, Forecast, ObservationRollup])
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class HistoryAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'history_app'
+
+    def ready(self) -> None:
+        # Store every new report the weather services fetch.
+        from weather_app.signals import reports_fetched
+        from .ingest import record_reports
+        reports_fetched.connect(record_reports, dispatch_uid="history_app.record_reports")
@@ -0,0 +1,174 @@
+"""Writes fetched METARs and TAFs to the Observation and Forecast tables in bulk.
+
+Reports are decoded into rows and written in one statement per batch. A report that's
+already stored, by this worker or another one, is skipped by the unique index on station
+and time rather than read back first. Observations go to monthly partitions, which are
+created here if the maintenance job hasn't made them yet. On PostgreSQL, batches of
+COPY_THRESHOLD rows or more are streamed in with COPY through a temporary table instead
+of INSERT.
+
+Methods:
+    observation_row(raw, now) -> Observation | None
+    forecast_row(raw, now) -> Forecast | None
+    ingest(kind, reports, now) -> int
+    record_reports(sender, reports, **kwargs) -> None
+"""
+
+import logging
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from weather_app.metar import KNOTS_PER_UNIT, decode_metar
+from weather_app.reports import report_time, station_id
+from weather_app.taf import decode_taf
+from .models import Observation, Forecast
+from .partitions import ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "BATCH_SIZE": 1000,
+    "COPY_THRESHOLD": 5000,
+    "PARTITIONS_AHEAD": 3,
+    "RETENTION_MONTHS": 3,
+    "HOURLY_ROLLUP_DAYS": 90,
+    "LATE_HOURS": 2,
+}
+
+INHG_PER_HPA = 0.0295300
+
+
+def _knots(speed: int | None, unit: str) -> int | None:
+    return None if speed is None else round(speed * KNOTS_PER_UNIT.get(unit, 1.0))
+
+
+def observation_row(raw: str, now: datetime | None = None) -> Observation | None:
+    """Decodes a METAR into an unsaved Observation.
+
+    Args:
+        raw (str): The raw METAR.
+        now (datetime | None): The current UTC time, which gives the report's month.
+
+    Returns:
+        Observation | None: The row, or None if the report has no station or time.
+    """
+
+    station, obs_time = station_id(raw), report_time(raw, now)
+    if station is None or obs_time is None:
+        return None
+    metar = decode_metar(raw)
+    wind, visibility = metar.wind, metar.visibility
+    altimeter = metar.altimeter
+    if altimeter is not None and metar.altimeter_unit == "hPa":
+        altimeter = round(altimeter * INHG_PER_HPA, 2)
+    return Observation(
+        station=station, obs_time=obs_time, raw=raw,
+        wind_direction=wind.direction if wind else None,
+        wind_speed_kt=_knots(wind.speed, wind.unit) if wind else None,
+        wind_gust_kt=_knots(wind.gust, wind.unit) if wind else None,
+        visibility_sm=round(visibility.statute_miles, 2) if visibility else None,
+        ceiling_ft=metar.ceiling_ft(), temperature_c=metar.temperature,
+        dewpoint_c=metar.dewpoint, altimeter_inhg=altimeter,
+        flight_category=metar.flight_category() or "")
+
+
+def forecast_row(raw: str, now: datetime | None = None) -> Forecast | None:
+    """Decodes a TAF into an unsaved Forecast with the worst of its whole validity.
+
+    Args:
+        raw (str): The raw TAF.
+        now (datetime | None): The current UTC time, which gives the report's month.
+
+    Returns:
+        Forecast | None: The row, or None if the report has no station or issue time.
+    """
+
+    taf = decode_taf(raw, now)
+    if taf.station is None or taf.issued is None:
+        return None
+    row = Forecast(station=taf.station, issue_time=taf.issued, valid_from=taf.valid_from,
+                   valid_to=taf.valid_to, raw=raw, modifier=taf.modifier or "")
+    outlook = taf.worst_between(taf.valid_from, taf.valid_to) if taf.valid_from else None
+    if outlook is not None:
+        worst = outlook.worst
+        row.max_wind_kt = round(worst.wind.peak_knots) if worst.wind else None
+        row.min_visibility_sm = round(worst.visibility.statute_miles, 2) \
+            if worst.visibility else None
+        row.min_ceiling_ft = worst.ceiling_ft()
+        row.flight_category = outlook.flight_category or ""
+    return row
+
+
+def _copy(model, rows: list) -> int:
+    """Streams rows into a temporary table with COPY, then moves the new ones across."""
+
+    table = model._meta.db_table
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    staging = connection.ops.quote_name(f"{table}_staging")
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS "
+                       f"SELECT {columns} FROM {connection.ops.quote_name(table)} WITH NO DATA")
+        with cursor.copy(f"COPY {staging} ({columns}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([field.get_db_prep_save(field.pre_save(row, True), connection)
+                                for field in fields])
+        cursor.execute(f"INSERT INTO {connection.ops.quote_name(table)} ({columns}) "
+                       f"SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING")
+        return cursor.rowcount
+
+
+def ingest(kind: str, reports: list[str], now: datetime | None = None) -> int:
+    """Stores reports, skipping the ones already stored.
+
+    Args:
+        kind (str): "metar" or "taf".
+        reports (list[str]): The raw reports.
+        now (datetime | None): The current UTC time, which gives the reports' month.
+
+    Returns:
+        int: The rows offered to the database after dropping unreadable reports and
+        duplicates within the batch; rows already stored are skipped by the database.
+    """
+
+    config = {**DEFAULT_CONFIG, **getattr(settings, "WEATHER_HISTORY", {})}
+    now = now or datetime.now(timezone.utc)
+    model, build, time_field = (Observation, observation_row, "obs_time") if kind == "metar" \
+        else (Forecast, forecast_row, "issue_time")
+    rows = {}
+    for raw in reports:
+        row = build(raw, now)
+        if row is not None:
+            rows.setdefault((row.station, getattr(row, time_field)), row)
+    rows = list(rows.values())
+    if not rows:
+        return 0
+    if model is Observation:
+        ensure_partitions([row.obs_time for row in rows])
+    if connection.vendor == "postgresql" and len(rows) >= int(config["COPY_THRESHOLD"]):
+        _copy(model, rows)
+    else:
+        model.objects.bulk_create(rows, batch_size=int(config["BATCH_SIZE"]),
+                                  ignore_conflicts=True)
+    return len(rows)
+
+
+def record_reports(sender: str, reports: list[str], **kwargs) -> None:
+    """Stores the reports of a weather_app.signals.reports_fetched signal.
+
+    A database error is logged rather than raised, so the history never fails a
+    weather request.
+
+    Args:
+        sender (str): "metar" or "taf".
+        reports (list[str]): The raw reports that were fetched.
+    """
+
+    if not reports or not {**DEFAULT_CONFIG,
+                           **getattr(settings, "WEATHER_HISTORY", {})}["ENABLED"]:
+        return
+    try:
+        ingest(sender, reports)
+    except DatabaseError as e:
+        logger.warning("Couldn't store %d fetched %s reports: %s", len(reports), sender, e)
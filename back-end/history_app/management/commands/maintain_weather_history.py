@@ -0,0 +1,43 @@
+"""Creates upcoming Observation partitions, rolls up observations and drops old months.
+
+It also prunes the log of changed reports behind the weather change feed.
+
+Run from cron, at least hourly, with: python manage.py maintain_weather_history
+"""
+
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from history_app.ingest import DEFAULT_CONFIG
+from history_app.partitions import create_future_partitions, drop_expired
+from history_app.rollups import prune_hours, rollup_days, rollup_hours
+from weather_app.changes import prune_changes
+
+
+class Command(BaseCommand):
+    help = ("Creates the Observation partitions of the coming months, writes hourly and "
+            "daily rollups, then drops the observations of months past retention.")
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--ahead", type=int,
+                            help="Months after the current one to create partitions for.")
+        parser.add_argument("--retention", type=int,
+                            help="Whole months of observations kept before the current one.")
+
+    def handle(self, *args, **options) -> None:
+        config = {**DEFAULT_CONFIG, **getattr(settings, "WEATHER_HISTORY", {})}
+        ahead = options["ahead"] if options["ahead"] is not None else config["PARTITIONS_AHEAD"]
+        retention = options["retention"] if options["retention"] is not None \
+            else config["RETENTION_MONTHS"]
+        now = datetime.now(timezone.utc)
+        created = create_future_partitions(now, int(ahead))
+        hours = rollup_hours(now, int(config["LATE_HOURS"]))
+        days = rollup_days(now)
+        pruned = prune_hours(now, int(config["HOURLY_ROLLUP_DAYS"]))
+        # Rollups are written first so a month is summarized before it's dropped.
+        dropped = drop_expired(now, int(retention))
+        changes = prune_changes(now)
+        self.stdout.write(
+            f"{len(created)} partitions created, {hours} hourly and {days} daily rollups "
+            f"written, {pruned} hourly rollups and {changes} report changes pruned, "
+            f"dropped: {', '.join(dropped) or 'none'}")
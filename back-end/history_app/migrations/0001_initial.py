@@ -0,0 +1,58 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Forecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('station', models.CharField(max_length=4)),
+                ('issue_time', models.DateTimeField()),
+                ('valid_from', models.DateTimeField(blank=True, null=True)),
+                ('valid_to', models.DateTimeField(blank=True, null=True)),
+                ('raw', models.TextField()),
+                ('modifier', models.CharField(blank=True, default='', max_length=3)),
+                ('max_wind_kt', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('min_visibility_sm', models.FloatField(blank=True, null=True)),
+                ('min_ceiling_ft', models.PositiveIntegerField(blank=True, null=True)),
+                ('flight_category', models.CharField(blank=True, default='', max_length=4)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Observation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('station', models.CharField(max_length=4)),
+                ('obs_time', models.DateTimeField()),
+                ('raw', models.TextField()),
+                ('wind_direction', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('wind_speed_kt', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('wind_gust_kt', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('visibility_sm', models.FloatField(blank=True, null=True)),
+                ('ceiling_ft', models.PositiveIntegerField(blank=True, null=True)),
+                ('temperature_c', models.SmallIntegerField(blank=True, null=True)),
+                ('dewpoint_c', models.SmallIntegerField(blank=True, null=True)),
+                ('altimeter_inhg', models.FloatField(blank=True, null=True)),
+                ('flight_category', models.CharField(blank=True, default='', max_length=4)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='forecast',
+            constraint=models.UniqueConstraint(models.F('station'), models.OrderBy(models.F('issue_time'), descending=True), name='unique forecast per station and time'),
+        ),
+        migrations.AddConstraint(
+            model_name='observation',
+            constraint=models.UniqueConstraint(models.F('station'), models.OrderBy(models.F('obs_time'), descending=True), name='unique observation per station and time'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObservationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('station', models.CharField(max_length=4)),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('period_start', models.DateTimeField()),
+                ('observations', models.PositiveIntegerField()),
+                ('min_ceiling_ft', models.PositiveIntegerField(blank=True, null=True)),
+                ('min_visibility_sm', models.FloatField(blank=True, null=True)),
+                ('max_gust_kt', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('hours_ifr', models.FloatField(default=0.0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='observationrollup',
+            constraint=models.UniqueConstraint(fields=('station', 'period', 'period_start'), name='unique rollup per station and period'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+"""Partitions the Observation table by month of obs_time on PostgreSQL.
+
+A partitioned table needs its primary key to include the partition key and, before
+PostgreSQL 17, can't have an identity column, so id is given a sequence default and the
+primary key becomes (id, obs_time). The columns' defaults and CHECK constraints are
+kept. Stored rows are copied into monthly partitions.
+Other databases are left unpartitioned.
+"""
+
+from datetime import datetime, timezone
+from django.db import migrations
+
+TABLE = "history_app_observation"
+PARTITIONS_AHEAD = 3
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_observations(apps, schema_editor) -> None:
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    now = datetime.now(timezone.utc)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned")
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {TABLE}_unpartitioned "
+                       f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (obs_time)")
+        cursor.execute(f"SELECT min(obs_time), max(obs_time) FROM {TABLE}_unpartitioned")
+        first, last = cursor.fetchone()
+        current = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+        month = min(_add_months(first, 0) if first else current, current)
+        last = max(last or current, _add_months(current, PARTITIONS_AHEAD))
+        while month <= last:
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_y{month:%Y}m{month:%m} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') "
+                f"TO ('{_add_months(month, 1):%Y-%m-%d} 00:00:00+00')")
+            month = _add_months(month, 1)
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_unpartitioned")
+        cursor.execute(f"DROP TABLE {TABLE}_unpartitioned")
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(f"SELECT setval('{TABLE}_id_seq', coalesce(max(id), 0) + 1, false) "
+                       f"FROM {TABLE}")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT "
+                       f"nextval('{TABLE}_id_seq')")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, obs_time)")
+        cursor.execute(f'CREATE UNIQUE INDEX "unique observation per station and time" '
+                       f'ON {TABLE} (station, obs_time DESC)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history_app', '0002_observationrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_observations, migrations.RunPython.noop),
+    ]
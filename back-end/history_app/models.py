@@ -0,0 +1,180 @@
+"""All models within the History app.
+
+Classes:
+    Observation
+    Forecast
+    ObservationRollup
+"""
+
+from django.db import models
+from django.db.models import F
+
+
+class Observation(models.Model):
+    """A METAR as it was fetched, with its key values decoded into columns.
+
+    There is one row per station and observation time, and the unique index on them is
+    kept newest first, so a station's latest observations are read straight off it.
+
+    Extends:
+        Model (class): The django Model class.
+
+    Attributes:
+        station: str
+            The ICAO code.
+        obs_time: datetime
+            When the observation was made.
+        raw: str
+            The report as received.
+        wind_direction: int | None
+            The true wind direction in degrees, None when variable.
+        wind_speed_kt: int | None
+            The sustained wind speed in knots.
+        wind_gust_kt: int | None
+            The gust speed in knots.
+        visibility_sm: float | None
+            The prevailing visibility in statute miles.
+        ceiling_ft: int | None
+            The height of the lowest broken, overcast or obscured layer.
+        temperature_c: int | None
+            The temperature in degrees Celsius.
+        dewpoint_c: int | None
+            The dew point in degrees Celsius.
+        altimeter_inhg: float | None
+            The altimeter setting in inches of mercury.
+        flight_category: str
+            "VFR", "MVFR", "IFR", "LIFR", or blank when it can't be told.
+        received_at: datetime
+            When the report was first stored.
+    """
+
+    station = models.CharField(max_length=4)
+    obs_time = models.DateTimeField()
+    raw = models.TextField()
+    wind_direction = models.PositiveSmallIntegerField(null=True, blank=True)
+    wind_speed_kt = models.PositiveSmallIntegerField(null=True, blank=True)
+    wind_gust_kt = models.PositiveSmallIntegerField(null=True, blank=True)
+    visibility_sm = models.FloatField(null=True, blank=True)
+    ceiling_ft = models.PositiveIntegerField(null=True, blank=True)
+    temperature_c = models.SmallIntegerField(null=True, blank=True)
+    dewpoint_c = models.SmallIntegerField(null=True, blank=True)
+    altimeter_inhg = models.FloatField(null=True, blank=True)
+    flight_category = models.CharField(max_length=4, blank=True, default="")
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # On PostgreSQL the table is partitioned by month of obs_time, see partitions.py.
+        constraints = [
+            models.UniqueConstraint(
+                F('station'), F('obs_time').desc(), name='unique observation per station and time')
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.station} at {self.obs_time:%Y-%m-%d %H:%MZ}: {self.flight_category or '?'}"
+
+
+class Forecast(models.Model):
+    """A TAF as it was fetched, with the worst of its forecast decoded into columns.
+
+    There is one row per station and issue time, and the unique index on them is kept
+    newest first, so a station's latest forecasts are read straight off it.
+
+    Extends:
+        Model (class): The django Model class.
+
+    Attributes:
+        station: str
+            The ICAO code.
+        issue_time: datetime
+            When the forecast was issued.
+        valid_from: datetime | None
+            The start of the forecast's validity.
+        valid_to: datetime | None
+            The end of the forecast's validity.
+        raw: str
+            The report as received.
+        modifier: str
+            "AMD" or "COR" for amended or corrected forecasts, otherwise blank.
+        max_wind_kt: int | None
+            The strongest wind or gust forecast, in knots.
+        min_visibility_sm: float | None
+            The lowest visibility forecast, in statute miles.
+        min_ceiling_ft: int | None
+            The lowest ceiling forecast.
+        flight_category: str
+            The worst flight category forecast, or blank when it can't be told.
+        received_at: datetime
+            When the report was first stored.
+    """
+
+    station = models.CharField(max_length=4)
+    issue_time = models.DateTimeField()
+    valid_from = models.DateTimeField(null=True, blank=True)
+    valid_to = models.DateTimeField(null=True, blank=True)
+    raw = models.TextField()
+    modifier = models.CharField(max_length=3, blank=True, default="")
+    max_wind_kt = models.PositiveSmallIntegerField(null=True, blank=True)
+    min_visibility_sm = models.FloatField(null=True, blank=True)
+    min_ceiling_ft = models.PositiveIntegerField(null=True, blank=True)
+    flight_category = models.CharField(max_length=4, blank=True, default="")
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                F('station'), F('issue_time').desc(), name='unique forecast per station and time')
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.station} issued {self.issue_time:%Y-%m-%d %H:%MZ}"
+
+
+class ObservationRollup(models.Model):
+    """The observations of one station over an hour or a day, summarized.
+
+    Rollups outlive the observations they summarize, so trends are read from them
+    however short the observations are kept.
+
+    Extends:
+        Model (class): The django Model class.
+
+    Attributes:
+        station: str
+            The ICAO code.
+        period: str
+            "hour" or "day".
+        period_start: datetime
+            The start of the hour or day, in UTC.
+        observations: int
+            The observations summarized.
+        min_ceiling_ft: int | None
+            The lowest ceiling reported, None if there was never one.
+        min_visibility_sm: float | None
+            The lowest visibility reported, in statute miles.
+        max_gust_kt: int | None
+            The strongest gust reported, or the strongest wind where none gusted.
+        hours_ifr: float
+            The hours spent in IFR or LIFR, taking each hour's share of IFR or LIFR
+            observations.
+    """
+
+    PERIODS = [("hour", "Hour"), ("day", "Day")]
+
+    station = models.CharField(max_length=4)
+    period = models.CharField(max_length=4, choices=PERIODS)
+    period_start = models.DateTimeField()
+    observations = models.PositiveIntegerField()
+    min_ceiling_ft = models.PositiveIntegerField(null=True, blank=True)
+    min_visibility_sm = models.FloatField(null=True, blank=True)
+    max_gust_kt = models.PositiveSmallIntegerField(null=True, blank=True)
+    hours_ifr = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['station', 'period', 'period_start'],
+                name='unique rollup per station and period')
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.station} {self.period} of {self.period_start:%Y-%m-%d %H:%MZ}"
@@ -0,0 +1,157 @@
+"""Monthly range partitions of the Observation table on PostgreSQL.
+
+The table is partitioned by obs_time, one partition per calendar month in UTC, named
+history_app_observation_yYYYYmMM. Partitions are created ahead of time by the
+maintenance job and, as a fallback, for the months of each batch before it's written.
+Old months are removed by dropping their partition, which is instant and leaves no
+dead rows to vacuum, rather than by DELETE. On other databases the table isn't
+partitioned and old rows are deleted instead.
+
+Methods:
+    is_partitioned() -> bool
+    month_start(time) -> datetime
+    add_months(month, count) -> datetime
+    partition_name(month) -> str
+    ensure_partitions(times) -> list[str]
+    create_future_partitions(now, ahead) -> list[str]
+    partition_months() -> list[datetime]
+    drop_expired(now, retention_months) -> list[str]
+"""
+
+import re
+from datetime import datetime, timezone
+from django.db import DatabaseError, connection, transaction
+from .models import Observation
+
+TABLE = Observation._meta.db_table
+PARTITION_PATTERN = re.compile(rf"^{TABLE}_y(\d{{4}})m(\d\d)$")
+
+
+def is_partitioned() -> bool:
+    """Checks whether the Observation table is a partitioned PostgreSQL table."""
+
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+                       [TABLE])
+        return cursor.fetchone() is not None
+
+
+def month_start(time: datetime) -> datetime:
+    """Gets midnight UTC on the first of a time's month."""
+
+    time = time.astimezone(timezone.utc)
+    return datetime(time.year, time.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    """Moves the first of a month forwards, or backwards, by whole months."""
+
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    """Gets the name of a month's partition."""
+
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def _create(month: datetime) -> bool:
+    """Creates a month's partition unless it exists; returns whether it was created."""
+
+    name = partition_name(month)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        try:
+            # Another worker may create the same partition at the same moment.
+            with transaction.atomic():
+                cursor.execute(
+                    f"CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF "
+                    f"{connection.ops.quote_name(TABLE)} "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') "
+                    f"TO ('{add_months(month, 1):%Y-%m-%d} 00:00:00+00')")
+        except DatabaseError:
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                raise
+            return False
+    return True
+
+
+def ensure_partitions(times: list[datetime]) -> list[str]:
+    """Creates the partitions rows at these times will go to, where they're missing.
+
+    Args:
+        times (list[datetime]): The obs_time of each row about to be written.
+
+    Returns:
+        list[str]: The partitions created.
+    """
+
+    if not times or not is_partitioned():
+        return []
+    months = sorted({month_start(time) for time in times})
+    return [partition_name(month) for month in months if _create(month)]
+
+
+def create_future_partitions(now: datetime | None = None, ahead: int = 3) -> list[str]:
+    """Creates the partitions of the current month and the next few.
+
+    Args:
+        now (datetime | None): The current UTC time.
+        ahead (int): The months after the current one to create.
+
+    Returns:
+        list[str]: The partitions created.
+    """
+
+    if not is_partitioned():
+        return []
+    current = month_start(now or datetime.now(timezone.utc))
+    months = [add_months(current, offset) for offset in range(ahead + 1)]
+    return [partition_name(month) for month in months if _create(month)]
+
+
+def partition_months() -> list[datetime]:
+    """Gets the month of every partition of the Observation table, oldest first."""
+
+    if not is_partitioned():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT inhrelid::regclass::text FROM pg_inherits "
+                       "WHERE inhparent = to_regclass(%s)", [TABLE])
+        names = [row[0].strip('"') for row in cursor.fetchall()]
+    matches = [PARTITION_PATTERN.match(name) for name in names]
+    return sorted(datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)
+                  for match in matches if match)
+
+
+def drop_expired(now: datetime | None = None, retention_months: int = 3) -> list[str]:
+    """Removes the observations of months that have fallen out of the retention window.
+
+    The current month and the retention_months before it are kept.
+
+    Args:
+        now (datetime | None): The current UTC time.
+        retention_months (int): The whole months kept before the current one.
+
+    Returns:
+        list[str]: The partitions dropped, or on an unpartitioned table a note of the
+        rows deleted.
+    """
+
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -retention_months)
+    if not is_partitioned():
+        deleted, _ = Observation.objects.filter(obs_time__lt=cutoff).delete()
+        return [f"{deleted} rows before {cutoff:%Y-%m}"] if deleted else []
+    dropped = []
+    with connection.cursor() as cursor:
+        for month in partition_months():
+            if month < cutoff:
+                cursor.execute(f"DROP TABLE {connection.ops.quote_name(partition_name(month))}")
+                dropped.append(partition_name(month))
+    return dropped
@@ -0,0 +1,112 @@
+"""Summarizes stored observations into hourly and daily rollups.
+
+Hours are rolled up from the observations once they're over, and days from the hours,
+so a day's rollup is rewritten as its hours come in. Each run starts a few hours before
+the newest rollup, so a report stored late still counts, and rows are upserted on
+station, period and start.
+
+Methods:
+    rollup_hours(now, late_hours) -> int
+    rollup_days(now) -> int
+    prune_hours(now, days) -> int
+"""
+
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from .ingest import DEFAULT_CONFIG
+from .models import Observation, ObservationRollup
+
+IFR_CATEGORIES = ("IFR", "LIFR")
+UPDATE_FIELDS = ["observations", "min_ceiling_ft", "min_visibility_sm", "max_gust_kt",
+                 "hours_ifr"]
+
+
+def _write(rollups: list[ObservationRollup]) -> int:
+    config = {**DEFAULT_CONFIG, **getattr(settings, "WEATHER_HISTORY", {})}
+    ObservationRollup.objects.bulk_create(
+        rollups, batch_size=int(config["BATCH_SIZE"]), update_conflicts=True,
+        unique_fields=["station", "period", "period_start"], update_fields=UPDATE_FIELDS)
+    return len(rollups)
+
+
+def rollup_hours(now: datetime | None = None, late_hours: int = 2) -> int:
+    """Rolls up every hour that's over since the last run.
+
+    Args:
+        now (datetime | None): The current UTC time; the hour it falls in isn't rolled up.
+        late_hours (int): The hours before the newest rollup to roll up again, for
+        reports stored late.
+
+    Returns:
+        int: The hourly rollups written.
+    """
+
+    until = (now or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+    latest = ObservationRollup.objects.filter(period="hour").aggregate(
+        start=Max("period_start"))["start"]
+    observations = Observation.objects.filter(obs_time__lt=until)
+    if latest is not None:
+        observations = observations.filter(obs_time__gte=latest - timedelta(hours=late_hours))
+    hours = observations.annotate(
+        start=TruncHour("obs_time", tzinfo=timezone.utc)
+    ).values("station", "start").annotate(
+        count=Count("id"), ceiling=Min("ceiling_ft"), visibility=Min("visibility_sm"),
+        gust=Max(Coalesce("wind_gust_kt", "wind_speed_kt")),
+        ifr=Count("id", filter=Q(flight_category__in=IFR_CATEGORIES)))
+    return _write([
+        ObservationRollup(
+            station=hour["station"], period="hour", period_start=hour["start"],
+            observations=hour["count"], min_ceiling_ft=hour["ceiling"],
+            min_visibility_sm=hour["visibility"], max_gust_kt=hour["gust"],
+            hours_ifr=round(hour["ifr"] / hour["count"], 3))
+        for hour in hours])
+
+
+def rollup_days(now: datetime | None = None) -> int:
+    """Rolls up the hourly rollups of the newest rolled up day onwards into days.
+
+    Args:
+        now (datetime | None): The current UTC time; only hours before it are counted.
+
+    Returns:
+        int: The daily rollups written.
+    """
+
+    now = now or datetime.now(timezone.utc)
+    latest = ObservationRollup.objects.filter(period="day").aggregate(
+        start=Max("period_start"))["start"]
+    hours = ObservationRollup.objects.filter(period="hour", period_start__lt=now)
+    if latest is not None:
+        hours = hours.filter(period_start__gte=latest)
+    days = hours.annotate(
+        start=TruncDay("period_start", tzinfo=timezone.utc)
+    ).values("station", "start").annotate(
+        count=Sum("observations"), ceiling=Min("min_ceiling_ft"),
+        visibility=Min("min_visibility_sm"), gust=Max("max_gust_kt"),
+        ifr=Sum("hours_ifr"))
+    return _write([
+        ObservationRollup(
+            station=day["station"], period="day", period_start=day["start"],
+            observations=day["count"], min_ceiling_ft=day["ceiling"],
+            min_visibility_sm=day["visibility"], max_gust_kt=day["gust"],
+            hours_ifr=round(day["ifr"], 3))
+        for day in days])
+
+
+def prune_hours(now: datetime | None = None, days: int = 90) -> int:
+    """Deletes the hourly rollups of days that have been rolled up long ago.
+
+    Args:
+        now (datetime | None): The current UTC time.
+        days (int): The days of hourly rollups kept.
+
+    Returns:
+        int: The hourly rollups deleted.
+    """
+
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+    deleted, _ = ObservationRollup.objects.filter(
+        period="hour", period_start__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,20 @@
+from rest_framework.serializers import ModelSerializer
+from .models import Observation, Forecast, ObservationRollup
+
+
+class ObservationSerializer(ModelSerializer):
+    class Meta:
+        model = Observation
+        exclude = ["id", "received_at"]
+
+
+class ForecastSerializer(ModelSerializer):
+    class Meta:
+        model = Forecast
+        exclude = ["id", "received_at"]
+
+
+class ObservationRollupSerializer(ModelSerializer):
+    class Meta:
+        model = ObservationRollup
+        exclude = ["id", "station", "period"]
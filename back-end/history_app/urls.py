@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import Station_history, Station_latest, Station_trend
+
+urlpatterns = [
+    path('<str:icao>/latest/', Station_latest.as_view(), name="station_latest"),
+    path('<str:icao>/trend/', Station_trend.as_view(), name="station_trend"),
+    path('<str:icao>/<str:kind>/', Station_history.as_view(), name="station_history"),
+]
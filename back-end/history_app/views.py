@@ -0,0 +1,149 @@
+"""Views that serve the stored METAR and TAF history from the database.
+
+Classes:
+    Station_latest
+    Station_history
+    Station_trend
+"""
+
+from datetime import timedelta
+from django.http import HttpRequest
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+)
+from user_app.views import TokenReq
+from .models import Observation, Forecast, ObservationRollup
+from .serializers import ObservationSerializer, ForecastSerializer, ObservationRollupSerializer
+
+MAX_HOURS = 24 * 30
+HISTORY = {
+    "metars": (Observation, ObservationSerializer, "obs_time"),
+    "tafs": (Forecast, ForecastSerializer, "issue_time"),
+}
+MAX_TREND_DAYS = {"hour": 31, "day": 366}
+
+
+class Station_latest(TokenReq):
+    """The view that holds the method to get a station's latest stored reports.
+
+    Extends:
+        TokenReq (class): The class that enables the view with proper authentication
+        and permissions.
+
+    Methods:
+        get(request, icao) -> Response
+    """
+
+    def get(self, request: HttpRequest, icao: str) -> Response:
+        """Gets the newest stored METAR and TAF of a station, without going upstream.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication.
+            icao (str): The station's ICAO code.
+
+        Returns:
+            Response: The latest "metar" and "taf" rows, either of which may be None,
+            and proper HTTP status code.
+        """
+
+        code = icao.strip().upper()
+        observation = Observation.objects.filter(station=code).order_by("-obs_time").first()
+        forecast = Forecast.objects.filter(station=code).order_by("-issue_time").first()
+        if observation is None and forecast is None:
+            return Response({'Error': 'No reports are stored for that ICAO code.'},
+                            status=HTTP_404_NOT_FOUND)
+        return Response({
+            "metar": ObservationSerializer(observation).data if observation else None,
+            "taf": ForecastSerializer(forecast).data if forecast else None,
+        }, status=HTTP_200_OK)
+
+
+class Station_history(TokenReq):
+    """The view that holds the method to get a station's stored METARs or TAFs.
+
+    Extends:
+        TokenReq (class): The class that enables the view with proper authentication
+        and permissions.
+
+    Methods:
+        get(request, icao, kind) -> Response
+    """
+
+    def get(self, request: HttpRequest, icao: str, kind: str) -> Response:
+        """Gets a station's stored reports of the last few hours, newest first.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication,
+            optionally with "hours" (1-720, 24 by default) to look back.
+            icao (str): The station's ICAO code.
+            kind (str): "metars" or "tafs".
+
+        Returns:
+            Response: The stored reports with their decoded columns and proper HTTP
+            status code.
+        """
+
+        hours = request.query_params.get("hours", "24")
+        if kind not in HISTORY or not hours.isdigit() or not 1 <= int(hours) <= MAX_HOURS:
+            return Response(
+                {'Error': f'Ask for metars or tafs, and hours between 1 and {MAX_HOURS}.'},
+                status=HTTP_400_BAD_REQUEST)
+        model, serializer, time_field = HISTORY[kind]
+        since = timezone.now() - timedelta(hours=int(hours))
+        reports = model.objects.filter(
+            station=icao.strip().upper(), **{f"{time_field}__gte": since}
+        ).order_by(f"-{time_field}")
+        return Response(serializer(reports, many=True).data, status=HTTP_200_OK)
+
+
+class Station_trend(TokenReq):
+    """The view that holds the method to get a station's hourly or daily rollups.
+
+    Extends:
+        TokenReq (class): The class that enables the view with proper authentication
+        and permissions.
+
+    Methods:
+        get(request, icao) -> Response
+    """
+
+    def get(self, request: HttpRequest, icao: str) -> Response:
+        """Gets a station's rollups of the last few days, oldest first.
+
+        Trends are read from the rollups alone, so they cover days whose observations
+        have already been dropped and cost the same whatever the retention.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication,
+            optionally with "period" ("day" by default, or "hour") and "days" (30 by
+            default, up to 366 days or 31 of hours) to look back.
+            icao (str): The station's ICAO code.
+
+        Returns:
+            Response: The "station", "period" and "rollups", each with its start, number
+            of observations, lowest ceiling and visibility, strongest gust and hours IFR,
+            and proper HTTP status code.
+        """
+
+        period = request.query_params.get("period", "day")
+        days = request.query_params.get("days", "30")
+        if period not in MAX_TREND_DAYS or not days.isdigit() \
+                or not 1 <= int(days) <= MAX_TREND_DAYS[period]:
+            return Response(
+                {'Error': 'Ask for a period of day, with up to 366 days, or hour, with up '
+                          'to 31 days.'},
+                status=HTTP_400_BAD_REQUEST)
+        code = icao.strip().upper()
+        since = timezone.now() - timedelta(days=int(days))
+        rollups = ObservationRollup.objects.filter(
+            station=code, period=period, period_start__gte=since
+        ).order_by("period_start")
+        return Response({
+            "station": code,
+            "period": period,
+            "rollups": ObservationRollupSerializer(rollups, many=True).data,
+        }, status=HTTP_200_OK)
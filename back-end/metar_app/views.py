@@ -1,50 +1,87 @@
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
-from dotenv import load_dotenv
-import requests
-import os
-import json
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_502_BAD_GATEWAY,
+)
 from decimal import Decimal
-from user_app.views import TokenReq
+from user_app.views import AsyncTokenReq
+from weather_app.client import UpstreamError
+from weather_app.metar import decode_metar
+from weather_app.services import (
+    split_codes,
+    acached_reports,
+    afetch_misses,
+    afetch_metar_near,
+    UNAVAILABLE,
+    INVALID,
+)
+from weather_app.views import (
+    set_cache_headers,
+    set_validators,
+    not_modified,
+    parse_coordinate,
+    anearest_report_response,
+    wants_decoded,
+)
 
 
-class A_airport_metar(TokenReq):
+class A_airport_metar(AsyncTokenReq):
     # TODO: Make sure to include on front end that multiple stations can be checked
     # by input of multiple icao_codes with comma delimiter
     # Example: KJFK,KLAX,KMIA
-    def get(self, request, icao):
-        load_dotenv()
-        endpoint = f"https://api.checkwx.com/metar/{icao}"
-        response = requests.get(
-            endpoint, headers={"X-API-Key": os.environ['CHECK_WX_KEY']})
-        responseJSON = response.json()
-        if responseJSON['results'] == 0:
-            return Response(
-                json.loads(
-                    json.dumps(
-                        {'Error': 'That ICAO code does not match any results.'})),
-                status=HTTP_404_NOT_FOUND)
-        lst_of_codes = icao.split(",")
-        client_response = {}
-        for idx, code in enumerate(lst_of_codes):
-            client_response[code.upper()] = responseJSON['data'][idx]
-        return Response(client_response, status=HTTP_200_OK)
+    # Add ?decoded=1 to get each METAR decoded into its groups rather than as raw text.
+    # Polling with If-None-Match or If-Modified-Since gets a 304 while the cached
+    # METARs are unchanged, without going upstream.
+    async def get(self, request, icao):
+        variant = "metar:decoded" if wants_decoded(request) else "metar"
+        lookup = await acached_reports("metar", split_codes(icao))
+        unchanged = not_modified(request, variant, lookup)
+        if unchanged is not None:
+            return unchanged
+        lookup = await afetch_misses("metar", lookup)
+        if not lookup.entries:
+            if UNAVAILABLE in lookup.errors.values():
+                return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+            if set(lookup.errors.values()) == {INVALID}:
+                return Response({'Error': INVALID}, status=HTTP_400_BAD_REQUEST)
+            return Response({'Error': 'That ICAO code does not match any results.'},
+                            status=HTTP_404_NOT_FOUND)
+        if variant == "metar:decoded":
+            client_response = {code: decode_metar(entry['raw']).as_dict()
+                               for code, entry in lookup.entries.items()}
+        else:
+            client_response = {code: entry['raw']
+                               for code, entry in lookup.entries.items()}
+        if lookup.errors:
+            client_response['errors'] = lookup.errors
+        return set_validators(
+            set_cache_headers(Response(client_response, status=HTTP_200_OK), lookup),
+            variant, lookup)
 
 
-class A_coordinate_metar(TokenReq):
-    def get(self, request, lat, lon):
-        load_dotenv()
+class A_coordinate_metar(AsyncTokenReq):
+    async def get(self, request, lat, lon):
+        coordinate = parse_coordinate(lat, lon)
+        if coordinate is None:
+            return Response({'Error': 'The latitude and longitude must be decimal degrees.'},
+                            status=HTTP_400_BAD_REQUEST)
+        response = await anearest_report_response(request, "metar", *coordinate)
+        if response is not None:
+            if wants_decoded(request) and response.status_code == HTTP_200_OK:
+                response.data = decode_metar(response.data).as_dict()
+            return response
+        # No catalogued station nearby has a report, so ask CheckWX for the nearest one.
         request_lat = str(round(Decimal(lat), 2))
         request_lon = str(round(Decimal(lon), 2))
-        endpoint = f"""https://api.checkwx.com/metar/lat/{
-            request_lat}/lon/{request_lon}/"""
-        response = requests.get(
-            endpoint, headers={"X-API-Key": os.environ['CHECK_WX_KEY']})
-        responseJSON = response.json()
-        if responseJSON['results'] == 0:
-            return Response(
-                json.loads(
-                    json.dumps(
-                        {'Error': 'That location does not have a nearby airport putting out METARs.'})),
-                status=HTTP_404_NOT_FOUND)
+        try:
+            responseJSON = await afetch_metar_near(request_lat, request_lon)
+        except UpstreamError:
+            return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+        if not responseJSON.get('data'):
+            return Response({'Error': 'That location does not have a nearby airport putting out METARs.'},
+                            status=HTTP_404_NOT_FOUND)
+        if wants_decoded(request):
+            return Response(decode_metar(responseJSON['data'][0]).as_dict(), status=HTTP_200_OK)
         return Response(responseJSON['data'][0], status=HTTP_200_OK)
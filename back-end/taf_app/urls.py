@@ -1,9 +1,18 @@
 from django.urls import path
-from .views import A_airport_taf, A_coordinate_taf
+from .views import (
+    A_airport_taf,
+    A_airport_taf_conditions,
+    A_coordinate_taf,
+    A_flight_taf_conditions,
+)
 
 urlpatterns = [
     # The API endpoints for all TAF methods and functionality.
     path('airports/<str:icao>/', A_airport_taf.as_view(), name="a_airport_taf"),
+    path('airports/<str:icao>/conditions/', A_airport_taf_conditions.as_view(),
+         name="a_airport_taf_conditions"),
+    path('flights/<int:flight_id>/conditions/', A_flight_taf_conditions.as_view(),
+         name="a_flight_taf_conditions"),
     path('lat/<str:lat>/lon/<str:lon>/',
          A_coordinate_taf.as_view(), name="a_coordinate_taf")
 ]
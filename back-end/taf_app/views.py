@@ -1,24 +1,49 @@
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_502_BAD_GATEWAY,
+)
 from django.http import HttpRequest
-from dotenv import load_dotenv
-import requests
-import os
-import json
+from asgiref.sync import sync_to_async
+from datetime import datetime, timezone
 from decimal import Decimal
-from user_app.views import TokenReq
+from user_app.views import AsyncTokenReq
+from weather_app.client import UpstreamError
+from weather_app.services import (
+    split_codes,
+    aget_reports,
+    acached_reports,
+    afetch_misses,
+    afetch_taf_near,
+    Lookup,
+    UNAVAILABLE,
+    INVALID,
+)
+from weather_app.taf import get_taf, resolve_time
+from weather_app.views import (
+    set_cache_headers,
+    set_validators,
+    not_modified,
+    parse_coordinate,
+    anearest_report_response,
+)
 
 
-class A_airport_taf(TokenReq):
+class A_airport_taf(AsyncTokenReq):
     """The view that holds the method to get TAF data for an Airport.
 
     Args:
-        TokenReq (class): The class that enables the view with proper authentication and permissions.
+        AsyncTokenReq (class): The class that enables the async view with proper authentication and permissions.
     """
 
-    def get(self, request: HttpRequest, icao: str) -> Response:
+    async def get(self, request: HttpRequest, icao: str) -> Response:
         """Gets the lastest TAF for an Airport.
 
+        A request with If-None-Match or If-Modified-Since gets a 304, without going
+        upstream, while the cached TAFs are unchanged.
+
         Args:
             request (HttpRequest): The request from the frontend with data and proper authentication.
             icao (str): The Airport's ICAO code.
@@ -27,36 +52,41 @@ class A_airport_taf(TokenReq):
             Response: The TAF and proper HTTP status code.
         """
 
-        load_dotenv()
-        endpoint = f"https://api.checkwx.com/taf/{icao}"
-        response = requests.get(
-            endpoint, headers={"X-API-Key": os.environ['CHECK_WX_KEY']})
-        responseJSON = response.json()
-        if responseJSON['results'] == 0:
-            return Response(
-                json.loads(
-                    json.dumps(
-                        {'Error': 'That ICAO code does not match any results.'}
-                    )
-                ), status=HTTP_404_NOT_FOUND
-            )
-        lst_of_codes = icao.split(",")
-        client_response = {}
-        for idx, code in enumerate(lst_of_codes):
-            client_response[code.upper()] = responseJSON['data'][idx]
-        return Response(client_response, status=HTTP_200_OK)
-
-
-class A_coordinate_taf(TokenReq):
+        lookup = await acached_reports("taf", split_codes(icao))
+        unchanged = not_modified(request, "taf", lookup)
+        if unchanged is not None:
+            return unchanged
+        lookup = await afetch_misses("taf", lookup)
+        if not lookup.entries:
+            if UNAVAILABLE in lookup.errors.values():
+                return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+            if set(lookup.errors.values()) == {INVALID}:
+                return Response({'Error': INVALID}, status=HTTP_400_BAD_REQUEST)
+            return Response({'Error': 'That ICAO code does not match any results.'},
+                            status=HTTP_404_NOT_FOUND)
+        client_response = {code: entry['raw']
+                           for code, entry in lookup.entries.items()}
+        if lookup.errors:
+            client_response['errors'] = lookup.errors
+        return set_validators(
+            set_cache_headers(Response(client_response, status=HTTP_200_OK), lookup),
+            "taf", lookup)
+
+
+class A_coordinate_taf(AsyncTokenReq):
     """The view that holds the method to get TAF data for a Named Location.
 
     Args:
-        TokenReq (class): The class that enables the view with proper authentication.
+        AsyncTokenReq (class): The class that enables the async view with proper authentication.
     """
 
-    def get(self, request: HttpRequest, lat: str, lon: str) -> Response:
+    async def get(self, request: HttpRequest, lat: str, lon: str) -> Response:
         """Gets the latest TAF for a Named Location.
 
+        The coordinate is resolved to the nearest catalogued stations issuing TAFs, whose
+        reports come from the same per-ICAO cache as the Airport lookups. CheckWX is only
+        asked for the nearest station when none of them nearby has a TAF.
+
         Args:
             request (HttpRequest): The request from the frontend with data and proper authentication.
             lat (str): The latitude of the Named Location.
@@ -66,18 +96,127 @@ class A_coordinate_taf(TokenReq):
             Response: The TAF and proper HTTP status code.
         """
 
-        load_dotenv()
+        coordinate = parse_coordinate(lat, lon)
+        if coordinate is None:
+            return Response({'Error': 'The latitude and longitude must be decimal degrees.'},
+                            status=HTTP_400_BAD_REQUEST)
+        response = await anearest_report_response(request, "taf", *coordinate)
+        if response is not None:
+            return response
+        # No catalogued station nearby has a report, so ask CheckWX for the nearest one.
         request_lat = str(round(Decimal(lat), 2))
         request_lon = str(round(Decimal(lon), 2))
-        endpoint = f"""https://api.checkwx.com/taf/lat/{
-            request_lat}/lon/{request_lon}/"""
-        response = requests.get(
-            endpoint, headers={"X-API-Key": os.environ['CHECK_WX_KEY']})
-        responseJSON = response.json()
-        if responseJSON['results'] == 0:
-            return Response(
-                json.loads(
-                    json.dumps(
-                        {'Error': 'That location does not have a nearby airport putting out TAFs.'})),
-                status=HTTP_404_NOT_FOUND)
+        try:
+            responseJSON = await afetch_taf_near(request_lat, request_lon)
+        except UpstreamError:
+            return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+        if not responseJSON.get('data'):
+            return Response({'Error': 'That location does not have a nearby airport putting out TAFs.'},
+                            status=HTTP_404_NOT_FOUND)
         return Response(responseJSON['data'][0], status=HTTP_200_OK)
+
+
+def outlooks_response(lookup: Lookup, start: str, end: str) -> Response:
+    """Answers a time window query on each station's decoded TAF.
+
+    Args:
+        lookup (Lookup): The TAF lookup of the stations.
+        start (str): The start of the window as ISO 8601, DDHHMMZ or HHMMZ.
+        end (str): The end of the window, or the same as start for a point in time.
+
+    Returns:
+        Response: Each station's raw TAF, validity and outlook for the window, with the
+        stations whose TAF doesn't cover it listed under "errors".
+    """
+
+    if not lookup.entries:
+        if UNAVAILABLE in lookup.errors.values():
+            return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+        if set(lookup.errors.values()) == {INVALID}:
+            return Response({'Error': INVALID}, status=HTTP_400_BAD_REQUEST)
+        return Response({'Error': 'That ICAO code does not match any results.'},
+                        status=HTTP_404_NOT_FOUND)
+    now = datetime.now(timezone.utc)
+    client_response, errors = {}, dict(lookup.errors)
+    for code, entry in lookup.entries.items():
+        taf = get_taf(entry['raw'], now)
+        outlook = None
+        if taf.valid_from is not None:
+            window = (resolve_time(start, taf.valid_from), resolve_time(end, taf.valid_from))
+            outlook = taf.conditions_at(window[0]) if start == end \
+                else taf.worst_between(*window)
+        if outlook is None:
+            errors[code] = 'The TAF does not cover that time.'
+            continue
+        client_response[code] = {'raw': taf.raw, 'issued': taf.issued,
+                                 'valid_from': taf.valid_from, 'valid_to': taf.valid_to,
+                                 **outlook.as_dict()}
+    if not client_response:
+        return Response({'Error': 'No TAF covers that time.', 'errors': errors},
+                        status=HTTP_404_NOT_FOUND)
+    if errors:
+        client_response['errors'] = errors
+    return set_cache_headers(Response(client_response, status=HTTP_200_OK), lookup)
+
+
+class A_airport_taf_conditions(AsyncTokenReq):
+    """The view that holds the method to get the forecast conditions for a time window.
+
+    Args:
+        AsyncTokenReq (class): The class that enables the async view with proper authentication and permissions.
+    """
+
+    async def get(self, request: HttpRequest, icao: str) -> Response:
+        """Gets the forecast conditions at an Airport at a time or within a time window.
+
+        Pass ?at=1430Z for a point in time, or ?from= and ?to= for the worst conditions
+        within a window. Times are ISO 8601, DDHHMMZ or HHMMZ; day and time-of-day only
+        forms are the next such time from the start of each TAF's validity.
+
+        Args:
+            request (HttpRequest): The request from the frontend with data and proper authentication.
+            icao (str): The Airport's ICAO code, or several comma delimited.
+
+        Returns:
+            Response: Each Airport's outlook and proper HTTP status code.
+        """
+
+        start = request.query_params.get('at') or request.query_params.get('from')
+        end = request.query_params.get('at') or request.query_params.get('to')
+        now = datetime.now(timezone.utc)
+        if not start or not end or resolve_time(start, now) is None \
+                or resolve_time(end, now) is None:
+            return Response(
+                {'Error': 'Pass ?at= or ?from= and ?to= as ISO 8601, DDHHMMZ or HHMMZ times.'},
+                status=HTTP_400_BAD_REQUEST)
+        lookup = await aget_reports("taf", split_codes(icao))
+        return outlooks_response(lookup, start, end)
+
+
+class A_flight_taf_conditions(AsyncTokenReq):
+    """The view that holds the method to brief a Flight's forecast conditions.
+
+    Args:
+        AsyncTokenReq (class): The class that enables the async view with proper authentication and permissions.
+    """
+
+    async def get(self, request: HttpRequest, flight_id: int) -> Response:
+        """Gets the worst forecast conditions at a Flight's origin and destination.
+
+        Both are queried for the window between the Flight's takeoff and arrival times.
+
+        Args:
+            request (HttpRequest): The request from the frontend with data and proper authentication.
+            flight_id (int): The Flight's id.
+
+        Returns:
+            Response: The origin's and destination's outlooks and proper HTTP status code.
+        """
+
+        flight = await sync_to_async(request.user.flights.filter(id=flight_id).first)()
+        if flight is None:
+            return Response({'Error': 'That flight does not exist.'},
+                            status=HTTP_404_NOT_FOUND)
+        lookup = await aget_reports("taf", split_codes(f"{flight.origin},{flight.destination}"))
+        return outlooks_response(lookup, flight.takeoff_time.isoformat(),
+                                 flight.arrival_time.isoformat())
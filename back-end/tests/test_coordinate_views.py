@@ -0,0 +1,135 @@
+"""Module that tests the Coordinate view against the local mock upstream.
+
+Classes:
+    TestCoordinateViews
+"""
+
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from coordinate_app.geocoding import geocoder, normalize
+from coordinate_app.models import Geocode
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+class TestCoordinateViews(MockUpstreamTestCase):
+    """Tests the geocoding of a city within a country.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the view against the local mock upstream.
+
+    Methods:
+        test_001_a_coordinate_get() -> None
+        test_002_unknown_city_not_found() -> None
+        test_003_upstream_errors_are_bad_gateway() -> None
+        test_004_repeat_lookups_stay_in_process() -> None
+        test_005_lookups_survive_a_cold_process() -> None
+        test_006_unknown_cities_are_cached_as_negative_entries() -> None
+        test_007_expired_negative_entries_are_rechecked() -> None
+        test_008_gazetteer_cities_stay_offline() -> None
+        test_009_city_search_ranks_by_population() -> None
+        test_010_city_search_requires_prefix_and_country() -> None
+        test_011_bad_city_or_country_is_a_bad_request() -> None
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        geocoder.lru.clear()
+
+    def test_001_a_coordinate_get(self) -> None:
+        """Tests that a city's name, country and coordinates are returned."""
+        response = self.client.get(reverse("a_coordinate", args=["savannah", "us"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"city": "Savannah", "country": "US",
+                                           "latitude": 32.08, "longitude": -81.1})
+
+    def test_002_unknown_city_not_found(self) -> None:
+        """Tests that a city the provider doesn't know is answered with a 404."""
+        response = self.client.get(reverse("a_coordinate", args=["atlantis", "us"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_003_upstream_errors_are_bad_gateway(self) -> None:
+        """Tests that a failing provider is answered with a 502."""
+        self.upstream.error_rate = 1.0
+        response = self.client.get(reverse("a_coordinate", args=["pooler", "us"]))
+        self.assertEqual(response.status_code, 502)
+
+    def test_004_repeat_lookups_stay_in_process(self) -> None:
+        """Tests that spellings that normalize alike share one provider call and one row."""
+        first = self.client.get(reverse("a_coordinate", args=["Pooler", "us"]))
+        second = self.client.get(reverse("a_coordinate", args=["  POOLER ", "US"]))
+        with self.subTest():
+            self.assertEqual(first.json(), second.json())
+        with self.subTest():
+            self.assertEqual(Geocode.objects.count(), 1)
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_005_lookups_survive_a_cold_process(self) -> None:
+        """Tests that a city in the Geocode table is served without the provider."""
+        self.client.get(reverse("a_coordinate", args=["tybee island", "us"]))
+        geocoder.lru.clear()
+        self.upstream.error_rate = 1.0
+        response = self.client.get(reverse("a_coordinate", args=["Tybee Island", "US"]))
+        with self.subTest():
+            self.assertEqual(response.json()["city"], "Tybee Island")
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_006_unknown_cities_are_cached_as_negative_entries(self) -> None:
+        """Tests that a city the provider doesn't know isn't asked for again."""
+        self.client.get(reverse("a_coordinate", args=["atlantis", "us"]))
+        geocoder.lru.clear()
+        response = self.client.get(reverse("a_coordinate", args=["Atlantis", "us"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 404)
+        with self.subTest():
+            self.assertFalse(Geocode.objects.get(city_key="atlantis").found)
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_007_expired_negative_entries_are_rechecked(self) -> None:
+        """Tests that an old "not found" answer is sent to the provider again."""
+        Geocode.objects.create(city_key="richmond hill", country_code="US", found=False)
+        Geocode.objects.update(fetched_at=timezone.now() - timedelta(days=30))
+        response = self.client.get(reverse("a_coordinate", args=["richmond hill", "us"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 200)
+        with self.subTest():
+            self.assertEqual(normalize(" Richmond  Hill\t", "us "), ("richmond hill", "US"))
+        self.assertTrue(Geocode.objects.get(city_key="richmond hill").found)
+
+    def test_008_gazetteer_cities_stay_offline(self) -> None:
+        """Tests that cities in the gazetteer, by any of their names, skip the provider."""
+        savannah = self.client.get(reverse("a_coordinate", args=["savannah", "us"]))
+        munich = self.client.get(reverse("a_coordinate", args=["München", "de"]))
+        with self.subTest():
+            self.assertEqual(savannah.json(), {"city": "Savannah", "country": "US",
+                                               "latitude": 32.08, "longitude": -81.1})
+        with self.subTest():
+            self.assertEqual(munich.json()["city"], "Munich")
+        self.assertEqual((self.upstream.calls, Geocode.objects.count()), (0, 0))
+
+    def test_009_city_search_ranks_by_population(self) -> None:
+        """Tests that type-ahead suggestions match the prefix and list larger cities first."""
+        response = self.client.get(reverse("city_search"), {"q": "sav", "country": "us"})
+        with self.subTest():
+            self.assertEqual([(city["city"], city["region"]) for city in response.json()],
+                             [("Savannah", "GA"), ("Savannah", "TN")])
+        self.assertEqual(
+            len(self.client.get(reverse("city_search"),
+                                {"q": "s", "country": "US", "limit": 3}).json()), 3)
+
+    def test_010_city_search_requires_prefix_and_country(self) -> None:
+        """Tests that a search without a prefix or a country code is a bad request."""
+        no_country = self.client.get(reverse("city_search"), {"q": "sav"})
+        no_prefix = self.client.get(reverse("city_search"), {"q": " ", "country": "US"})
+        self.assertEqual((no_country.status_code, no_prefix.status_code), (400, 400))
+
+    def test_011_bad_city_or_country_is_a_bad_request(self) -> None:
+        """Tests that country codes that aren't two letters and over-long city names are
+        bad requests, answered without a provider call or a stored row."""
+        responses = [self.client.get(reverse("a_coordinate", args=[city, country_code]))
+                     for city, country_code in (("Paris", "FRA"), ("Paris", " "),
+                                                ("x" * 101, "US"))]
+        with self.subTest():
+            self.assertEqual([response.status_code for response in responses], [400] * 3)
+        self.assertEqual((self.upstream.calls, Geocode.objects.count()), (0, 0))
@@ -0,0 +1,113 @@
+"""Module that tests the Workflow dashboard against the local mock upstream.
+
+Classes:
+    TestDashboard
+"""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from airport_app.models import Airport
+from list_app.models import List, Task
+from named_locations_app.models import Named_location
+from user_app.models import User
+from weather_app.services import UNAVAILABLE
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+class TestDashboard(MockUpstreamTestCase):
+    """Tests that one request gets every record and the weather at every place.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the view against the local mock upstream.
+
+    Methods:
+        setUp() -> None
+        test_001_records_and_weather() -> None
+        test_002_cached_weather_is_not_fetched_again() -> None
+        test_003_queries_do_not_grow_with_records() -> None
+        test_004_empty_dashboard() -> None
+        test_005_records_are_sent_when_upstream_is_down() -> None
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = User.objects.get(email="odie@odie.com")
+        for code, name in (("KSVN", "Hunter AAF"), ("KXXX", "Nowhere")):
+            Airport.objects.create(user=self.user, icao_code=code, name=name)
+        Named_location.objects.create(user=self.user, city="Pooler", country="US",
+                                      latitude="32.1155", longitude="-81.2471")
+        preflight = List.objects.create(user=self.user, name="Preflight")
+        for name in ("Check NOTAMs", "Brief crew"):
+            Task.objects.create(list=preflight, name=name)
+
+    def test_001_records_and_weather(self) -> None:
+        """Tests that the records come with each place's METAR and TAF, one call per kind."""
+        body = self.client.get(reverse("dashboard")).json()
+        weather = [(place.get("icao_code") or place["city"],
+                    {kind: report and (report["station"], report["distance_km"])
+                     for kind, report in place["weather"].items()})
+                   for place in body["airports"] + body["named_locations"]]
+        with self.subTest():
+            self.assertEqual(weather, [
+                ("KSVN", {"metar": ("KSVN", None), "taf": ("KSVN", None)}),
+                ("KXXX", {"metar": None, "taf": None}),
+                ("Pooler", {"metar": ("KSAV", 4.7), "taf": ("KSAV", 4.7)}),
+            ])
+        with self.subTest():
+            self.assertTrue(body["airports"][0]["weather"]["metar"]["raw"].startswith("KSVN"))
+        with self.subTest():
+            self.assertEqual([(lst["name"], [task["name"] for task in lst["tasks"]])
+                              for lst in body["lists"]],
+                             [("Preflight", ["Check NOTAMs", "Brief crew"])])
+        with self.subTest():
+            self.assertEqual(set(body["errors"]), {"metar", "taf"})
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_002_cached_weather_is_not_fetched_again(self) -> None:
+        """Tests that a reload is answered from the weather cache."""
+        self.client.get(reverse("dashboard"))
+        response = self.client.get(reverse("dashboard"))
+        with self.subTest():
+            self.assertEqual((response.status_code, response["X-Cache"]), (200, "HIT"))
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_003_queries_do_not_grow_with_records(self) -> None:
+        """Tests that the records are read with the same queries however many there are.
+
+        The reports are cached first, so storing new ones doesn't add queries.
+        """
+        self.client.get(reverse("dashboard"))
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse("dashboard"))
+        for number in range(5):
+            Airport.objects.create(user=self.user, icao_code=f"KSA{'ABCDE'[number]}",
+                                   name=f"Field {number}")
+            checklist = List.objects.create(user=self.user, name=f"Checklist {number}")
+            Task.objects.create(list=checklist, name="Sign off")
+        self.client.get(reverse("dashboard"))
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse("dashboard"))
+        self.assertEqual(len(many), len(few))
+
+    def test_004_empty_dashboard(self) -> None:
+        """Tests that a User without records gets empty lists and no upstream call."""
+        for model in (Airport, Named_location, List):
+            model.objects.all().delete()
+        response = self.client.get(reverse("dashboard"))
+        with self.subTest():
+            self.assertEqual((response.status_code, response.json()),
+                             (200, {"airports": [], "named_locations": [], "lists": []}))
+        self.assertEqual(self.upstream.calls, 0)
+
+    def test_005_records_are_sent_when_upstream_is_down(self) -> None:
+        """Tests that a failing provider still lets the page render its records."""
+        self.upstream.error_rate = 1.0
+        response = self.client.get(reverse("dashboard"))
+        body = response.json()
+        with self.subTest():
+            self.assertEqual((response.status_code, len(body["airports"]), len(body["lists"])),
+                             (200, 2, 1))
+        with self.subTest():
+            self.assertEqual(body["airports"][0]["weather"], {"metar": None, "taf": None})
+        self.assertEqual(body["errors"]["metar"]["KSVN"], UNAVAILABLE)
@@ -0,0 +1,182 @@
+"""Module that tests the station corridor along a Flight's route and its weather.
+
+Classes:
+    TestStationCorridor
+    TestRouteWeather
+"""
+
+import math
+import random
+from django.test import SimpleTestCase
+from django.urls import reverse
+from flight_app.models import Flight
+from user_app.models import User
+from weather_app.stations import Station, StationIndex, distance_km, get_station_index
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+def track(origin: tuple[float, float], destination: tuple[float, float],
+          steps: int) -> list[tuple[float, float]]:
+    """Gets points every 1/steps of the great-circle track between two coordinates."""
+
+    (lat1, lon1), (lat2, lon2) = [map(math.radians, point) for point in (origin, destination)]
+    angle = distance_km(*origin, *destination) / 6371.0088
+    points = []
+    for step in range(steps + 1):
+        a = math.sin((1 - step / steps) * angle) / math.sin(angle)
+        b = math.sin(step / steps * angle) / math.sin(angle)
+        x = a * math.cos(lat1) * math.cos(lon1) + b * math.cos(lat2) * math.cos(lon2)
+        y = a * math.cos(lat1) * math.sin(lon1) + b * math.cos(lat2) * math.sin(lon2)
+        z = a * math.sin(lat1) + b * math.sin(lat2)
+        points.append((math.degrees(math.atan2(z, math.hypot(x, y))),
+                       math.degrees(math.atan2(y, x))))
+    return points
+
+
+class TestStationCorridor(SimpleTestCase):
+    """Tests the great-circle corridor queries of the KD-tree.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_matches_a_linear_scan() -> None
+        test_002_orders_along_the_track() -> None
+        test_003_crosses_the_antimeridian() -> None
+    """
+
+    def test_001_matches_a_linear_scan(self) -> None:
+        """Tests that the corridor has the stations a scan of points on the track finds.
+
+        Stations within a kilometre of the edge are left out, as the scan measures to
+        the nearest of its points rather than to the track.
+        """
+        rng = random.Random(11)
+        stations = [Station(f"S{slot:03d}", "", rng.uniform(-70, 70), rng.uniform(-180, 180),
+                            0, True, True) for slot in range(1000)]
+        index = StationIndex(stations)
+        for _ in range(5):
+            origin = (rng.uniform(-60, 60), rng.uniform(-180, 180))
+            destination = (rng.uniform(-60, 60), rng.uniform(-180, 180))
+            points = track(origin, destination, 500)
+            off = {station.icao: min(distance_km(station.latitude, station.longitude, *point)
+                                     for point in points) for station in stations}
+            found = {station.icao for station, _, _ in index.corridor(origin, destination, 300)}
+            with self.subTest(origin=origin, destination=destination):
+                self.assertEqual({code for code in found if abs(off[code] - 300) > 1},
+                                 {code for code, km in off.items() if km < 299})
+
+    def test_002_orders_along_the_track(self) -> None:
+        """Tests that the stations come in order along the track and can be filtered by kind."""
+        index = get_station_index()
+        hunter, charleston = index.get("KSVN"), index.get("KCHS")
+        ends = ((hunter.latitude, hunter.longitude), (charleston.latitude, charleston.longitude))
+        corridor = index.corridor(*ends, 25)
+        with self.subTest():
+            self.assertEqual([station.icao for station, _, _ in corridor],
+                             ["KSVN", "KSAV", "KHXD", "KNBC", "KARW", "KCHS"])
+        with self.subTest():
+            self.assertEqual([(round(along, 1), round(off, 1)) for _, along, off
+                              in (corridor[0], corridor[-1])], [(0.0, 0.0), (143.7, 0.0)])
+        self.assertEqual([station.icao for station, _, _ in index.corridor(*ends, 25, "taf")],
+                         ["KSVN", "KSAV", "KNBC", "KCHS"])
+
+    def test_003_crosses_the_antimeridian(self) -> None:
+        """Tests that a track over 180 degrees keeps the stations under it and none behind."""
+        index = StationIndex([Station("WEST", "", 52, 179, 0, True, True),
+                              Station("EAST", "", 52, -178, 0, True, True),
+                              Station("BEHIND", "", 52, 170, 0, True, True)])
+        self.assertEqual([station.icao for station, _, _
+                          in index.corridor((52, 175), (52, -175), 50)], ["WEST", "EAST"])
+
+
+class TestRouteWeather(MockUpstreamTestCase):
+    """Tests the weather along a Flight's route.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the view against the local mock upstream.
+
+    Methods:
+        setUp() -> None
+        flight(origin, destination) -> int
+        test_001_stations_along_the_route() -> None
+        test_002_default_corridor() -> None
+        test_003_bad_requests() -> None
+        test_004_upstream_errors_are_bad_gateway() -> None
+        test_005_long_routes_are_fetched_in_batches() -> None
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = User.objects.get(email="odie@odie.com")
+
+    def flight(self, origin: str = "KSVN", destination: str = "KCHS") -> int:
+        """Creates a Flight of the User and gets its id."""
+        return Flight.objects.create(
+            user=self.user, tail_number=459, callsign="SHADY29", aircraft_type_model="CH-47F",
+            pilot_responsible="CW2 Pilot Sucks", origin=origin, destination=destination,
+            arrival_time='2024-04-08T01:00:00Z').id
+
+    def test_001_stations_along_the_route(self) -> None:
+        """Tests that the corridor's reports come in track order from one call per kind."""
+        response = self.client.get(reverse("flight_route_weather", args=[self.flight()]),
+                                   {"width_km": "25"})
+        body = response.json()
+        with self.subTest():
+            self.assertEqual((body["origin"], body["destination"], body["distance_km"],
+                              body["corridor_km"]), ("KSVN", "KCHS", 143.7, 25))
+        with self.subTest():
+            self.assertEqual([(station["icao"], station["taf"] is not None)
+                              for station in body["stations"]],
+                             [("KSVN", True), ("KSAV", True), ("KHXD", False),
+                              ("KNBC", True), ("KARW", False), ("KCHS", True)])
+        with self.subTest():
+            self.assertTrue(all(station["metar"].startswith(station["icao"])
+                                for station in body["stations"]))
+        with self.subTest():
+            self.assertNotIn("errors", body)
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_002_default_corridor(self) -> None:
+        """Tests that the corridor is WEATHER_STATIONS["CORRIDOR_KM"] wide by default."""
+        with self.settings(WEATHER_STATIONS={"CORRIDOR_KM": 5}):
+            body = self.client.get(reverse("flight_route_weather", args=[self.flight()])).json()
+        self.assertEqual((body["corridor_km"], [station["icao"] for station in body["stations"]]),
+                         (5, ["KSVN", "KARW", "KCHS"]))
+
+    def test_003_bad_requests(self) -> None:
+        """Tests bad widths, uncatalogued ends and other Users' Flights, all without a call."""
+        other = User.objects.create_user(username="garfield@odie.com", email="garfield@odie.com",
+                                         password="garfield")
+        foreign = Flight.objects.create(
+            user=other, tail_number=460, callsign="SHADY30", aircraft_type_model="CH-47F",
+            pilot_responsible="CW2 Pilot Sucks", origin="KSVN", destination="KCHS",
+            arrival_time='2024-04-08T01:00:00Z').id
+        responses = [
+            self.client.get(reverse("flight_route_weather", args=[self.flight()]),
+                            {"width_km": width}) for width in ("0", "501", "wide")]
+        responses.append(self.client.get(
+            reverse("flight_route_weather", args=[self.flight("KSVN", "KZZZ")])))
+        responses.append(self.client.get(reverse("flight_route_weather", args=[foreign])))
+        with self.subTest():
+            self.assertEqual([response.status_code for response in responses],
+                             [400, 400, 400, 404, 404])
+        self.assertEqual(self.upstream.calls, 0)
+
+    def test_004_upstream_errors_are_bad_gateway(self) -> None:
+        """Tests that a failing provider with nothing cached is answered with a 502."""
+        self.upstream.error_rate = 1.0
+        response = self.client.get(reverse("flight_route_weather", args=[self.flight()]))
+        self.assertEqual(response.status_code, 502)
+
+    def test_005_long_routes_are_fetched_in_batches(self) -> None:
+        """Tests that the stations are fetched WEATHER_PREWARM["BATCH_SIZE"] at a time.
+
+        The 6 METAR stations take 3 calls of 2 and the 4 TAF stations 2 calls.
+        """
+        with self.settings(WEATHER_PREWARM={"BATCH_SIZE": 2}):
+            body = self.client.get(reverse("flight_route_weather", args=[self.flight()]),
+                                   {"width_km": "25"}).json()
+        with self.subTest():
+            self.assertEqual(sum(station["metar"] is not None for station in body["stations"]), 6)
+        self.assertEqual(self.upstream.calls_by_path, {"metar": 3, "taf": 2})
@@ -0,0 +1,124 @@
+"""Module that tests the stored METAR and TAF history.
+
+Classes:
+    TestHistoryIngest
+    TestHistoryViews
+"""
+
+from datetime import datetime, timedelta, timezone
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from history_app.ingest import forecast_row, ingest, observation_row
+from history_app.models import Forecast, Observation
+from weather_app.services import refresh_reports
+from tests.test_metar_views import MockUpstreamTestCase
+
+NOW = datetime(2024, 5, 1, 18, 5, tzinfo=timezone.utc)
+
+
+class TestHistoryIngest(TestCase):
+    """Tests decoding reports into rows and writing them in bulk.
+
+    Extends:
+        TestCase (class): The django TestCase class.
+
+    Methods:
+        test_001_observation_columns() -> None
+        test_002_forecast_columns() -> None
+        test_003_duplicates_are_skipped() -> None
+        test_004_large_batches_are_copied() -> None
+    """
+
+    def test_001_observation_columns(self) -> None:
+        """Tests the decoded columns of a METAR, in knots, statute miles and inches."""
+        row = observation_row("EGLL 011750Z 24010MPS 4000 -RA BKN008 12/10 Q1013", NOW)
+        self.assertEqual(
+            (row.station, row.obs_time, row.wind_speed_kt, row.visibility_sm, row.ceiling_ft,
+             row.altimeter_inhg, row.flight_category),
+            ("EGLL", datetime(2024, 5, 1, 17, 50, tzinfo=timezone.utc), 19, 2.49, 800,
+             29.91, "IFR"))
+
+    def test_002_forecast_columns(self) -> None:
+        """Tests that a TAF is stored with the worst conditions of its whole validity."""
+        row = forecast_row("TAF AMD KSVN 011720Z 0118/0224 18008KT P6SM SCT040 "
+                           "TEMPO 0120/0124 3SM -TSRA BKN025CB "
+                           "FM020000 20015G28KT P6SM BKN050", NOW)
+        self.assertEqual(
+            (row.issue_time, row.valid_to, row.modifier, row.max_wind_kt,
+             row.min_visibility_sm, row.min_ceiling_ft, row.flight_category),
+            (datetime(2024, 5, 1, 17, 20, tzinfo=timezone.utc),
+             datetime(2024, 5, 3, 0, tzinfo=timezone.utc), "AMD", 28, 3.0, 2500, "MVFR"))
+
+    def test_003_duplicates_are_skipped(self) -> None:
+        """Tests that a report stored twice, or twice in one batch, is kept once."""
+        reports = ["KSVN 011755Z 18008KT 10SM FEW045 28/21 A2998",
+                   "KSVN 011755Z 18008KT 10SM FEW045 28/21 A2998",
+                   "KSAV 011753Z 20006KT 10SM CLR 29/20 A2997", "not a report"]
+        with self.subTest():
+            self.assertEqual(ingest("metar", reports, NOW), 2)
+        ingest("metar", reports[:2], NOW)
+        self.assertEqual(Observation.objects.count(), 2)
+
+    @override_settings(WEATHER_HISTORY={"COPY_THRESHOLD": 2})
+    def test_004_large_batches_are_copied(self) -> None:
+        """Tests the COPY path stores new rows and skips stored ones."""
+        ingest("metar", ["KSVN 011655Z 18008KT 10SM FEW045 28/21 A2998"], NOW)
+        reports = [f"KSVN 01{hour:02d}55Z 18008KT 10SM BKN0{hour:02d} 28/21 A2998"
+                   for hour in range(10, 18)]
+        ingest("metar", reports, NOW)
+        stored = Observation.objects.filter(station="KSVN").order_by("-obs_time")
+        self.assertEqual((stored.count(), stored[0].ceiling_ft, stored[0].received_at.year),
+                         (8, 1700, datetime.now(timezone.utc).year))
+
+
+class TestHistoryViews(MockUpstreamTestCase):
+    """Tests that fetched reports are stored and served from the database.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_fetched_reports_are_stored_once() -> None
+        test_002_latest_is_a_local_query() -> None
+        test_003_history_window() -> None
+    """
+
+    def test_001_fetched_reports_are_stored_once(self) -> None:
+        """Tests that the fetch and refresh paths store new reports and skip repeats."""
+        self.client.get(reverse("a_airport_metar", args=["KSVN,KSAV"]))
+        self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+        refresh_reports("metar", ["KSVN", "KJFK"])
+        with self.subTest():
+            self.assertEqual(sorted(Observation.objects.values_list("station", flat=True)),
+                             ["KJFK", "KSAV", "KSVN"])
+        self.assertEqual(list(Forecast.objects.values_list("station", "flight_category")),
+                         [("KSVN", "VFR")])
+
+    def test_002_latest_is_a_local_query(self) -> None:
+        """Tests that the latest stored reports are served without the provider."""
+        self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        self.upstream.error_rate = 1.0
+        response = self.client.get(reverse("station_latest", args=["ksvn"]))
+        with self.subTest():
+            self.assertEqual((response.json()["metar"]["station"], response.json()["taf"]),
+                             ("KSVN", None))
+        with self.subTest():
+            self.assertEqual(self.upstream.calls, 1)
+        missing = self.client.get(reverse("station_latest", args=["KJFK"]))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_003_history_window(self) -> None:
+        """Tests that history is listed newest first within the hours asked for."""
+        now = datetime.now(timezone.utc)
+        ingest("metar", [f"KSVN {now - timedelta(hours=hours):%d%H}55Z 18008KT 10SM "
+                         f"FEW045 28/21 A2998" for hours in (1, 3, 30)], now)
+        recent = self.client.get(reverse("station_history", args=["KSVN", "metars"]))
+        longer = self.client.get(reverse("station_history", args=["KSVN", "metars"]),
+                                 {"hours": "48"})
+        bad = self.client.get(reverse("station_history", args=["KSVN", "pireps"]))
+        with self.subTest():
+            self.assertEqual([row["obs_time"] for row in recent.json()],
+                             sorted((row["obs_time"] for row in recent.json()), reverse=True))
+        self.assertEqual((len(recent.json()), len(longer.json()), bad.status_code),
+                         (2, 3, 400))
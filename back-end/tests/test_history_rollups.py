@@ -0,0 +1,145 @@
+"""Module that tests the monthly partitions and rollups of the stored METARs.
+
+Classes:
+    TestHistoryPartitions
+    TestHistoryRollups
+"""
+
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+from history_app.ingest import ingest
+from history_app.models import Observation, ObservationRollup
+from history_app.partitions import (
+    create_future_partitions,
+    drop_expired,
+    is_partitioned,
+    partition_months,
+)
+from history_app.rollups import rollup_days, rollup_hours
+from tests.test_metar_views import MockUpstreamTestCase
+
+NOW = datetime(2024, 5, 2, 0, 5, tzinfo=timezone.utc)
+REPORTS = [
+    "KSVN 011655Z 18008KT 10SM FEW045 28/21 A2998",
+    "KSVN 011715Z 18012G22KT 10SM BKN035 26/21 A2998",
+    "KSVN 011755Z 19015KT 1/2SM FG VV002 24/21 A2999",
+    "KSVN 011855Z 20010KT 10SM BKN030 25/20 A2999",
+]
+
+
+class TestHistoryPartitions(TestCase):
+    """Tests that observations are kept in monthly partitions that are dropped whole.
+
+    Extends:
+        TestCase (class): The django TestCase class.
+
+    Methods:
+        test_001_months_get_partitions() -> None
+        test_002_future_partitions() -> None
+        test_003_expired_months_are_dropped() -> None
+        test_004_partitions_keep_the_checks() -> None
+    """
+
+    def test_001_months_get_partitions(self) -> None:
+        """Tests that a batch spanning months is stored in a partition per month."""
+        ingest("metar", ["KSVN 301755Z 18008KT 10SM FEW045 28/21 A2998"] + REPORTS, NOW)
+        with self.subTest():
+            self.assertEqual(Observation.objects.count(), 5)
+        with self.subTest():
+            self.assertEqual(is_partitioned(), connection.vendor == "postgresql")
+        if is_partitioned():
+            self.assertLessEqual({datetime(2024, month, 1, tzinfo=timezone.utc)
+                                  for month in (4, 5)}, set(partition_months()))
+
+    def test_002_future_partitions(self) -> None:
+        """Tests that the coming months get partitions once."""
+        if not is_partitioned():
+            self.skipTest("Observations are only partitioned on PostgreSQL.")
+        later = datetime(2031, 11, 20, tzinfo=timezone.utc)
+        with self.subTest():
+            self.assertEqual(create_future_partitions(later, 2),
+                             ["history_app_observation_y2031m11",
+                              "history_app_observation_y2031m12",
+                              "history_app_observation_y2032m01"])
+        self.assertEqual(create_future_partitions(later, 2), [])
+
+    def test_003_expired_months_are_dropped(self) -> None:
+        """Tests that months before the retention window go and the rest stay."""
+        ingest("metar", REPORTS, NOW)
+        ingest("metar", ["KSVN 011755Z 18008KT 10SM FEW045 28/21 A2998"],
+               datetime(2024, 8, 1, 18, tzinfo=timezone.utc))
+        dropped = drop_expired(datetime(2024, 8, 15, tzinfo=timezone.utc), 2)
+        with self.subTest():
+            self.assertEqual(list(Observation.objects.values_list("obs_time__month", flat=True)),
+                             [8])
+        if is_partitioned():
+            self.assertIn("history_app_observation_y2024m05", dropped)
+
+    def test_004_partitions_keep_the_checks(self) -> None:
+        """Tests that the partitioned table refuses negative winds and ceilings.
+
+        The rows are for now, which always has a partition.
+        """
+        for field in ("wind_direction", "wind_speed_kt", "wind_gust_kt", "ceiling_ft"):
+            with self.subTest(field=field):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    Observation.objects.create(station="KSVN", raw="KSVN",
+                                               obs_time=datetime.now(timezone.utc),
+                                               **{field: -1})
+
+
+class TestHistoryRollups(MockUpstreamTestCase):
+    """Tests the hourly and daily rollups, and the trends served from them.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_hourly_rollups() -> None
+        test_002_daily_rollups_are_rewritten() -> None
+        test_003_trend_outlives_observations() -> None
+    """
+
+    def test_001_hourly_rollups(self) -> None:
+        """Tests the lowest ceiling, strongest gust and hours IFR of each hour."""
+        ingest("metar", REPORTS, NOW)
+        with self.subTest():
+            self.assertEqual(rollup_hours(NOW), 3)
+        hours = ObservationRollup.objects.filter(period="hour").order_by("period_start")
+        self.assertEqual(
+            [(hour.period_start.hour, hour.observations, hour.min_ceiling_ft,
+              hour.max_gust_kt, hour.hours_ifr) for hour in hours],
+            [(16, 1, None, 8, 0.0), (17, 2, 200, 22, 0.5), (18, 1, 3000, 10, 0.0)])
+
+    def test_002_daily_rollups_are_rewritten(self) -> None:
+        """Tests that a day is summed from its hours and redone as late hours come in."""
+        ingest("metar", REPORTS[:2], NOW)
+        rollup_hours(NOW)
+        rollup_days(NOW)
+        ingest("metar", REPORTS[2:], NOW)
+        with self.subTest():
+            self.assertEqual(rollup_hours(NOW), 3)
+        rollup_days(NOW)
+        day = ObservationRollup.objects.get(period="day")
+        self.assertEqual((day.observations, day.min_ceiling_ft, day.min_visibility_sm,
+                          day.max_gust_kt, day.hours_ifr), (4, 200, 0.5, 22, 0.5))
+
+    def test_003_trend_outlives_observations(self) -> None:
+        """Tests that trends are served from rollups after the observations are dropped."""
+        now = datetime.now(timezone.utc)
+        ingest("metar", [f"KSVN {now - timedelta(days=days):%d%H}55Z 18008KT 1SM BR "
+                         f"OVC004 28/21 A2998" for days in (1, 2)], now)
+        call_command("maintain_weather_history", "--retention", "0", stdout=StringIO())
+        Observation.objects.all().delete()
+        trend = self.client.get(reverse("station_trend", args=["ksvn"]), {"days": "7"})
+        hourly = self.client.get(reverse("station_trend", args=["KSVN"]),
+                                 {"period": "hour", "days": "3"})
+        bad = self.client.get(reverse("station_trend", args=["KSVN"]), {"period": "week"})
+        with self.subTest():
+            self.assertEqual([day["min_ceiling_ft"] for day in trend.json()["rollups"]],
+                             [400, 400])
+        self.assertEqual((len(hourly.json()["rollups"]), bad.status_code), (2, 400))
@@ -0,0 +1,112 @@
+"""Module that tests METAR views against the local mock upstream.
+
+Classes:
+    MockUpstreamTestCase
+    TestMetarViews
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from weather_app.client import reset_client
+from weather_app.mock_upstream import MockUpstream
+from tests.test_weather_cache import sign_up
+
+
+class MockUpstreamTestCase(APITestCase):
+    """Signs up a User and points the weather client at a fresh MockUpstream.
+
+    Extends:
+        APITestCase (class): The rest_framework APITestCase class.
+
+    Attributes:
+        upstream_options: dict
+            The MockUpstream arguments used by the test case.
+
+    Methods:
+        setUp() -> None
+    """
+
+    upstream_options = {"unknown_stations": ["KXXX"]}
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        sign_up(self)
+        self.upstream = MockUpstream(**self.upstream_options).start()
+        self.addCleanup(self.upstream.stop)
+        override = override_settings(WEATHER_CLIENT={
+            **settings.WEATHER_CLIENT, "MAX_RETRIES": 0,
+            "CHECKWX_BASE_URL": self.upstream.base_url,
+            "OPENWX_BASE_URL": self.upstream.base_url})
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_client()
+        self.addCleanup(reset_client)
+
+
+class TestMetarViews(MockUpstreamTestCase):
+    """Tests the METAR views.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_a_airport_metar_get() -> None
+        test_002_multiple_airports_with_unknown_code() -> None
+        test_003_unknown_airport_not_found() -> None
+        test_004_a_coordinate_metar_get() -> None
+        test_005_coordinate_without_nearby_station() -> None
+        test_006_upstream_errors_are_bad_gateway() -> None
+        test_007_rate_limited_upstream_is_bad_gateway() -> None
+    """
+
+    def test_001_a_airport_metar_get(self) -> None:
+        """Tests that the latest METAR of an airport is returned by its ICAO code."""
+        response = self.client.get(reverse("a_airport_metar", args=["ksvn"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 200)
+        self.assertRegex(response.json()["KSVN"], r"^KSVN \d{6}Z ")
+
+    def test_002_multiple_airports_with_unknown_code(self) -> None:
+        """Tests that several airports share one call and unknown codes are reported."""
+        response = self.client.get(reverse("a_airport_metar", args=["KSVN,KXXX,KJFK"]))
+        with self.subTest():
+            self.assertEqual(sorted(response.json()), ["KJFK", "KSVN", "errors"])
+        with self.subTest():
+            self.assertEqual(response.json()["errors"],
+                             {"KXXX": "That ICAO code does not match any results."})
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_003_unknown_airport_not_found(self) -> None:
+        """Tests that a code with no METAR is answered with a 404."""
+        response = self.client.get(reverse("a_airport_metar", args=["KXXX"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_004_a_coordinate_metar_get(self) -> None:
+        """Tests that the METAR of the station nearest to a coordinate is returned."""
+        response = self.client.get(
+            reverse("a_coordinate_metar", args=["32.0809", "-81.0912"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json().startswith("KSVN "))
+
+    def test_005_coordinate_without_nearby_station(self) -> None:
+        """Tests that a coordinate far from every station is answered with a 404."""
+        response = self.client.get(reverse("a_coordinate_metar", args=["0", "-30"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_006_upstream_errors_are_bad_gateway(self) -> None:
+        """Tests that a failing provider is answered with a 502."""
+        self.upstream.error_rate = 1.0
+        airport = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        coordinate = self.client.get(reverse("a_coordinate_metar", args=["32.08", "-81.09"]))
+        self.assertEqual((airport.status_code, coordinate.status_code), (502, 502))
+
+    def test_007_rate_limited_upstream_is_bad_gateway(self) -> None:
+        """Tests that requests beyond the provider's rate limit are answered with a 502."""
+        self.upstream.rate_limit = 1
+        first = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        second = self.client.get(reverse("a_airport_metar", args=["KJFK"]))
+        self.assertEqual((first.status_code, second.status_code), (200, 502))
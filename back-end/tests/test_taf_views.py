@@ -0,0 +1,56 @@
+"""Module that tests TAF views against the local mock upstream.
+
+Classes:
+    TestTafViews
+"""
+
+from django.urls import reverse
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+class TestTafViews(MockUpstreamTestCase):
+    """Tests the TAF views.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_a_airport_taf_get() -> None
+        test_002_second_request_is_served_from_cache() -> None
+        test_003_unknown_airport_not_found() -> None
+        test_004_a_coordinate_taf_get() -> None
+        test_005_upstream_errors_are_bad_gateway() -> None
+    """
+
+    def test_001_a_airport_taf_get(self) -> None:
+        """Tests that the latest TAF of an airport is returned by its ICAO code."""
+        response = self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 200)
+        self.assertRegex(response.json()["KSVN"], r"^TAF KSVN \d{6}Z \d{4}/\d{4} ")
+
+    def test_002_second_request_is_served_from_cache(self) -> None:
+        """Tests that a repeated request doesn't reach the provider again."""
+        first = self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+        second = self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+        with self.subTest():
+            self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_003_unknown_airport_not_found(self) -> None:
+        """Tests that a code with no TAF is answered with a 404."""
+        response = self.client.get(reverse("a_airport_taf", args=["KXXX"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_004_a_coordinate_taf_get(self) -> None:
+        """Tests that the TAF of the station nearest to a coordinate is returned."""
+        response = self.client.get(reverse("a_coordinate_taf", args=["40.71", "-74.01"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json().startswith("TAF KEWR "))
+
+    def test_005_upstream_errors_are_bad_gateway(self) -> None:
+        """Tests that a failing provider is answered with a 502."""
+        self.upstream.error_rate = 1.0
+        response = self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+        self.assertEqual(response.status_code, 502)
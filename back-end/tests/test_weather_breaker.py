@@ -0,0 +1,161 @@
+"""Module that tests serving stale reports and the upstream circuit breaker.
+
+Classes:
+    TestCircuitBreaker
+    TestStaleWhileRevalidate
+"""
+
+import asyncio
+import time
+from unittest import mock
+from django.core.cache import caches
+from django.test.utils import override_settings
+from django.urls import reverse
+from weather_app import background
+from weather_app.cache import MetarCache
+from weather_app.client import AsyncWeatherClient, CircuitOpenError, get_client
+from tests.test_metar_views import MockUpstreamTestCase
+
+OLD_METAR = "KSVN 010055Z 00000KT 10SM CLR 20/10 A3000"
+
+
+class TestCircuitBreaker(MockUpstreamTestCase):
+    """Tests that repeated upstream failures stop calls until a probe succeeds.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the client against the local mock upstream.
+
+    Methods:
+        test_001_breaker_opens_after_repeated_failures() -> None
+        test_002_half_open_probe_closes_the_breaker() -> None
+        test_003_failed_probe_keeps_the_breaker_open() -> None
+        test_004_open_breaker_fails_views_fast() -> None
+        test_005_async_client_shares_the_breaker() -> None
+    """
+
+    def setUp(self) -> None:
+        override = override_settings(WEATHER_BREAKER={
+            "FAILURE_THRESHOLD": 3, "RESET_TIMEOUT": 0.3, "PROBE_TIMEOUT": 5})
+        override.enable()
+        self.addCleanup(override.disable)
+        super().setUp()
+        self.upstream.error_rate = 1.0
+
+    def fail_until_open(self) -> None:
+        for _ in range(3):
+            with self.assertRaises(Exception):
+                get_client().metar("KSVN")
+
+    def test_001_breaker_opens_after_repeated_failures(self) -> None:
+        """Tests that calls stop reaching the provider once the threshold is hit."""
+        self.fail_until_open()
+        with self.subTest():
+            with self.assertRaises(CircuitOpenError):
+                get_client().metar("KSVN")
+        self.assertEqual(self.upstream.calls, 3)
+
+    def test_002_half_open_probe_closes_the_breaker(self) -> None:
+        """Tests that a successful probe after the reset timeout closes the breaker."""
+        self.fail_until_open()
+        self.upstream.error_rate = 0.0
+        time.sleep(0.35)
+        with self.subTest():
+            self.assertEqual(get_client().breakers["checkwx"].state(), "half-open")
+        get_client().metar("KSVN")
+        self.assertEqual(get_client().breakers["checkwx"].state(), "closed")
+
+    def test_003_failed_probe_keeps_the_breaker_open(self) -> None:
+        """Tests that a failed probe reopens the breaker for another reset timeout."""
+        self.fail_until_open()
+        time.sleep(0.35)
+        with self.subTest():
+            with self.assertRaises(Exception):
+                get_client().metar("KSVN")
+        with self.subTest():
+            self.assertEqual(get_client().breakers["checkwx"].state(), "open")
+        self.assertEqual(self.upstream.calls, 4)
+
+    def test_004_open_breaker_fails_views_fast(self) -> None:
+        """Tests that views answer 502 without calling a provider whose breaker is open."""
+        self.fail_until_open()
+        responses = [self.client.get(reverse(name, args=["KJFK"]))
+                     for name in ("a_airport_metar", "a_airport_weather")]
+        with self.subTest():
+            self.assertEqual([response.status_code for response in responses], [502, 502])
+        self.assertEqual(self.upstream.calls, 3)
+
+    def test_005_async_client_shares_the_breaker(self) -> None:
+        """Tests that the async client opens the breaker and closes it with a probe."""
+        async def calls() -> list[str]:
+            client = AsyncWeatherClient({"MAX_RETRIES": 0})
+            breaker, outcomes = client.breakers["checkwx"], []
+            try:
+                for _ in range(4):
+                    try:
+                        await client.metar("KSVN")
+                    except CircuitOpenError:
+                        outcomes.append("refused")
+                    except Exception:
+                        outcomes.append("failed")
+                self.upstream.error_rate = 0.0
+                await asyncio.sleep(0.35)
+                outcomes.append(await breaker.astate())
+                await client.metar("KSVN")
+                outcomes.append(await breaker.astate())
+            finally:
+                await client.aclose()
+            return outcomes
+
+        with self.subTest():
+            self.assertEqual(asyncio.run(calls()),
+                             ["failed"] * 3 + ["refused", "half-open", "closed"])
+        self.assertEqual(self.upstream.calls, 4)
+
+
+class TestStaleWhileRevalidate(MockUpstreamTestCase):
+    """Tests that expired reports are served right away while they're refreshed.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        setUp() -> None
+        test_001_stale_report_is_served_and_refreshed() -> None
+        test_002_stale_report_is_served_while_upstream_is_down() -> None
+        test_003_coordinate_response_without_results() -> None
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        entry = MetarCache().set("KSVN", OLD_METAR)
+        entry["expires_at"] = time.time() - 60
+        caches["weather"].set(MetarCache().key("KSVN"), entry, 3600)
+
+    def test_001_stale_report_is_served_and_refreshed(self) -> None:
+        """Tests that the stale METAR is returned and replaced in the background."""
+        response = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        background.wait(timeout=5)
+        with self.subTest():
+            self.assertEqual((response.json(), response["X-Weather-Stale"]),
+                             ({"KSVN": OLD_METAR}, "true"))
+        fresh = MetarCache().get("KSVN")
+        with self.subTest():
+            self.assertNotEqual(fresh["raw"], OLD_METAR)
+        self.assertFalse(MetarCache().is_stale(fresh))
+
+    def test_002_stale_report_is_served_while_upstream_is_down(self) -> None:
+        """Tests that the last known good METAR is still served during an outage."""
+        self.upstream.error_rate = 1.0
+        response = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        background.wait(timeout=5)
+        with self.subTest():
+            self.assertEqual((response.status_code, response.json()), (200, {"KSVN": OLD_METAR}))
+        self.assertEqual(MetarCache().get("KSVN")["raw"], OLD_METAR)
+
+    def test_003_coordinate_response_without_results(self) -> None:
+        """Tests that a provider answer without results is a 404 rather than a crash."""
+        upstream = mock.AsyncMock()
+        upstream.metar_near.return_value = {"error": "Unexpected response"}
+        with mock.patch("weather_app.services.get_async_client", return_value=upstream):
+            response = self.client.get(reverse("a_coordinate_metar", args=["0", "-30"]))
+        self.assertEqual(response.status_code, 404)
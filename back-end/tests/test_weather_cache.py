@@ -0,0 +1,256 @@
+"""Module that tests the weather report caches.
+
+Classes:
+    TestMetarCache
+    TestMetarCacheView
+    TestTafCache
+    TestTafCacheView
+    TestPartialHitBatching
+"""
+
+from datetime import datetime, timezone
+from unittest import mock
+from django.core.cache import caches
+from django.test import Client, SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from weather_app import background
+from weather_app.cache import MetarCache, TafCache
+from weather_app.client import UpstreamError
+from weather_app.reports import report_time, station_id
+
+NOW = datetime(2024, 5, 12, 13, 10, tzinfo=timezone.utc)
+ROUTINE = "KSVN 121255Z 18008KT 10SM FEW045 28/21 A2998 RMK AO2 SLP152"
+SPECI = "SPECI KSVN 121310Z 20015G25KT 3SM TSRA BKN020CB 24/21 A2999"
+TAF = "TAF KSVN 121120Z 1212/1318 18008KT P6SM SCT040 FM121800 20012KT P6SM BKN050"
+TAF_AMD = "TAF AMD KSVN 121345Z 1214/1318 20015G25KT 3SM TSRA BKN020CB"
+
+
+def sign_up(test_case: APITestCase) -> None:
+    """Signs up a User and stores their authentication cookie on the test client."""
+    client = Client()
+    sign_up_response = client.post(
+        reverse("signup"),
+        data={"email": "odie@odie.com", "password": "odie", "display_name": "odiesturn",
+              "first_name": "Odie", "last_name": "Childress"},
+        content_type="application/json"
+    )
+    test_case.client.cookies = sign_up_response.client.cookies
+
+
+class TestMetarCache(SimpleTestCase):
+    """Tests how long METARs stay in the MetarCache.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        setUp() -> None
+        test_001_report_header_parsing() -> None
+        test_002_routine_metar_expires_after_next_observation() -> None
+        test_003_overdue_metar_uses_poll_interval() -> None
+        test_004_speci_expires_at_next_routine_observation() -> None
+        test_005_hit_and_miss_counters() -> None
+    """
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        self.cache = MetarCache()
+
+    def test_001_report_header_parsing(self) -> None:
+        """Tests that the station and observation time are read from raw reports."""
+        with self.subTest():
+            self.assertEqual(station_id(SPECI), "KSVN")
+        with self.subTest():
+            self.assertEqual(report_time(ROUTINE, NOW),
+                             datetime(2024, 5, 12, 12, 55, tzinfo=timezone.utc))
+        self.assertEqual(report_time("KSVN 302355Z AUTO", NOW).month, 4)
+
+    def test_002_routine_metar_expires_after_next_observation(self) -> None:
+        """Tests that a routine METAR lives until the next one is published."""
+        # Next observation 1355Z plus the 5 minute publish delay, 50 minutes from 1310Z.
+        self.assertEqual(self.cache.timeout_for("KSVN", ROUTINE, NOW), 50 * 60)
+
+    def test_003_overdue_metar_uses_poll_interval(self) -> None:
+        """Tests that an overdue METAR is only held for the poll-again window."""
+        late = datetime(2024, 5, 12, 14, 5, tzinfo=timezone.utc)
+        self.assertEqual(self.cache.timeout_for("KSVN", ROUTINE, late), 120)
+
+    def test_004_speci_expires_at_next_routine_observation(self) -> None:
+        """Tests that a SPECI only lives until the station's next routine METAR."""
+        self.cache.set("KSVN", ROUTINE, NOW)
+        later = datetime(2024, 5, 12, 13, 12, tzinfo=timezone.utc)
+        # Next routine observation 1355Z plus 5 minutes, 48 minutes from 1312Z.
+        self.assertEqual(self.cache.timeout_for("KSVN", SPECI, later), 48 * 60)
+
+    def test_005_hit_and_miss_counters(self) -> None:
+        """Tests that lookups are counted as hits and misses."""
+        self.cache.get("KSVN")
+        self.cache.set("KSVN", ROUTINE, NOW)
+        self.cache.get("KSVN")
+        self.cache.get("ksvn")
+        self.assertEqual(self.cache.stats(), {
+                         "hits": 2, "misses": 1, "hit_rate": 0.6667})
+
+
+class TestMetarCacheView(APITestCase):
+    """Tests that the METAR view serves repeat requests from the cache.
+
+    Extends:
+        APITestCase (class): The rest_framework APITestCase class.
+
+    Methods:
+        setUp() -> None
+        test_001_repeat_request_skips_upstream() -> None
+    """
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        sign_up(self)
+
+    def test_001_repeat_request_skips_upstream(self) -> None:
+        """Tests that only the first of several identical requests reaches CheckWX."""
+        upstream = mock.AsyncMock()
+        upstream.metar.return_value = {"results": 1, "data": [ROUTINE]}
+        with mock.patch("weather_app.services.get_async_client", return_value=upstream):
+            responses = [self.client.get(
+                reverse("a_airport_metar", args=["KSVN"])) for _ in range(3)]
+        with self.subTest():
+            self.assertEqual([r.status_code for r in responses], [200] * 3)
+        with self.subTest():
+            self.assertEqual(responses[2].json(), {"KSVN": ROUTINE})
+        self.assertEqual(upstream.metar.call_count, 1)
+
+
+class TestTafCache(SimpleTestCase):
+    """Tests how long TAFs stay in the TafCache.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        setUp() -> None
+        test_001_taf_expires_at_next_issuance() -> None
+        test_002_amendment_keeps_routine_schedule() -> None
+        test_003_overdue_taf_uses_poll_interval() -> None
+        test_004_same_text_keeps_fetched_at() -> None
+    """
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        self.cache = TafCache()
+
+    def test_001_taf_expires_at_next_issuance(self) -> None:
+        """Tests that a routine TAF lives until the next routine TAF is published."""
+        # Next TAF issued 1720Z and published by 1725Z, 4 hours 15 minutes from 1310Z.
+        self.assertEqual(self.cache.timeout_for("KSVN", TAF, NOW), 255 * 60)
+
+    def test_002_amendment_keeps_routine_schedule(self) -> None:
+        """Tests that an amended TAF expires at the next routine issuance too."""
+        later = datetime(2024, 5, 12, 13, 50, tzinfo=timezone.utc)
+        self.assertEqual(self.cache.next_issuance(TAF_AMD, later),
+                         datetime(2024, 5, 12, 17, 25, tzinfo=timezone.utc))
+
+    def test_003_overdue_taf_uses_poll_interval(self) -> None:
+        """Tests that a TAF past its next issuance is only held for the poll interval."""
+        late = datetime(2024, 5, 12, 17, 40, tzinfo=timezone.utc)
+        self.assertEqual(self.cache.timeout_for("KSVN", TAF, late), 600)
+
+    def test_004_same_text_keeps_fetched_at(self) -> None:
+        """Tests that re-caching unchanged text only moves the checked time."""
+        later = datetime(2024, 5, 12, 13, 30, tzinfo=timezone.utc)
+        self.cache.set("KSVN", TAF, NOW)
+        entry = self.cache.set("KSVN", TAF, later)
+        with self.subTest():
+            self.assertEqual(entry["fetched_at"], NOW.timestamp())
+        self.assertEqual(entry["checked_at"], later.timestamp())
+
+
+class TestTafCacheView(APITestCase):
+    """Tests that the TAF view serves from the cache and polls for amendments.
+
+    Extends:
+        APITestCase (class): The rest_framework APITestCase class.
+
+    Methods:
+        setUp() -> None
+        test_001_hit_is_served_with_cache_headers() -> None
+        test_002_stale_entry_is_refreshed_in_the_background() -> None
+    """
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        sign_up(self)
+        self.upstream = mock.AsyncMock()
+        self.upstream.taf.return_value = {"results": 1, "data": [TAF]}
+
+    def test_001_hit_is_served_with_cache_headers(self) -> None:
+        """Tests that a cached TAF is served without an upstream call."""
+        with mock.patch("weather_app.services.get_async_client", return_value=self.upstream):
+            first = self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+            second = self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+        with self.subTest():
+            self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        with self.subTest():
+            self.assertEqual(second["X-Weather-Stale"], "false")
+        self.assertEqual(self.upstream.taf.call_count, 1)
+
+    def test_002_stale_entry_is_refreshed_in_the_background(self) -> None:
+        """Tests that an unchecked TAF is served stale while an amendment replaces it."""
+        entry = TafCache().set("KSVN", TAF)
+        entry["checked_at"] -= 3600
+        caches["weather"].set(TafCache().key("KSVN"), entry, 3600)
+        upstream = mock.Mock()
+        upstream.taf.return_value = {"results": 1, "data": [TAF_AMD]}
+        with mock.patch("weather_app.services.get_client", return_value=upstream):
+            response = self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+            background.wait(timeout=5)
+        with self.subTest():
+            self.assertEqual(response.json(), {"KSVN": TAF})
+        with self.subTest():
+            self.assertEqual((response["X-Weather-Stale"], int(response["Age"]) >= 3600),
+                             ("true", True))
+        self.assertEqual(TafCache().get("KSVN")["raw"], TAF_AMD)
+
+
+class TestPartialHitBatching(APITestCase):
+    """Tests that multi-station requests only fetch the uncached stations.
+
+    Extends:
+        APITestCase (class): The rest_framework APITestCase class.
+
+    Methods:
+        setUp() -> None
+        test_001_only_misses_are_fetched_and_matched_by_station() -> None
+        test_002_upstream_failure_keeps_cached_stations() -> None
+    """
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        sign_up(self)
+        MetarCache().set("KSVN", ROUTINE)
+        self.upstream = mock.AsyncMock()
+
+    def test_001_only_misses_are_fetched_and_matched_by_station(self) -> None:
+        """Tests that one combined call fetches the misses and bad codes are reported."""
+        kjfk = "KJFK 121251Z 21010KT 10SM SCT250 24/14 A3001"
+        klax = "KLAX 121253Z 25012KT 10SM FEW015 18/13 A2990"
+        self.upstream.metar.return_value = {"results": 2, "data": [klax, kjfk]}
+        with mock.patch("weather_app.services.get_async_client", return_value=self.upstream):
+            response = self.client.get(
+                reverse("a_airport_metar", args=["KSVN,kjfk,KXXX,KLAX"]))
+        with self.subTest():
+            self.upstream.metar.assert_awaited_once_with("KJFK,KXXX,KLAX")
+        self.assertEqual(response.json(), {
+            "KSVN": ROUTINE, "KJFK": kjfk, "KLAX": klax,
+            "errors": {"KXXX": "That ICAO code does not match any results."}})
+
+    def test_002_upstream_failure_keeps_cached_stations(self) -> None:
+        """Tests that cached stations are still served when the upstream call fails."""
+        self.upstream.metar.side_effect = UpstreamError("CheckWX answered 503")
+        with mock.patch("weather_app.services.get_async_client", return_value=self.upstream):
+            response = self.client.get(reverse("a_airport_metar", args=["KSVN,KJFK"]))
+            missing = self.client.get(reverse("a_airport_metar", args=["KJFK"]))
+        with self.subTest():
+            self.assertEqual((response.status_code, response.json()["KSVN"]), (200, ROUTINE))
+        self.assertEqual(missing.status_code, 502)
@@ -0,0 +1,116 @@
+"""Module that tests the vectorized flight categories and the flight category view.
+
+Classes:
+    TestFlightCategories
+    TestFlightCategoryView
+"""
+
+import random
+from datetime import datetime, timezone
+import numpy as np
+from django.test import SimpleTestCase
+from django.urls import reverse
+from airport_app.models import Airport
+from named_locations_app.models import Named_location
+from user_app.models import User
+from weather_app.categories import category_table, flight_categories
+from weather_app.management.commands.bench_metar_decode import sample_reports
+from weather_app.metar import decode_metar, flight_category
+from weather_app.services import metar_cache
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+class TestFlightCategories(SimpleTestCase):
+    """Tests that the array computations agree with the per-report ones.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_thresholds() -> None
+        test_002_matches_scalar_categories() -> None
+        test_003_table_matches_decoded_reports() -> None
+    """
+
+    def test_001_thresholds(self) -> None:
+        """Tests the values either side of each category boundary and missing values."""
+        ceilings = [3100, 3000, 1000, 999, 500, 499, np.nan, np.nan, np.nan]
+        visibilities = [6, 6, 6, 6, 6, 6, 5, 0.75, np.nan]
+        self.assertEqual(flight_categories(ceilings, visibilities).tolist(),
+                         ["VFR", "MVFR", "MVFR", "IFR", "IFR", "LIFR", "MVFR", "LIFR", None])
+
+    def test_002_matches_scalar_categories(self) -> None:
+        """Tests that random ceilings and visibilities get the same category as one at a time."""
+        rng = random.Random(15)
+        ceilings = [None if rng.random() < 0.3 else rng.randrange(0, 6000, 100)
+                    for _ in range(2000)]
+        visibilities = [None if rng.random() < 0.1 else rng.choice([0.25, 1, 2.5, 3, 5, 6, 10])
+                        for _ in range(2000)]
+        vectorized = flight_categories(
+            np.array([np.nan if ceiling is None else ceiling for ceiling in ceilings]),
+            np.array([np.nan if visibility is None else visibility
+                      for visibility in visibilities]))
+        self.assertEqual(vectorized.tolist(),
+                         [flight_category(ceiling, visibility)
+                          for ceiling, visibility in zip(ceilings, visibilities)])
+
+    def test_003_table_matches_decoded_reports(self) -> None:
+        """Tests each row's ceiling, visibility and category against its decoded METAR."""
+        metars = [decode_metar(raw) for raw in sample_reports(300)] + [None]
+        table = category_table(metars)
+        with self.subTest():
+            self.assertEqual(table[-1], (None, None, None))
+        for metar, (ceiling, visibility, category) in zip(metars, table):
+            if metar is None:
+                continue
+            with self.subTest(raw=metar.raw):
+                self.assertEqual((ceiling, visibility, category),
+                                 (metar.ceiling_ft(), round(metar.visibility.statute_miles, 2),
+                                  metar.flight_category()))
+
+
+class TestFlightCategoryView(MockUpstreamTestCase):
+    """Tests the flight category table of a User's saved places.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the view against the local mock upstream.
+
+    Methods:
+        setUp() -> None
+        test_001_status_table() -> None
+        test_002_upstream_errors_are_bad_gateway() -> None
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        user = User.objects.get(email="odie@odie.com")
+        for code, name in (("KSVN", "Hunter AAF"), ("KSAV", "Savannah Intl"),
+                           ("KXXX", "Nowhere")):
+            Airport.objects.create(user=user, icao_code=code, name=name)
+        Named_location.objects.create(user=user, city="Pooler", country="US",
+                                      latitude="32.1155", longitude="-81.2471")
+
+    def test_001_status_table(self) -> None:
+        """Tests every Airport and Named Location gets a row from one batched upstream call."""
+        now = datetime.now(timezone.utc)
+        metar_cache.set("KSAV", f"KSAV {now:%d%H%M}Z 09006KT 2SM BR OVC007 18/17 A3001", now)
+        response = self.client.get(reverse("flight_categories"))
+        body = response.json()
+        with self.subTest():
+            self.assertEqual(body["columns"][-3:], ["ceiling_ft", "visibility_sm",
+                                                   "flight_category"])
+        with self.subTest():
+            self.assertEqual(body["rows"],
+                             [["Savannah Intl", "airport", "KSAV", None, 700, 2.0, "IFR"],
+                              ["Hunter AAF", "airport", "KSVN", None, None, 10.0, "VFR"],
+                              ["Nowhere", "airport", None, None, None, None, None],
+                              ["Pooler, US", "named_location", "KSAV", 4.7, 700, 2.0, "IFR"]])
+        with self.subTest():
+            self.assertEqual(body["errors"], {"KXXX": "That ICAO code does not match any results."})
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_002_upstream_errors_are_bad_gateway(self) -> None:
+        """Tests that a failing provider with nothing cached is answered with a 502."""
+        self.upstream.error_rate = 1.0
+        response = self.client.get(reverse("flight_categories"))
+        self.assertEqual(response.status_code, 502)
@@ -0,0 +1,126 @@
+"""Module that tests the log of changed reports and the cursor feed read from it.
+
+Classes:
+    TestChangeCursor
+    TestChangeFeed
+"""
+
+from datetime import datetime, timedelta, timezone
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from weather_app.changes import decode_cursor, encode_cursor, record_changes
+from weather_app.models import ReportChange
+from tests.test_metar_views import MockUpstreamTestCase
+
+NOW = datetime(2024, 5, 1, 18, 5, tzinfo=timezone.utc)
+
+
+class TestChangeCursor(SimpleTestCase):
+    """Tests that cursors are opaque and read back as they were built.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_round_trip() -> None
+        test_002_not_a_cursor() -> None
+    """
+
+    def test_001_round_trip(self) -> None:
+        """Tests a cursor gives back its change id and issue time."""
+        cursor = encode_cursor(123456789, NOW)
+        with self.subTest():
+            self.assertRegex(cursor, r"^[A-Za-z0-9_-]+$")
+        self.assertEqual(decode_cursor(cursor), (123456789, NOW))
+
+    def test_002_not_a_cursor(self) -> None:
+        """Tests that text that isn't a cursor is rejected."""
+        self.assertEqual([decode_cursor(text) for text in ("", "42", "not a cursor!")],
+                         [None, None, None])
+
+
+@override_settings(WEATHER_CHANGES={"SETTLE_SECONDS": 0})
+class TestChangeFeed(MockUpstreamTestCase):
+    """Tests that polls get only the reports changed since their cursor.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        poll(cursor, **params) -> dict
+        test_001_fetched_reports_are_changes() -> None
+        test_002_latest_change_per_station() -> None
+        test_003_pages() -> None
+        test_004_bad_and_expired_cursors() -> None
+        test_005_unsettled_changes_wait() -> None
+    """
+
+    def poll(self, cursor: str | None = None, **params) -> dict:
+        """Gets the change feed after a cursor."""
+        if cursor is not None:
+            params["since"] = cursor
+        return self.client.get(reverse("weather_changes"), params).json()
+
+    def test_001_fetched_reports_are_changes(self) -> None:
+        """Tests that reports fetched by the views are polled once, cached ones never."""
+        start = self.poll()
+        self.client.get(reverse("a_airport_metar", args=["KSVN,KSAV"]))
+        self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        changed = self.poll(start["cursor"])
+        with self.subTest():
+            self.assertEqual(start["changes"], [])
+        with self.subTest():
+            self.assertEqual([(change["kind"], change["station"])
+                              for change in changed["changes"]],
+                             [("metar", "KSVN"), ("metar", "KSAV")])
+        self.assertEqual(self.poll(changed["cursor"])["changes"], [])
+
+    def test_002_latest_change_per_station(self) -> None:
+        """Tests that a station changed twice is sent once and stations can be picked."""
+        cursor = self.poll()["cursor"]
+        record_changes("metar", ["KSVN 011655Z 18008KT 10SM FEW045 28/21 A2998",
+                                 "KSAV 011653Z 20006KT 10SM CLR 29/20 A2997",
+                                 "KSVN 011755Z 19010KT 10SM BKN030 27/21 A2998"])
+        changed = self.poll(cursor)
+        picked = self.poll(cursor, stations="ksav")
+        with self.subTest():
+            self.assertEqual([change["raw"][:12] for change in changed["changes"]],
+                             ["KSAV 011653Z", "KSVN 011755Z"])
+        with self.subTest():
+            self.assertEqual([change["station"] for change in picked["changes"]], ["KSAV"])
+        self.assertEqual(self.poll(picked["cursor"])["changes"], [])
+
+    @override_settings(WEATHER_CHANGES={"SETTLE_SECONDS": 0, "PAGE_SIZE": 2})
+    def test_003_pages(self) -> None:
+        """Tests that more changes than a page are read over consecutive polls."""
+        cursor = self.poll()["cursor"]
+        record_changes("taf", [f"TAF {code} 011720Z 0118/0224 18008KT P6SM SCT040"
+                               for code in ("KSVN", "KSAV", "KJFK")])
+        first = self.poll(cursor)
+        second = self.poll(first["cursor"])
+        self.assertEqual(
+            ([change["station"] for change in first["changes"]], first["more"],
+             [change["station"] for change in second["changes"]], second["more"]),
+            (["KSVN", "KSAV"], True, ["KJFK"], False))
+
+    def test_004_bad_and_expired_cursors(self) -> None:
+        """Tests a malformed cursor is a 400 and one past retention is a 410."""
+        bad = self.client.get(reverse("weather_changes"), {"since": "nope!"})
+        expired = self.client.get(reverse("weather_changes"), {
+            "since": encode_cursor(0, datetime.now(timezone.utc) - timedelta(days=3))})
+        with self.subTest():
+            self.assertEqual((bad.status_code, expired.status_code), (400, 410))
+        self.assertIsNotNone(decode_cursor(expired.json()["cursor"]))
+
+    @override_settings(WEATHER_CHANGES={"SETTLE_SECONDS": 60})
+    def test_005_unsettled_changes_wait(self) -> None:
+        """Tests that changes younger than SETTLE_SECONDS are left for a later poll."""
+        cursor = self.poll()["cursor"]
+        record_changes("metar", ["KSVN 011655Z 18008KT 10SM FEW045 28/21 A2998"])
+        changed = self.poll(cursor)
+        with self.subTest():
+            self.assertEqual(changed["changes"], [])
+        with self.subTest():
+            self.assertEqual(decode_cursor(changed["cursor"])[0], decode_cursor(cursor)[0])
+        self.assertEqual(ReportChange.objects.count(), 1)
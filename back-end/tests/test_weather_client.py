@@ -0,0 +1,125 @@
+"""Module that tests the shared upstream weather client.
+
+Classes:
+    TestWeatherClient
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import SimpleTestCase
+from weather_app.client import WeatherClient, UpstreamError, get_async_client, get_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers every request from the script set on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.server.calls.append(
+            (self.path, self.headers.get("X-API-Key"), self.client_address[1]))
+        status, body, delay = self.server.script.pop(0) if len(
+            self.server.script) > 1 else self.server.script[0]
+        if delay:
+            time.sleep(delay)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class TestWeatherClient(SimpleTestCase):
+    """Tests the pooling, timeouts, and retries of the WeatherClient.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        setUp() -> None
+        tearDown() -> None
+        test_001_checkwx_sends_key_and_reuses_connection() -> None
+        test_002_retries_server_errors() -> None
+        test_003_read_timeout_raises_upstream_error() -> None
+        test_004_geocode_not_found_returns_none() -> None
+        test_005_get_client_is_shared() -> None
+        test_006_async_client_closes_with_its_loop() -> None
+    """
+
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.calls = []
+        self.server.script = [(200, {"results": 1, "data": ["KSVN"]}, 0)]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = WeatherClient({
+            "CHECKWX_BASE_URL": base_url, "OPENWX_BASE_URL": base_url,
+            "CONNECT_TIMEOUT": 1, "READ_TIMEOUT": 0.5, "BACKOFF_FACTOR": 0,
+        })
+        self.client.checkwx_key = "test-key"
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_001_checkwx_sends_key_and_reuses_connection(self) -> None:
+        """Tests that the API key is sent and one kept-alive connection serves every call."""
+        self.client.metar("KSVN")
+        self.client.taf("KSVN")
+        paths = [call[0] for call in self.server.calls]
+        with self.subTest():
+            self.assertEqual(paths, ["/metar/KSVN", "/taf/KSVN"])
+        with self.subTest():
+            self.assertEqual(self.server.calls[0][1], "test-key")
+        self.assertEqual(len({call[2] for call in self.server.calls}), 1)
+
+    def test_002_retries_server_errors(self) -> None:
+        """Tests that a 5xx answer is retried before the real answer is returned."""
+        self.server.script = [(503, {}, 0), (200, {"results": 1, "data": ["KSVN"]}, 0)]
+        response = self.client.metar("KSVN")
+        with self.subTest():
+            self.assertEqual(response["results"], 1)
+        self.assertEqual(len(self.server.calls), 2)
+
+    def test_003_read_timeout_raises_upstream_error(self) -> None:
+        """Tests that a hung upstream raises UpstreamError instead of blocking."""
+        self.client.config["MAX_RETRIES"] = 0
+        self.server.script = [(200, {"results": 1, "data": []}, 1.5)]
+        client = WeatherClient({**self.client.config})
+        start = time.monotonic()
+        with self.assertRaises(UpstreamError):
+            client.metar("KSVN")
+        client.close()
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_004_geocode_not_found_returns_none(self) -> None:
+        """Tests that a 404 from OpenWeatherMap is reported as None."""
+        self.server.script = [(404, {"cod": "404"}, 0)]
+        with self.subTest():
+            self.assertIsNone(self.client.geocode("Nowhere", "US"))
+        self.assertTrue(self.server.calls[0][0].startswith(
+            "/data/2.5/weather?q=Nowhere%2CUS"))
+
+    def test_005_get_client_is_shared(self) -> None:
+        """Tests that every caller in the process shares one client."""
+        self.assertIs(get_client(), get_client())
+
+    def test_006_async_client_closes_with_its_loop(self) -> None:
+        """Tests that each event loop shares one async client, closed when the loop ends."""
+        async def clients():
+            return get_async_client(), get_async_client()
+
+        first, again = asyncio.run(clients())
+        with self.subTest():
+            self.assertIs(first, again)
+        with self.subTest():
+            self.assertTrue(first.session.closed)
+        self.assertIsNot(asyncio.run(clients())[0], first)
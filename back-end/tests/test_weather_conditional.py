@@ -0,0 +1,100 @@
+"""Module that tests conditional GETs of the METAR and TAF views.
+
+Classes:
+    TestConditionalReports
+"""
+
+from datetime import datetime, timezone
+from django.core.cache import caches
+from django.urls import reverse
+from django.utils.http import http_date
+from weather_app.reports import report_time
+from weather_app.services import metar_cache
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+class TestConditionalReports(MockUpstreamTestCase):
+    """Tests that unchanged reports are answered with a 304 without going upstream.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_matching_etag_is_not_modified() -> None
+        test_002_if_modified_since() -> None
+        test_003_new_report_changes_etag() -> None
+        test_004_representations_have_their_own_etag() -> None
+        test_005_uncached_stations_are_fetched() -> None
+        test_006_combined_and_coordinate_views() -> None
+    """
+
+    def test_001_matching_etag_is_not_modified(self) -> None:
+        """Tests that a matching If-None-Match gets an empty 304 from the cache."""
+        first = self.client.get(reverse("a_airport_metar", args=["KSVN,KSAV"]))
+        again = self.client.get(reverse("a_airport_metar", args=["KSVN,KSAV"]),
+                                HTTP_IF_NONE_MATCH=first["ETag"])
+        with self.subTest():
+            self.assertEqual((again.status_code, again.content, again["ETag"]),
+                             (304, b"", first["ETag"]))
+        with self.subTest():
+            self.assertEqual(first["Cache-Control"], "private, no-cache")
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_002_if_modified_since(self) -> None:
+        """Tests that Last-Modified is the observation time and is honoured."""
+        first = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        observed = report_time(first.json()["KSVN"], datetime.now(timezone.utc))
+        with self.subTest():
+            self.assertEqual(first["Last-Modified"], http_date(observed.timestamp()))
+        same = self.client.get(reverse("a_airport_metar", args=["KSVN"]),
+                               HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        older = self.client.get(reverse("a_airport_metar", args=["KSVN"]),
+                                HTTP_IF_MODIFIED_SINCE=http_date(observed.timestamp() - 60))
+        self.assertEqual((same.status_code, older.status_code), (304, 200))
+
+    def test_003_new_report_changes_etag(self) -> None:
+        """Tests that a new report, or a correction at the same time, is sent in full."""
+        first = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        metar_cache.set("KSVN", f"{first.json()['KSVN']} $",
+                        datetime.fromtimestamp(metar_cache.get("KSVN")["checked_at"] + 1,
+                                               timezone.utc))
+        corrected = self.client.get(reverse("a_airport_metar", args=["KSVN"]),
+                                    HTTP_IF_NONE_MATCH=first["ETag"])
+        with self.subTest():
+            self.assertEqual(corrected.status_code, 200)
+        self.assertNotEqual(corrected["ETag"], first["ETag"])
+
+    def test_004_representations_have_their_own_etag(self) -> None:
+        """Tests that decoded METARs and TAFs are validated separately from raw METARs."""
+        raw = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        decoded = self.client.get(reverse("a_airport_metar", args=["KSVN"]), {"decoded": "1"},
+                                  HTTP_IF_NONE_MATCH=raw["ETag"])
+        taf = self.client.get(reverse("a_airport_taf", args=["KSVN"]))
+        taf_again = self.client.get(reverse("a_airport_taf", args=["KSVN"]),
+                                    HTTP_IF_NONE_MATCH=taf["ETag"])
+        self.assertEqual((decoded.status_code, taf_again.status_code), (200, 304))
+
+    def test_005_uncached_stations_are_fetched(self) -> None:
+        """Tests that an ETag can't stand in for a station that isn't cached."""
+        first = self.client.get(reverse("a_airport_metar", args=["KSVN,KSAV"]))
+        caches["weather"].delete(metar_cache.key("KSAV"))
+        again = self.client.get(reverse("a_airport_metar", args=["KSVN,KSAV"]),
+                                HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual((again.status_code, self.upstream.calls), (200, 2))
+
+    def test_006_combined_and_coordinate_views(self) -> None:
+        """Tests the combined METAR and TAF view and the coordinate view."""
+        weather = self.client.get(reverse("a_airport_weather", args=["KSVN"]))
+        coordinate = self.client.get(reverse("a_coordinate_metar", args=["32.0809", "-81.0912"]))
+        calls = self.upstream.calls
+        weather_again = self.client.get(reverse("a_airport_weather", args=["KSVN"]),
+                                        HTTP_IF_NONE_MATCH=weather["ETag"])
+        coordinate_again = self.client.get(
+            reverse("a_coordinate_metar", args=["32.0809", "-81.0912"]),
+            HTTP_IF_NONE_MATCH=coordinate["ETag"])
+        with self.subTest():
+            self.assertEqual((weather_again.status_code, coordinate_again.status_code),
+                             (304, 304))
+        with self.subTest():
+            self.assertEqual(coordinate_again["X-Weather-Station"], "KSVN")
+        self.assertEqual(self.upstream.calls, calls)
@@ -0,0 +1,126 @@
+"""Module that tests the METAR decoder and the decoded METAR views.
+
+Classes:
+    TestMetarDecoder
+    TestDecodedMetarViews
+"""
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from weather_app.management.commands.bench_metar_decode import sample_reports
+from weather_app.metar import (
+    RunwayVisualRange,
+    SkyLayer,
+    Visibility,
+    WeatherGroup,
+    Wind,
+    decode_metar,
+)
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+class TestMetarDecoder(SimpleTestCase):
+    """Tests that raw METARs are decoded into their groups.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_routine_report() -> None
+        test_002_low_visibility_special() -> None
+        test_003_metric_report() -> None
+        test_004_groups_out_of_order_and_unknown() -> None
+        test_005_generated_reports_decode_fully() -> None
+    """
+
+    def test_001_routine_report(self) -> None:
+        """Tests the header, wind, visibility, sky, temperature, altimeter and remarks."""
+        metar = decode_metar("METAR KJFK 121851Z 31017G28KT 280V340 10SM FEW050 SCT250 "
+                             "08/M07 A2985 RMK AO2 SLP107 T00831067")
+        with self.subTest():
+            self.assertEqual((metar.type, metar.station, metar.day, metar.time),
+                             ("METAR", "KJFK", 12, "1851"))
+        with self.subTest():
+            self.assertEqual(metar.wind, Wind(310, 17, 28, "KT", 280, 340))
+        with self.subTest():
+            self.assertEqual(metar.sky, [SkyLayer("FEW", 5000), SkyLayer("SCT", 25000)])
+        with self.subTest():
+            self.assertEqual((metar.visibility, metar.temperature, metar.dewpoint,
+                              metar.altimeter, metar.altimeter_unit),
+                             (Visibility(10.0), 8, -7, 29.85, "inHg"))
+        self.assertEqual((metar.remarks, metar.unparsed, metar.ceiling_ft()),
+                         ("AO2 SLP107 T00831067", [], None))
+
+    def test_002_low_visibility_special(self) -> None:
+        """Tests fractional visibility, runway visual range, weather and a ceiling."""
+        metar = decode_metar("SPECI KORD 051532Z 09012KT 1 1/2SM R10L/4500VP6000FT/U "
+                             "-TSRA BR BKN008 OVC015CB 18/17 A2990")
+        with self.subTest():
+            self.assertEqual((metar.type, metar.visibility), ("SPECI", Visibility(1.5)))
+        with self.subTest():
+            self.assertEqual(metar.runway_visual_range,
+                             [RunwayVisualRange("10L", 4500, 6000, "FT", "P", "U")])
+        with self.subTest():
+            self.assertEqual(metar.weather, [WeatherGroup("-", "TS", ["RA"]),
+                                             WeatherGroup(None, None, ["BR"])])
+        self.assertEqual((metar.ceiling_ft(), metar.sky[1].cloud_type), (800, "CB"))
+
+    def test_003_metric_report(self) -> None:
+        """Tests metre visibilities, CAVOK and hectopascal altimeter settings."""
+        fog = decode_metar("ETAR 121855Z AUTO 22005KT 0800 R26/0550N BCFG VV/// 04/04 Q1018")
+        cavok = decode_metar("LFPG 121830Z VRB02KT CAVOK M15/M19 Q1020 NOSIG")
+        with self.subTest():
+            self.assertEqual((fog.modifier, fog.visibility, fog.sky, fog.altimeter_unit),
+                             ("AUTO", Visibility(800.0, "M"), [SkyLayer("VV")], "hPa"))
+        with self.subTest():
+            self.assertAlmostEqual(fog.visibility.statute_miles, 0.497, places=3)
+        self.assertEqual((cavok.wind.direction, cavok.visibility.modifier, cavok.temperature,
+                          cavok.unparsed), (None, "P", -15, ["NOSIG"]))
+
+    def test_004_groups_out_of_order_and_unknown(self) -> None:
+        """Tests that groups out of order are still read and unknown ones are kept."""
+        metar = decode_metar("KXYZ 121853Z -RA 3SM 18010KT BKN010 WS020 12/10 A2990")
+        with self.subTest():
+            self.assertEqual((metar.wind.speed, metar.visibility.distance, metar.ceiling_ft()),
+                             (10, 3.0, 1000))
+        with self.subTest():
+            self.assertEqual(metar.unparsed, ["WS020"])
+        self.assertEqual(decode_metar("not a report").as_dict()["unparsed"], ["not", "a", "report"])
+
+    def test_005_generated_reports_decode_fully(self) -> None:
+        """Tests that every report the benchmark generates is decoded without leftovers."""
+        for raw in sample_reports(500):
+            metar = decode_metar(raw)
+            with self.subTest(raw=raw):
+                self.assertEqual(metar.unparsed, [])
+            with self.subTest(raw=raw):
+                self.assertIsNotNone(metar.altimeter)
+
+
+class TestDecodedMetarViews(MockUpstreamTestCase):
+    """Tests the ?decoded=1 mode of the METAR views.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_airport_metar_decoded() -> None
+        test_002_coordinate_metar_decoded() -> None
+    """
+
+    def test_001_airport_metar_decoded(self) -> None:
+        """Tests that each airport's METAR is returned decoded alongside its raw text."""
+        raw = self.client.get(reverse("a_airport_metar", args=["KSVN"])).json()["KSVN"]
+        response = self.client.get(reverse("a_airport_metar", args=["KSVN"]), {"decoded": "1"})
+        decoded = response.json()["KSVN"]
+        with self.subTest():
+            self.assertEqual((decoded["raw"], decoded["station"]), (raw, "KSVN"))
+        self.assertEqual((decoded["wind"]["speed"], decoded["sky"][0]["height_ft"],
+                          decoded["altimeter"]), (8, 4500, 29.98))
+
+    def test_002_coordinate_metar_decoded(self) -> None:
+        """Tests that the nearest station's METAR is returned decoded."""
+        response = self.client.get(reverse("a_coordinate_metar", args=["32.08", "-81.09"]),
+                                   {"decoded": "true"})
+        self.assertEqual((response.json()["station"], response.json()["visibility"]),
+                         ("KSVN", {"distance": 10.0, "unit": "SM", "modifier": None}))
@@ -0,0 +1,87 @@
+"""Module that tests the local CheckWX and OpenWeatherMap stand-in.
+
+Classes:
+    TestMockUpstream
+"""
+
+import random
+import requests
+from django.test import SimpleTestCase
+from weather_app.mock_upstream import Latency, MockUpstream
+
+
+class TestMockUpstream(SimpleTestCase):
+    """Tests the latency, error and rate limiting behaviour of the MockUpstream.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_latency_specs_are_parsed() -> None
+        test_002_latency_samples_follow_the_distribution() -> None
+        test_003_error_rate_is_applied() -> None
+        test_004_rate_limit_answers_too_many_requests() -> None
+        test_005_provider_response_shapes() -> None
+    """
+
+    def start(self, **options) -> MockUpstream:
+        upstream = MockUpstream(seed=3, **options).start()
+        self.addCleanup(upstream.stop)
+        return upstream
+
+    def test_001_latency_specs_are_parsed(self) -> None:
+        """Tests that numbers and "kind:param" strings become distributions."""
+        with self.subTest():
+            self.assertEqual(str(Latency.parse(0.2)), "constant:0.2")
+        with self.subTest():
+            self.assertEqual(str(Latency.parse("uniform:0.05:0.3")), "uniform:0.05:0.3")
+        with self.assertRaises(ValueError):
+            Latency.parse("uniform:0.05")
+
+    def test_002_latency_samples_follow_the_distribution(self) -> None:
+        """Tests that uniform samples stay in range and lognormal ones center on the median."""
+        rng = random.Random(1)
+        uniform = [Latency("uniform", 0.1, 0.2).sample(rng) for _ in range(1000)]
+        lognormal = sorted(Latency("lognormal", 0.15, 0.5).sample(rng) for _ in range(1001))
+        with self.subTest():
+            self.assertTrue(all(0.1 <= delay <= 0.2 for delay in uniform))
+        self.assertAlmostEqual(lognormal[500], 0.15, delta=0.02)
+
+    def test_003_error_rate_is_applied(self) -> None:
+        """Tests that roughly the configured fraction of requests fail with a 5xx."""
+        upstream = self.start(error_rate=0.3)
+        with requests.Session() as session:
+            statuses = [session.get(f"{upstream.base_url}/metar/KSVN").status_code
+                        for _ in range(200)]
+        failed = [status for status in statuses if status != 200]
+        with self.subTest():
+            self.assertTrue(set(failed) <= {500, 502, 503})
+        self.assertAlmostEqual(len(failed) / 200, 0.3, delta=0.1)
+
+    def test_004_rate_limit_answers_too_many_requests(self) -> None:
+        """Tests that requests beyond the per-minute limit get a 429 with Retry-After."""
+        upstream = self.start(rate_limit=3)
+        with requests.Session() as session:
+            responses = [session.get(f"{upstream.base_url}/taf/KSVN") for _ in range(5)]
+        with self.subTest():
+            self.assertEqual([response.status_code for response in responses],
+                             [200, 200, 200, 429, 429])
+        self.assertEqual(responses[-1].headers["Retry-After"], "60")
+
+    def test_005_provider_response_shapes(self) -> None:
+        """Tests that the endpoints answer with the providers' JSON shapes."""
+        upstream = self.start(unknown_stations=["KXXX"])
+        with requests.Session() as session:
+            metar = session.get(f"{upstream.base_url}/metar/KSVN,KXXX,KJFK").json()
+            near = session.get(f"{upstream.base_url}/taf/lat/51.5/lon/-0.4/").json()
+            city = session.get(f"{upstream.base_url}/data/2.5/weather",
+                               params={"q": "London,gb", "appid": "key"}).json()
+        with self.subTest():
+            self.assertEqual(metar["results"], 2)
+        with self.subTest():
+            self.assertTrue(near["data"][0].startswith("TAF EGLL "))
+        with self.subTest():
+            self.assertEqual(sorted(city), ["base", "clouds", "cod", "coord", "dt", "id",
+                                            "main", "name", "sys", "timezone",
+                                            "visibility", "weather", "wind"])
+        self.assertEqual(upstream.calls_by_path, {"metar": 1, "taf": 1, "data": 1})
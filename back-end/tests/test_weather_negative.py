@@ -0,0 +1,104 @@
+"""Module that tests that known-bad ICAO codes are answered without going upstream.
+
+Classes:
+    TestScreenCodes
+    TestNegativeCache
+"""
+
+import time
+from datetime import datetime, timezone
+from unittest import mock
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from airport_app.models import Airport
+from user_app.models import User
+from weather_app.prewarm import Prewarmer
+from weather_app.services import INVALID, NOT_FOUND, is_icao_code, screen_codes, taf_cache
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+class TestScreenCodes(SimpleTestCase):
+    """Tests the local checks of ICAO codes against the Airport rules and the catalogue.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_airport_rules() -> None
+        test_002_catalogue_kinds() -> None
+        test_003_complete_catalogue() -> None
+    """
+
+    def test_001_airport_rules(self) -> None:
+        """Tests that only 4 capital letters make an ICAO code."""
+        self.assertEqual([is_icao_code(code) for code in ("KSVN", "ksvn", "KSV", "KSVNX", "K1V4")],
+                         [True, False, False, False, False])
+
+    def test_002_catalogue_kinds(self) -> None:
+        """Tests that a catalogued station without TAFs is only screened out for TAFs."""
+        with self.subTest():
+            self.assertEqual(screen_codes("taf", ["KSVN", "KJYL", "KS1"]),
+                             (["KSVN"], {"KJYL": NOT_FOUND, "KS1": INVALID}))
+        self.assertEqual(screen_codes("metar", ["KJYL", "KZZZ"]), (["KJYL", "KZZZ"], {}))
+
+    @override_settings(WEATHER_STATIONS={"COMPLETE": True})
+    def test_003_complete_catalogue(self) -> None:
+        """Tests that a complete catalogue screens out the stations it doesn't have."""
+        self.assertEqual(screen_codes("metar", ["KSVN", "KZZZ"]),
+                         (["KSVN"], {"KZZZ": NOT_FOUND}))
+
+
+class TestNegativeCache(MockUpstreamTestCase):
+    """Tests that stations without a report aren't asked for again for NEGATIVE_TTL.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_unknown_station_is_asked_for_once() -> None
+        test_002_negative_entry_expires() -> None
+        test_003_invalid_codes_never_go_upstream() -> None
+        test_004_prewarm_skips_known_bad_stations() -> None
+    """
+
+    def test_001_unknown_station_is_asked_for_once(self) -> None:
+        """Tests that repeats of an unknown station are answered from the negative cache."""
+        first = self.client.get(reverse("a_airport_metar", args=["KXXX"]))
+        again = self.client.get(reverse("a_airport_metar", args=["KXXX"]))
+        mixed = self.client.get(reverse("a_airport_metar", args=["KSVN,KXXX"]))
+        with self.subTest():
+            self.assertEqual((first.status_code, again.status_code), (404, 404))
+        with self.subTest():
+            self.assertEqual(mixed.json()["errors"], {"KXXX": NOT_FOUND})
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_002_negative_entry_expires(self) -> None:
+        """Tests that an unknown station is asked for again after NEGATIVE_TTL."""
+        with mock.patch.dict(taf_cache.config, {"NEGATIVE_TTL": 1}):
+            self.client.get(reverse("a_airport_taf", args=["KXXX"]))
+        time.sleep(1.1)
+        self.client.get(reverse("a_airport_taf", args=["KXXX"]))
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_003_invalid_codes_never_go_upstream(self) -> None:
+        """Tests that invalid codes are a 400 and a station without TAFs a 404, locally."""
+        invalid = self.client.get(reverse("a_airport_metar", args=["KS1,KSVNX"]))
+        combined = self.client.get(reverse("a_airport_weather", args=["12"]))
+        no_taf = self.client.get(reverse("a_airport_taf", args=["KJYL"]))
+        with self.subTest():
+            self.assertEqual((invalid.status_code, invalid.json()), (400, {"Error": INVALID}))
+        with self.subTest():
+            self.assertEqual((combined.status_code, no_taf.status_code), (400, 404))
+        self.assertEqual(self.upstream.calls, 0)
+
+    def test_004_prewarm_skips_known_bad_stations(self) -> None:
+        """Tests that the prewarmer skips known-bad stations, per kind of report."""
+        user = User.objects.get(email="odie@odie.com")
+        for code in ("KSVN", "KXXX", "KJYL"):
+            Airport.objects.create(user=user, icao_code=code, name=code.title())
+        self.client.get(reverse("a_airport_metar", args=["KXXX"]))
+        prewarmer, now = Prewarmer(), datetime.now(timezone.utc)
+        self.assertEqual((prewarmer.due("metar", prewarmer.stored_codes(), now),
+                          prewarmer.due("taf", prewarmer.stored_codes(), now)),
+                         (["KJYL", "KSVN"], ["KSVN", "KXXX"]))
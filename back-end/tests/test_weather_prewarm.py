@@ -0,0 +1,161 @@
+"""Module that tests the background cache prewarmer.
+
+Classes:
+    TestRequestBudget
+    TestPrewarmer
+"""
+
+import random
+from datetime import datetime, timezone
+from unittest import mock
+from django.core.cache import caches
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from airport_app.models import Airport
+from user_app.models import User
+from weather_app.prewarm import Prewarmer, RequestBudget
+from tests.test_weather_cache import sign_up
+
+
+class FakeClock:
+    """A monotonic clock that only moves when the budget sleeps."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def upstream_reports(kind: str):
+    """Builds a fake upstream call that answers with a current report for every code."""
+
+    def answer(icao: str) -> dict:
+        now = datetime.now(timezone.utc)
+        prefix = "TAF " if kind == "taf" else ""
+        data = [f"{prefix}{code} {now:%d%H%M}Z 18008KT 10SM FEW045"
+                for code in icao.split(",")]
+        return {"results": len(data), "data": data}
+    return answer
+
+
+class TestRequestBudget(SimpleTestCase):
+    """Tests that the request budget spreads calls out and caps them per minute.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_calls_are_spaced_evenly_without_jitter() -> None
+        test_002_jittered_calls_stay_within_the_budget() -> None
+    """
+
+    def test_001_calls_are_spaced_evenly_without_jitter(self) -> None:
+        """Tests that a budget of 3 per minute sends a call every 20 seconds."""
+        clock = FakeClock()
+        budget = RequestBudget(3, clock=clock, sleep=clock.sleep)
+        for _ in range(4):
+            budget.acquire()
+        self.assertEqual(clock.sleeps, [20, 20, 20])
+
+    def test_002_jittered_calls_stay_within_the_budget(self) -> None:
+        """Tests that no 60 second window holds more calls than the budget allows."""
+        clock = FakeClock()
+        budget = RequestBudget(10, jitter=0.9, clock=clock, sleep=clock.sleep,
+                               rng=random.Random(7))
+        sent = []
+        for _ in range(200):
+            budget.acquire()
+            sent.append(clock.now)
+        busiest = max(sum(1 for other in sent if start <= other < start + 60)
+                      for start in sent)
+        with self.subTest():
+            self.assertLessEqual(busiest, 10)
+        self.assertGreater(len(set(clock.sleeps)), 1)
+
+
+class TestPrewarmer(APITestCase):
+    """Tests that the prewarmer fills the caches for every stored airport.
+
+    Extends:
+        APITestCase (class): The rest_framework APITestCase class.
+
+    Methods:
+        setUp() -> None
+        test_001_stored_codes_are_fetched_in_batches() -> None
+        test_002_fresh_entries_are_not_refetched() -> None
+        test_003_prewarmed_airports_are_served_without_upstream_calls() -> None
+        test_004_failed_pass_does_not_stop_the_worker() -> None
+    """
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        sign_up(self)
+        owner = User.objects.get(email="odie@odie.com")
+        other = User.objects.create(email="jon@jon.com", username="jon@jon.com",
+                                    display_name="jonarbuckle")
+        codes = [f"KA{chr(65 + idx // 26)}{chr(65 + idx % 26)}" for idx in range(45)]
+        for code in codes:
+            Airport.objects.create(user=owner, icao_code=code, name=code)
+        for code in codes[:10]:
+            Airport.objects.create(user=other, icao_code=code.lower(), name=code)
+        self.upstream = mock.Mock()
+        self.upstream.metar.side_effect = upstream_reports("metar")
+        self.upstream.taf.side_effect = upstream_reports("taf")
+        clock = FakeClock()
+        self.prewarmer = Prewarmer(
+            {"BATCH_SIZE": 20}, budget=RequestBudget(30, clock=clock, sleep=clock.sleep))
+
+    def test_001_stored_codes_are_fetched_in_batches(self) -> None:
+        """Tests that 45 distinct stations take three METAR and three TAF calls."""
+        with mock.patch("weather_app.services.get_client", return_value=self.upstream):
+            summary = self.prewarmer.run_once()
+        with self.subTest():
+            self.assertEqual(summary, {"stations": 45, "metar": 45, "taf": 45,
+                                       "calls": 6, "errors": 0})
+        self.assertEqual(
+            [len(call.args[0].split(",")) for call in self.upstream.metar.call_args_list],
+            [20, 20, 5])
+
+    def test_002_fresh_entries_are_not_refetched(self) -> None:
+        """Tests that a second pass right after the first makes no upstream calls."""
+        with mock.patch("weather_app.services.get_client", return_value=self.upstream):
+            self.prewarmer.run_once()
+            summary = self.prewarmer.run_once()
+        self.assertEqual(summary["calls"], 0)
+
+    def test_003_prewarmed_airports_are_served_without_upstream_calls(self) -> None:
+        """Tests that the weather views answer from the cache once it has been warmed."""
+        with mock.patch("weather_app.services.get_client", return_value=self.upstream):
+            self.prewarmer.run_once()
+        views_upstream = mock.AsyncMock()
+        with mock.patch("weather_app.services.get_async_client", return_value=views_upstream):
+            metar = self.client.get(reverse("a_airport_metar", args=["KAAA,KABQ"]))
+            taf = self.client.get(reverse("a_airport_taf", args=["KABS"]))
+            weather = self.client.get(reverse("a_airport_weather", args=["KABS"]))
+        with self.subTest():
+            self.assertEqual((metar.status_code, weather.status_code), (200, 200))
+        with self.subTest():
+            self.assertEqual(taf["X-Cache"], "HIT")
+        self.assertEqual(views_upstream.mock_calls, [])
+
+    def test_004_failed_pass_does_not_stop_the_worker(self) -> None:
+        """Tests that run_forever logs a pass that raises and carries on with the next."""
+        summaries = []
+
+        def report(summary: dict) -> None:
+            summaries.append(summary)
+            self.prewarmer.stop.set()
+
+        self.prewarmer.config["PASS_INTERVAL"] = 0
+        with mock.patch.object(self.prewarmer, "run_once",
+                               side_effect=[RuntimeError("cache went away"), {"calls": 0}]):
+            with self.assertLogs("weather_app.prewarm", level="ERROR"):
+                self.prewarmer.run_forever(report)
+        self.assertEqual(summaries, [{"calls": 0}])
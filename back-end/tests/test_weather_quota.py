@@ -0,0 +1,218 @@
+"""Module that tests the upstream request quota shared by every worker.
+
+Classes:
+    TestQuotaGovernor
+    TestQuotaFetches
+"""
+
+import asyncio
+import time
+from django.core.cache import caches
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from airport_app.models import Airport
+from user_app.models import User
+from weather_app import background
+from weather_app.cache import MetarCache
+from weather_app.client import (
+    AsyncWeatherClient,
+    CircuitOpenError,
+    QuotaExceededError,
+    UpstreamError,
+    WeatherClient,
+    get_client,
+)
+from weather_app.prewarm import Prewarmer
+from weather_app.quota import QuotaGovernor, background_priority, current_priority
+from weather_app.services import refresh_reports
+from tests.test_metar_views import MockUpstreamTestCase
+from tests.test_weather_breaker import OLD_METAR
+
+# 30 seconds into a minute, so a call 30 seconds later lands in the next one.
+NOW = 1714586430.0
+
+
+class TestQuotaGovernor(SimpleTestCase):
+    """Tests the per-minute and per-day token buckets and the share kept for users.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        setUp() -> None
+        test_001_minute_bucket_refills() -> None
+        test_002_background_stops_at_the_reserve() -> None
+        test_003_day_bucket() -> None
+        test_004_usage() -> None
+        test_005_priority_of_the_context() -> None
+        test_006_async_acquire_shares_the_buckets() -> None
+    """
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        self.quota = QuotaGovernor("test", config={"PER_MINUTE": 5, "PER_DAY": 100,
+                                                   "RESERVE": 0.4})
+
+    def test_001_minute_bucket_refills(self) -> None:
+        """Tests that the sixth call of a minute is refused and the next minute allowed."""
+        self.assertEqual([self.quota.acquire("user", NOW) for _ in range(6)]
+                         + [self.quota.acquire("user", NOW + 30)],
+                         [True] * 5 + [False, True])
+
+    def test_002_background_stops_at_the_reserve(self) -> None:
+        """Tests that background calls leave RESERVE of the bucket to user calls."""
+        background_calls = [self.quota.acquire("background", NOW) for _ in range(4)]
+        with self.subTest():
+            self.assertEqual(background_calls, [True, True, True, False])
+        with self.subTest():
+            self.assertFalse(self.quota.has_room("background", NOW))
+        self.assertEqual([self.quota.acquire("user", NOW) for _ in range(3)],
+                         [True, True, False])
+
+    def test_003_day_bucket(self) -> None:
+        """Tests that the day's cap holds across minutes and refused calls are given back."""
+        quota = QuotaGovernor("test", config={"PER_MINUTE": 2, "PER_DAY": 3})
+        granted = [quota.acquire("user", NOW + minute * 60)
+                   for minute in range(5) for _ in range(2)]
+        self.assertEqual((granted.count(True), quota.usage(NOW + 240)["day"]["used"]), (3, 3))
+
+    def test_004_usage(self) -> None:
+        """Tests that the usage has each window's use and the day's calls per priority.
+
+        Background calls stop once 3 of the 5 tokens are used, whoever used them.
+        """
+        self.quota.acquire("user", NOW)
+        for _ in range(4):
+            self.quota.acquire("background", NOW)
+        usage = self.quota.usage(NOW)
+        self.assertEqual(usage, {
+            "minute": {"used": 3, "limit": 5, "remaining": 2,
+                       "resets_at": int(NOW // 60 + 1) * 60},
+            "day": {"used": 3, "limit": 100, "remaining": 97,
+                    "resets_at": int(NOW // 86400 + 1) * 86400},
+            "granted": {"user": 1, "background": 2},
+            "refused": {"user": 0, "background": 2},
+        })
+
+    def test_005_priority_of_the_context(self) -> None:
+        """Tests that calls are for a user unless made in a background block."""
+        with background_priority():
+            inside = current_priority()
+        self.assertEqual((inside, current_priority()), ("background", "user"))
+
+    def test_006_async_acquire_shares_the_buckets(self) -> None:
+        """Tests that aacquire takes from the same buckets as acquire and is counted alike."""
+        async def acquire_all() -> list[bool]:
+            return [await self.quota.aacquire("user", NOW) for _ in range(3)]
+
+        granted = [self.quota.acquire("user", NOW) for _ in range(3)] + asyncio.run(acquire_all())
+        with self.subTest():
+            self.assertEqual(granted, [True] * 5 + [False])
+        self.assertEqual((self.quota.usage(NOW)["granted"]["user"],
+                          self.quota.usage(NOW)["refused"]["user"]), (5, 1))
+
+
+@override_settings(WEATHER_QUOTA={"PER_MINUTE": 3, "PER_DAY": 1000, "RESERVE": 0.34})
+class TestQuotaFetches(MockUpstreamTestCase):
+    """Tests that a spent quota stops upstream calls and keeps stale reports served.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the client against the local mock upstream.
+
+    Methods:
+        test_001_spent_quota_is_not_called() -> None
+        test_002_refused_refresh_keeps_the_stale_report() -> None
+        test_003_prewarm_leaves_the_reserve() -> None
+        test_004_usage_is_in_the_cache_stats() -> None
+        test_005_open_breaker_spends_no_quota() -> None
+        test_006_every_attempt_takes_a_token() -> None
+    """
+
+    def test_001_spent_quota_is_not_called(self) -> None:
+        """Tests that views answer 502 without an upstream call once the quota is spent."""
+        for code in ("KSVN", "KSAV", "KJFK"):
+            self.client.get(reverse("a_airport_metar", args=[code]))
+        with self.subTest():
+            with self.assertRaises(QuotaExceededError):
+                get_client().metar("KLAX")
+        response = self.client.get(reverse("a_airport_metar", args=["KMIA"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.upstream.calls, 3)
+
+    def test_002_refused_refresh_keeps_the_stale_report(self) -> None:
+        """Tests that a stale report is still served, and held, when its refresh is refused."""
+        entry = MetarCache().set("KSVN", OLD_METAR)
+        entry["expires_at"] = time.time() - 60
+        caches["weather"].set(MetarCache().key("KSVN"), entry, 1)
+        self.client.get(reverse("a_airport_metar", args=["KSAV"]))
+        self.client.get(reverse("a_airport_metar", args=["KJFK"]))
+        response = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        background.wait(timeout=5)
+        with self.subTest():
+            self.assertEqual((response.json(), response["X-Weather-Stale"]),
+                             ({"KSVN": OLD_METAR}, "true"))
+        with self.subTest():
+            self.assertEqual(self.upstream.calls, 2)
+        time.sleep(1.1)
+        self.assertEqual(MetarCache().get("KSVN")["raw"], OLD_METAR)
+
+    def test_003_prewarm_leaves_the_reserve(self) -> None:
+        """Tests that background refreshes and the prewarmer stop at the users' share."""
+        Airport.objects.create(user=User.objects.get(email="odie@odie.com"),
+                               icao_code="KMIA", name="Miami Intl")
+        refreshed = refresh_reports("metar", ["KSVN"])
+        refused = refresh_reports("metar", ["KSAV"])
+        with self.subTest():
+            self.assertEqual((list(refreshed.entries), list(refused.errors)), (["KSVN"], ["KSAV"]))
+        with self.subTest():
+            self.assertEqual(Prewarmer().run_once()["calls"], 0)
+        self.assertEqual(self.client.get(reverse("a_airport_metar", args=["KJFK"])).status_code,
+                         200)
+
+    def test_004_usage_is_in_the_cache_stats(self) -> None:
+        """Tests that the quota used is reported next to the cache counters, to staff only."""
+        self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        forbidden = self.client.get(reverse("cache_stats"))
+        User.objects.filter(email="odie@odie.com").update(is_staff=True)
+        usage = self.client.get(reverse("cache_stats")).json()["quota"]["checkwx"]
+        with self.subTest():
+            self.assertEqual(forbidden.status_code, 403)
+        self.assertEqual((usage["minute"]["used"], usage["granted"]),
+                         (1, {"user": 1, "background": 0}))
+
+    def test_005_open_breaker_spends_no_quota(self) -> None:
+        """Tests that calls refused by an open breaker don't take quota tokens."""
+        client = get_client()
+        breaker = client.breakers["checkwx"]
+        for _ in range(breaker.config["FAILURE_THRESHOLD"]):
+            breaker.record_failure()
+        for _ in range(5):
+            with self.assertRaises(CircuitOpenError):
+                client.metar("KSVN")
+        self.assertEqual((client.quotas["checkwx"].usage()["minute"]["used"],
+                          self.upstream.calls), (0, 0))
+
+    def test_006_every_attempt_takes_a_token(self) -> None:
+        """Tests that retries take a token each and stop when the quota is spent.
+
+        One call takes 1 of the 3 tokens, so a failing call gets 2 attempts, not 3.
+        """
+        async def afailing_call() -> None:
+            client = AsyncWeatherClient({"MAX_RETRIES": 2, "BACKOFF_FACTOR": 0})
+            try:
+                await client.metar("KSVN")
+            finally:
+                await client.aclose()
+
+        for failing_call in (WeatherClient({"MAX_RETRIES": 2, "BACKOFF_FACTOR": 0}).metar,
+                             lambda code: asyncio.run(afailing_call())):
+            caches["weather"].clear()
+            self.upstream.error_rate, self.upstream.calls = 0.0, 0
+            get_client().metar("KSAV")
+            self.upstream.error_rate = 1.0
+            with self.subTest(failing_call=failing_call):
+                with self.assertRaises(UpstreamError):
+                    failing_call("KSVN")
+                self.assertEqual(self.upstream.calls, 3)
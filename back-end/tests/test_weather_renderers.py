@@ -0,0 +1,139 @@
+"""Module that tests the JSON and MessagePack renderers and response compression.
+
+Classes:
+    TestRenderers
+    TestNegotiatedResponses
+"""
+
+import gzip
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+import brotli
+import msgpack
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from weather_app.middleware import accepted_encodings
+from weather_app.renderers import FastJSONRenderer, MessagePackRenderer
+from tests.test_metar_views import MockUpstreamTestCase
+
+SAMPLE = {
+    "KSVN": "KSVN 011655Z 18008KT 10SM FEW045 28/21 A2998",
+    "observed_at": datetime(2024, 5, 1, 16, 55, 12, 345678, tzinfo=timezone.utc),
+    "elevation_ft": Decimal("41.5"),
+    "label": gettext_lazy("Hunter AAF"),
+    "remarks": ["São Paulo", "line\u2028break"],
+    7: None,
+}
+
+
+class TestRenderers(SimpleTestCase):
+    """Tests that the fast renderers send the values DRF's JSON renderer does.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_same_json_as_drf() -> None
+        test_002_msgpack_round_trip() -> None
+        test_003_accepted_encodings() -> None
+    """
+
+    def test_001_same_json_as_drf(self) -> None:
+        """Tests orjson's output is byte for byte DRF's, and indented when asked for."""
+        indented = FastJSONRenderer().render(SAMPLE, "application/json; indent=2")
+        with self.subTest():
+            self.assertEqual(FastJSONRenderer().render(SAMPLE), JSONRenderer().render(SAMPLE))
+        with self.subTest():
+            self.assertIn(b'\n  "KSVN": ', indented)
+        self.assertEqual(json.loads(indented), json.loads(JSONRenderer().render(SAMPLE)))
+
+    def test_002_msgpack_round_trip(self) -> None:
+        """Tests MessagePack decodes to the same values as the JSON."""
+        self.assertEqual(
+            msgpack.unpackb(MessagePackRenderer().render(SAMPLE), strict_map_key=False),
+            {"KSVN": SAMPLE["KSVN"], "observed_at": "2024-05-01T16:55:12.345678Z",
+             "elevation_ft": 41.5, "label": "Hunter AAF",
+             "remarks": ["São Paulo", "line\u2028break"], 7: None})
+
+    def test_003_accepted_encodings(self) -> None:
+        """Tests codings refused with q=0 are left out."""
+        self.assertEqual(accepted_encodings("gzip, deflate;q=0.5, BR;q=0, identity; q=0.0"),
+                         {"gzip", "deflate"})
+
+
+@override_settings(WEATHER_COMPRESSION={"MIN_SIZE": 200})
+class TestNegotiatedResponses(MockUpstreamTestCase):
+    """Tests the format and compression of the weather views' responses.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_msgpack_by_accept_or_format() -> None
+        test_002_brotli_and_gzip() -> None
+        test_003_compressed_etag_still_matches() -> None
+        test_004_small_or_unaccepted_is_not_compressed() -> None
+    """
+
+    codes = "KSVN,KSAV,KJFK,KLAX,KMIA"
+
+    def test_001_msgpack_by_accept_or_format(self) -> None:
+        """Tests MessagePack is sent for its media type or ?format=msgpack."""
+        as_json = self.client.get(reverse("a_airport_metar", args=[self.codes]))
+        accepted = self.client.get(reverse("a_airport_metar", args=[self.codes]),
+                                   HTTP_ACCEPT="application/msgpack")
+        formatted = self.client.get(reverse("a_airport_metar", args=[self.codes]),
+                                    {"format": "msgpack"})
+        with self.subTest():
+            self.assertEqual((accepted["Content-Type"], formatted["Content-Type"]),
+                             ("application/msgpack", "application/msgpack"))
+        self.assertEqual([msgpack.unpackb(accepted.content), msgpack.unpackb(formatted.content)],
+                         [as_json.json(), as_json.json()])
+
+    def test_002_brotli_and_gzip(self) -> None:
+        """Tests brotli is preferred to gzip and both decompress to the JSON."""
+        plain = self.client.get(reverse("a_airport_metar", args=[self.codes]))
+        squeezed = self.client.get(reverse("a_airport_metar", args=[self.codes]),
+                                   HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+        zipped = self.client.get(reverse("a_airport_metar", args=[self.codes]),
+                                 HTTP_ACCEPT_ENCODING="gzip")
+        with self.subTest():
+            self.assertEqual((squeezed["Content-Encoding"], zipped["Content-Encoding"]),
+                             ("br", "gzip"))
+        with self.subTest():
+            self.assertIn("Accept-Encoding", squeezed["Vary"])
+        with self.subTest():
+            self.assertEqual(int(squeezed["Content-Length"]), len(squeezed.content))
+        self.assertEqual(
+            [brotli.decompress(squeezed.content), gzip.decompress(zipped.content)],
+            [plain.content, plain.content])
+
+    def test_003_compressed_etag_still_matches(self) -> None:
+        """Tests a compressed body has a weak ETag that is answered with a 304."""
+        plain = self.client.get(reverse("a_airport_metar", args=[self.codes]))
+        squeezed = self.client.get(reverse("a_airport_metar", args=[self.codes]),
+                                   HTTP_ACCEPT_ENCODING="br")
+        again = self.client.get(reverse("a_airport_metar", args=[self.codes]),
+                                HTTP_ACCEPT_ENCODING="br", HTTP_IF_NONE_MATCH=squeezed["ETag"])
+        with self.subTest():
+            self.assertEqual(squeezed["ETag"], f"W/{plain['ETag']}")
+        self.assertEqual(again.status_code, 304)
+
+    def test_004_small_or_unaccepted_is_not_compressed(self) -> None:
+        """Tests bodies under MIN_SIZE and clients without a known coding get plain bodies."""
+        small = self.client.get(reverse("a_airport_metar", args=["KSVN"]),
+                                HTTP_ACCEPT_ENCODING="br")
+        unaccepted = self.client.get(reverse("a_airport_metar", args=[self.codes]),
+                                     HTTP_ACCEPT_ENCODING="compress, br;q=0")
+        missing = self.client.get(reverse("a_airport_metar", args=["KXXX"]),
+                                  HTTP_ACCEPT_ENCODING="br")
+        with self.subTest():
+            self.assertEqual([response.has_header("Content-Encoding")
+                              for response in (small, unaccepted, missing)],
+                             [False, False, False])
+        self.assertEqual((missing.status_code, missing.json()),
+                         (404, {"Error": "That ICAO code does not match any results."}))
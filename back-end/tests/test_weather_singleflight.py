@@ -0,0 +1,167 @@
+"""Module that tests coalescing of concurrent upstream weather fetches.
+
+Classes:
+    TestSingleFlight
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from django.core.cache import caches
+from django.test import SimpleTestCase
+from weather_app import services
+from weather_app.client import WeatherClient, AsyncWeatherClient, UpstreamError
+from weather_app.singleflight import SingleFlight
+
+METAR = "KSVN 121255Z 18008KT 10SM FEW045 28/21 A2998"
+
+
+class _SlowUpstream(BaseHTTPRequestHandler):
+    """Answers every METAR request after a delay and counts the calls."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.calls += 1
+        time.sleep(self.server.delay)
+        payload = json.dumps({"results": 1, "data": [METAR]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def run_concurrently(count: int, fn) -> list:
+    """Calls fn from count threads released at the same moment and collects the results."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(idx: int) -> None:
+        barrier.wait()
+        try:
+            results[idx] = fn(idx)
+        except Exception as e:
+            results[idx] = e
+
+    threads = [threading.Thread(target=worker, args=(idx,)) for idx in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+class TestSingleFlight(SimpleTestCase):
+    """Tests that concurrent identical fetches make exactly one upstream call.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        setUp() -> None
+        tearDown() -> None
+        test_001_threads_share_one_upstream_call() -> None
+        test_002_workers_share_one_upstream_call_through_the_cache() -> None
+        test_003_different_keys_are_not_coalesced() -> None
+        test_004_errors_reach_every_waiter() -> None
+        test_005_coroutines_share_one_upstream_call() -> None
+        test_006_waiters_outlive_a_cancelled_leader() -> None
+    """
+
+    def setUp(self) -> None:
+        caches["weather"].clear()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowUpstream)
+        self.server.calls = 0
+        self.server.delay = 0.5
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = WeatherClient(
+            {"CHECKWX_BASE_URL": f"http://127.0.0.1:{self.server.server_address[1]}",
+             "POOL_MAXSIZE": 20})
+        self.patcher = mock.patch(
+            "weather_app.services.get_client", return_value=self.client)
+        self.patcher.start()
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_001_threads_share_one_upstream_call(self) -> None:
+        """Tests that 20 threads asking for the same METAR cause one upstream call."""
+        results = run_concurrently(20, lambda idx: services.fetch_metar("KSVN"))
+        with self.subTest():
+            self.assertTrue(all(result == {"results": 1, "data": [METAR]}
+                                for result in results))
+        self.assertEqual(self.server.calls, 1)
+
+    def test_002_workers_share_one_upstream_call_through_the_cache(self) -> None:
+        """Tests that separate workers coordinate through the lease in the shared cache."""
+        workers = [SingleFlight() for _ in range(4)]
+        results = run_concurrently(
+            12, lambda idx: workers[idx % 4].do("metar:KSVN", self.client.metar, "KSVN"))
+        with self.subTest():
+            self.assertTrue(all(result["data"] == [METAR] for result in results))
+        self.assertEqual(self.server.calls, 1)
+
+    def test_003_different_keys_are_not_coalesced(self) -> None:
+        """Tests that fetches for different stations each reach the upstream."""
+        codes = ["KSVN", "KJFK", "KLAX"]
+        run_concurrently(9, lambda idx: services.fetch_metar(codes[idx % 3]))
+        self.assertEqual(self.server.calls, 3)
+
+    def test_004_errors_reach_every_waiter(self) -> None:
+        """Tests that a failed fetch raises for every waiting caller."""
+        flight = SingleFlight()
+
+        def failing_fetch() -> None:
+            time.sleep(0.3)
+            raise UpstreamError("CheckWX answered 503")
+
+        results = run_concurrently(5, lambda idx: flight.do("metar:KSVN", failing_fetch))
+        self.assertTrue(all(isinstance(result, UpstreamError) for result in results))
+
+    def test_005_coroutines_share_one_upstream_call(self) -> None:
+        """Tests that 20 concurrent coroutines asking for the same TAF cause one upstream call."""
+        async def fetch_all() -> list:
+            client = AsyncWeatherClient(
+                {"CHECKWX_BASE_URL": f"http://127.0.0.1:{self.server.server_address[1]}"})
+            with mock.patch("weather_app.services.get_async_client", return_value=client):
+                results = await asyncio.gather(
+                    *(services.afetch_taf("KSVN") for _ in range(20)))
+            await client.aclose()
+            return results
+
+        results = asyncio.run(fetch_all())
+        with self.subTest():
+            self.assertEqual(len(results), 20)
+        self.assertEqual(self.server.calls, 1)
+
+    def test_006_waiters_outlive_a_cancelled_leader(self) -> None:
+        """Tests that coroutines waiting on a cancelled fetch run it again rather than hang."""
+        flight, calls = SingleFlight(), []
+
+        async def fetch() -> int:
+            calls.append(len(calls) + 1)
+            await asyncio.sleep(0.5 if len(calls) == 1 else 0.05)
+            return len(calls)
+
+        async def cancel_leader() -> tuple:
+            leader = asyncio.create_task(flight.ado("taf:KSVN", fetch))
+            await asyncio.sleep(0.05)
+            waiters = [asyncio.create_task(flight.ado("taf:KSVN", fetch)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            results = await asyncio.wait_for(asyncio.gather(*waiters), timeout=5)
+            return leader.cancelled(), results
+
+        self.assertEqual((asyncio.run(cancel_leader()), len(calls)), ((True, [2, 2, 2]), 2))
@@ -0,0 +1,120 @@
+"""Module that tests the station catalogue's spatial index and coordinate lookups.
+
+Classes:
+    TestStationIndex
+    TestCoordinateLookups
+"""
+
+import random
+from django.test import SimpleTestCase
+from django.urls import reverse
+from weather_app.stations import Station, StationIndex, distance_km, get_station_index
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+class TestStationIndex(SimpleTestCase):
+    """Tests the nearest-station queries of the KD-tree.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_matches_a_linear_scan() -> None
+        test_002_filters_by_report_kind_and_distance() -> None
+        test_003_searches_across_the_antimeridian() -> None
+    """
+
+    def test_001_matches_a_linear_scan(self) -> None:
+        """Tests that the k nearest stations equal those of comparing every station."""
+        rng = random.Random(7)
+        stations = [Station(f"S{slot:03d}", "", rng.uniform(-90, 90), rng.uniform(-180, 180),
+                            0, True, slot % 2 == 0) for slot in range(500)]
+        index = StationIndex(stations)
+        for _ in range(50):
+            lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+            expected = sorted(stations, key=lambda station: distance_km(
+                lat, lon, station.latitude, station.longitude))[:4]
+            with self.subTest(lat=lat, lon=lon):
+                self.assertEqual([station for station, _ in index.nearest(lat, lon, 4)],
+                                 expected)
+
+    def test_002_filters_by_report_kind_and_distance(self) -> None:
+        """Tests that stations without TAFs or beyond the distance limit are skipped."""
+        index = get_station_index()
+        near_sylvania = index.nearest(32.65, -81.60, 1)
+        with self.subTest():
+            self.assertEqual(near_sylvania[0][0].icao, "KJYL")
+        with self.subTest():
+            self.assertEqual(index.nearest(32.65, -81.60, 1, "taf")[0][0].icao, "KSAV")
+        self.assertEqual(index.nearest(0, -30, 3, max_km=150), [])
+
+    def test_003_searches_across_the_antimeridian(self) -> None:
+        """Tests that stations on either side of 180 degrees are found as neighbours."""
+        index = StationIndex([Station("WEST", "", 0, 179.9, 0, True, True),
+                              Station("EAST", "", 0, -179.9, 0, True, True),
+                              Station("FAR", "", 0, 170, 0, True, True)])
+        nearest = index.nearest(0, -179.95, 2)
+        with self.subTest():
+            self.assertEqual([station.icao for station, _ in nearest], ["EAST", "WEST"])
+        self.assertAlmostEqual(nearest[1][1], 16.7, places=1)
+
+
+class TestCoordinateLookups(MockUpstreamTestCase):
+    """Tests that coordinates are resolved locally and share the per-ICAO cache.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        test_001_coordinate_shares_the_airport_cache_entry() -> None
+        test_002_nearby_coordinates_share_one_upstream_call() -> None
+        test_003_uncatalogued_area_falls_back_to_the_provider() -> None
+        test_004_invalid_coordinates_are_bad_requests() -> None
+        test_005_nearest_stations_endpoint() -> None
+    """
+
+    def test_001_coordinate_shares_the_airport_cache_entry(self) -> None:
+        """Tests that a coordinate near a cached airport is served without the provider."""
+        airport = self.client.get(reverse("a_airport_metar", args=["KSVN"]))
+        coordinate = self.client.get(reverse("a_coordinate_metar", args=["32.0809", "-81.0912"]))
+        with self.subTest():
+            self.assertEqual(coordinate.json(), airport.json()["KSVN"])
+        with self.subTest():
+            self.assertEqual((coordinate["X-Cache"], coordinate["X-Weather-Station"],
+                              coordinate["X-Station-Distance-Km"]), ("HIT", "KSVN", "9.6"))
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_002_nearby_coordinates_share_one_upstream_call(self) -> None:
+        """Tests that different coordinates resolving to one station fetch it once."""
+        first = self.client.get(reverse("a_coordinate_taf", args=["32.02", "-81.14"]))
+        second = self.client.get(reverse("a_coordinate_taf", args=["31.99", "-81.17"]))
+        with self.subTest():
+            self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        with self.subTest():
+            self.assertTrue(second.json().startswith("TAF KSVN "))
+        self.assertEqual(self.upstream.calls_by_path, {"taf": 1})
+
+    def test_003_uncatalogued_area_falls_back_to_the_provider(self) -> None:
+        """Tests that CheckWX is asked for the nearest station away from the catalogue."""
+        response = self.client.get(reverse("a_coordinate_metar", args=["0", "-30"]))
+        with self.subTest():
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.upstream.calls_by_path, {"metar": 1})
+
+    def test_004_invalid_coordinates_are_bad_requests(self) -> None:
+        """Tests that a latitude or longitude that isn't a coordinate is a 400."""
+        text = self.client.get(reverse("a_coordinate_metar", args=["north", "-81.09"]))
+        range_ = self.client.get(reverse("a_coordinate_taf", args=["32.08", "-181"]))
+        self.assertEqual((text.status_code, range_.status_code), (400, 400))
+
+    def test_005_nearest_stations_endpoint(self) -> None:
+        """Tests that the nearest stations are listed with their distances."""
+        response = self.client.get(reverse("nearest_stations"),
+                                   {"lat": "32.65", "lon": "-81.60", "kind": "taf", "k": "2"})
+        with self.subTest():
+            self.assertEqual([(station["icao"], station["distance_km"])
+                              for station in response.json()],
+                             [("KSAV", 68.9), ("KSVN", 82.8)])
+        self.assertEqual(self.client.get(reverse("nearest_stations"),
+                                         {"lat": "32.65", "lon": "-81.60", "k": "50"}
+                                         ).status_code, 400)
@@ -0,0 +1,129 @@
+"""Module that tests the Server-Sent Events stream of a User's weather.
+
+Classes:
+    TestReportEvents
+    TestWeatherStreamView
+"""
+
+import json
+import time
+from datetime import datetime, timezone
+from asgiref.sync import async_to_sync
+from django.test.utils import override_settings
+from django.urls import reverse
+from airport_app.models import Airport
+from named_locations_app.models import Named_location
+from user_app.models import User
+from weather_app.services import metar_cache
+from weather_app.stream import areport_events, watchers
+from tests.test_metar_views import MockUpstreamTestCase
+
+
+def parse_events(chunks: list[str]) -> list[tuple[str, dict]]:
+    """Reads the events out of the chunks of a stream, skipping comments and retry lines."""
+
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n")
+                      if line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class TestReportEvents(MockUpstreamTestCase):
+    """Tests that the stream sends the current reports and then only the changes.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the stream against the local mock upstream.
+
+    Methods:
+        test_001_changes_wake_the_stream() -> None
+        test_002_heartbeat_and_end() -> None
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.now = datetime.now(timezone.utc)
+        for code in ("KSVN", "KSAV"):
+            metar_cache.set(code, f"{code} {self.now:%d%H%M}Z 18008KT 10SM FEW045 28/21 A2998",
+                            self.now)
+
+    def test_001_changes_wake_the_stream(self) -> None:
+        """Tests that a new report is sent at once when this worker fetches it."""
+        changed = f"KSVN {self.now:%d%H%M}Z 18008KT 2SM BR OVC006 28/21 A2998"
+
+        async def stream() -> tuple[list[str], list[str], float]:
+            events = areport_events({"metar": ["KSVN", "KSAV"]},
+                                    {"POLL_INTERVAL": 60, "MAX_DURATION": 30})
+            opened = [await anext(events) for _ in range(3)]
+            metar_cache.set("KSVN", changed, self.now)
+            watchers.notify("metar", [changed])
+            started = time.monotonic()
+            update = await anext(events)
+            waited = time.monotonic() - started
+            await events.aclose()
+            return opened, [update], waited
+
+        opened, update, waited = async_to_sync(stream)()
+        with self.subTest():
+            self.assertEqual(opened[0], "retry: 5000\n\n")
+        with self.subTest():
+            self.assertEqual([data["station"] for _, data in parse_events(opened)],
+                             ["KSVN", "KSAV"])
+        with self.subTest():
+            self.assertEqual(parse_events(update), [("metar", {
+                "station": "KSVN", "raw": changed,
+                "observed_at": self.now.replace(second=0, microsecond=0).isoformat()})])
+        self.assertLess(waited, 5)
+
+    def test_002_heartbeat_and_end(self) -> None:
+        """Tests that an unchanged stream only sends comments and ends when it's due."""
+
+        async def stream() -> list[str]:
+            return [chunk async for chunk in areport_events(
+                {"metar": ["KSVN"]},
+                {"POLL_INTERVAL": 0.05, "HEARTBEAT": 0.1, "MAX_DURATION": 0.5})]
+
+        chunks = async_to_sync(stream)()
+        with self.subTest():
+            self.assertEqual(len(parse_events(chunks)), 1)
+        self.assertIn(": keep-alive\n\n", chunks)
+
+
+@override_settings(WEATHER_STREAM={"POLL_INTERVAL": 0.05, "MAX_DURATION": 0.3})
+class TestWeatherStreamView(MockUpstreamTestCase):
+    """Tests the stream of the reports of a User's Airports and Named Locations.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the view against the local mock upstream.
+
+    Methods:
+        test_001_stream_of_saved_places() -> None
+        test_002_no_places_is_not_found() -> None
+    """
+
+    async def test_001_stream_of_saved_places(self) -> None:
+        """Tests every place's station is streamed after one upstream call per kind."""
+        user = await User.objects.aget(email="odie@odie.com")
+        await Airport.objects.acreate(user=user, icao_code="KSVN", name="Hunter AAF")
+        await Named_location.objects.acreate(user=user, city="Pooler", country="US",
+                                             latitude="32.1155", longitude="-81.2471")
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(reverse("weather_stream"),
+                                               HTTP_ACCEPT="text/event-stream")
+        events = parse_events([chunk.decode() async for chunk in response.streaming_content])
+        with self.subTest():
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+        with self.subTest():
+            self.assertEqual([(event, data["station"]) for event, data in events],
+                             [("metar", "KSVN"), ("metar", "KSAV"),
+                              ("taf", "KSVN"), ("taf", "KSAV")])
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_002_no_places_is_not_found(self) -> None:
+        """Tests that a User with nothing saved gets an error event and a 404."""
+        response = self.client.get(reverse("weather_stream"), HTTP_ACCEPT="text/event-stream")
+        with self.subTest():
+            self.assertEqual(response.status_code, 404)
+        self.assertTrue(response.content.startswith(b"event: error\ndata: "))
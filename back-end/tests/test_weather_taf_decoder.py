@@ -0,0 +1,227 @@
+"""Module that tests the TAF decoder, its time indexes and the TAF conditions views.
+
+Classes:
+    TestTafDecoder
+    TestTafConditionsViews
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from django.test import SimpleTestCase
+from django.urls import reverse
+from flight_app.models import Flight
+from user_app.models import User
+from weather_app.metar import SkyLayer, Visibility, WeatherGroup, Wind
+from weather_app.services import taf_cache
+from weather_app.taf import IntervalIndex, decode_taf, resolve_time
+from tests.test_metar_views import MockUpstreamTestCase
+
+NOW = datetime(2024, 5, 1, 18, 5, tzinfo=timezone.utc)
+RAW = ("TAF AMD KSVN 011720Z 0118/0224 18008KT P6SM SCT040 "
+       "TEMPO 0120/0124 3SM -TSRA BKN025CB "
+       "FM020000 20012KT P6SM BKN050 WS020/27045KT "
+       "BECMG 0206/0208 1SM BR OVC006 "
+       "PROB30 TEMPO 0210/0214 1/2SM FG VV002 "
+       "FM021500 27015G25KT P6SM NSW SKC RMK NXT FCST BY 02Z")
+
+
+def utc(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2024, 5, day, hour, minute, tzinfo=timezone.utc)
+
+
+def briefing_taf(icao: str, now: datetime) -> str:
+    """Builds a TAF valid from the start of the current hour, with IFR fog from +3h to +6h."""
+
+    start = now.replace(minute=0, second=0, microsecond=0)
+
+    def hours(offset: int, layout: str = "%d%H") -> str:
+        return f"{start + timedelta(hours=offset):{layout}}"
+
+    return (f"TAF {icao} {hours(-1, '%d%H%M')}Z {hours(0)}/{hours(24)} 18008KT P6SM SCT040 "
+            f"FM{hours(3, '%d%H%M')} 09005KT 2SM BR OVC008 "
+            f"FM{hours(6, '%d%H%M')} 20012KT P6SM BKN050")
+
+
+class TestTafDecoder(SimpleTestCase):
+    """Tests that raw TAFs are decoded into periods with resolved times and queried by time.
+
+    Extends:
+        SimpleTestCase (class): The django SimpleTestCase class.
+
+    Methods:
+        test_001_periods_and_validity() -> None
+        test_002_point_in_time_queries() -> None
+        test_003_worst_in_window_queries() -> None
+        test_004_interval_index_matches_a_scan() -> None
+        test_005_times_and_malformed_reports() -> None
+    """
+
+    def test_001_periods_and_validity(self) -> None:
+        """Tests the header, each change group's kind and times, and their conditions."""
+        taf = decode_taf(RAW, NOW)
+        with self.subTest():
+            self.assertEqual((taf.station, taf.modifier, taf.issued, taf.valid_from,
+                              taf.valid_to, taf.remarks, taf.unparsed),
+                             ("KSVN", "AMD", utc(1, 17, 20), utc(1, 18), utc(3, 0),
+                              "NXT FCST BY 02Z", []))
+        with self.subTest():
+            self.assertEqual([(period.kind, period.probability, period.start, period.end)
+                              for period in taf.periods],
+                             [("BASE", None, utc(1, 18), utc(2, 0)),
+                              ("TEMPO", None, utc(1, 20), utc(2, 0)),
+                              ("FM", None, utc(2, 0), utc(2, 15)),
+                              ("BECMG", None, utc(2, 6), utc(2, 8)),
+                              ("TEMPO", 30, utc(2, 10), utc(2, 14)),
+                              ("FM", None, utc(2, 15), utc(3, 0))])
+        with self.subTest():
+            self.assertEqual((taf.periods[1].conditions.wind, taf.periods[1].conditions.weather,
+                              taf.periods[1].conditions.sky),
+                             (None, [WeatherGroup("-", "TS", ["RA"])],
+                              [SkyLayer("BKN", 2500, "CB")]))
+        self.assertEqual((taf.periods[2].conditions.wind_shear, taf.periods[5].conditions.weather,
+                          taf.periods[5].conditions.wind), ("WS020/27045KT", [],
+                                                            Wind(270, 15, 25)))
+
+    def test_002_point_in_time_queries(self) -> None:
+        """Tests the prevailing conditions and the changes in progress at a time."""
+        taf = decode_taf(RAW, NOW)
+        tempo = taf.conditions_at(utc(1, 22, 30))
+        becoming = taf.conditions_at(utc(2, 7))
+        became = taf.conditions_at(utc(2, 9))
+        with self.subTest():
+            self.assertEqual((tempo.flight_category, [period.kind for period in tempo.changes],
+                              tempo.prevailing[0].kind), ("MVFR", ["TEMPO"], "BASE"))
+        with self.subTest():
+            self.assertEqual((becoming.prevailing[0].conditions.flight_category(),
+                              becoming.flight_category), ("VFR", "IFR"))
+        with self.subTest():
+            self.assertEqual((became.changes, became.prevailing[0].conditions.wind,
+                              became.flight_category), ([], Wind(200, 12), "IFR"))
+        self.assertEqual((taf.conditions_at(utc(1, 17)), taf.conditions_at(utc(3, 0))),
+                         (None, None))
+
+    def test_003_worst_in_window_queries(self) -> None:
+        """Tests that a window gets the worst of every period it overlaps, clipped to the TAF."""
+        taf = decode_taf(RAW, NOW)
+        night = taf.worst_between(utc(2, 0), utc(2, 5))
+        morning = taf.worst_between(utc(2, 9), utc(2, 12))
+        clipped = taf.worst_between(utc(2, 16), utc(3, 6))
+        with self.subTest():
+            self.assertEqual((night.flight_category, night.worst.wind_shear, night.changes),
+                             ("VFR", "WS020/27045KT", []))
+        with self.subTest():
+            self.assertEqual((morning.flight_category, morning.worst.visibility,
+                              morning.worst.ceiling_ft(), morning.changes[0].probability),
+                             ("LIFR", Visibility(0.5), 200, 30))
+        with self.subTest():
+            self.assertEqual((clipped.end, clipped.worst.wind.peak_knots), (utc(3, 0), 25))
+        self.assertIsNone(taf.worst_between(utc(3, 1), utc(3, 5)))
+
+    def test_004_interval_index_matches_a_scan(self) -> None:
+        """Tests that the interval index finds the same intervals as checking each one."""
+        rng = random.Random(4)
+        intervals = []
+        for _ in range(300):
+            start = rng.randint(0, 1000)
+            intervals.append((start, start + rng.randint(1, 60)))
+        index = IntervalIndex(intervals, start=lambda item: item[0], end=lambda item: item[1])
+        for _ in range(200):
+            low = rng.randint(-20, 1060)
+            high = low + rng.choice([0, 0, rng.randint(1, 80)])
+            with self.subTest(window=(low, high)):
+                self.assertEqual(
+                    index.overlapping(low, high),
+                    sorted((item for item in intervals if item[0] <= high and item[1] > low),
+                           key=lambda item: item[0]))
+
+    def test_005_times_and_malformed_reports(self) -> None:
+        """Tests requested time formats, month rollover and reports without a valid period."""
+        rollover = decode_taf("TAF KSVN 311720Z 3118/0124 18008KT P6SM SCT040 "
+                              "FM010600 20012KT P6SM BKN050",
+                              datetime(2024, 5, 31, 18, tzinfo=timezone.utc))
+        with self.subTest():
+            self.assertEqual((rollover.valid_to, rollover.periods[1].start),
+                             (datetime(2024, 6, 2, 0, tzinfo=timezone.utc),
+                              datetime(2024, 6, 1, 6, tzinfo=timezone.utc)))
+        with self.subTest():
+            self.assertEqual([resolve_time(value, utc(1, 18)) for value in
+                              ("1430Z", "2030z", "021430Z", "2024-05-02T09:15",
+                               "2024-05-02T05:15-04:00", "25:00Z", "soon")],
+                             [utc(2, 14, 30), utc(1, 20, 30), utc(2, 14, 30), utc(2, 9, 15),
+                              utc(2, 9, 15), None, None])
+        broken = decode_taf("TAF KSVN NIL")
+        self.assertEqual((broken.periods, broken.conditions_at(NOW), broken.unparsed),
+                         ([], None, ["KSVN", "NIL"]))
+
+
+class TestTafConditionsViews(MockUpstreamTestCase):
+    """Tests the TAF conditions views.
+
+    Extends:
+        MockUpstreamTestCase (class): Runs the views against the local mock upstream.
+
+    Methods:
+        setUp() -> None
+        test_001_conditions_at_a_time() -> None
+        test_002_worst_conditions_in_a_window() -> None
+        test_003_flight_briefing() -> None
+        test_004_bad_and_uncovered_times() -> None
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.now = datetime.now(timezone.utc)
+        self.start = self.now.replace(minute=0, second=0, microsecond=0)
+        for icao in ("KSVN", "KSAV"):
+            taf_cache.set(icao, briefing_taf(icao, self.now))
+
+    def test_001_conditions_at_a_time(self) -> None:
+        """Tests that ?at= returns the conditions forecast at that time from the cache."""
+        fog = self.start + timedelta(hours=4)
+        response = self.client.get(reverse("a_airport_taf_conditions", args=["KSVN"]),
+                                   {"at": f"{fog:%H%M}Z"})
+        with self.subTest():
+            self.assertEqual(response.status_code, 200)
+        with self.subTest():
+            self.assertEqual((response.json()["KSVN"]["flight_category"],
+                              response.json()["KSVN"]["worst"]["visibility"]["distance"]),
+                             ("IFR", 2.0))
+        self.assertEqual(self.upstream.calls, 0)
+
+    def test_002_worst_conditions_in_a_window(self) -> None:
+        """Tests that ?from= and ?to= return the worst conditions of each station's window."""
+        response = self.client.get(
+            reverse("a_airport_taf_conditions", args=["KSVN,KSAV"]),
+            {"from": (self.start + timedelta(hours=1)).isoformat(),
+             "to": (self.start + timedelta(hours=8)).isoformat()})
+        body = response.json()
+        with self.subTest():
+            self.assertEqual([body[code]["flight_category"] for code in ("KSVN", "KSAV")],
+                             ["IFR", "IFR"])
+        self.assertEqual([period["kind"] for period in body["KSVN"]["prevailing"]],
+                         ["BASE", "FM", "FM"])
+
+    def test_003_flight_briefing(self) -> None:
+        """Tests that a Flight is briefed for its takeoff to arrival window at both ends."""
+        flight = Flight.objects.create(
+            user=User.objects.get(email="odie@odie.com"), tail_number=459, callsign="SHADY29",
+            aircraft_type_model="CH-47F", pilot_responsible="CW2 Pilot", origin="KSVN",
+            destination="KSAV", takeoff_time=self.start + timedelta(hours=7),
+            arrival_time=self.start + timedelta(hours=9))
+        response = self.client.get(reverse("a_flight_taf_conditions", args=[flight.id]))
+        with self.subTest():
+            self.assertEqual({code: outlook["flight_category"]
+                              for code, outlook in response.json().items()},
+                             {"KSVN": "VFR", "KSAV": "VFR"})
+        missing = self.client.get(reverse("a_flight_taf_conditions", args=[flight.id + 1]))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_004_bad_and_uncovered_times(self) -> None:
+        """Tests that unreadable times are bad requests and times past the TAF are not found."""
+        bad = self.client.get(reverse("a_airport_taf_conditions", args=["KSVN"]),
+                              {"from": "soon", "to": "1430Z"})
+        missing = self.client.get(reverse("a_airport_taf_conditions", args=["KSVN"]))
+        late = self.client.get(reverse("a_airport_taf_conditions", args=["KSVN"]),
+                               {"at": (self.now + timedelta(days=2)).isoformat()})
+        self.assertEqual((bad.status_code, missing.status_code, late.status_code),
+                         (400, 400, 404))
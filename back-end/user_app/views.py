@@ -2,6 +2,7 @@
 
 Classes:
     TokenReq
+    AsyncTokenReq
     Info
     SignUp
     LogIn
@@ -14,6 +15,7 @@ Methods:
 
 from datetime import datetime, timedelta
 from rest_framework.views import APIView
+from adrf.views import APIView as AsyncAPIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.status import (
@@ -73,6 +75,24 @@ class TokenReq(APIView):
     permission_classes = [IsAuthenticated]
 
 
+class AsyncTokenReq(AsyncAPIView):
+    """The TokenReq counterpart for views whose handlers are coroutines.
+
+    Under ASGI the handlers run on the event loop, so a worker isn't blocked while
+    they wait on upstream APIs. Authentication still runs in a thread.
+
+    Extends:
+        AsyncAPIView (class): The adrf APIView class, which dispatches async handlers.
+
+    Attributes:
+        authentication_classes
+        permission_classes
+    """
+
+    authentication_classes = [HttpOnlyTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+
 class Info(TokenReq):
     """The view that holds the methods to get or update a User's information.
 
@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class WeatherAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'weather_app'
+
+    def ready(self) -> None:
+        from .changes import record_changes
+        from .signals import reports_fetched
+        from .stream import watchers
+        # Wake this worker's event streams when it fetches a report they're watching,
+        # and log the change for the cursor feed.
+        reports_fetched.connect(watchers.notify, dispatch_uid="weather_stream_watchers")
+        reports_fetched.connect(record_changes, dispatch_uid="weather_change_log")
+        # Build the station index while the worker starts rather than on its first lookup.
+        if getattr(settings, "WEATHER_STATIONS", {}).get("PRELOAD", True):
+            from .stations import get_station_index
+            get_station_index()
@@ -0,0 +1,50 @@
+"""A small per-process thread pool for refreshing cached weather off the request path.
+
+Methods:
+    submit_once(key, fn, *args) -> Future | None
+    wait(timeout) -> None
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from django.db import close_old_connections
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="weather-refresh")
+_pending: dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def _run(key: str, fn, args: tuple) -> None:
+    try:
+        fn(*args)
+    finally:
+        close_old_connections()
+        with _lock:
+            _pending.pop(key, None)
+
+
+def submit_once(key: str, fn, *args) -> Future | None:
+    """Runs fn(*args) in the background unless a job with the same key is already queued.
+
+    Args:
+        key (str): Identifies the job, e.g. "taf:KSVN".
+        fn (callable): The function to run.
+
+    Returns:
+        Future | None: The queued job, or None if one with the same key was already pending.
+    """
+
+    with _lock:
+        if key in _pending:
+            return None
+        future = _executor.submit(_run, key, fn, args)
+        _pending[key] = future
+        return future
+
+
+def wait(timeout: float | None = None) -> None:
+    """Blocks until every pending background job has finished."""
+
+    with _lock:
+        futures = list(_pending.values())
+    wait_futures(futures, timeout=timeout)
@@ -0,0 +1,191 @@
+"""A circuit breaker that stops calling an upstream provider while it keeps failing.
+
+The breaker's state lives in the shared weather cache, so once one worker sees the
+provider fail FAILURE_THRESHOLD times in a row every worker stops calling it. After
+RESET_TIMEOUT seconds the breaker goes half-open and lets a single probe request
+through: a success closes it again, a failure keeps it open for another RESET_TIMEOUT.
+Every method has an async counterpart, prefixed with "a", for callers on an event loop.
+
+Classes:
+    CircuitBreaker
+"""
+
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_CONFIG = {
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 30,
+    "PROBE_TIMEOUT": 15,
+}
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures of one upstream provider across every worker.
+
+    Attributes:
+        name: str
+            The provider the breaker guards, used to namespace cache keys.
+        alias: str
+            The Django cache alias that holds the breaker's state.
+        config: dict
+            DEFAULT_CONFIG overridden by settings.WEATHER_BREAKER and the config argument.
+
+    Methods:
+        state() -> str
+        allow() -> tuple[bool, str | None]
+        record_success(token) -> None
+        record_failure(token) -> None
+        release(token) -> None
+        reset() -> None
+        astate() -> str
+        aallow() -> tuple[bool, str | None]
+        arecord_success(token) -> None
+        arecord_failure(token) -> None
+        arelease(token) -> None
+        areset() -> None
+    """
+
+    def __init__(self, name: str, alias: str | None = None,
+                 config: dict | None = None) -> None:
+        self.name = name
+        self.alias = alias or getattr(settings, "WEATHER_CACHE_ALIAS", "default")
+        self.config = {**DEFAULT_CONFIG,
+                       **getattr(settings, "WEATHER_BREAKER", {}), **(config or {})}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, name: str) -> str:
+        return f"wx:breaker:{self.name}:{name}"
+
+    def _state(self, opened_at: float | None) -> str:
+        if opened_at is None:
+            return "closed"
+        if time.time() - opened_at < self.config["RESET_TIMEOUT"]:
+            return "open"
+        return "half-open"
+
+    def state(self) -> str:
+        """Gets whether the breaker is "closed", "open" or "half-open"."""
+
+        return self._state(self.cache.get(self._key("opened_at")))
+
+    def allow(self) -> tuple[bool, str | None]:
+        """Checks whether a call may go upstream, claiming the probe when half-open.
+
+        Returns:
+            tuple[bool, str | None]: Whether the call may go ahead, and the probe token
+            when it's the half-open probe.
+        """
+
+        state = self.state()
+        if state == "closed":
+            return True, None
+        token = uuid.uuid4().hex
+        if state == "half-open" and self.cache.add(
+                self._key("probe"), token, self.config["PROBE_TIMEOUT"]):
+            return True, token
+        return False, None
+
+    def record_success(self, token: str | None = None) -> None:
+        """Closes the breaker and clears the failure count."""
+
+        if token is None and self.cache.get(self._key("failures")) is None:
+            return
+        self.reset()
+
+    def record_failure(self, token: str | None = None) -> None:
+        """Counts a failure, opening the breaker at the threshold or when a probe fails."""
+
+        if token is not None:
+            self._open()
+            return
+        key = self._key("failures")
+        if self.cache.add(key, 1, timeout=None):
+            failures = 1
+        else:
+            try:
+                failures = self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, timeout=None)
+                failures = 1
+        if failures >= self.config["FAILURE_THRESHOLD"]:
+            self._open()
+
+    def release(self, token: str | None = None) -> None:
+        """Gives up the half-open probe claimed with the token without making the call."""
+
+        if token is not None and self.cache.get(self._key("probe")) == token:
+            self.cache.delete(self._key("probe"))
+
+    def _open(self) -> None:
+        self.cache.set(self._key("opened_at"), time.time(), timeout=None)
+        self.cache.delete(self._key("probe"))
+
+    def reset(self) -> None:
+        """Closes the breaker."""
+
+        self.cache.delete_many([self._key("opened_at"), self._key("failures"),
+                                self._key("probe")])
+
+    async def astate(self) -> str:
+        """Gets whether the breaker is "closed", "open" or "half-open"."""
+
+        return self._state(await self.cache.aget(self._key("opened_at")))
+
+    async def aallow(self) -> tuple[bool, str | None]:
+        """Checks whether a call may go upstream, claiming the probe when half-open."""
+
+        state = await self.astate()
+        if state == "closed":
+            return True, None
+        token = uuid.uuid4().hex
+        if state == "half-open" and await self.cache.aadd(
+                self._key("probe"), token, self.config["PROBE_TIMEOUT"]):
+            return True, token
+        return False, None
+
+    async def arecord_success(self, token: str | None = None) -> None:
+        """Closes the breaker and clears the failure count."""
+
+        if token is None and await self.cache.aget(self._key("failures")) is None:
+            return
+        await self.areset()
+
+    async def arecord_failure(self, token: str | None = None) -> None:
+        """Counts a failure, opening the breaker at the threshold or when a probe fails."""
+
+        if token is not None:
+            await self._aopen()
+            return
+        key = self._key("failures")
+        if await self.cache.aadd(key, 1, timeout=None):
+            failures = 1
+        else:
+            try:
+                failures = await self.cache.aincr(key)
+            except ValueError:
+                await self.cache.aset(key, 1, timeout=None)
+                failures = 1
+        if failures >= self.config["FAILURE_THRESHOLD"]:
+            await self._aopen()
+
+    async def arelease(self, token: str | None = None) -> None:
+        """Gives up the half-open probe claimed with the token without making the call."""
+
+        if token is not None and await self.cache.aget(self._key("probe")) == token:
+            await self.cache.adelete(self._key("probe"))
+
+    async def _aopen(self) -> None:
+        await self.cache.aset(self._key("opened_at"), time.time(), timeout=None)
+        await self.cache.adelete(self._key("probe"))
+
+    async def areset(self) -> None:
+        """Closes the breaker."""
+
+        await self.cache.adelete_many([self._key("opened_at"), self._key("failures"),
+                                       self._key("probe")])
@@ -0,0 +1,349 @@
+"""Caches for upstream weather reports, built on Django's cache framework.
+
+Entries are keyed by ICAO code and live in the cache named by
+settings.WEATHER_CACHE_ALIAS, so every worker shares them when that cache is shared
+(Redis, Memcached or the database cache). An entry is fresh until its "expires_at"
+time and is then kept for another MAX_STALE seconds, so the last known good report
+can still be served, flagged as stale, while it's refreshed or while the provider is
+down. Stations the provider had no report for are remembered for NEGATIVE_TTL seconds,
+so they aren't asked for again on every request.
+
+Classes:
+    ReportCache
+    MetarCache
+    TafCache
+"""
+
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.core.cache import caches
+from .reports import report_time, is_speci, taf_validity
+
+
+DEFAULT_CONFIG = {
+    "METAR_CYCLE": 3600,
+    "METAR_PUBLISH_DELAY": 300,
+    "METAR_POLL_INTERVAL": 120,
+    "TAF_CYCLE": 21600,
+    "TAF_ISSUE_LEAD": 2400,
+    "TAF_PUBLISH_DELAY": 300,
+    "TAF_AMENDMENT_POLL": 600,
+    "MAX_STALE": 10800,
+    "NEGATIVE_TTL": 900,
+}
+
+
+class ReportCache:
+    """Stores the latest raw report per ICAO code and counts hits and misses.
+
+    Subclasses decide how long an entry lives by overriding timeout_for.
+
+    Attributes:
+        kind: str
+            The report type, used to namespace cache keys.
+        alias: str
+            The Django cache alias the entries are stored in.
+        config: dict
+            DEFAULT_CONFIG overridden by settings.WEATHER_CACHE.
+
+    Methods:
+        key(icao) -> str
+        get(icao) -> dict | None
+        peek_many(codes) -> dict[str, dict]
+        set(icao, raw, now) -> dict
+        hold(codes) -> None
+        set_missing(codes) -> None
+        missing_many(codes) -> list[str]
+        timeout_for(icao, raw, now) -> int
+        is_stale(entry, now) -> bool
+        age(entry, now) -> int
+        stats() -> dict
+        reset_stats() -> None
+    """
+
+    kind = "report"
+
+    def __init__(self, alias: str | None = None) -> None:
+        self.alias = alias or getattr(settings, "WEATHER_CACHE_ALIAS", "default")
+        self.config = {**DEFAULT_CONFIG, **getattr(settings, "WEATHER_CACHE", {})}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, icao: str) -> str:
+        """Builds the cache key for a station's report."""
+
+        return f"wx:{self.kind}:{icao.upper()}"
+
+    def get(self, icao: str) -> dict | None:
+        """Gets a station's cached report and counts the lookup as a hit or a miss.
+
+        Args:
+            icao (str): The station's ICAO code.
+
+        Returns:
+            dict | None: The entry with its "raw" text, the "observed_at" timestamp of
+            the report's observation or issue time, the "fetched_at" timestamp of when
+            that text was first seen, the "checked_at" timestamp of when it was last
+            confirmed upstream, and the "expires_at" timestamp of when it drops out of
+            the cache, or None.
+        """
+
+        entry = self.cache.get(self.key(icao))
+        self._count("hits" if entry is not None else "misses")
+        return entry
+
+    def peek_many(self, codes: list[str]) -> dict[str, dict]:
+        """Gets the cached reports of many stations without counting hits or misses.
+
+        Args:
+            codes (list[str]): The stations' ICAO codes.
+
+        Returns:
+            dict[str, dict]: The entries of the cached stations, keyed by ICAO code.
+        """
+
+        found = self.cache.get_many([self.key(code) for code in codes])
+        return {code: found[self.key(code)] for code in codes if self.key(code) in found}
+
+    def set(self, icao: str, raw: str, now: datetime | None = None) -> dict:
+        """Caches a station's latest report, fresh until timeout_for says it's due to change.
+
+        Setting the same text again only moves "checked_at", so the entry keeps the
+        time the report was first seen. The entry stays cached, stale, for MAX_STALE
+        seconds after it stops being fresh.
+
+        Args:
+            icao (str): The station's ICAO code.
+            raw (str): The raw report text.
+            now (datetime | None): The current UTC time.
+
+        Returns:
+            dict: The stored entry.
+        """
+
+        now = now or datetime.now(timezone.utc)
+        current = self.cache.get(self.key(icao))
+        fetched_at = current["fetched_at"] if current and current["raw"] == raw \
+            else now.timestamp()
+        timeout = self.timeout_for(icao, raw, now)
+        observed = report_time(raw, now)
+        entry = {"raw": raw, "observed_at": observed.timestamp() if observed else None,
+                 "fetched_at": fetched_at, "checked_at": now.timestamp(),
+                 "expires_at": now.timestamp() + timeout}
+        self.cache.set(self.key(icao), entry,
+                       timeout + int(self.config["MAX_STALE"]))
+        return entry
+
+    def hold(self, codes: list[str]) -> None:
+        """Keeps the stations' cached reports for another MAX_STALE seconds, still stale.
+
+        Used when a refresh can't be made yet, so the last report is served until it can.
+
+        Args:
+            codes (list[str]): The stations' ICAO codes.
+        """
+
+        for code in codes:
+            self.cache.touch(self.key(code), int(self.config["MAX_STALE"]))
+
+    def set_missing(self, codes: list[str]) -> None:
+        """Remembers for NEGATIVE_TTL seconds that the provider has no report for the stations.
+
+        Args:
+            codes (list[str]): The stations' ICAO codes.
+        """
+
+        if codes:
+            self.cache.set_many({f"wx:{self.kind}:missing:{code.upper()}": True
+                                 for code in codes}, int(self.config["NEGATIVE_TTL"]))
+
+    def missing_many(self, codes: list[str]) -> list[str]:
+        """Gets the stations the provider recently had no report for.
+
+        Args:
+            codes (list[str]): The stations' ICAO codes.
+
+        Returns:
+            list[str]: The stations remembered by set_missing, in the order given.
+        """
+
+        if not codes:
+            return []
+        found = self.cache.get_many([f"wx:{self.kind}:missing:{code.upper()}" for code in codes])
+        return [code for code in codes if f"wx:{self.kind}:missing:{code.upper()}" in found]
+
+    def timeout_for(self, icao: str, raw: str, now: datetime) -> int:
+        """Gets how many seconds a station's report stays fresh."""
+
+        raise NotImplementedError
+
+    def is_stale(self, entry: dict, now: datetime | None = None) -> bool:
+        """Checks whether a cached report is past its fresh period and due a refresh."""
+
+        now = now or datetime.now(timezone.utc)
+        return now.timestamp() >= entry.get("expires_at", 0)
+
+    def age(self, entry: dict, now: datetime | None = None) -> int:
+        """Gets the seconds since a cached report was last confirmed upstream."""
+
+        now = now or datetime.now(timezone.utc)
+        return max(0, int(now.timestamp() - entry["checked_at"]))
+
+    def _count(self, name: str) -> None:
+        key = f"wx:{self.kind}:stats:{name}"
+        if not self.cache.add(key, 1, timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, timeout=None)
+
+    def stats(self) -> dict:
+        """Gets the hit and miss counters and the resulting hit rate.
+
+        Returns:
+            dict: The "hits", "misses", and "hit_rate" of the cache.
+        """
+
+        counts = self.cache.get_many(
+            [f"wx:{self.kind}:stats:hits", f"wx:{self.kind}:stats:misses"])
+        hits = counts.get(f"wx:{self.kind}:stats:hits", 0)
+        misses = counts.get(f"wx:{self.kind}:stats:misses", 0)
+        total = hits + misses
+        return {"hits": hits, "misses": misses,
+                "hit_rate": round(hits / total, 4) if total else None}
+
+    def reset_stats(self) -> None:
+        """Sets the hit and miss counters back to zero."""
+
+        self.cache.delete_many(
+            [f"wx:{self.kind}:stats:hits", f"wx:{self.kind}:stats:misses"])
+
+
+class MetarCache(ReportCache):
+    """Caches METARs until the station's next expected observation is published.
+
+    Routine METARs are taken on a fixed minute every METAR_CYCLE seconds, so an entry
+    expires METAR_PUBLISH_DELAY seconds after the next routine observation time. The
+    minute of each station's routine observations is remembered so that a SPECI only
+    lives until the next routine report. Once an observation is overdue the entry is
+    refreshed every METAR_POLL_INTERVAL seconds until the new report shows up.
+
+    Extends:
+        ReportCache (class): The base per-station report cache.
+
+    Methods:
+        next_observation(icao, raw, now) -> datetime | None
+    """
+
+    kind = "metar"
+
+    def set(self, icao: str, raw: str, now: datetime | None = None) -> dict:
+        now = now or datetime.now(timezone.utc)
+        observed = report_time(raw, now)
+        if observed is not None and not is_speci(raw):
+            self.cache.set(f"wx:{self.kind}:minute:{icao.upper()}",
+                           observed.minute, timeout=86400)
+        return super().set(icao, raw, now)
+
+    def next_observation(self, icao: str, raw: str, now: datetime) -> datetime | None:
+        """Gets when a station's next routine METAR is expected.
+
+        Args:
+            icao (str): The station's ICAO code.
+            raw (str): The station's latest raw METAR.
+            now (datetime): The current UTC time.
+
+        Returns:
+            datetime | None: The expected observation time, or None if it can't be worked out.
+        """
+
+        observed = report_time(raw, now)
+        if observed is None:
+            return None
+        cycle = timedelta(seconds=self.config["METAR_CYCLE"])
+        if not is_speci(raw):
+            return observed + cycle
+        minute = self.cache.get(f"wx:{self.kind}:minute:{icao.upper()}")
+        if minute is None:
+            return None
+        routine = observed.replace(minute=minute)
+        return routine if routine > observed else routine + cycle
+
+    def timeout_for(self, icao: str, raw: str, now: datetime) -> int:
+        poll = int(self.config["METAR_POLL_INTERVAL"])
+        expected = self.next_observation(icao, raw, now)
+        if expected is None:
+            return poll
+        expires = expected + \
+            timedelta(seconds=self.config["METAR_PUBLISH_DELAY"])
+        longest = self.config["METAR_CYCLE"] + \
+            self.config["METAR_PUBLISH_DELAY"]
+        return max(poll, min(int((expires - now).total_seconds()), longest))
+
+
+class TafCache(ReportCache):
+    """Caches TAFs until the station's next scheduled TAF is published.
+
+    Routine TAFs are issued every TAF_CYCLE seconds, TAF_ISSUE_LEAD seconds before
+    their valid period starts, so an entry lives until the next routine issuance plus
+    TAF_PUBLISH_DELAY. Amendments and corrections can come out at any time, so entries
+    older than TAF_AMENDMENT_POLL seconds are re-checked in the background while the
+    cached TAF keeps being served.
+
+    Extends:
+        ReportCache (class): The base per-station report cache.
+
+    Methods:
+        next_issuance(raw, now) -> datetime | None
+        needs_amendment_check(entry, now) -> bool
+    """
+
+    kind = "taf"
+
+    def next_issuance(self, raw: str, now: datetime) -> datetime | None:
+        """Gets when the station's next routine TAF is expected to be published.
+
+        Args:
+            raw (str): The station's latest raw TAF.
+            now (datetime): The current UTC time.
+
+        Returns:
+            datetime | None: The expected publish time, which is in the past when the
+            station's next TAF is overdue, or None if it can't be worked out.
+        """
+
+        cycle = self.config["TAF_CYCLE"]
+        validity = taf_validity(raw, now)
+        if validity is not None:
+            anchor = validity[0]
+        else:
+            issued = report_time(raw, now)
+            if issued is None:
+                return None
+            anchor = issued + \
+                timedelta(seconds=self.config["TAF_ISSUE_LEAD"])
+        # Amendments keep the routine schedule, so snap the valid period start back to
+        # the issuance grid before stepping to the next routine TAF.
+        grid = anchor.timestamp() // cycle * cycle
+        issuance = grid + cycle - \
+            self.config["TAF_ISSUE_LEAD"] + self.config["TAF_PUBLISH_DELAY"]
+        return datetime.fromtimestamp(issuance, timezone.utc)
+
+    def timeout_for(self, icao: str, raw: str, now: datetime) -> int:
+        poll = int(self.config["TAF_AMENDMENT_POLL"])
+        expected = self.next_issuance(raw, now)
+        if expected is None:
+            return poll
+        return max(poll, int((expected - now).total_seconds()))
+
+    def is_stale(self, entry: dict, now: datetime | None = None) -> bool:
+        now = now or datetime.now(timezone.utc)
+        return super().is_stale(entry, now) or self.needs_amendment_check(entry, now)
+
+    def needs_amendment_check(self, entry: dict, now: datetime | None = None) -> bool:
+        """Checks whether a cached TAF is due to be compared against the upstream copy."""
+
+        now = now or datetime.now(timezone.utc)
+        return now.timestamp() - entry["checked_at"] >= self.config["TAF_AMENDMENT_POLL"]
@@ -0,0 +1,106 @@
+"""Ceilings, visibilities and flight categories of many METARs at once.
+
+The decoded reports are laid out as arrays once, with one row per report and a column
+per sky layer, and every station's ceiling, visibility and category is then computed by
+NumPy array operations rather than by branching on each report in Python. Missing
+values are NaN throughout, and a report with neither a ceiling nor a visibility has no
+category.
+
+Methods:
+    ceilings_and_visibilities(metars) -> tuple[numpy.ndarray, numpy.ndarray]
+    flight_categories(ceilings_ft, visibilities_sm) -> numpy.ndarray
+    category_table(metars) -> list[tuple[int | None, float | None, str | None]]
+"""
+
+import numpy as np
+from .metar import CEILING_COVERS, FLIGHT_CATEGORIES, METERS_PER_STATUTE_MILE, Metar
+
+# The categories from best to worst, and a last entry for reports with no category.
+CATEGORY_NAMES = np.array([name for name, _, _ in FLIGHT_CATEGORIES] + [None], dtype=object)
+# The lowest ceiling and visibility of each category but the worst, in increasing order,
+# so np.searchsorted counts the thresholds a value reaches.
+CEILING_THRESHOLDS = np.array([ceiling for _, ceiling, _ in FLIGHT_CATEGORIES[-2::-1]],
+                              dtype=float)
+VISIBILITY_THRESHOLDS = np.array([visibility for _, _, visibility
+                                  in FLIGHT_CATEGORIES[-2::-1]], dtype=float)
+
+
+def ceilings_and_visibilities(metars: list[Metar | None]) -> tuple[np.ndarray, np.ndarray]:
+    """Gets the ceiling and the visibility of every report.
+
+    Args:
+        metars (list[Metar | None]): The decoded reports; None for a station without one.
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray]: The ceilings in feet and the visibilities in
+        statute miles, NaN where a report has none.
+    """
+
+    count = len(metars)
+    layers = max((len(metar.sky) for metar in metars if metar is not None), default=0)
+    heights = np.full((count, max(layers, 1)), np.nan)
+    ceiling_layer = np.zeros(heights.shape, dtype=bool)
+    distances = np.full(count, np.nan)
+    in_meters = np.zeros(count, dtype=bool)
+    for row, metar in enumerate(metars):
+        if metar is None:
+            continue
+        for column, layer in enumerate(metar.sky):
+            if layer.height_ft is not None:
+                heights[row, column] = layer.height_ft
+                ceiling_layer[row, column] = layer.cover in CEILING_COVERS
+        if metar.visibility is not None:
+            distances[row] = metar.visibility.distance
+            in_meters[row] = metar.visibility.unit == "M"
+    ceilings = np.where(ceiling_layer, heights, np.inf).min(axis=1)
+    ceilings[np.isinf(ceilings)] = np.nan
+    visibilities = np.where(in_meters, distances / METERS_PER_STATUTE_MILE, distances)
+    return ceilings, visibilities
+
+
+def flight_categories(ceilings_ft: np.ndarray, visibilities_sm: np.ndarray) -> np.ndarray:
+    """Gets the FAA flight category of every ceiling and visibility pair.
+
+    Each value is ranked by how many category thresholds it reaches, and a pair takes
+    the worse rank of its two values. NaN reaches every threshold, so a missing ceiling
+    (a clear sky) or visibility leaves the category to the other value.
+
+    Args:
+        ceilings_ft (numpy.ndarray): The ceilings in feet, NaN for no ceiling.
+        visibilities_sm (numpy.ndarray): The visibilities in statute miles, NaN if unknown.
+
+    Returns:
+        numpy.ndarray: "VFR", "MVFR", "IFR" or "LIFR" per pair, or None when the
+        visibility is unknown and there's no ceiling.
+    """
+
+    ceilings_ft = np.asarray(ceilings_ft, dtype=float)
+    visibilities_sm = np.asarray(visibilities_sm, dtype=float)
+    worst = len(CEILING_THRESHOLDS)
+    rank = np.maximum(
+        worst - np.searchsorted(CEILING_THRESHOLDS, ceilings_ft, side="right"),
+        worst - np.searchsorted(VISIBILITY_THRESHOLDS, visibilities_sm, side="right"))
+    rank[np.isnan(ceilings_ft) & np.isnan(visibilities_sm)] = len(CATEGORY_NAMES) - 1
+    return CATEGORY_NAMES[rank]
+
+
+def category_table(metars: list[Metar | None]) -> list[tuple[int | None, float | None,
+                                                             str | None]]:
+    """Gets the ceiling, visibility and flight category of every report.
+
+    Args:
+        metars (list[Metar | None]): The decoded reports; None for a station without one.
+
+    Returns:
+        list[tuple[int | None, float | None, str | None]]: The ceiling in feet, the
+        visibility in statute miles rounded to hundredths, and the flight category of
+        each report, in order, with None for anything missing.
+    """
+
+    ceilings, visibilities = ceilings_and_visibilities(metars)
+    categories = flight_categories(ceilings, visibilities)
+    ceilings = np.where(np.isnan(ceilings), None, ceilings).tolist()
+    visibilities = np.where(np.isnan(visibilities), None,
+                            np.round(visibilities, 2)).tolist()
+    return [(None if ceiling is None else int(ceiling), visibility, category)
+            for ceiling, visibility, category in zip(ceilings, visibilities, categories)]
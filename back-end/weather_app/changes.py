@@ -0,0 +1,165 @@
+"""The append-only log of changed station reports and the cursor feed read from it.
+
+Every report the services see for the first time is logged by record_changes. Clients
+poll with the opaque cursor of their last response and get only what changed after it,
+read off the primary key from that point on, so a poll costs the changes since the
+cursor however many stations there are. Rows younger than SETTLE_SECONDS aren't served
+yet, so a change whose insert commits a moment after a later one's isn't skipped.
+
+Methods:
+    encode_cursor(change_id, issued) -> str
+    decode_cursor(cursor) -> tuple[int, datetime] | None
+    has_expired(issued, now) -> bool
+    record_changes(sender, reports, **kwargs) -> None
+    head_id(now) -> int
+    changes_since(change_id, stations, now) -> tuple[list[ReportChange], int, bool]
+    prune_changes(now) -> int
+"""
+
+import base64
+import binascii
+import logging
+import struct
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.db import DatabaseError
+from .models import ReportChange
+from .reports import report_time, station_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "PAGE_SIZE": 500,
+    "RETENTION_HOURS": 48,
+    "SETTLE_SECONDS": 1,
+}
+CURSOR_FORMAT = ">QI"
+
+
+def _config() -> dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "WEATHER_CHANGES", {})}
+
+
+def encode_cursor(change_id: int, issued: datetime) -> str:
+    """Builds the opaque cursor of a position in the change log.
+
+    Args:
+        change_id (int): The id of the last change the client has.
+        issued (datetime): When the cursor was handed out, to tell when it has expired.
+
+    Returns:
+        str: The URL safe cursor.
+    """
+
+    packed = struct.pack(CURSOR_FORMAT, change_id, int(issued.timestamp()))
+    return base64.urlsafe_b64encode(packed).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[int, datetime] | None:
+    """Reads a cursor built by encode_cursor.
+
+    Args:
+        cursor (str): The cursor as sent back by the client.
+
+    Returns:
+        tuple[int, datetime] | None: The change id and issue time, or None if it isn't a
+        cursor.
+    """
+
+    try:
+        packed = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        change_id, issued = struct.unpack(CURSOR_FORMAT, packed)
+    except (binascii.Error, struct.error, ValueError):
+        return None
+    return change_id, datetime.fromtimestamp(issued, timezone.utc)
+
+
+def has_expired(issued: datetime, now: datetime | None = None) -> bool:
+    """Checks whether the changes after a cursor may have been pruned from the log."""
+
+    return issued < (now or datetime.now(timezone.utc)) - \
+        timedelta(hours=_config()["RETENTION_HOURS"])
+
+
+def record_changes(sender: str, reports: list[str], **kwargs) -> None:
+    """Logs the reports of a weather_app.signals.reports_fetched signal as changes.
+
+    A database error is logged rather than raised, so the log never fails a weather
+    request.
+
+    Args:
+        sender (str): "metar" or "taf".
+        reports (list[str]): The new raw reports.
+    """
+
+    if not reports or not _config()["ENABLED"]:
+        return
+    now = datetime.now(timezone.utc)
+    changes = [ReportChange(kind=sender, station=station_id(raw), raw=raw,
+                            observed_at=report_time(raw, now))
+               for raw in reports if station_id(raw)]
+    try:
+        ReportChange.objects.bulk_create(changes)
+    except DatabaseError as e:
+        logger.warning("Couldn't log %d changed %s reports: %s", len(changes), sender, e)
+
+
+def head_id(now: datetime | None = None) -> int:
+    """Gets the id of the newest settled change, where a new client starts reading from."""
+
+    settled = (now or datetime.now(timezone.utc)) - \
+        timedelta(seconds=_config()["SETTLE_SECONDS"])
+    return ReportChange.objects.filter(recorded_at__lte=settled).order_by("-id") \
+        .values_list("id", flat=True).first() or 0
+
+
+def changes_since(change_id: int, stations: list[str] | None = None,
+                  now: datetime | None = None) -> tuple[list[ReportChange], int, bool]:
+    """Gets the latest change of each station report changed after a position in the log.
+
+    Args:
+        change_id (int): The id of the last change the client has.
+        stations (list[str] | None): The ICAO codes to get changes of, or None for all.
+        now (datetime | None): The current UTC time.
+
+    Returns:
+        tuple[list[ReportChange], int, bool]: The latest change per kind and station, in
+        log order, the id to carry on from, and whether there are more changes than
+        PAGE_SIZE to read.
+    """
+
+    config = _config()
+    settled = (now or datetime.now(timezone.utc)) - timedelta(seconds=config["SETTLE_SECONDS"])
+    after = ReportChange.objects.filter(id__gt=change_id, recorded_at__lte=settled)
+    rows = after.filter(station__in=stations) if stations is not None else after
+    rows = list(rows.order_by("id")[:int(config["PAGE_SIZE"]) + 1])
+    more = len(rows) > int(config["PAGE_SIZE"])
+    rows = rows[:int(config["PAGE_SIZE"])]
+    if more or stations is None:
+        next_id = rows[-1].id if rows else change_id
+    else:
+        # Move past other stations' changes too, so they aren't read again next time.
+        next_id = after.order_by("-id").values_list("id", flat=True).first() or change_id
+    latest = {(row.kind, row.station): row for row in rows}
+    return sorted(latest.values(), key=lambda row: row.id), next_id, more
+
+
+def prune_changes(now: datetime | None = None) -> int:
+    """Deletes the changes older than RETENTION_HOURS, whose cursors have expired.
+
+    Args:
+        now (datetime | None): The current UTC time.
+
+    Returns:
+        int: The changes deleted.
+    """
+
+    cutoff = (now or datetime.now(timezone.utc)) - \
+        timedelta(hours=_config()["RETENTION_HOURS"])
+    newest = ReportChange.objects.filter(recorded_at__lt=cutoff).order_by("-id") \
+        .values_list("id", flat=True).first()
+    if newest is None:
+        return 0
+    deleted, _ = ReportChange.objects.filter(id__lte=newest).delete()
+    return deleted
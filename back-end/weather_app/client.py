@@ -0,0 +1,552 @@
+"""Shared HTTP clients for the upstream weather providers (CheckWX and OpenWeatherMap).
+
+Every weather view goes through a single client per process (per event loop for the
+async client) so that connections to the providers are kept alive and pooled, API
+keys are read once from settings, and every call is bounded by connect/read timeouts
+and a small number of retries.
+
+Calls to a provider go through its CircuitBreaker, so while a provider keeps failing
+callers get a CircuitOpenError straight away instead of waiting out timeouts. CheckWX
+calls that the breaker lets through also take a token from its QuotaGovernor, one per
+attempt including retries, and get a QuotaExceededError without going upstream once
+the plan's requests for the minute or day are spent.
+
+Classes:
+    UpstreamError
+    CircuitOpenError
+    QuotaExceededError
+    WeatherClient
+    AsyncWeatherClient
+
+Methods:
+    get_client() -> WeatherClient
+    reset_client() -> None
+    get_async_client() -> AsyncWeatherClient
+"""
+
+import asyncio
+import json
+import os
+import threading
+import weakref
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+from django.conf import settings
+from .breaker import CircuitBreaker
+from .quota import QuotaGovernor
+
+
+DEFAULT_CONFIG = {
+    "CHECKWX_BASE_URL": "https://api.checkwx.com",
+    "OPENWX_BASE_URL": "https://api.openweathermap.org",
+    "CONNECT_TIMEOUT": 3.05,
+    "READ_TIMEOUT": 10.0,
+    "MAX_RETRIES": 2,
+    "BACKOFF_FACTOR": 0.3,
+    "POOL_CONNECTIONS": 2,
+    "POOL_MAXSIZE": 10,
+}
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+PROVIDERS = {"checkwx": "CheckWX", "openweathermap": "OpenWeatherMap"}
+
+# The providers whose plans cap the requests made to them.
+METERED_PROVIDERS = ("checkwx",)
+
+
+class UpstreamError(Exception):
+    """Raised when an upstream weather provider can't be reached or sends back a bad response."""
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+class QuotaExceededError(UpstreamError):
+    """Raised instead of calling a provider whose request quota is spent for now."""
+
+
+class _QuotaRetry(Retry):
+    """A urllib3 Retry that takes a token from a provider's quota for every retry.
+
+    Attributes:
+        quota: QuotaGovernor | None
+            The quota each retry takes a token from; when it's spent the last
+            response is returned, or the last error raised, instead of retrying.
+    """
+
+    def __init__(self, *args, quota: QuotaGovernor | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.quota = quota
+
+    def new(self, **kwargs) -> "_QuotaRetry":
+        retry = super().new(**kwargs)
+        retry.quota = self.quota
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None,
+                  _stacktrace=None) -> "_QuotaRetry":
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if self.quota is not None and not self.quota.acquire():
+            raise MaxRetryError(_pool, url, error or ResponseError(
+                "The request quota is spent, so the call isn't retried"))
+        return retry
+
+
+class _ProviderRequests:
+    """Builds provider requests and reads provider responses for both clients.
+
+    Attributes:
+        config: dict
+            The client configuration, DEFAULT_CONFIG overridden by settings.WEATHER_CLIENT.
+        checkwx_key: str
+            The CheckWX API key.
+        openwx_key: str
+            The OpenWeatherMap API key.
+        breakers: dict[str, CircuitBreaker]
+            The circuit breaker of each provider, shared by every worker.
+        quotas: dict[str, QuotaGovernor]
+            The request quota of each metered provider, shared by every worker.
+    """
+
+    def __init__(self, config: dict | None = None) -> None:
+        self.config = {**DEFAULT_CONFIG,
+                       **getattr(settings, "WEATHER_CLIENT", {}), **(config or {})}
+        self.checkwx_key = getattr(settings, "CHECK_WX_KEY", "")
+        self.openwx_key = getattr(settings, "OPENWX_KEY", "")
+        self.breakers = {provider: CircuitBreaker(provider) for provider in PROVIDERS}
+        self.quotas = {provider: QuotaGovernor(provider) for provider in METERED_PROVIDERS}
+
+    def _before_call(self, provider: str) -> str | None:
+        """Checks the provider's breaker then quota, returning the probe token when half-open.
+
+        The breaker comes first so calls it refuses don't spend the quota.
+
+        Raises:
+            CircuitOpenError: The provider's breaker is open.
+            QuotaExceededError: The provider's quota has no room for the call.
+        """
+
+        allowed, probe = self.breakers[provider].allow()
+        if not allowed:
+            raise CircuitOpenError(
+                f"{PROVIDERS[provider]} is unavailable, its circuit breaker is open")
+        if not self._take_quota(provider):
+            self.breakers[provider].release(probe)
+            raise QuotaExceededError(
+                f"The {PROVIDERS[provider]} request quota is spent for now")
+        return probe
+
+    async def _abefore_call(self, provider: str) -> str | None:
+        """The async counterpart of _before_call."""
+
+        allowed, probe = await self.breakers[provider].aallow()
+        if not allowed:
+            raise CircuitOpenError(
+                f"{PROVIDERS[provider]} is unavailable, its circuit breaker is open")
+        if not await self._atake_quota(provider):
+            await self.breakers[provider].arelease(probe)
+            raise QuotaExceededError(
+                f"The {PROVIDERS[provider]} request quota is spent for now")
+        return probe
+
+    def _take_quota(self, provider: str) -> bool:
+        """Takes a token from the provider's quota, if it has one, for one attempt at a call."""
+
+        quota = self.quotas.get(provider)
+        return quota is None or quota.acquire()
+
+    async def _atake_quota(self, provider: str) -> bool:
+        """The async counterpart of _take_quota."""
+
+        quota = self.quotas.get(provider)
+        return quota is None or await quota.aacquire()
+
+    def _after_call(self, provider: str, probe: str | None, status: int | None) -> None:
+        """Records a call's outcome; no status means it never got an answer."""
+
+        if status is None or status in RETRY_STATUSES or status == 429:
+            self.breakers[provider].record_failure(probe)
+        else:
+            self.breakers[provider].record_success(probe)
+
+    async def _aafter_call(self, provider: str, probe: str | None, status: int | None) -> None:
+        """The async counterpart of _after_call."""
+
+        if status is None or status in RETRY_STATUSES or status == 429:
+            await self.breakers[provider].arecord_failure(probe)
+        else:
+            await self.breakers[provider].arecord_success(probe)
+
+    def _base_url(self, provider: str) -> str:
+        return self.config["CHECKWX_BASE_URL" if provider == "checkwx"
+                           else "OPENWX_BASE_URL"].rstrip("/") + "/"
+
+    def _checkwx_url(self, path: str) -> str:
+        return f"{self._base_url('checkwx')}{path.lstrip('/')}"
+
+    def _geocode_url(self) -> str:
+        return f"{self.config['OPENWX_BASE_URL'].rstrip('/')}/data/2.5/weather"
+
+    def _geocode_params(self, city: str, country_code: str) -> dict:
+        return {"q": f"{city},{country_code}", "appid": self.openwx_key}
+
+    def _checkwx_result(self, status: int, body: bytes, path: str) -> dict:
+        if status != 200:
+            raise UpstreamError(f"CheckWX answered {status} for {path}")
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise UpstreamError(
+                f"CheckWX sent a malformed response for {path}") from e
+
+    def _geocode_result(self, status: int, body: bytes, city: str,
+                        country_code: str) -> dict | None:
+        if status == 404:
+            return None
+        if status != 200:
+            raise UpstreamError(
+                f"OpenWeatherMap answered {status} for {city},{country_code}")
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise UpstreamError(
+                f"OpenWeatherMap sent a malformed response for {city},{country_code}") from e
+
+
+class WeatherClient(_ProviderRequests):
+    """A pooled, keep-alive HTTP client for the CheckWX and OpenWeatherMap APIs.
+
+    Extends:
+        _ProviderRequests (class): Builds provider requests and reads their responses.
+
+    Attributes:
+        timeout: tuple[float, float]
+            The (connect, read) timeout applied to every request.
+        session: requests.Session
+            The session that holds the connection pool.
+
+    Methods:
+        checkwx(path) -> dict
+        metar(icao) -> dict
+        metar_near(lat, lon) -> dict
+        taf(icao) -> dict
+        taf_near(lat, lon) -> dict
+        geocode(city, country_code) -> dict | None
+        close() -> None
+    """
+
+    def __init__(self, config: dict | None = None) -> None:
+        super().__init__(config)
+        self.timeout = (float(self.config["CONNECT_TIMEOUT"]),
+                        float(self.config["READ_TIMEOUT"]))
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter())
+        self.session.mount("http://", self._adapter())
+        # Metered providers get their own pool, whose retries take quota tokens.
+        for provider, quota in self.quotas.items():
+            self.session.mount(self._base_url(provider), self._adapter(quota))
+
+    def _adapter(self, quota: QuotaGovernor | None = None) -> HTTPAdapter:
+        retries = _QuotaRetry(
+            total=int(self.config["MAX_RETRIES"]),
+            backoff_factor=float(self.config["BACKOFF_FACTOR"]),
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+            quota=quota,
+        )
+        return HTTPAdapter(
+            pool_connections=int(self.config["POOL_CONNECTIONS"]),
+            pool_maxsize=int(self.config["POOL_MAXSIZE"]),
+            max_retries=retries,
+        )
+
+    def _get(self, provider: str, url: str, **kwargs) -> requests.Response:
+        """Sends a GET request through the pooled session and the provider's breaker.
+
+        Args:
+            provider (str): "checkwx" or "openweathermap".
+            url (str): The full URL to request.
+
+        Raises:
+            QuotaExceededError: The provider's quota has no room for the call.
+            CircuitOpenError: The provider's breaker is open.
+            UpstreamError: The request timed out or the connection failed after all retries.
+
+        Returns:
+            requests.Response: The provider's response.
+        """
+
+        probe = self._before_call(provider)
+        try:
+            response = self.session.get(url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            self._after_call(provider, probe, None)
+            raise UpstreamError(f"Request to {url} failed: {e}") from e
+        self._after_call(provider, probe, response.status_code)
+        return response
+
+    def checkwx(self, path: str) -> dict:
+        """Requests a path from the CheckWX API.
+
+        Args:
+            path (str): The path below the API root, e.g. "metar/KSVN".
+
+        Raises:
+            UpstreamError: The request failed or CheckWX didn't answer with JSON.
+
+        Returns:
+            dict: The decoded CheckWX response.
+        """
+
+        response = self._get("checkwx", self._checkwx_url(path),
+                             headers={"X-API-Key": self.checkwx_key})
+        return self._checkwx_result(response.status_code, response.content, path)
+
+    def metar(self, icao: str) -> dict:
+        """Gets the latest METAR for one or more comma delimited ICAO codes."""
+
+        return self.checkwx(f"metar/{icao}")
+
+    def metar_near(self, lat: str, lon: str) -> dict:
+        """Gets the latest METAR from the station nearest to a coordinate."""
+
+        return self.checkwx(f"metar/lat/{lat}/lon/{lon}/")
+
+    def taf(self, icao: str) -> dict:
+        """Gets the latest TAF for one or more comma delimited ICAO codes."""
+
+        return self.checkwx(f"taf/{icao}")
+
+    def taf_near(self, lat: str, lon: str) -> dict:
+        """Gets the latest TAF from the station nearest to a coordinate."""
+
+        return self.checkwx(f"taf/lat/{lat}/lon/{lon}/")
+
+    def geocode(self, city: str, country_code: str) -> dict | None:
+        """Looks up a city within a country through the OpenWeatherMap weather endpoint.
+
+        Args:
+            city (str): The city name.
+            country_code (str): The two letter country code.
+
+        Raises:
+            UpstreamError: The request failed or OpenWeatherMap didn't answer with JSON.
+
+        Returns:
+            dict | None: The OpenWeatherMap response, or None if the city wasn't found.
+        """
+
+        response = self._get("openweathermap", self._geocode_url(),
+                             params=self._geocode_params(city, country_code))
+        return self._geocode_result(response.status_code, response.content, city, country_code)
+
+    def close(self) -> None:
+        """Closes every pooled connection."""
+
+        self.session.close()
+
+
+class AsyncWeatherClient(_ProviderRequests):
+    """The asyncio counterpart of WeatherClient, for the async weather views.
+
+    Extends:
+        _ProviderRequests (class): Builds provider requests and reads their responses.
+
+    Attributes:
+        session: aiohttp.ClientSession
+            The session that holds the connection pool. It's bound to the event loop
+            that created the client.
+
+    Methods:
+        checkwx(path) -> dict
+        metar(icao) -> dict
+        metar_near(lat, lon) -> dict
+        taf(icao) -> dict
+        taf_near(lat, lon) -> dict
+        geocode(city, country_code) -> dict | None
+        aclose() -> None
+    """
+
+    def __init__(self, config: dict | None = None) -> None:
+        super().__init__(config)
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=float(self.config["CONNECT_TIMEOUT"]),
+                sock_read=float(self.config["READ_TIMEOUT"])),
+            connector=aiohttp.TCPConnector(
+                limit=int(self.config["POOL_MAXSIZE"]) * 4,
+                limit_per_host=int(self.config["POOL_MAXSIZE"]) * 4),
+        )
+
+    async def _get(self, provider: str, url: str, **kwargs) -> tuple[int, bytes]:
+        """Sends a GET request through the pooled session and the provider's breaker,
+        retrying like WeatherClient, with a quota token taken for every retry.
+
+        Args:
+            provider (str): "checkwx" or "openweathermap".
+            url (str): The full URL to request.
+
+        Raises:
+            QuotaExceededError: The provider's quota has no room for the call.
+            CircuitOpenError: The provider's breaker is open.
+            UpstreamError: The request timed out or the connection failed after all retries.
+
+        Returns:
+            tuple[int, bytes]: The provider's status code and response body.
+        """
+
+        probe = await self._abefore_call(provider)
+        retries = int(self.config["MAX_RETRIES"])
+        for attempt in range(retries + 1):
+            try:
+                async with self.session.get(url, **kwargs) as response:
+                    body = await response.read()
+                    if response.status not in RETRY_STATUSES or attempt == retries \
+                            or not await self._atake_quota(provider):
+                        await self._aafter_call(provider, probe, response.status)
+                        return response.status, body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == retries or not await self._atake_quota(provider):
+                    await self._aafter_call(provider, probe, None)
+                    raise UpstreamError(f"Request to {url} failed: {e!r}") from e
+            await asyncio.sleep(float(self.config["BACKOFF_FACTOR"]) * 2 ** attempt)
+
+    async def checkwx(self, path: str) -> dict:
+        """Requests a path from the CheckWX API.
+
+        Args:
+            path (str): The path below the API root, e.g. "metar/KSVN".
+
+        Raises:
+            UpstreamError: The request failed or CheckWX didn't answer with JSON.
+
+        Returns:
+            dict: The decoded CheckWX response.
+        """
+
+        status, body = await self._get("checkwx", self._checkwx_url(path),
+                                       headers={"X-API-Key": self.checkwx_key})
+        return self._checkwx_result(status, body, path)
+
+    async def metar(self, icao: str) -> dict:
+        """Gets the latest METAR for one or more comma delimited ICAO codes."""
+
+        return await self.checkwx(f"metar/{icao}")
+
+    async def metar_near(self, lat: str, lon: str) -> dict:
+        """Gets the latest METAR from the station nearest to a coordinate."""
+
+        return await self.checkwx(f"metar/lat/{lat}/lon/{lon}/")
+
+    async def taf(self, icao: str) -> dict:
+        """Gets the latest TAF for one or more comma delimited ICAO codes."""
+
+        return await self.checkwx(f"taf/{icao}")
+
+    async def taf_near(self, lat: str, lon: str) -> dict:
+        """Gets the latest TAF from the station nearest to a coordinate."""
+
+        return await self.checkwx(f"taf/lat/{lat}/lon/{lon}/")
+
+    async def geocode(self, city: str, country_code: str) -> dict | None:
+        """Looks up a city within a country through the OpenWeatherMap weather endpoint.
+
+        Args:
+            city (str): The city name.
+            country_code (str): The two letter country code.
+
+        Raises:
+            UpstreamError: The request failed or OpenWeatherMap didn't answer with JSON.
+
+        Returns:
+            dict | None: The OpenWeatherMap response, or None if the city wasn't found.
+        """
+
+        status, body = await self._get("openweathermap", self._geocode_url(),
+                                       params=self._geocode_params(city, country_code))
+        return self._geocode_result(status, body, city, country_code)
+
+    async def aclose(self) -> None:
+        """Closes every pooled connection."""
+
+        await self.session.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+# The _close_with_loop generator of each loop's client, kept alive until the loop shuts down.
+_async_closers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_client() -> WeatherClient:
+    """Gets the process wide WeatherClient, creating it on first use.
+
+    The client is rebuilt after a fork so gunicorn workers never share sockets
+    with their parent.
+
+    Returns:
+        WeatherClient: The shared client for this process.
+    """
+
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = WeatherClient()
+                _client_pid = pid
+    return _client
+
+
+def reset_client() -> None:
+    """Closes and drops the shared clients so the next call rebuilds them from settings."""
+
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+        _async_clients.clear()
+        _async_closers.clear()
+
+
+async def _close_with_loop(client: AsyncWeatherClient):
+    """An async generator that closes the client when its event loop shuts down.
+
+    Event loops close their unfinished async generators on shutdown (asyncio.run,
+    uvicorn and asgiref all call loop.shutdown_asyncgens()), which runs the finally.
+    """
+
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+def get_async_client() -> AsyncWeatherClient:
+    """Gets the AsyncWeatherClient of the running event loop, creating it on first use.
+
+    Under an ASGI server every worker runs one event loop, so this is one pool per
+    process. Pooled connections can't outlive their loop, so each loop gets its own,
+    closed when the loop shuts down.
+
+    Returns:
+        AsyncWeatherClient: The shared client for the running event loop.
+    """
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncWeatherClient()
+        closer = _async_closers[loop] = _close_with_loop(client)
+        loop.create_task(anext(closer))
+    return client
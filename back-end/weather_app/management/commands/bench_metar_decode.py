@@ -0,0 +1,73 @@
+"""Benchmarks the METAR decoder against a set of generated real-format reports.
+
+Run with: python manage.py bench_metar_decode --reports 100000
+"""
+
+import random
+import time
+from django.core.management.base import BaseCommand
+from weather_app.metar import decode_metar
+from weather_app.mock_upstream import STATIONS
+
+WEATHER = ["", "", "", "-RA", "RA BR", "+TSRA", "-SN", "FZFG", "VCSH", "-DZ BR", "HZ"]
+SKY = ["CLR", "SKC", "FEW045", "SCT030 BKN080", "BKN012 OVC025", "FEW025CB SCT250",
+       "OVC004", "VV002", "BKN008 OVC015CB"]
+VISIBILITY = ["10SM", "P6SM", "5SM", "3SM", "1 1/2SM", "3/4SM", "M1/4SM", "9999", "0800"]
+REMARKS = ["", " RMK AO2", " RMK AO2 SLP132 T02170183", " RMK AO2 PK WND 30031/1821 SLP107",
+           " RMK AO2 LTG DSNT W $"]
+
+
+def sample_reports(count: int, seed: int = 1) -> list[str]:
+    """Builds METARs in the format CheckWX returns, with varied groups in each."""
+
+    rng = random.Random(seed)
+    stations = list(STATIONS)
+    reports = []
+    for _ in range(count):
+        temperature = rng.randint(-25, 38)
+        dewpoint = temperature - rng.randint(0, 15)
+        wind = (f"{rng.randrange(10, 370, 10):03d}{rng.randint(2, 25):02d}"
+                + (f"G{rng.randint(26, 45)}" if rng.random() < 0.2 else "") + "KT")
+        if rng.random() < 0.1:
+            wind += f" {rng.randrange(10, 180, 10):03d}V{rng.randrange(190, 360, 10):03d}"
+        runway = f" R{rng.randint(1, 36):02d}L/{rng.randint(6, 60) * 100:04d}FT/U" \
+            if rng.random() < 0.05 else ""
+        weather = rng.choice(WEATHER)
+        groups = [rng.choice(stations), f"{rng.randint(1, 28):02d}{rng.randint(0, 23):02d}55Z",
+                  wind, rng.choice(VISIBILITY) + runway, weather, rng.choice(SKY),
+                  f"{'M' if temperature < 0 else ''}{abs(temperature):02d}/"
+                  f"{'M' if dewpoint < 0 else ''}{abs(dewpoint):02d}",
+                  f"A{rng.randint(2920, 3070)}" if rng.random() < 0.7
+                  else f"Q{rng.randint(990, 1040):04d}"]
+        reports.append(" ".join(group for group in groups if group) + rng.choice(REMARKS))
+    return reports
+
+
+class Command(BaseCommand):
+    help = "Measures how many METARs per second the decoder parses."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--reports", type=int, default=100000,
+                            help="Reports decoded per round.")
+        parser.add_argument("--rounds", type=int, default=3,
+                            help="Rounds run; the fastest one is reported.")
+        parser.add_argument("--target", type=float, default=100000,
+                            help="Reports per second the decoder should reach.")
+
+    def handle(self, *args, **options) -> None:
+        reports = sample_reports(options["reports"])
+        unparsed = sum(bool(decode_metar(raw).unparsed) for raw in reports)
+        best = float("inf")
+        for _ in range(options["rounds"]):
+            start = time.perf_counter()
+            for raw in reports:
+                decode_metar(raw)
+            best = min(best, time.perf_counter() - start)
+        rate = len(reports) / best
+        self.stdout.write(f"decoded {len(reports)} METARs in {best:.3f}s: "
+                          f"{rate:,.0f}/s, {best / len(reports) * 1e6:.1f}us each "
+                          f"({unparsed} with unparsed groups)")
+        if rate >= options["target"]:
+            self.stdout.write(self.style.SUCCESS(f"at or above {options['target']:,.0f}/s"))
+        else:
+            self.stdout.write(self.style.WARNING(f"below {options['target']:,.0f}/s"))
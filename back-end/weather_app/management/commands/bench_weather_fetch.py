@@ -0,0 +1,94 @@
+"""Benchmarks the thread-per-request and asyncio upstream fetch paths.
+
+Run with: python manage.py bench_weather_fetch --latency 0.2 --requests 400
+or with a latency distribution: --latency lognormal:0.15:0.5
+"""
+
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.conf import settings
+from weather_app import services
+from weather_app.client import reset_client
+from weather_app.mock_upstream import Latency, MockUpstream
+
+
+def station_codes(count: int) -> list[str]:
+    """Builds unique made-up ICAO codes so no fetch is coalesced with another."""
+
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return [f"X{letters[idx // 676 % 26]}{letters[idx // 26 % 26]}{letters[idx % 26]}"
+            for idx in range(count)]
+
+
+class Command(BaseCommand):
+    help = ("Compares upstream METAR fetch throughput of a threaded WSGI worker with "
+            "the async views' event loop against a local mock upstream.")
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--latency", type=Latency.parse, default=Latency("constant", 0.2),
+                            help=("Seconds the mock upstream waits before answering, or a "
+                                  "distribution such as uniform:0.05:0.3."))
+        parser.add_argument("--requests", type=int, default=400,
+                            help="Requests sent through each path.")
+        parser.add_argument("--threads", type=int, default=8,
+                            help="Threads of the WSGI worker (gunicorn --threads).")
+        parser.add_argument("--concurrency", type=int, default=200,
+                            help="Requests in flight at once on the event loop.")
+
+    def handle(self, *args, **options) -> None:
+        upstream = MockUpstream(latency=options["latency"]).start()
+        client_settings = {**settings.WEATHER_CLIENT, "CHECKWX_BASE_URL": upstream.base_url,
+                           "POOL_MAXSIZE": max(options["threads"], options["concurrency"])}
+        try:
+            with override_settings(WEATHER_CLIENT=client_settings):
+                reset_client()
+                codes = station_codes(options["requests"])
+                sync_results = self.run_threads(codes, options["threads"])
+                async_results = asyncio.run(
+                    self.run_async(codes, options["concurrency"]))
+        finally:
+            reset_client()
+            upstream.stop()
+        self.report("WSGI threads", *sync_results)
+        self.report("ASGI async", *async_results)
+        self.stdout.write(
+            f"speedup: {sync_results[0] / async_results[0]:.1f}x "
+            f"({upstream.calls} upstream calls)")
+
+    def run_threads(self, codes: list[str], threads: int) -> tuple[float, list[float]]:
+        latencies = []
+
+        def fetch(code: str) -> None:
+            start = time.perf_counter()
+            services.fetch_metar(code)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(fetch, codes))
+        return time.perf_counter() - start, latencies
+
+    async def run_async(self, codes: list[str], concurrency: int) -> tuple[float, list[float]]:
+        latencies = []
+        limit = asyncio.Semaphore(concurrency)
+
+        async def fetch(code: str) -> None:
+            async with limit:
+                start = time.perf_counter()
+                await services.afetch_metar(code)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch(code) for code in codes))
+        return time.perf_counter() - start, latencies
+
+    def report(self, name: str, elapsed: float, latencies: list[float]) -> None:
+        latencies.sort()
+        self.stdout.write(
+            f"{name:>12}: {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms")
@@ -0,0 +1,76 @@
+"""Benchmarks the size and render time of multi-station METAR responses in each format.
+
+Run with: python manage.py bench_weather_render --stations 1 20 200
+"""
+
+import gzip
+import time
+import brotli
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from weather_app.metar import decode_metar
+from weather_app.middleware import DEFAULT_CONFIG
+from weather_app.renderers import FastJSONRenderer, MessagePackRenderer
+from .bench_metar_decode import sample_reports
+from .bench_weather_fetch import station_codes
+
+RENDERERS = {
+    "json (drf)": JSONRenderer(),
+    "json (orjson)": FastJSONRenderer(),
+    "msgpack": MessagePackRenderer(),
+}
+
+
+def sample_payloads(count: int) -> dict[str, dict]:
+    """Builds the raw and decoded bodies of an A_airport_metar response for count stations."""
+
+    raw = {code: f"{code}{report[4:]}"
+           for code, report in zip(station_codes(count), sample_reports(count))}
+    return {"raw": raw,
+            "decoded": {code: decode_metar(report).as_dict() for code, report in raw.items()}}
+
+
+def best_time(render, rounds: int) -> float:
+    """Runs a render rounds times and gets the fastest, in seconds."""
+
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        render()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Command(BaseCommand):
+    help = ("Compares the bytes and render time of METAR responses as DRF's JSON, orjson "
+            "and MessagePack, uncompressed, gzipped and brotli compressed.")
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--stations", type=int, nargs="+", default=[1, 20, 200],
+                            help="Stations per response, one table row each.")
+        parser.add_argument("--rounds", type=int, default=200,
+                            help="Renders per measurement; the fastest one is reported.")
+
+    def handle(self, *args, **options) -> None:
+        self.stdout.write(f"{'stations':>8} {'body':<8} {'format':<14} {'bytes':>8} "
+                          f"{'gzip':>8} {'br':>8} {'render us':>10} {'gzip us':>9} "
+                          f"{'br us':>9}")
+        for count in options["stations"]:
+            for body, data in sample_payloads(count).items():
+                for name, renderer in RENDERERS.items():
+                    rendered = renderer.render(data)
+                    zipped = gzip.compress(rendered, compresslevel=DEFAULT_CONFIG["GZIP_LEVEL"],
+                                           mtime=0)
+                    squeezed = brotli.compress(rendered,
+                                               quality=DEFAULT_CONFIG["BROTLI_QUALITY"])
+                    render_s = best_time(lambda: renderer.render(data), options["rounds"])
+                    gzip_s = best_time(lambda: gzip.compress(
+                        rendered, compresslevel=DEFAULT_CONFIG["GZIP_LEVEL"], mtime=0),
+                        options["rounds"])
+                    brotli_s = best_time(lambda: brotli.compress(
+                        rendered, quality=DEFAULT_CONFIG["BROTLI_QUALITY"]),
+                        options["rounds"])
+                    self.stdout.write(
+                        f"{count:>8} {body:<8} {name:<14} {len(rendered):>8} "
+                        f"{len(zipped):>8} {len(squeezed):>8} {render_s * 1e6:>10.1f} "
+                        f"{gzip_s * 1e6:>9.1f} {brotli_s * 1e6:>9.1f}")
@@ -0,0 +1,41 @@
+"""Keeps the METAR and TAF caches warm for every stored airport.
+
+Run as a long-lived worker with: python manage.py prewarm_weather
+Or from cron with: python manage.py prewarm_weather --once
+"""
+
+from django.core.management.base import BaseCommand
+from weather_app.prewarm import Prewarmer
+
+
+class Command(BaseCommand):
+    help = ("Refreshes the cached METARs and TAFs of every stored airport before they "
+            "expire, in batched upstream calls held to a per-minute request budget.")
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--once", action="store_true",
+                            help="Run a single pass and exit.")
+        parser.add_argument("--budget", type=int,
+                            help="Upstream requests allowed per minute.")
+        parser.add_argument("--batch-size", type=int,
+                            help="Stations fetched per upstream request.")
+        parser.add_argument("--jitter", type=float,
+                            help="Fraction by which each wait may randomly vary.")
+
+    def handle(self, *args, **options) -> None:
+        overrides = {"REQUESTS_PER_MINUTE": options["budget"],
+                     "BATCH_SIZE": options["batch_size"], "JITTER": options["jitter"]}
+        prewarmer = Prewarmer(
+            {key: value for key, value in overrides.items() if value is not None})
+        if options["once"]:
+            self.report(prewarmer.run_once())
+            return
+        try:
+            prewarmer.run_forever(self.report)
+        except KeyboardInterrupt:
+            prewarmer.stop.set()
+
+    def report(self, summary: dict) -> None:
+        self.stdout.write(
+            "{stations} stations: {metar} METARs and {taf} TAFs refreshed in "
+            "{calls} calls, {errors} errors".format(**summary))
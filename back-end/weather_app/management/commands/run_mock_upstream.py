@@ -0,0 +1,50 @@
+"""Serves the local CheckWX and OpenWeatherMap stand-in until interrupted.
+
+Run with: python manage.py run_mock_upstream --port 8900 --latency lognormal:0.15:0.5
+Then start the back-end with CHECKWX_BASE_URL and OPENWX_BASE_URL set to
+http://127.0.0.1:8900 to send every weather request to it.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from weather_app.mock_upstream import Latency, MockUpstream
+
+
+class Command(BaseCommand):
+    help = ("Serves a local stand-in for the CheckWX METAR/TAF and OpenWeatherMap "
+            "geocoding APIs with configurable latency, errors and rate limiting.")
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8900)
+        parser.add_argument("--latency", default="0",
+                            help=("Seconds, or a distribution such as uniform:0.05:0.3, "
+                                  "normal:0.2:0.05, lognormal:0.15:0.5 or exponential:0.2."))
+        parser.add_argument("--error-rate", type=float, default=0.0,
+                            help="Fraction of requests answered with a 5xx error.")
+        parser.add_argument("--rate-limit", type=int,
+                            help="Requests allowed per minute before answering 429.")
+        parser.add_argument("--unknown", default="",
+                            help="Comma delimited ICAO codes to treat as nonexistent.")
+        parser.add_argument("--seed", type=int,
+                            help="Seeds the latency and error draws.")
+
+    def handle(self, *args, **options) -> None:
+        try:
+            latency = Latency.parse(options["latency"])
+        except ValueError as e:
+            raise CommandError(e) from e
+        server = MockUpstream(
+            options["host"], options["port"], latency=latency,
+            error_rate=options["error_rate"], rate_limit=options["rate_limit"],
+            unknown_stations=[code for code in options["unknown"].split(",") if code],
+            seed=options["seed"])
+        self.stdout.write(f"Mock upstream on {server.base_url} (latency {latency}, "
+                          f"error rate {options['error_rate']:g}, "
+                          f"rate limit {options['rate_limit'] or 'none'})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Answered {server.calls} requests")
@@ -0,0 +1,496 @@
+"""A decoder that turns raw METAR text into compact, typed records.
+
+Reports are tokenized in a single pass by pre-compiled patterns. REPORT_PATTERN matches
+a whole report in the order METARs are written (header, wind, visibility, runway visual
+range, present weather, sky, temperature/dew point, altimeter, remarks), so a typical
+report costs one trip through the regex engine. Runs of repeated groups (RVR, weather,
+sky layers) are then split with their own patterns. Groups left over out of order are
+read one at a time by TOKEN_PATTERN, and groups the decoder doesn't know are kept as
+unparsed rather than failing the whole report.
+
+Classes:
+    Wind
+    Visibility
+    RunwayVisualRange
+    WeatherGroup
+    SkyLayer
+    Metar
+
+Methods:
+    flight_category(ceiling_ft, visibility_sm) -> str | None
+    decode_metar(raw) -> Metar
+"""
+
+import re
+
+CEILING_COVERS = {"BKN", "OVC", "VV"}
+METERS_PER_STATUTE_MILE = 1609.344
+KNOTS_PER_UNIT = {"KT": 1.0, "MPS": 1.943844, "KMH": 0.539957}
+# The FAA flight categories, best first, with the ceiling (ft) and visibility (SM) a
+# report has to stay at or above to be in each.
+FLIGHT_CATEGORIES = (("VFR", 3001, 5.01), ("MVFR", 1000, 3.0), ("IFR", 500, 1.0),
+                     ("LIFR", 0, 0.0))
+
+_RVR = r"R(\d\d[LCR]?)/([PM])?(\d{4})(?:V([PM])?(\d{4}))?(FT)?/?([UDN])?"
+_WEATHER = (r"(?=[-+A-Z])([-+]|VC)?(MI|PR|BC|DR|BL|SH|TS|FZ)?"
+            r"((?:DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PY|PO|SQ|FC|SS|DS)*)"
+            r"(?<=[A-Z])")
+_SKY = r"(FEW|SCT|BKN|OVC|VV)(\d{3}|///)(CB|TCU|///)?|(SKC|CLR|NSC|NCD)"
+
+
+def _uncaptured(pattern: str) -> str:
+    return pattern.replace("(?", "\0").replace("(", "(?:").replace("\0", "(?")
+
+
+RVR_PATTERN = re.compile(_RVR)
+WEATHER_PATTERN = re.compile(_WEATHER)
+SKY_PATTERN = re.compile(_SKY)
+
+# Reports are matched single spaced with a trailing space, so every group ends in one.
+REPORT_PATTERN = re.compile(
+    r"(?:(METAR|SPECI) )?(?:COR )?([A-Z][A-Z0-9]{3}) "
+    r"(?:(\d\d)(\d{4})Z )?(?:(AUTO|COR) )?"
+    r"(?:(\d{3}|VRB)(\d\d\d?)(?:G(\d\d\d?))?(KT|MPS|KMH) )?"
+    r"(?:(\d{3})V(\d{3}) )?"
+    r"(?:([PM])?(?:(\d\d?) (?=\d/))?(?:(\d\d?)/(\d\d?)|(\d\d?))SM |(\d{4})(?:NDV)? |(CAVOK) )?"
+    rf"((?:{_uncaptured(_RVR)} )*)"
+    rf"((?:{_uncaptured(_WEATHER)} )*)"
+    rf"((?:(?:{_uncaptured(_SKY)}) )*)"
+    r"(?:(M?\d\d)/(M?\d\d)? )?"
+    r"(?:([AQ])(\d{4}) )?"
+    r"((?:(?!RMK )\S+ )*)"
+    r"(?:RMK (.*))?$", re.DOTALL)
+
+# Reads one group at a time, for groups REPORT_PATTERN left over or reports it can't match.
+TOKEN_PATTERN = re.compile(r"""
+    (?:
+        (?P<wind>(?P<wdir>\d{3}|VRB)(?P<wspd>\d\d\d?)(?:G(?P<wgst>\d\d\d?))?(?P<wunit>KT|MPS|KMH))
+      | (?P<varwind>(?P<vfrom>\d{3})V(?P<vto>\d{3}))
+      | (?P<vis>(?P<vmod>[PM])?(?:(?P<vwhole>\d\d?)\ (?=\d/))?
+            (?:(?P<vnum>\d\d?)/(?P<vden>\d\d?)|(?P<vint>\d\d?))SM)
+      | (?P<metric>(?P<meters>\d{4})(?:NDV)?)
+      | (?P<cavok>CAVOK)
+      | (?P<rvr>R\d\d[LCR]?/\S+)
+      | (?P<sky>(?:FEW|SCT|BKN|OVC|VV)(?:\d{3}|///)(?:CB|TCU|///)?|SKC|CLR|NSC|NCD)
+      | (?P<temp>(?P<tmp>M?\d\d)/(?P<dew>M?\d\d)?)
+      | (?P<alt>(?P<aunit>[AQ])(?P<aval>\d{4}))
+      | (?P<wx>(?=[-+A-Z])(?:[-+]|VC)?(?:MI|PR|BC|DR|BL|SH|TS|FZ)?
+            (?:DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PY|PO|SQ|FC|SS|DS)*(?<=[A-Z]))
+      | (?P<auto>AUTO|COR)
+      | (?P<rmk>RMK(?:\ (?P<remarks>.*))?)
+      | (?P<other>\S+)
+    )\ 
+""", re.VERBOSE | re.DOTALL)
+
+
+class _Record:
+    """A record whose fields are its __slots__, comparable and convertible to a dict."""
+
+    __slots__ = ()
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and all(
+            getattr(self, name) == getattr(other, name) for name in self._fields())
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields())
+        return f"{type(self).__name__}({fields})"
+
+    def _fields(self) -> list[str]:
+        """Gets the public slots; slots starting with _ hold derived, private state."""
+
+        return [name for name in self.__slots__ if name[0] != "_"]
+
+    def as_dict(self) -> dict:
+        """Converts the record, and any records it holds, to plain JSON-ready values."""
+
+        return {name: _plain(getattr(self, name)) for name in self._fields()}
+
+
+def _plain(value):
+    if isinstance(value, _Record):
+        return value.as_dict()
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+class Wind(_Record):
+    """The surface wind group, e.g. 18008G18KT 150V210.
+
+    Attributes:
+        direction: int | None
+            The true direction in degrees, or None when variable (VRB).
+        speed: int
+            The sustained speed.
+        gust: int | None
+            The gust speed.
+        unit: str
+            "KT", "MPS" or "KMH".
+        variable_from: int | None
+            One end of a variable direction range.
+        variable_to: int | None
+            The other end of a variable direction range.
+    """
+
+    __slots__ = ("direction", "speed", "gust", "unit", "variable_from", "variable_to")
+
+    def __init__(self, direction: int | None, speed: int, gust: int | None = None,
+                 unit: str = "KT", variable_from: int | None = None,
+                 variable_to: int | None = None) -> None:
+        self.direction = direction
+        self.speed = speed
+        self.gust = gust
+        self.unit = unit
+        self.variable_from = variable_from
+        self.variable_to = variable_to
+
+    @property
+    def peak_knots(self) -> float:
+        """Gets the gust, or the sustained speed when there's no gust, in knots."""
+
+        return (self.gust or self.speed) * KNOTS_PER_UNIT.get(self.unit, 1.0)
+
+
+class Visibility(_Record):
+    """The prevailing visibility group, e.g. 1 1/2SM, P6SM or 9999.
+
+    Attributes:
+        distance: float
+            The visibility in the unit given.
+        unit: str
+            "SM" for statute miles or "M" for metres.
+        modifier: str | None
+            "P" for more than, "M" for less than the distance.
+    """
+
+    __slots__ = ("distance", "unit", "modifier")
+
+    def __init__(self, distance: float, unit: str = "SM", modifier: str | None = None) -> None:
+        self.distance = distance
+        self.unit = unit
+        self.modifier = modifier
+
+    @property
+    def statute_miles(self) -> float:
+        """Gets the visibility in statute miles."""
+
+        if self.unit == "SM":
+            return self.distance
+        return self.distance / METERS_PER_STATUTE_MILE
+
+
+class RunwayVisualRange(_Record):
+    """A runway visual range group, e.g. R28L/2400V4000FT/U.
+
+    Attributes:
+        runway: str
+            The runway designator.
+        low: int
+            The visual range, or the lower end of a variable one.
+        high: int | None
+            The upper end of a variable visual range.
+        unit: str
+            "FT" or "M".
+        modifier: str | None
+            "P" or "M" when the range is beyond what can be measured.
+        trend: str | None
+            "U" upward, "D" downward or "N" no change.
+    """
+
+    __slots__ = ("runway", "low", "high", "unit", "modifier", "trend")
+
+    def __init__(self, runway: str, low: int, high: int | None = None, unit: str = "FT",
+                 modifier: str | None = None, trend: str | None = None) -> None:
+        self.runway = runway
+        self.low = low
+        self.high = high
+        self.unit = unit
+        self.modifier = modifier
+        self.trend = trend
+
+
+class WeatherGroup(_Record):
+    """A present weather group, e.g. -TSRA or VCSH.
+
+    Attributes:
+        intensity: str | None
+            "-" light, "+" heavy, or "VC" in the vicinity.
+        descriptor: str | None
+            The descriptor, e.g. "TS" or "FZ".
+        phenomena: list[str]
+            The two letter phenomena codes, e.g. ["RA", "BR"].
+    """
+
+    __slots__ = ("intensity", "descriptor", "phenomena")
+
+    def __init__(self, intensity: str | None, descriptor: str | None,
+                 phenomena: list[str]) -> None:
+        self.intensity = intensity
+        self.descriptor = descriptor
+        self.phenomena = phenomena
+
+
+class SkyLayer(_Record):
+    """A sky condition group, e.g. BKN015CB.
+
+    Attributes:
+        cover: str
+            "FEW", "SCT", "BKN", "OVC", "VV", or "CLR"/"SKC"/"NSC"/"NCD" for a clear sky.
+        height_ft: int | None
+            The height of the layer's base above ground level.
+        cloud_type: str | None
+            "CB" or "TCU" for convective clouds.
+    """
+
+    __slots__ = ("cover", "height_ft", "cloud_type")
+
+    def __init__(self, cover: str, height_ft: int | None = None,
+                 cloud_type: str | None = None) -> None:
+        self.cover = cover
+        self.height_ft = height_ft
+        self.cloud_type = cloud_type
+
+
+class Metar(_Record):
+    """A decoded METAR.
+
+    Attributes:
+        raw: str
+            The report as received.
+        type: str
+            "METAR" or "SPECI".
+        station: str | None
+            The ICAO code.
+        day: int | None
+            The day of the month of the observation.
+        time: str | None
+            The UTC time of the observation as HHMM.
+        modifier: str | None
+            "AUTO" or "COR".
+        wind: Wind | None
+            The surface wind.
+        visibility: Visibility | None
+            The prevailing visibility.
+        runway_visual_range: list[RunwayVisualRange]
+            The visual range of each reported runway.
+        weather: list[WeatherGroup]
+            The present weather.
+        sky: list[SkyLayer]
+            The sky layers, lowest first.
+        temperature: int | None
+            The temperature in degrees Celsius.
+        dewpoint: int | None
+            The dew point in degrees Celsius.
+        altimeter: float | None
+            The altimeter setting in the unit given.
+        altimeter_unit: str | None
+            "inHg" or "hPa".
+        remarks: str
+            Everything after RMK.
+        unparsed: list[str]
+            The groups the decoder didn't recognize.
+
+    Methods:
+        ceiling_ft() -> int | None
+        flight_category() -> str | None
+    """
+
+    __slots__ = ("raw", "type", "station", "day", "time", "modifier", "wind", "visibility",
+                 "runway_visual_range", "weather", "sky", "temperature", "dewpoint",
+                 "altimeter", "altimeter_unit", "remarks", "unparsed")
+
+    def __init__(self, raw: str, type: str = "METAR", station: str | None = None) -> None:
+        self.raw = raw
+        self.type = type
+        self.station = station
+        self.day = self.time = self.modifier = self.wind = self.visibility = None
+        self.temperature = self.dewpoint = self.altimeter = self.altimeter_unit = None
+        self.runway_visual_range = []
+        self.weather = []
+        self.sky = []
+        self.remarks = ""
+        self.unparsed = []
+
+    def ceiling_ft(self) -> int | None:
+        """Gets the height of the lowest broken, overcast or obscured layer."""
+
+        return min((layer.height_ft for layer in self.sky
+                    if layer.cover in CEILING_COVERS and layer.height_ft is not None),
+                   default=None)
+
+    def flight_category(self) -> str | None:
+        """Gets the flight category the ceiling and visibility put the report in."""
+
+        return flight_category(self.ceiling_ft(),
+                               self.visibility.statute_miles if self.visibility else None)
+
+
+def flight_category(ceiling_ft: int | None, visibility_sm: float | None) -> str | None:
+    """Gets the FAA flight category of a ceiling and a visibility.
+
+    Args:
+        ceiling_ft (int | None): The ceiling in feet, or None for no ceiling.
+        visibility_sm (float | None): The visibility in statute miles, or None if unknown.
+
+    Returns:
+        str | None: "VFR", "MVFR", "IFR" or "LIFR", whichever the lower of the two puts
+        it in, or None if the visibility is unknown and there's no ceiling.
+    """
+
+    if visibility_sm is None and ceiling_ft is None:
+        return None
+    for category, lowest_ceiling, lowest_visibility in FLIGHT_CATEGORIES:
+        if (ceiling_ft is None or ceiling_ft >= lowest_ceiling) and \
+                (visibility_sm is None or visibility_sm >= lowest_visibility):
+            return category
+    return "LIFR"
+
+
+def _temperature(value: str | None) -> int | None:
+    if not value:
+        return None
+    return -int(value[1:]) if value[0] == "M" else int(value)
+
+
+def _statute_miles(modifier, whole, numerator, denominator, integer) -> Visibility:
+    distance = float(integer) if integer else int(numerator) / int(denominator)
+    if whole:
+        distance += int(whole)
+    return Visibility(distance, "SM", modifier)
+
+
+def _meters(meters: str) -> Visibility:
+    if meters == "9999":
+        return Visibility(10000.0, "M", "P")
+    return Visibility(float(meters), "M")
+
+
+def _runway_visual_ranges(text: str) -> list[RunwayVisualRange]:
+    return [RunwayVisualRange(runway, int(low), int(high) if high else None,
+                              "FT" if feet else "M", low_modifier or high_modifier or None,
+                              trend or None)
+            for runway, low_modifier, low, high_modifier, high, feet, trend
+            in RVR_PATTERN.findall(text)]
+
+
+def _weather(text: str) -> list[WeatherGroup]:
+    return [WeatherGroup(intensity or None, descriptor or None,
+                         [codes[i:i + 2] for i in range(0, len(codes), 2)])
+            for intensity, descriptor, codes in WEATHER_PATTERN.findall(text)]
+
+
+def _sky(text: str) -> list[SkyLayer]:
+    return [SkyLayer(clear) if clear else
+            SkyLayer(cover, None if height == "///" else int(height) * 100,
+                     cloud_type if cloud_type and cloud_type != "///" else None)
+            for cover, height, cloud_type, clear in SKY_PATTERN.findall(text)]
+
+
+def _read_tokens(metar: Metar, text: str) -> None:
+    """Reads groups one at a time into the record, in whatever order they come."""
+
+    for match in TOKEN_PATTERN.finditer(text):
+        group = match.lastgroup
+        token = match[group]
+        if group == "wind":
+            direction, speed, gust, unit = match.group("wdir", "wspd", "wgst", "wunit")
+            variable = metar.wind
+            metar.wind = Wind(None if direction == "VRB" else int(direction), int(speed),
+                              int(gust) if gust else None, unit)
+            if variable is not None:
+                metar.wind.variable_from = variable.variable_from
+                metar.wind.variable_to = variable.variable_to
+        elif group == "varwind":
+            if metar.wind is None:
+                metar.wind = Wind(None, 0)
+            metar.wind.variable_from = int(match["vfrom"])
+            metar.wind.variable_to = int(match["vto"])
+        elif group == "vis":
+            metar.visibility = _statute_miles(
+                *match.group("vmod", "vwhole", "vnum", "vden", "vint"))
+        elif group == "metric":
+            metar.visibility = _meters(match["meters"])
+        elif group == "cavok":
+            metar.visibility = _meters("9999")
+            metar.sky.append(SkyLayer("NSC"))
+        elif group == "rvr" and RVR_PATTERN.fullmatch(token):
+            metar.runway_visual_range += _runway_visual_ranges(token)
+        elif group == "sky":
+            metar.sky += _sky(token)
+        elif group == "wx":
+            metar.weather += _weather(token)
+        elif group == "temp":
+            metar.temperature = _temperature(match["tmp"])
+            metar.dewpoint = _temperature(match["dew"])
+        elif group == "alt":
+            unit, value = match.group("aunit", "aval")
+            metar.altimeter, metar.altimeter_unit = \
+                (int(value) / 100, "inHg") if unit == "A" else (float(value), "hPa")
+        elif group == "auto":
+            metar.modifier = token
+        elif group == "rmk":
+            metar.remarks = (match["remarks"] or "").strip()
+        else:
+            metar.unparsed.append(token)
+
+
+def decode_metar(raw: str) -> Metar:
+    """Decodes a raw METAR or SPECI.
+
+    Args:
+        raw (str): The raw report, e.g. "KSVN 010055Z 18008KT 10SM FEW045 28/21 A2998".
+
+    Returns:
+        Metar: The decoded report. Groups that couldn't be read are left out and listed
+        in its unparsed attribute, so a malformed report is decoded as far as possible.
+    """
+
+    text = raw + " "
+    if "  " in text or "\n" in text or "\t" in text or text[0] == " ":
+        text = " ".join(raw.split()) + " "
+    match = REPORT_PATTERN.match(text)
+    if match is None:
+        metar = Metar(raw, "SPECI" if text.startswith("SPECI") else "METAR")
+        _read_tokens(metar, text)
+        return metar
+    (report_type, station, day, time, modifier,
+     direction, speed, gust, wind_unit, variable_from, variable_to,
+     vis_modifier, whole, numerator, denominator, integer, meters, cavok,
+     rvr, weather, sky, temperature, dewpoint, altimeter_unit, altimeter,
+     rest, remarks) = match.groups()
+    metar = Metar(raw, report_type or "METAR", station)
+    if day:
+        metar.day, metar.time = int(day), time
+    metar.modifier = modifier
+    if speed:
+        metar.wind = Wind(None if direction == "VRB" else int(direction), int(speed),
+                          int(gust) if gust else None, wind_unit,
+                          int(variable_from) if variable_from else None,
+                          int(variable_to) if variable_to else None)
+    if numerator or integer:
+        metar.visibility = _statute_miles(vis_modifier, whole, numerator, denominator,
+                                          integer)
+    elif meters:
+        metar.visibility = _meters(meters)
+    elif cavok:
+        metar.visibility = _meters("9999")
+        metar.sky.append(SkyLayer("NSC"))
+    if rvr:
+        metar.runway_visual_range = _runway_visual_ranges(rvr)
+    if weather:
+        metar.weather = _weather(weather)
+    if sky:
+        metar.sky += _sky(sky)
+    if temperature:
+        metar.temperature = _temperature(temperature)
+        metar.dewpoint = _temperature(dewpoint)
+    if altimeter:
+        metar.altimeter, metar.altimeter_unit = \
+            (int(altimeter) / 100, "inHg") if altimeter_unit == "A" \
+            else (float(altimeter), "hPa")
+    if rest:
+        _read_tokens(metar, rest)
+    if remarks:
+        metar.remarks = remarks.rstrip()
+    return metar
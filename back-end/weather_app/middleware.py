@@ -0,0 +1,112 @@
+"""Middleware that compresses the API's larger responses with brotli or gzip.
+
+Only bodies of at least MIN_SIZE bytes in one of MEDIA_TYPES are compressed: below
+that the headers and the time spent outweigh the bytes saved. Brotli is picked when
+the client accepts it, as it makes multi-station reports about a tenth smaller than
+gzip for a similar cost, and gzip otherwise. Streaming responses, such as the
+Server-Sent Events stream, are left alone so each event is sent as soon as it's
+written.
+
+Classes:
+    CompressionMiddleware
+
+Methods:
+    accepted_encodings(header) -> set[str]
+"""
+
+import gzip
+import brotli
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "MIN_SIZE": 1024,
+    "BROTLI_QUALITY": 5,
+    "GZIP_LEVEL": 6,
+    "MEDIA_TYPES": ["application/json", "application/msgpack"],
+}
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Reads the codings an Accept-Encoding header allows, leaving out those with q=0.
+
+    Args:
+        header (str): The Accept-Encoding header, e.g. "gzip, deflate, br;q=0.9".
+
+    Returns:
+        set[str]: The lower case codings accepted.
+    """
+
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip().lower()
+        if coding and not (quality.startswith("q=") and _is_zero(quality[2:])):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _is_zero(quality: str) -> bool:
+    try:
+        return float(quality) == 0
+    except ValueError:
+        return False
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compresses responses of settings.WEATHER_COMPRESSION's MEDIA_TYPES and MIN_SIZE.
+
+    Extends:
+        MiddlewareMixin (class): Django's middleware base class.
+
+    Methods:
+        process_response(request, response) -> HttpResponse
+    """
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        """Compresses the response if it's worth it and the client accepts it.
+
+        Args:
+            request (HttpRequest): The request the response answers.
+            response (HttpResponse): The response of the view.
+
+        Returns:
+            HttpResponse: The response, compressed or as it was.
+        """
+
+        config = {**DEFAULT_CONFIG, **getattr(settings, "WEATHER_COMPRESSION", {})}
+        if not config["ENABLED"] or response.streaming or \
+                response.has_header("Content-Encoding"):
+            return response
+        media_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if media_type not in config["MEDIA_TYPES"]:
+            return response
+        # Bodies of the same URL may be compressed or not depending on the header.
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < int(config["MIN_SIZE"]):
+            return response
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if "br" in accepted:
+            coding = "br"
+            compressed = brotli.compress(response.content,
+                                         quality=int(config["BROTLI_QUALITY"]))
+        elif "gzip" in accepted:
+            coding = "gzip"
+            compressed = gzip.compress(response.content,
+                                       compresslevel=int(config["GZIP_LEVEL"]), mtime=0)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        response.headers["Content-Encoding"] = coding
+        # The compressed bytes aren't those the strong ETag was made from (RFC 9110
+        # 8.8.1), and Django compares If-None-Match weakly, so the weak tag still matches.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.3 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('metar', 'METAR'), ('taf', 'TAF')], max_length=5)),
+                ('station', models.CharField(max_length=4)),
+                ('raw', models.TextField()),
+                ('observed_at', models.DateTimeField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['station', 'id'], name='report change by station')],
+            },
+        ),
+    ]
@@ -0,0 +1,367 @@
+"""A local stand-in for the CheckWX and OpenWeatherMap APIs, for tests, load tests and
+benchmarks that mustn't spend API quota.
+
+Point settings.WEATHER_CLIENT's CHECKWX_BASE_URL and OPENWX_BASE_URL (or the
+CHECKWX_BASE_URL and OPENWX_BASE_URL environment variables) at a running server, e.g.
+one started with python manage.py run_mock_upstream. It answers the same JSON shapes
+as the real providers:
+
+    GET /metar/<codes>                    {"results": n, "data": [raw METAR, ...]}
+    GET /taf/<codes>                      {"results": n, "data": [raw TAF, ...]}
+    GET /metar/lat/<lat>/lon/<lon>/       the nearest station's METAR, if within range
+    GET /taf/lat/<lat>/lon/<lon>/         the nearest station's TAF, if within range
+    GET /data/2.5/weather?q=<city>,<cc>   the OpenWeatherMap current weather of a city
+
+Every response can be delayed by a latency distribution, replaced by a 5xx error at
+a given rate, or refused with a 429 once a per-minute rate limit is used up.
+
+Classes:
+    Latency
+    MockUpstreamHandler
+    MockUpstream
+
+Methods:
+    sample_metar(icao, now) -> str
+    sample_taf(icao, now) -> str
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Stations answered by the coordinate endpoints: ICAO code -> (latitude, longitude).
+STATIONS = {
+    "KSVN": (32.01, -81.15),
+    "KSAV": (32.13, -81.20),
+    "KJFK": (40.64, -73.78),
+    "KLGA": (40.78, -73.87),
+    "KORD": (41.98, -87.90),
+    "KDFW": (32.90, -97.04),
+    "KDEN": (39.86, -104.67),
+    "KLAX": (33.94, -118.41),
+    "KSEA": (47.45, -122.31),
+    "KMIA": (25.79, -80.29),
+    "PANC": (61.17, -150.00),
+    "PHNL": (21.32, -157.92),
+    "EGLL": (51.47, -0.45),
+    "LFPG": (49.01, 2.55),
+    "EDDF": (50.03, 8.56),
+    "ETAR": (49.44, 7.60),
+    "RJTT": (35.55, 139.78),
+    "YSSY": (-33.95, 151.18),
+}
+
+# Cities answered by the geocoding endpoint: (city, country code) -> (name, lat, lon).
+CITIES = {
+    ("savannah", "us"): ("Savannah", 32.08, -81.10),
+    ("pooler", "us"): ("Pooler", 32.12, -81.25),
+    ("richmond hill", "us"): ("Richmond Hill", 31.94, -81.30),
+    ("tybee island", "us"): ("Tybee Island", 32.00, -80.85),
+    ("new york", "us"): ("New York", 40.71, -74.01),
+    ("chicago", "us"): ("Chicago", 41.85, -87.65),
+    ("dallas", "us"): ("Dallas", 32.78, -96.81),
+    ("denver", "us"): ("Denver", 39.74, -104.98),
+    ("los angeles", "us"): ("Los Angeles", 34.05, -118.24),
+    ("seattle", "us"): ("Seattle", 47.61, -122.33),
+    ("miami", "us"): ("Miami", 25.77, -80.19),
+    ("anchorage", "us"): ("Anchorage", 61.22, -149.90),
+    ("honolulu", "us"): ("Honolulu", 21.31, -157.86),
+    ("london", "gb"): ("London", 51.51, -0.13),
+    ("paris", "fr"): ("Paris", 48.85, 2.35),
+    ("frankfurt", "de"): ("Frankfurt am Main", 50.12, 8.68),
+    ("kaiserslautern", "de"): ("Kaiserslautern", 49.44, 7.77),
+    ("tokyo", "jp"): ("Tokyo", 35.69, 139.69),
+    ("sydney", "au"): ("Sydney", -33.87, 151.21),
+}
+
+# How far away, in kilometres, the coordinate endpoints still find a station.
+NEARBY_KM = 250
+
+
+def sample_metar(icao: str, now: datetime) -> str:
+    """Builds a routine METAR for a station, observed at the last :55."""
+
+    observed = now.replace(minute=55, second=0, microsecond=0)
+    if observed > now:
+        observed -= timedelta(hours=1)
+    return f"{icao} {observed:%d%H%M}Z 18008KT 10SM FEW045 28/21 A2998 RMK AO2"
+
+
+def sample_taf(icao: str, now: datetime) -> str:
+    """Builds a routine TAF for a station, issued for the current six hour cycle."""
+
+    start = now.replace(hour=now.hour // 6 * 6, minute=0, second=0, microsecond=0)
+    issued = start - timedelta(minutes=40)
+    end = start + timedelta(hours=30)
+    return (f"TAF {icao} {issued:%d%H%M}Z {start:%d%H}/{end:%d%H} 18008KT P6SM SCT040 "
+            f"FM{start + timedelta(hours=6):%d%H%M} 20012KT P6SM BKN050")
+
+
+def _distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Gets the great-circle distance between two coordinates."""
+
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+
+class Latency:
+    """A distribution of response delays, in seconds.
+
+    Attributes:
+        kind: str
+            "constant", "uniform", "normal", "lognormal" or "exponential".
+        params: tuple[float, ...]
+            The distribution's parameters: the delay for constant, (low, high) for
+            uniform, (mean, standard deviation) for normal, (median, sigma) for
+            lognormal, and the mean for exponential.
+
+    Methods:
+        parse(spec) -> Latency
+        sample(rng) -> float
+    """
+
+    KINDS = {"constant": 1, "uniform": 2, "normal": 2,
+             "lognormal": 2, "exponential": 1}
+
+    def __init__(self, kind: str = "constant", *params: float) -> None:
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind}")
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(
+                f"The {kind} distribution takes {self.KINDS[kind]} parameter(s)")
+        self.kind = kind
+        self.params = tuple(float(param) for param in params)
+        if kind == "lognormal" and self.params[0] <= 0:
+            raise ValueError("The lognormal distribution needs a median above zero")
+
+    @classmethod
+    def parse(cls, spec: "str | float | Latency") -> "Latency":
+        """Reads a distribution from a number of seconds or a "kind:param:param" string.
+
+        Args:
+            spec (str | float | Latency): e.g. 0.2, "uniform:0.05:0.3" or "lognormal:0.15:0.6".
+
+        Raises:
+            ValueError: The spec doesn't name a known distribution and its parameters.
+
+        Returns:
+            Latency: The distribution.
+        """
+
+        if isinstance(spec, Latency):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("constant", spec)
+        kind, *params = spec.split(":")
+        if not params:
+            return cls("constant", float(kind))
+        return cls(kind, *params)
+
+    def sample(self, rng: random.Random) -> float:
+        """Draws one delay, never less than zero."""
+
+        if self.kind == "constant":
+            delay = self.params[0]
+        elif self.kind == "uniform":
+            delay = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            delay = rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            delay = rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        else:
+            delay = rng.expovariate(1 / self.params[0]) if self.params[0] else 0.0
+        return max(0.0, delay)
+
+    def __str__(self) -> str:
+        return ":".join([self.kind, *(f"{param:g}" for param in self.params)])
+
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    """Answers CheckWX and OpenWeatherMap style requests after the server's latency."""
+
+    protocol_version = "HTTP/1.1"
+    # Buffer each response so its headers and body leave in one write; otherwise
+    # keep-alive clients stall on delayed ACKs between the two.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        self.server.count_call(parts[0] if parts else "")
+        fault = self.server.fault()
+        time.sleep(self.server.delay())
+        if fault == 429:
+            return self._send(429, {"error": "Too many requests"}, {"Retry-After": "60"})
+        if fault:
+            return self._send(fault, {"error": "Upstream error"})
+        if parts[:3] == ["data", "2.5", "weather"]:
+            return self._weather(parse_qs(url.query).get("q", [""])[0])
+        if len(parts) >= 2 and parts[0] in ("metar", "taf"):
+            build = sample_metar if parts[0] == "metar" else sample_taf
+            if len(parts) == 5 and parts[1] == "lat" and parts[3] == "lon":
+                codes = self.server.nearest(parts[2], parts[4])
+            elif len(parts) == 2:
+                codes = [code.upper() for code in parts[1].split(",")
+                         if self.server.knows(code)]
+            else:
+                return self._send(404, {"error": "Not found"})
+            now = datetime.now(timezone.utc)
+            data = [build(code, now) for code in codes]
+            return self._send(200, {"results": len(data), "data": data})
+        return self._send(404, {"error": "Not found"})
+
+    def _weather(self, query: str) -> None:
+        city, _, country_code = query.rpartition(",")
+        key = (city.strip().lower(), country_code.strip().lower())
+        found = CITIES.get(key)
+        if found is None:
+            return self._send(404, {"cod": "404", "message": "city not found"})
+        name, lat, lon = found
+        return self._send(200, {
+            "coord": {"lon": lon, "lat": lat},
+            "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+            "base": "stations",
+            "main": {"temp": 295.15, "feels_like": 295.1, "temp_min": 294.0,
+                     "temp_max": 296.5, "pressure": 1015, "humidity": 60},
+            "visibility": 10000,
+            "wind": {"speed": 3.6, "deg": 180},
+            "clouds": {"all": 0},
+            "dt": int(time.time()),
+            "sys": {"country": country_code.strip().upper()},
+            "timezone": 0,
+            "id": 4000000 + list(CITIES).index(key),
+            "name": name,
+            "cod": 200,
+        })
+
+    def _send(self, status: int, body: dict, headers: dict | None = None) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class MockUpstream(ThreadingHTTPServer):
+    """A threaded HTTP server that plays CheckWX and OpenWeatherMap.
+
+    Attributes:
+        latency: Latency
+            The distribution every response is delayed by.
+        error_rate: float
+            The fraction of requests answered with one of error_statuses instead.
+        error_statuses: tuple[int, ...]
+            The statuses failed requests are answered with.
+        rate_limit: int | None
+            The most requests answered in any 60 seconds before the rest get a 429.
+        unknown_stations: set[str]
+            ICAO codes that are answered as if they don't exist.
+        calls: int
+            How many requests have been received.
+        calls_by_path: dict[str, int]
+            How many requests each top-level path ("metar", "taf", "data") received.
+
+    Methods:
+        base_url -> str
+        count_call(path) -> None
+        fault() -> int | None
+        delay() -> float
+        knows(icao) -> bool
+        nearest(lat, lon) -> list[str]
+        start() -> MockUpstream
+        stop() -> None
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: "float | str | Latency" = 0.0, error_rate: float = 0.0,
+                 error_statuses: tuple[int, ...] = (500, 502, 503),
+                 rate_limit: int | None = None, unknown_stations=(),
+                 seed: int | None = None) -> None:
+        super().__init__((host, port), MockUpstreamHandler)
+        self.latency = Latency.parse(latency)
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.rate_limit = rate_limit
+        self.unknown_stations = {code.upper() for code in unknown_stations}
+        self.calls = 0
+        self.calls_by_path = {}
+        self._answered = deque()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count_call(self, path: str = "") -> None:
+        with self._lock:
+            self.calls += 1
+            self.calls_by_path[path] = self.calls_by_path.get(path, 0) + 1
+
+    def fault(self) -> int | None:
+        """Decides whether a request is rate limited (429) or fails with an error status."""
+
+        with self._lock:
+            now = time.monotonic()
+            if self.rate_limit is not None:
+                while self._answered and now - self._answered[0] >= 60:
+                    self._answered.popleft()
+                if len(self._answered) >= self.rate_limit:
+                    return 429
+                self._answered.append(now)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self._rng.choice(self.error_statuses)
+        return None
+
+    def delay(self) -> float:
+        """Draws the delay of one response from the latency distribution."""
+
+        with self._lock:
+            return self.latency.sample(self._rng)
+
+    def knows(self, icao: str) -> bool:
+        """Checks whether a code is answered like an existing station."""
+
+        icao = icao.strip().upper()
+        return len(icao) == 4 and icao.isalnum() and icao not in self.unknown_stations
+
+    def nearest(self, lat: str, lon: str) -> list[str]:
+        """Gets the catalogued station nearest to a coordinate, if one is within NEARBY_KM."""
+
+        try:
+            lat, lon = float(lat), float(lon)
+        except ValueError:
+            return []
+        distance, code = min((_distance_km(lat, lon, *position), code)
+                             for code, position in STATIONS.items())
+        return [code] if distance <= NEARBY_KM else []
+
+    def start(self) -> "MockUpstream":
+        """Serves requests from a background thread."""
+
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stops serving and closes the listening socket."""
+
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,47 @@
+"""All models within the Weather app.
+
+Classes:
+    ReportChange
+"""
+
+from django.db import models
+
+
+class ReportChange(models.Model):
+    """An entry in the append-only log of changed station reports.
+
+    A row is added whenever a station's METAR or TAF text is seen for the first time,
+    and rows are never updated, so the id orders the changes and serves as the cursor
+    of the change feed.
+
+    Extends:
+        Model (class): The django Model class.
+
+    Attributes:
+        kind: str
+            "metar" or "taf".
+        station: str
+            The ICAO code.
+        raw: str
+            The new report.
+        observed_at: datetime | None
+            The report's observation or issue time.
+        recorded_at: datetime
+            When the change was logged.
+    """
+
+    KINDS = [("metar", "METAR"), ("taf", "TAF")]
+
+    kind = models.CharField(max_length=5, choices=KINDS)
+    station = models.CharField(max_length=4)
+    raw = models.TextField()
+    observed_at = models.DateTimeField(null=True, blank=True)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['station', 'id'], name='report change by station'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind.upper()} {self.station} #{self.id}"
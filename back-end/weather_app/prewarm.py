@@ -0,0 +1,224 @@
+"""Keeps the METAR and TAF caches warm for every airport stored by a user.
+
+The weather views only go upstream on a cache miss, so refreshing each stored
+station's reports shortly before its cache entry expires means page loads are served
+from the cache. Stations are fetched in batched upstream calls that are spread over
+the minute with jitter and held to a per-minute request budget. A pass also stops
+early once CheckWX's shared quota is down to the share kept for users' requests.
+
+Classes:
+    RequestBudget
+    Prewarmer
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db import close_old_connections
+from airport_app.models import Airport
+from . import services
+from .quota import QuotaGovernor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "REQUESTS_PER_MINUTE": 30,
+    "BATCH_SIZE": 20,
+    "REFRESH_AHEAD": 180,
+    "JITTER": 0.5,
+    "PASS_INTERVAL": 60,
+}
+
+
+class RequestBudget:
+    """Paces upstream requests so no more than per_minute go out in any 60 seconds.
+
+    Requests are spaced 60 / per_minute seconds apart on average, with each gap
+    stretched or shrunk at random by up to the jitter fraction, so batches don't all
+    land on the provider at the same instant.
+
+    Attributes:
+        per_minute: int
+            The most requests allowed in any 60 second window.
+        jitter: float
+            How far each gap may stray from the even spacing, as a fraction of it.
+        clock: callable
+            Returns the current monotonic time in seconds.
+        sleep: callable
+            Waits for the given number of seconds.
+
+    Methods:
+        delay() -> float
+        acquire() -> None
+    """
+
+    def __init__(self, per_minute: int, jitter: float = 0.0, clock=time.monotonic,
+                 sleep=time.sleep, rng: random.Random | None = None) -> None:
+        self.per_minute = max(1, int(per_minute))
+        self.jitter = min(max(jitter, 0.0), 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.sent = deque()
+        self.next_at = None
+
+    def delay(self) -> float:
+        """Gets how many seconds to wait before the next request may be sent."""
+
+        return max(0.0, self._ready_at() - self.clock())
+
+    def _ready_at(self) -> float:
+        now = self.clock()
+        while self.sent and now >= self.sent[0] + 60:
+            self.sent.popleft()
+        ready = self.sent[0] + 60 if len(self.sent) >= self.per_minute else now
+        return max(ready, self.next_at) if self.next_at is not None else ready
+
+    def acquire(self) -> None:
+        """Waits until the budget allows another request and counts it as sent."""
+
+        ready = self._ready_at()
+        if ready > self.clock():
+            self.sleep(ready - self.clock())
+        now = max(self.clock(), ready)
+        self.sent.append(now)
+        spacing = 60 / self.per_minute
+        self.next_at = now + spacing * \
+            self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class Prewarmer:
+    """Refreshes the cached reports of every stored airport before they expire.
+
+    Attributes:
+        config: dict
+            DEFAULT_CONFIG overridden by settings.WEATHER_PREWARM and the config argument.
+        stop: threading.Event
+            Set to end run_forever; also wakes the prewarmer from any wait.
+        budget: RequestBudget
+            Paces the upstream calls.
+        quota: QuotaGovernor
+            CheckWX's request quota, shared with every worker's views.
+
+    Methods:
+        stored_codes() -> list[str]
+        due(kind, codes, now) -> list[str]
+        batches(codes) -> list[list[str]]
+        run_once(now) -> dict
+        run_forever() -> None
+    """
+
+    def __init__(self, config: dict | None = None, budget: RequestBudget | None = None,
+                 stop: threading.Event | None = None,
+                 quota: QuotaGovernor | None = None) -> None:
+        self.config = {**DEFAULT_CONFIG,
+                       **getattr(settings, "WEATHER_PREWARM", {}), **(config or {})}
+        self.stop = stop or threading.Event()
+        self.budget = budget or RequestBudget(
+            self.config["REQUESTS_PER_MINUTE"], self.config["JITTER"],
+            sleep=self.stop.wait)
+        self.quota = quota or QuotaGovernor("checkwx")
+
+    def stored_codes(self) -> list[str]:
+        """Gets the distinct ICAO codes of every user's saved airports."""
+
+        codes = Airport.objects.values_list("icao_code", flat=True).distinct()
+        return sorted({code.upper() for code in codes})
+
+    def due(self, kind: str, codes: list[str], now: datetime) -> list[str]:
+        """Gets the stations whose cached report is missing or about to go stale.
+
+        Missing stations come first, then the rest by how soon their entry expires.
+        Cached TAFs are also due once they need an amendment check. Stations known to
+        have no report, by services.screen_codes or the negative cache, are never due.
+
+        Args:
+            kind (str): "metar" or "taf".
+            codes (list[str]): The stations' ICAO codes.
+            now (datetime): The current UTC time.
+
+        Returns:
+            list[str]: The stations to refresh, most urgent first.
+        """
+
+        cache = services.metar_cache if kind == "metar" else services.taf_cache
+        codes, _ = services.screen_codes(kind, codes)
+        entries = cache.peek_many(codes)
+        horizon = now.timestamp() + self.config["REFRESH_AHEAD"]
+        missing = [code for code in codes if code not in entries]
+        known = set(cache.missing_many(missing))
+        missing = [code for code in missing if code not in known]
+        expiring = sorted(
+            (code for code, entry in entries.items()
+             if entry.get("expires_at", 0) <= horizon
+             or (kind == "taf" and services.taf_cache.needs_amendment_check(entry, now))),
+            key=lambda code: entries[code].get("expires_at", 0))
+        return missing + expiring
+
+    def batches(self, codes: list[str]) -> list[list[str]]:
+        """Splits the stations into groups of at most BATCH_SIZE per upstream call."""
+
+        size = max(1, int(self.config["BATCH_SIZE"]))
+        return [codes[idx:idx + size] for idx in range(0, len(codes), size)]
+
+    def run_once(self, now: datetime | None = None) -> dict:
+        """Refreshes every stored station that is due, within the request budget.
+
+        Args:
+            now (datetime | None): The current UTC time used to pick the due stations.
+
+        Returns:
+            dict: The number of "stations" stored, the "metar" and "taf" reports
+            refreshed, the upstream "calls" made, and the stations that came back
+            with "errors".
+        """
+
+        now = now or datetime.now(timezone.utc)
+        codes = self.stored_codes()
+        summary = {"stations": len(codes), "metar": 0,
+                   "taf": 0, "calls": 0, "errors": 0}
+        for kind in ("metar", "taf"):
+            for batch in self.batches(self.due(kind, codes, now)):
+                self.budget.acquire()
+                if self.stop.is_set():
+                    return summary
+                if not self.quota.has_room("background"):
+                    logger.info("Prewarm pass ended early, the CheckWX quota left is kept "
+                                "for users' requests")
+                    return summary
+                lookup = services.refresh_reports(kind, batch)
+                summary["calls"] += 1
+                summary[kind] += len(lookup.entries)
+                summary["errors"] += len(lookup.errors)
+        return summary
+
+    def run_forever(self, report=None) -> None:
+        """Runs a pass every PASS_INTERVAL seconds, give or take the jitter, until stopped.
+
+        A pass that fails is logged and the next one runs on schedule, so one bad pass
+        (a cache or database error, a report that won't parse) doesn't stop the worker.
+
+        Args:
+            report (callable | None): Called with each successful pass's summary.
+        """
+
+        interval = self.config["PASS_INTERVAL"]
+        jitter = self.budget.jitter
+        # Start at a random point so several workers don't line up on the same second.
+        self.stop.wait(random.uniform(0, 60 / max(1, self.config["REQUESTS_PER_MINUTE"])))
+        while not self.stop.is_set():
+            try:
+                summary = self.run_once()
+            except Exception:
+                logger.exception("Prewarm pass failed, the next one runs in about %ss",
+                                 interval)
+                summary = None
+            finally:
+                close_old_connections()
+            if report is not None and summary is not None:
+                report(summary)
+            self.stop.wait(interval * random.uniform(1 - jitter, 1 + jitter))
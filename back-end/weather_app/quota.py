@@ -0,0 +1,256 @@
+"""A request quota for an upstream provider, shared by every worker through the cache.
+
+The provider's plan caps requests per minute and per day, so each cap is a token bucket
+that is refilled at the start of every minute and every UTC day. A call takes a token
+from both buckets by incrementing the window's counter in the shared weather cache,
+which is atomic on the shared backends, and gives it back when either bucket is empty.
+
+Fetches made for a user's request may empty the buckets, while background refreshes
+(stale reports, streams and the prewarmer) stop once only the RESERVE share of a
+bucket is left, so a busy prewarm pass can't spend the quota that page loads need.
+Background refreshes that are refused leave the stale reports being served instead.
+The async client takes its tokens with aacquire, which uses the async cache API.
+
+Classes:
+    QuotaGovernor
+
+Methods:
+    current_priority() -> str
+    background_priority() -> Iterator[None]
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "PER_MINUTE": 60,
+    "PER_DAY": 2000,
+    "RESERVE": 0.2,
+}
+PRIORITIES = ("user", "background")
+WINDOWS = {"minute": 60, "day": 86400}
+
+_priority: ContextVar[str] = ContextVar("weather_fetch_priority", default="user")
+
+
+def current_priority() -> str:
+    """Gets whether upstream calls made here are for a "user" or in the "background"."""
+
+    return _priority.get()
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Marks the upstream calls made in the block as background refreshes."""
+
+    token = _priority.set("background")
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class QuotaGovernor:
+    """Hands out one provider's per-minute and per-day request quota to every worker.
+
+    Attributes:
+        name: str
+            The provider the quota is for, used to namespace cache keys.
+        alias: str
+            The Django cache alias that holds the counters.
+        config: dict
+            DEFAULT_CONFIG overridden by settings.WEATHER_QUOTA and the config argument.
+
+    Methods:
+        limit(window, priority) -> int | None
+        acquire(priority, now) -> bool
+        aacquire(priority, now) -> bool
+        has_room(priority, now) -> bool
+        usage(now) -> dict
+        reset(now) -> None
+    """
+
+    def __init__(self, name: str, alias: str | None = None,
+                 config: dict | None = None) -> None:
+        self.name = name
+        self.alias = alias or getattr(settings, "WEATHER_CACHE_ALIAS", "default")
+        self.config = {**DEFAULT_CONFIG,
+                       **getattr(settings, "WEATHER_QUOTA", {}), **(config or {})}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, window: str, now: float) -> str:
+        return f"wx:quota:{self.name}:{window}:{int(now // WINDOWS[window])}"
+
+    def _counter_key(self, outcome: str, priority: str, now: float) -> str:
+        return f"wx:quota:{self.name}:{outcome}:{priority}:{int(now // WINDOWS['day'])}"
+
+    def _incr(self, key: str, timeout: int) -> int:
+        if self.cache.add(key, 1, timeout=timeout):
+            return 1
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, timeout=timeout)
+            return 1
+
+    async def _aincr(self, key: str, timeout: int) -> int:
+        if await self.cache.aadd(key, 1, timeout=timeout):
+            return 1
+        try:
+            return await self.cache.aincr(key)
+        except ValueError:
+            await self.cache.aset(key, 1, timeout=timeout)
+            return 1
+
+    def limit(self, window: str, priority: str = "user") -> int | None:
+        """Gets how many calls of a priority a window allows, or None if it's uncapped.
+
+        Args:
+            window (str): "minute" or "day".
+            priority (str): "user" or "background".
+
+        Returns:
+            int | None: The calls allowed in the window.
+        """
+
+        capacity = self.config[f"PER_{window.upper()}"]
+        if capacity is None:
+            return None
+        if priority == "background":
+            return int(capacity * (1 - float(self.config["RESERVE"])))
+        return int(capacity)
+
+    def acquire(self, priority: str | None = None, now: float | None = None) -> bool:
+        """Takes a token from the minute and day buckets for one upstream call.
+
+        Args:
+            priority (str | None): "user" or "background", by default the priority of
+            the calling context.
+            now (float | None): The current UNIX time.
+
+        Returns:
+            bool: Whether the call may go upstream.
+        """
+
+        if not self.config["ENABLED"]:
+            return True
+        priority = priority or current_priority()
+        now = time.time() if now is None else now
+        taken = []
+        for window in WINDOWS:
+            limit = self.limit(window, priority)
+            if limit is None:
+                continue
+            key = self._key(window, now)
+            taken.append(key)
+            if self._incr(key, WINDOWS[window] * 2) > limit:
+                for key in taken:
+                    try:
+                        self.cache.decr(key)
+                    except ValueError:
+                        pass
+                self._refused(window, priority, now)
+                return False
+        self._incr(self._counter_key("granted", priority, now), WINDOWS["day"] * 2)
+        return True
+
+    async def aacquire(self, priority: str | None = None, now: float | None = None) -> bool:
+        """The async counterpart of acquire."""
+
+        if not self.config["ENABLED"]:
+            return True
+        priority = priority or current_priority()
+        now = time.time() if now is None else now
+        taken = []
+        for window in WINDOWS:
+            limit = self.limit(window, priority)
+            if limit is None:
+                continue
+            key = self._key(window, now)
+            taken.append(key)
+            if await self._aincr(key, WINDOWS[window] * 2) > limit:
+                for key in taken:
+                    try:
+                        await self.cache.adecr(key)
+                    except ValueError:
+                        pass
+                await self._arefused(window, priority, now)
+                return False
+        await self._aincr(self._counter_key("granted", priority, now), WINDOWS["day"] * 2)
+        return True
+
+    def _refused(self, window: str, priority: str, now: float) -> None:
+        self._incr(self._counter_key("refused", priority, now), WINDOWS["day"] * 2)
+        # Log once per window and priority rather than for every refused call.
+        if self.cache.add(f"{self._key(window, now)}:logged:{priority}", True,
+                          timeout=WINDOWS[window]):
+            logger.warning("%s %s quota is spent, %s calls are refused until it refills",
+                           self.name, window, priority)
+
+    async def _arefused(self, window: str, priority: str, now: float) -> None:
+        await self._aincr(self._counter_key("refused", priority, now), WINDOWS["day"] * 2)
+        if await self.cache.aadd(f"{self._key(window, now)}:logged:{priority}", True,
+                                 timeout=WINDOWS[window]):
+            logger.warning("%s %s quota is spent, %s calls are refused until it refills",
+                           self.name, window, priority)
+
+    def has_room(self, priority: str | None = None, now: float | None = None) -> bool:
+        """Checks, without taking a token, whether a call of a priority would be allowed."""
+
+        if not self.config["ENABLED"]:
+            return True
+        priority = priority or current_priority()
+        now = time.time() if now is None else now
+        used = self.cache.get_many([self._key(window, now) for window in WINDOWS])
+        return all(self.limit(window, priority) is None
+                   or used.get(self._key(window, now), 0) < self.limit(window, priority)
+                   for window in WINDOWS)
+
+    def usage(self, now: float | None = None) -> dict:
+        """Gets how much of the quota has been used, for monitoring.
+
+        Args:
+            now (float | None): The current UNIX time.
+
+        Returns:
+            dict: Per "minute" and "day" window the calls "used", the "limit", the
+            calls "remaining" and when the window "resets_at" (UNIX time), then today's
+            "granted" and "refused" calls per priority.
+        """
+
+        now = time.time() if now is None else now
+        counters = [self._counter_key(outcome, priority, now)
+                    for outcome in ("granted", "refused") for priority in PRIORITIES]
+        found = self.cache.get_many([self._key(window, now) for window in WINDOWS] + counters)
+        usage = {}
+        for window, seconds in WINDOWS.items():
+            used, limit = found.get(self._key(window, now), 0), self.limit(window)
+            usage[window] = {
+                "used": used, "limit": limit,
+                "remaining": None if limit is None else max(0, limit - used),
+                "resets_at": (int(now // seconds) + 1) * seconds,
+            }
+        for outcome in ("granted", "refused"):
+            usage[outcome] = {priority: found.get(self._counter_key(outcome, priority, now), 0)
+                              for priority in PRIORITIES}
+        return usage
+
+    def reset(self, now: float | None = None) -> None:
+        """Refills both buckets and clears today's counters."""
+
+        now = time.time() if now is None else now
+        self.cache.delete_many(
+            [self._key(window, now) for window in WINDOWS]
+            + [self._counter_key(outcome, priority, now)
+               for outcome in ("granted", "refused") for priority in PRIORITIES])
@@ -0,0 +1,119 @@
+"""Helpers that read the header of raw METAR and TAF reports.
+
+CheckWX sends reports back as raw text, so the station and the time a report was
+observed or issued have to be read from the report itself.
+
+Methods:
+    station_id(raw) -> str | None
+    is_speci(raw) -> bool
+    report_time(raw, now) -> datetime | None
+    taf_validity(raw, now) -> tuple[datetime, datetime] | None
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+REPORT_PREFIXES = {"METAR", "SPECI", "TAF", "AMD", "COR", "RTD"}
+STATION_PATTERN = re.compile(r"^[A-Z][A-Z0-9]{3}$")
+TIME_PATTERN = re.compile(r"^(\d{2})(\d{2})(\d{2})Z$")
+VALIDITY_PATTERN = re.compile(r"^(\d{2})(\d{2})/(\d{2})(\d{2})$")
+
+
+def _header(raw: str) -> list[str]:
+    """Splits the leading tokens of a report, skipping the report type keywords."""
+
+    tokens = raw.split(None, 6)
+    while tokens and tokens[0] in REPORT_PREFIXES:
+        tokens.pop(0)
+    return tokens
+
+
+def station_id(raw: str) -> str | None:
+    """Gets the ICAO code a raw report was issued for.
+
+    Args:
+        raw (str): The raw METAR or TAF text.
+
+    Returns:
+        str | None: The ICAO code, or None if the report doesn't start with one.
+    """
+
+    tokens = _header(raw)
+    if tokens and STATION_PATTERN.match(tokens[0]):
+        return tokens[0]
+    return None
+
+
+def is_speci(raw: str) -> bool:
+    """Checks whether a raw METAR is a special (off-cycle) observation."""
+
+    return raw.lstrip().startswith("SPECI")
+
+
+def _resolve_day(day: int, hour: int, minute: int, now: datetime) -> datetime | None:
+    """Builds a UTC datetime for a day of the month that's within about a month of now."""
+
+    year, month = now.year, now.month
+    if day > now.day + 1:
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    elif day < now.day - 20:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    try:
+        return datetime(year, month, day, tzinfo=timezone.utc) + \
+            timedelta(hours=hour, minutes=minute)
+    except ValueError:
+        return None
+
+
+def report_time(raw: str, now: datetime | None = None) -> datetime | None:
+    """Gets the observation time of a METAR or the issue time of a TAF.
+
+    Reports only carry the day of the month, so the month and year are taken from the
+    current time, stepping back a month when the day is in the future.
+
+    Args:
+        raw (str): The raw METAR or TAF text.
+        now (datetime | None): The current UTC time, defaults to datetime.now(timezone.utc).
+
+    Returns:
+        datetime | None: The aware UTC datetime, or None if the report has no DDHHMMZ group.
+    """
+
+    now = now or datetime.now(timezone.utc)
+    for token in _header(raw)[1:3]:
+        match = TIME_PATTERN.match(token)
+        if not match:
+            continue
+        day, hour, minute = (int(group) for group in match.groups())
+        return _resolve_day(day, hour, minute, now)
+    return None
+
+
+def taf_validity(raw: str, now: datetime | None = None) -> tuple[datetime, datetime] | None:
+    """Gets the start and end of a TAF's valid period from its DDHH/DDHH group.
+
+    Args:
+        raw (str): The raw TAF text.
+        now (datetime | None): The current UTC time, defaults to datetime.now(timezone.utc).
+
+    Returns:
+        tuple[datetime, datetime] | None: The aware UTC start and end, or None if the
+        TAF has no valid period group.
+    """
+
+    now = now or datetime.now(timezone.utc)
+    for token in _header(raw)[1:4]:
+        match = VALIDITY_PATTERN.match(token)
+        if not match:
+            continue
+        start_day, start_hour, end_day, end_hour = (
+            int(group) for group in match.groups())
+        start = _resolve_day(start_day, start_hour, 0, now)
+        end = _resolve_day(end_day, end_hour, 0, now)
+        if start is None or end is None:
+            return None
+        if end <= start:
+            end = _resolve_day(end_day, end_hour, 0, start + timedelta(days=2))
+        return start, end
+    return None
+
@@ -0,0 +1,558 @@
+"""Functions that keep the weather report caches filled from the upstream providers.
+
+Classes:
+    Lookup
+
+Methods:
+    split_codes(icao) -> list[str]
+    is_icao_code(code) -> bool
+    screen_codes(kind, codes) -> tuple[list[str], dict[str, str]]
+    cached_reports(kind, codes) -> Lookup
+    acached_reports(kind, codes) -> Lookup
+    peek_reports(kind, codes) -> Lookup
+    apeek_reports(kind, codes) -> Lookup
+    afetch_misses(kind, lookup, batch_size) -> Lookup
+    get_reports(kind, codes) -> Lookup
+    aget_reports(kind, codes, batch_size) -> Lookup
+    aget_weather(codes) -> tuple[Lookup, Lookup]
+    nearest_stations(kind, lat, lon) -> list[tuple[Station, float]]
+    route_stations(origin, destination, width_km) -> list[tuple[Station, float, float]] | None
+    aget_nearest_report(kind, stations) -> tuple[str | None, Lookup]
+    aget_first_reports(kind, choices) -> tuple[list[str | None], Lookup]
+    refresh_reports(kind, codes) -> Lookup
+    fetch_metar(icao) -> dict
+    fetch_metar_near(lat, lon) -> dict
+    fetch_taf(icao) -> dict
+    fetch_taf_near(lat, lon) -> dict
+    afetch_metar(icao) -> dict
+    afetch_metar_near(lat, lon) -> dict
+    afetch_taf(icao) -> dict
+    afetch_taf_near(lat, lon) -> dict
+"""
+
+import asyncio
+from asgiref.sync import sync_to_async
+from itertools import takewhile
+from typing import NamedTuple
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from airport_app.validators import validate_icao_code
+from .background import submit_once
+from .cache import MetarCache, TafCache
+from .client import get_client, get_async_client, QuotaExceededError, UpstreamError
+from .quota import background_priority
+from .reports import station_id
+from .signals import reports_fetched
+from .singleflight import SingleFlight
+from .stations import DEFAULT_CONFIG as STATIONS_CONFIG, Station, get_station_index
+
+NOT_FOUND = "That ICAO code does not match any results."
+UNAVAILABLE = "The weather provider is unavailable. Try again shortly."
+INVALID = "That is not a valid ICAO code. It should consist of only 4 capitalized characters."
+
+metar_cache = MetarCache()
+taf_cache = TafCache()
+flights = SingleFlight()
+
+
+class Lookup(NamedTuple):
+    """The outcome of looking up the latest reports for a set of stations.
+
+    Attributes:
+        entries: dict[str, dict]
+            The cache entry of every station that has a report, keyed by ICAO code.
+        errors: dict[str, str]
+            Why a station has no report, keyed by ICAO code.
+        misses: list[str]
+            The stations that weren't cached and had to be fetched upstream.
+        stale: list[str]
+            The cached stations served past their fresh period while being refreshed.
+    """
+
+    entries: dict[str, dict]
+    errors: dict[str, str]
+    misses: list[str]
+    stale: list[str]
+
+
+def split_codes(icao: str) -> list[str]:
+    """Splits a comma delimited list of ICAO codes into unique upper case codes.
+
+    Args:
+        icao (str): The codes as sent by the frontend, e.g. "KJFK, klax,KMIA".
+
+    Returns:
+        list[str]: The codes in the order they were asked for.
+    """
+
+    return list(dict.fromkeys(
+        code.strip().upper() for code in icao.split(",") if code.strip()))
+
+
+def is_icao_code(code: str) -> bool:
+    """Checks a code against the rules of an Airport's ICAO code: 4 capital letters."""
+
+    try:
+        validate_icao_code(code)
+    except ValidationError:
+        return False
+    return len(code) == 4
+
+
+def screen_codes(kind: str, codes: list[str]) -> tuple[list[str], dict[str, str]]:
+    """Sets aside the stations known locally to have no report, before the caches are read.
+
+    A code that isn't a valid ICAO code is INVALID. A station the catalogue says
+    doesn't issue the kind of report, or that isn't in a catalogue marked COMPLETE,
+    is NOT_FOUND.
+
+    Args:
+        kind (str): "metar" or "taf".
+        codes (list[str]): The stations' ICAO codes.
+
+    Returns:
+        tuple[list[str], dict[str, str]]: The codes left to look up, and the errors of
+        the others keyed by ICAO code.
+    """
+
+    config = {**STATIONS_CONFIG, **getattr(settings, "WEATHER_STATIONS", {})}
+    index = get_station_index()
+    errors = {}
+    for code in codes:
+        if not is_icao_code(code):
+            errors[code] = INVALID
+            continue
+        station = index.get(code)
+        if (station is not None and not getattr(station, kind)) or \
+                (station is None and config["COMPLETE"] and len(index)):
+            errors[code] = NOT_FOUND
+    return [code for code in codes if code not in errors], errors
+
+
+def _known_missing(kind: str, codes: list[str]) -> list[str]:
+    """Gets the stations the provider had no report for within NEGATIVE_TTL."""
+
+    return (metar_cache if kind == "metar" else taf_cache).missing_many(codes)
+
+
+def cached_reports(kind: str, codes: list[str]) -> Lookup:
+    """Splits the stations into cached entries and misses, without going upstream.
+
+    Stale entries are still served, and are queued for one combined background refresh.
+    Stations screened out by screen_codes, or that recently had no report upstream, are
+    errors rather than misses, so they never reach the provider.
+
+    Args:
+        kind (str): "metar" or "taf".
+        codes (list[str]): The stations' ICAO codes.
+
+    Returns:
+        Lookup: The cached entries, with the uncached stations as misses.
+    """
+
+    cache = metar_cache if kind == "metar" else taf_cache
+    codes, errors = screen_codes(kind, codes)
+    entries, misses, stale = {}, [], []
+    for code in codes:
+        entry = cache.get(code)
+        if entry is None:
+            misses.append(code)
+            continue
+        entries[code] = entry
+        if cache.is_stale(entry):
+            stale.append(code)
+    known = _known_missing(kind, misses)
+    if known:
+        errors.update(dict.fromkeys(known, NOT_FOUND))
+        misses = [code for code in misses if code not in errors]
+    if stale:
+        submit_once(f"{kind}:{','.join(stale)}", refresh_reports, kind, stale)
+    return Lookup(entries, errors, misses, stale)
+
+
+async def acached_reports(kind: str, codes: list[str]) -> Lookup:
+    """The async counterpart of cached_reports, reading the cache off the event loop.
+
+    Args:
+        kind (str): "metar" or "taf".
+        codes (list[str]): The stations' ICAO codes.
+
+    Returns:
+        Lookup: The cached entries, with the uncached stations as misses.
+    """
+
+    # Each worker thread has its own cache connection, so the reads needn't share one.
+    return await sync_to_async(cached_reports, thread_sensitive=False)(kind, codes)
+
+
+def peek_reports(kind: str, codes: list[str]) -> Lookup:
+    """Gets the cached reports of stations that are being watched, without counting hits.
+
+    The stale and uncached stations are refreshed together in the background, so a
+    watcher sees their new reports on a later look.
+
+    Args:
+        kind (str): "metar" or "taf".
+        codes (list[str]): The stations' ICAO codes.
+
+    Returns:
+        Lookup: The cached entries, with the uncached stations as misses.
+    """
+
+    cache = metar_cache if kind == "metar" else taf_cache
+    codes, errors = screen_codes(kind, codes)
+    entries = cache.peek_many(codes)
+    misses = [code for code in codes if code not in entries]
+    known = _known_missing(kind, misses)
+    if known:
+        errors.update(dict.fromkeys(known, NOT_FOUND))
+        misses = [code for code in misses if code not in errors]
+    stale = [code for code, entry in entries.items() if cache.is_stale(entry)]
+    if misses or stale:
+        submit_once(f"{kind}:{','.join(stale + misses)}", refresh_reports, kind, stale + misses)
+    return Lookup(entries, errors, misses, stale)
+
+
+async def apeek_reports(kind: str, codes: list[str]) -> Lookup:
+    """The async counterpart of peek_reports, reading the cache off the event loop.
+
+    Args:
+        kind (str): "metar" or "taf".
+        codes (list[str]): The stations' ICAO codes.
+
+    Returns:
+        Lookup: The cached entries, with the uncached stations as misses.
+    """
+
+    return await sync_to_async(peek_reports, thread_sensitive=False)(kind, codes)
+
+
+def _matched(kind: str, lookup: Lookup, response: dict) -> Lookup:
+    """Caches the reports of an upstream response and matches them to the misses.
+
+    The misses the response has no report for are negative cached.
+    """
+
+    cache = metar_cache if kind == "metar" else taf_cache
+    reports = {station_id(raw): raw for raw in response.get('data') or []
+               if isinstance(raw, str)}
+    for code in lookup.misses:
+        if code in reports:
+            lookup.entries[code] = cache.set(code, reports[code])
+        else:
+            lookup.errors[code] = NOT_FOUND
+    cache.set_missing([code for code in lookup.misses if code not in reports])
+    return lookup
+
+
+def _new_reports(lookup: Lookup) -> list[str]:
+    """Gets the fetched reports whose text wasn't cached before."""
+
+    return [lookup.entries[code]['raw'] for code in lookup.misses if code in lookup.entries
+            and lookup.entries[code]['fetched_at'] == lookup.entries[code]['checked_at']]
+
+
+def _announced(kind: str, lookup: Lookup) -> Lookup:
+    """Sends reports_fetched for the new reports of a lookup."""
+
+    reports = _new_reports(lookup)
+    if reports:
+        reports_fetched.send(sender=kind, reports=reports)
+    return lookup
+
+
+async def _aannounced(kind: str, lookup: Lookup) -> Lookup:
+    """The async counterpart of _announced, for receivers that touch the database."""
+
+    reports = _new_reports(lookup)
+    if reports:
+        await reports_fetched.asend(sender=kind, reports=reports)
+    return lookup
+
+
+def get_reports(kind: str, codes: list[str]) -> Lookup:
+    """Gets the latest METAR or TAF for every station, fetching only the uncached ones.
+
+    Cached stations are served locally and all of the misses are fetched in one
+    combined upstream call, with the reports matched back to their stations by the
+    station ID in each report. Stale cached reports are served as they are and
+    refreshed in the background, so only misses ever wait on the provider.
+
+    Args:
+        kind (str): "metar" or "taf".
+        codes (list[str]): The stations' ICAO codes.
+
+    Returns:
+        Lookup: The cache entries, the per-station errors, and the stations fetched.
+    """
+
+    lookup = cached_reports(kind, codes)
+    if not lookup.misses:
+        return lookup
+    fetch = fetch_metar if kind == "metar" else fetch_taf
+    try:
+        response = fetch(",".join(lookup.misses))
+    except UpstreamError:
+        lookup.errors.update(dict.fromkeys(lookup.misses, UNAVAILABLE))
+        return lookup
+    return _announced(kind, _matched(kind, lookup, response))
+
+
+async def aget_reports(kind: str, codes: list[str], batch_size: int | None = None) -> Lookup:
+    """The async counterpart of get_reports, fetching the misses with the async client.
+
+    Args:
+        kind (str): "metar" or "taf".
+        codes (list[str]): The stations' ICAO codes.
+        batch_size (int | None): The most stations asked for in one upstream call.
+
+    Returns:
+        Lookup: The cache entries, the per-station errors, and the stations fetched.
+    """
+
+    return await afetch_misses(kind, await acached_reports(kind, codes), batch_size)
+
+
+async def afetch_misses(kind: str, lookup: Lookup, batch_size: int | None = None) -> Lookup:
+    """Fetches the misses of a lookup in one combined upstream call with the async client.
+
+    With a batch_size the misses are split into calls of at most that many stations,
+    made concurrently, so a long list stays within the provider's URL limits and a
+    failed call only fails its own stations.
+
+    Args:
+        kind (str): "metar" or "taf".
+        lookup (Lookup): The lookup from cached_reports.
+        batch_size (int | None): The most stations asked for in one upstream call.
+
+    Returns:
+        Lookup: The lookup with the fetched entries added and errors for the misses
+        that have no report.
+    """
+
+    if not lookup.misses:
+        return lookup
+    if batch_size and len(lookup.misses) > batch_size:
+        # The batches add their entries and errors to the lookup's shared dicts.
+        await asyncio.gather(*(
+            afetch_misses(kind, lookup._replace(misses=lookup.misses[start:start + batch_size]))
+            for start in range(0, len(lookup.misses), batch_size)))
+        return lookup
+    fetch = afetch_metar if kind == "metar" else afetch_taf
+    try:
+        response = await fetch(",".join(lookup.misses))
+    except UpstreamError:
+        lookup.errors.update(dict.fromkeys(lookup.misses, UNAVAILABLE))
+        return lookup
+    lookup = await sync_to_async(_matched, thread_sensitive=False)(kind, lookup, response)
+    return await _aannounced(kind, lookup)
+
+
+async def aget_weather(codes: list[str]) -> tuple[Lookup, Lookup]:
+    """Gets the METARs and TAFs of the stations with both upstream calls in flight at once.
+
+    Args:
+        codes (list[str]): The stations' ICAO codes.
+
+    Returns:
+        tuple[Lookup, Lookup]: The METAR lookup and the TAF lookup.
+    """
+
+    return tuple(await asyncio.gather(aget_reports("metar", codes), aget_reports("taf", codes)))
+
+
+def nearest_stations(kind: str, lat: float, lon: float) -> list[tuple[Station, float]]:
+    """Gets the catalogued stations issuing METARs or TAFs nearest to a coordinate.
+
+    Args:
+        kind (str): "metar" or "taf".
+        lat (float): The latitude in decimal degrees.
+        lon (float): The longitude in decimal degrees.
+
+    Returns:
+        list[tuple[Station, float]]: Up to WEATHER_STATIONS["NEAREST"] stations within
+        WEATHER_STATIONS["MAX_DISTANCE_KM"], with their distances in kilometres,
+        nearest first.
+    """
+
+    config = {**STATIONS_CONFIG, **getattr(settings, "WEATHER_STATIONS", {})}
+    return get_station_index().nearest(lat, lon, int(config["NEAREST"]), kind,
+                                       config["MAX_DISTANCE_KM"])
+
+
+def route_stations(origin: str, destination: str,
+                   width_km: float | None = None) -> list[tuple[Station, float, float]] | None:
+    """Gets the catalogued stations along the great-circle track between two stations.
+
+    Args:
+        origin (str): The ICAO code of the station the track starts at.
+        destination (str): The ICAO code of the station the track ends at.
+        width_km (float | None): The farthest a station may be from the track, on
+        either side, by default WEATHER_STATIONS["CORRIDOR_KM"].
+
+    Returns:
+        list[tuple[Station, float, float]] | None: The stations with how far along the
+        track they are and how far off it in kilometres, in order along the track, or
+        None if either end isn't in the catalogue.
+    """
+
+    config = {**STATIONS_CONFIG, **getattr(settings, "WEATHER_STATIONS", {})}
+    index = get_station_index()
+    start, end = index.get(origin), index.get(destination)
+    if start is None or end is None:
+        return None
+    return index.corridor((start.latitude, start.longitude), (end.latitude, end.longitude),
+                          config["CORRIDOR_KM"] if width_km is None else width_km)
+
+
+async def aget_nearest_report(kind: str,
+                              stations: list[tuple[Station, float]]) -> tuple[str | None, Lookup]:
+    """Gets the report of the nearest station that has one, through the per-ICAO cache.
+
+    Only the stations nearer than the nearest cached one are fetched, in one combined
+    upstream call, so a coordinate shares its cache entries with airport lookups and
+    never waits on CheckWX when its nearest station is already cached.
+
+    Args:
+        kind (str): "metar" or "taf".
+        stations (list[tuple[Station, float]]): The candidates, nearest first, as
+        given by nearest_stations.
+
+    Returns:
+        tuple[str | None, Lookup]: The ICAO code of the station whose report to serve,
+        or None if none of them have one, and the lookup.
+    """
+
+    codes, lookup = await aget_first_reports(kind, [[station.icao for station, _ in stations]])
+    return codes[0], lookup
+
+
+async def aget_first_reports(kind: str,
+                             choices: list[list[str]]) -> tuple[list[str | None], Lookup]:
+    """Gets the first station with a report out of each list of choices, in one batch.
+
+    Each list is in order of preference, e.g. an Airport's own code, or the stations
+    nearest to a Named Location, nearest first. Only the stations preferred over the
+    first cached one of their list are fetched, all of them in one combined upstream call.
+
+    Args:
+        kind (str): "metar" or "taf".
+        choices (list[list[str]]): The ICAO codes to choose from, per list.
+
+    Returns:
+        tuple[list[str | None], Lookup]: The ICAO code chosen from each list, or None if
+        none of its stations have a report, and the combined lookup.
+    """
+
+    lookup = await acached_reports(
+        kind, list(dict.fromkeys(code for codes in choices for code in codes)))
+    preferred = [code for codes in choices
+                 for code in takewhile(lambda code: code not in lookup.entries, codes)
+                 if code not in lookup.errors]
+    lookup = await afetch_misses(kind, lookup._replace(misses=list(dict.fromkeys(preferred))))
+    return [next((code for code in codes if code in lookup.entries), None)
+            for codes in choices], lookup
+
+
+def refresh_reports(kind: str, codes: list[str]) -> Lookup:
+    """Re-fetches the METARs or TAFs of the stations in one upstream call, cached or not.
+
+    The call is a background refresh for the provider's quota. When the quota has no
+    room for it, the stations' cached reports are kept to be served stale until it does.
+    Stations screened out by screen_codes or negative cached aren't asked for.
+
+    Args:
+        kind (str): "metar" or "taf".
+        codes (list[str]): The stations' ICAO codes.
+
+    Returns:
+        Lookup: The updated cache entries, the per-station errors, and the stations fetched.
+    """
+
+    codes, errors = screen_codes(kind, codes)
+    errors.update(dict.fromkeys(_known_missing(kind, codes), NOT_FOUND))
+    codes = [code for code in codes if code not in errors]
+    lookup = Lookup({}, errors, codes, [])
+    if not codes:
+        return lookup
+    fetch = fetch_metar if kind == "metar" else fetch_taf
+    try:
+        with background_priority():
+            response = fetch(",".join(codes))
+    except QuotaExceededError:
+        (metar_cache if kind == "metar" else taf_cache).hold(codes)
+        lookup.errors.update(dict.fromkeys(codes, UNAVAILABLE))
+        return lookup
+    except UpstreamError:
+        lookup.errors.update(dict.fromkeys(codes, UNAVAILABLE))
+        return lookup
+    return _announced(kind, _matched(kind, lookup, response))
+
+
+def fetch_metar(icao: str) -> dict:
+    """Gets METARs from CheckWX, sharing one upstream call between concurrent callers.
+
+    Args:
+        icao (str): One or more comma delimited ICAO codes.
+
+    Raises:
+        UpstreamError: CheckWX couldn't be reached or sent back a bad response.
+
+    Returns:
+        dict: The CheckWX response.
+    """
+
+    return flights.do(f"metar:{icao.upper()}", get_client().metar, icao)
+
+
+def fetch_metar_near(lat: str, lon: str) -> dict:
+    """Gets the METAR nearest to a coordinate, sharing one upstream call between callers."""
+
+    return flights.do(f"metar:{lat}:{lon}", get_client().metar_near, lat, lon)
+
+
+def fetch_taf(icao: str) -> dict:
+    """Gets TAFs from CheckWX, sharing one upstream call between concurrent callers.
+
+    Args:
+        icao (str): One or more comma delimited ICAO codes.
+
+    Raises:
+        UpstreamError: CheckWX couldn't be reached or sent back a bad response.
+
+    Returns:
+        dict: The CheckWX response.
+    """
+
+    return flights.do(f"taf:{icao.upper()}", get_client().taf, icao)
+
+
+def fetch_taf_near(lat: str, lon: str) -> dict:
+    """Gets the TAF nearest to a coordinate, sharing one upstream call between callers."""
+
+    return flights.do(f"taf:{lat}:{lon}", get_client().taf_near, lat, lon)
+
+
+async def afetch_metar(icao: str) -> dict:
+    """The async counterpart of fetch_metar."""
+
+    return await flights.ado(f"metar:{icao.upper()}", get_async_client().metar, icao)
+
+
+async def afetch_metar_near(lat: str, lon: str) -> dict:
+    """The async counterpart of fetch_metar_near."""
+
+    return await flights.ado(f"metar:{lat}:{lon}", get_async_client().metar_near, lat, lon)
+
+
+async def afetch_taf(icao: str) -> dict:
+    """The async counterpart of fetch_taf."""
+
+    return await flights.ado(f"taf:{icao.upper()}", get_async_client().taf, icao)
+
+
+async def afetch_taf_near(lat: str, lon: str) -> dict:
+    """The async counterpart of fetch_taf_near."""
+
+    return await flights.ado(f"taf:{lat}:{lon}", get_async_client().taf_near, lat, lon)
+
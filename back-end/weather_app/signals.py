@@ -0,0 +1,11 @@
+"""Signals sent by the weather services.
+
+Attributes:
+    reports_fetched: Signal
+        Sent after an upstream call with sender set to "metar" or "taf" and reports set
+        to the raw reports that came back and weren't already cached with the same text.
+"""
+
+from django.dispatch import Signal
+
+reports_fetched = Signal()
@@ -0,0 +1,211 @@
+"""Coalesces concurrent identical upstream fetches into a single call.
+
+Within a process the first caller for a key runs the fetch and every other thread
+(or coroutine, for the async views) waiting on the same key gets its result. Across processes the caller also has to win
+a lease in the shared weather cache; callers in other workers wait for the lease
+holder to publish its result instead of fetching themselves.
+
+Classes:
+    SingleFlight
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_CONFIG = {
+    "LEASE_TIMEOUT": 30,
+    "WAIT_TIMEOUT": 15,
+    "POLL_INTERVAL": 0.05,
+    "RESULT_TIMEOUT": 10,
+}
+
+_MISSING = object()
+
+
+class _Call:
+    """One in-flight call that the threads of this process are waiting on."""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one fetch per key at a time, sharing its result with every waiter.
+
+    Attributes:
+        alias: str
+            The Django cache alias that holds the cross-process leases and results.
+        config: dict
+            DEFAULT_CONFIG overridden by settings.WEATHER_SINGLE_FLIGHT.
+
+    Methods:
+        do(key, fn, *args) -> object
+        ado(key, fn, *args) -> object
+    """
+
+    def __init__(self, alias: str | None = None, config: dict | None = None) -> None:
+        self.alias = alias or getattr(settings, "WEATHER_CACHE_ALIAS", "default")
+        self.config = {**DEFAULT_CONFIG,
+                       **getattr(settings, "WEATHER_SINGLE_FLIGHT", {}), **(config or {})}
+        self._calls: dict[str, _Call] = {}
+        self._futures: dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def do(self, key: str, fn, *args):
+        """Calls fn(*args), or waits for the identical call already in flight.
+
+        Args:
+            key (str): Identifies identical calls, e.g. "metar:KSVN".
+            fn (callable): The upstream fetch.
+
+        Raises:
+            Exception: Whatever the fetch raised, for the caller and its in-process waiters.
+
+        Returns:
+            object: The result of the one fetch made for the key.
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = self._do_shared(key, fn, args)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key: str, fn, *args):
+        """Awaits fn(*args), or the identical call already in flight.
+
+        Args:
+            key (str): Identifies identical calls, e.g. "metar:KSVN".
+            fn (coroutine function): The upstream fetch.
+
+        If the caller running the fetch is cancelled, e.g. because its client went away,
+        its waiters don't wait on it any longer: the first of them runs the fetch again.
+
+        Raises:
+            Exception: Whatever the fetch raised, for the caller and its waiters.
+
+        Returns:
+            object: The result of the one fetch made for the key.
+        """
+
+        loop = asyncio.get_running_loop()
+        while True:
+            future = self._futures.get(key)
+            if future is None or future.get_loop() is not loop:
+                break
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only retry when the leader was cancelled, not this waiter.
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+        future = self._futures[key] = loop.create_future()
+        try:
+            result = await self._ado_shared(key, fn, args)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting.
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    def _do_shared(self, key: str, fn, args: tuple):
+        lease_key = f"wx:lease:{key}"
+        deadline = time.monotonic() + self.config["WAIT_TIMEOUT"]
+        while True:
+            token = uuid.uuid4().hex
+            if self.cache.add(lease_key, token, timeout=self.config["LEASE_TIMEOUT"]):
+                try:
+                    result = fn(*args)
+                    self.cache.set(f"wx:flight:{key}:{token}", result,
+                                   timeout=self.config["RESULT_TIMEOUT"])
+                    return result
+                finally:
+                    if self.cache.get(lease_key) == token:
+                        self.cache.delete(lease_key)
+            holder = self.cache.get(lease_key)
+            if holder is not None:
+                result = self._wait_for(lease_key, holder, deadline)
+                if result is not _MISSING:
+                    return result
+            if time.monotonic() >= deadline:
+                # The other worker is taking too long, so stop waiting and fetch.
+                return fn(*args)
+
+    def _wait_for(self, lease_key: str, holder: str, deadline: float):
+        result_key = f"{lease_key.replace('wx:lease:', 'wx:flight:', 1)}:{holder}"
+        while time.monotonic() < deadline:
+            time.sleep(self.config["POLL_INTERVAL"])
+            result = self.cache.get(result_key, _MISSING)
+            if result is not _MISSING:
+                return result
+            if self.cache.get(lease_key) != holder:
+                # The holder finished or gave up, check once more for its result.
+                return self.cache.get(result_key, _MISSING)
+        return _MISSING
+
+    async def _ado_shared(self, key: str, fn, args: tuple):
+        # The async cache methods, so a shared backend such as Redis doesn't block the loop.
+        lease_key = f"wx:lease:{key}"
+        deadline = time.monotonic() + self.config["WAIT_TIMEOUT"]
+        while True:
+            token = uuid.uuid4().hex
+            if await self.cache.aadd(lease_key, token, timeout=self.config["LEASE_TIMEOUT"]):
+                try:
+                    result = await fn(*args)
+                    await self.cache.aset(f"wx:flight:{key}:{token}", result,
+                                          timeout=self.config["RESULT_TIMEOUT"])
+                    return result
+                finally:
+                    if await self.cache.aget(lease_key) == token:
+                        await self.cache.adelete(lease_key)
+            holder = await self.cache.aget(lease_key)
+            if holder is not None:
+                result = await self._await_for(lease_key, holder, deadline)
+                if result is not _MISSING:
+                    return result
+            if time.monotonic() >= deadline:
+                return await fn(*args)
+
+    async def _await_for(self, lease_key: str, holder: str, deadline: float):
+        result_key = f"{lease_key.replace('wx:lease:', 'wx:flight:', 1)}:{holder}"
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.config["POLL_INTERVAL"])
+            result = await self.cache.aget(result_key, _MISSING)
+            if result is not _MISSING:
+                return result
+            if await self.cache.aget(lease_key) != holder:
+                return await self.cache.aget(result_key, _MISSING)
+        return _MISSING
@@ -0,0 +1,340 @@
+"""A local catalogue of reporting stations with a nearest-station spatial index.
+
+Stations are loaded from a CSV catalogue into a KD-tree over points on the unit sphere,
+so the nearest stations to a coordinate are found in process, without a CheckWX call
+and without the distortion of a flat lat/lon grid near the poles or the antimeridian.
+The straight-line (chord) distance between two points on the sphere grows with their
+great-circle distance, so the tree is searched by chord and only the results are
+converted to kilometres.
+
+The stations along a flight's route are found the same way: the great-circle track
+and its corridor fit in a box, only the subtrees that overlap the box are visited, and
+only the stations inside it are measured against the track.
+
+Classes:
+    Station
+    StationIndex
+
+Methods:
+    distance_km(lat1, lon1, lat2, lon2) -> float
+    get_station_index() -> StationIndex
+"""
+
+import csv
+import heapq
+import logging
+import math
+import threading
+from pathlib import Path
+from typing import NamedTuple
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "PATH": Path(__file__).resolve().parent / "data" / "stations.csv",
+    "NEAREST": 3,
+    "MAX_DISTANCE_KM": 150,
+    "PRELOAD": True,
+    "COMPLETE": False,
+    "CORRIDOR_KM": 50,
+}
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class Station(NamedTuple):
+    """A reporting station of the catalogue.
+
+    Attributes:
+        icao: str
+            The station's ICAO code.
+        name: str
+            The station's name.
+        latitude: float
+            The station's latitude in decimal degrees.
+        longitude: float
+            The station's longitude in decimal degrees.
+        elevation_ft: int
+            The station's field elevation in feet.
+        metar: bool
+            Whether the station issues METARs.
+        taf: bool
+            Whether the station issues TAFs.
+    """
+
+    icao: str
+    name: str
+    latitude: float
+    longitude: float
+    elevation_ft: int
+    metar: bool
+    taf: bool
+
+
+def _point(lat: float, lon: float) -> tuple[float, float, float]:
+    """Gets the position of a coordinate on the unit sphere."""
+
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord(km: float) -> float:
+    """Gets the unit sphere chord length of a great-circle distance."""
+
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def _cross(a: tuple[float, float, float],
+           b: tuple[float, float, float]) -> tuple[float, float, float]:
+    """Gets the cross product of two vectors."""
+
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+def _angle(a: tuple[float, float, float], b: tuple[float, float, float]) -> float:
+    """Gets the angle between two points on the unit sphere, in radians."""
+
+    return 2 * math.asin(min(math.dist(a, b) / 2, 1.0))
+
+
+def _arc_box(start: tuple[float, float, float], ahead: tuple[float, float, float],
+             length: float, margin: float) -> tuple[list[float], list[float]]:
+    """Gets the box around a great-circle arc and every point within a chord of it.
+
+    The arc is start * cos(t) + ahead * sin(t) for t from 0 to length, so on each axis
+    it is furthest out at its ends or where that axis peaks, at t = atan2(ahead, start).
+
+    Returns:
+        tuple[list[float], list[float]]: The lowest and highest corner of the box.
+    """
+
+    low, high = [], []
+    for axis in range(3):
+        turns = [0.0, length]
+        peak = math.atan2(ahead[axis], start[axis])
+        turns += [t for t in (peak, peak + math.pi, peak - math.pi) if 0 < t < length]
+        values = [start[axis] * math.cos(t) + ahead[axis] * math.sin(t) for t in turns]
+        low.append(min(values) - margin)
+        high.append(max(values) + margin)
+    return low, high
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Gets the great-circle distance between two coordinates.
+
+    Args:
+        lat1 (float): The first latitude in decimal degrees.
+        lon1 (float): The first longitude in decimal degrees.
+        lat2 (float): The second latitude in decimal degrees.
+        lon2 (float): The second longitude in decimal degrees.
+
+    Returns:
+        float: The distance in kilometres.
+    """
+
+    chord = math.dist(_point(lat1, lon1), _point(lat2, lon2))
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+class StationIndex:
+    """The station catalogue held as an implicit KD-tree.
+
+    The tree needs no node objects: the stations are reordered so that each subtree is
+    a slice whose median is the node, split on the axis of its depth.
+
+    Attributes:
+        stations: list[Station]
+            The stations in tree order.
+
+    Methods:
+        load(path) -> StationIndex
+        get(icao) -> Station | None
+        nearest(lat, lon, k, kind, max_km) -> list[tuple[Station, float]]
+        corridor(origin, destination, width_km, kind) -> list[tuple[Station, float, float]]
+    """
+
+    def __init__(self, stations: list[Station] = ()) -> None:
+        entries = [(_point(station.latitude, station.longitude), station)
+                   for station in stations]
+        self._build(entries, 0, len(entries), 0)
+        self.stations = [station for _, station in entries]
+        self._points = [point for point, _ in entries]
+        self._codes = {station.icao: station for station in self.stations}
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def __contains__(self, icao: str) -> bool:
+        return icao in self._codes
+
+    @classmethod
+    def load(cls, path) -> "StationIndex":
+        """Reads a station catalogue; lines starting with # are skipped.
+
+        Args:
+            path (str | Path): A CSV file with icao, name, latitude, longitude,
+            elevation_ft, metar and taf columns.
+
+        Returns:
+            StationIndex: The indexed catalogue.
+        """
+
+        with open(path, encoding="utf-8", newline="") as catalogue:
+            rows = csv.DictReader(line for line in catalogue if not line.startswith("#"))
+            return cls([Station(row["icao"].strip().upper(), row["name"],
+                                float(row["latitude"]), float(row["longitude"]),
+                                int(row["elevation_ft"] or 0),
+                                row["metar"] == "1", row["taf"] == "1")
+                        for row in rows])
+
+    def _build(self, entries: list, start: int, end: int, depth: int) -> None:
+        """Orders entries[start:end] into a subtree split on the depth's axis."""
+
+        while end - start > 1:
+            axis = depth % 3
+            entries[start:end] = sorted(entries[start:end], key=lambda entry: entry[0][axis])
+            middle = (start + end) // 2
+            self._build(entries, start, middle, depth + 1)
+            start, depth = middle + 1, depth + 1
+
+    def get(self, icao: str) -> Station | None:
+        """Gets a catalogued station by its ICAO code."""
+
+        return self._codes.get(icao.strip().upper())
+
+    def nearest(self, lat: float, lon: float, k: int = 1, kind: str | None = None,
+                max_km: float | None = None) -> list[tuple[Station, float]]:
+        """Gets the stations nearest to a coordinate.
+
+        Args:
+            lat (float): The latitude in decimal degrees.
+            lon (float): The longitude in decimal degrees.
+            k (int): The most stations returned.
+            kind (str | None): "metar" or "taf" to only return stations issuing them.
+            max_km (float | None): The farthest a returned station may be.
+
+        Returns:
+            list[tuple[Station, float]]: The stations with their distances in
+            kilometres, nearest first.
+        """
+
+        target = _point(lat, lon)
+        limit = _chord(max_km) ** 2 if max_km is not None else math.inf
+        # A max-heap of the best k so far as (-squared chord, slot).
+        best = []
+        # Subtrees to visit as (start, end, depth, squared distance to their side of
+        # the splitting plane); a subtree farther away than the k-th best is skipped.
+        stack = [(0, len(self._points), 0, 0.0)]
+        while stack:
+            start, end, depth, plane = stack.pop()
+            bound = -best[0][0] if len(best) == k else limit
+            if start >= end or plane > bound:
+                continue
+            middle = (start + end) // 2
+            point = self._points[middle]
+            squared = ((point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2
+                       + (point[2] - target[2]) ** 2)
+            if squared <= bound and (kind is None or getattr(self.stations[middle], kind)):
+                heapq.heappush(best, (-squared, middle))
+                if len(best) > k:
+                    heapq.heappop(best)
+            offset = target[depth % 3] - point[depth % 3]
+            near, far = ((start, middle), (middle + 1, end)) if offset < 0 \
+                else ((middle + 1, end), (start, middle))
+            stack.append((*far, depth + 1, offset * offset))
+            stack.append((*near, depth + 1, 0.0))
+        return [(self.stations[slot],
+                 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(-squared) / 2, 1.0)))
+                for squared, slot in sorted(best, reverse=True)]
+
+    def corridor(self, origin: tuple[float, float], destination: tuple[float, float],
+                 width_km: float, kind: str | None = None
+                 ) -> list[tuple[Station, float, float]]:
+        """Gets the stations within a distance of the great-circle track between two points.
+
+        Args:
+            origin (tuple[float, float]): The start of the track as latitude and
+            longitude in decimal degrees.
+            destination (tuple[float, float]): The end of the track.
+            width_km (float): The farthest a returned station may be from the track,
+            on either side.
+            kind (str | None): "metar" or "taf" to only return stations issuing them.
+
+        Returns:
+            list[tuple[Station, float, float]]: The stations with how far along the
+            track they are and how far off it, in kilometres, in order along the track.
+        """
+
+        start, end = _point(*origin), _point(*destination)
+        normal = _cross(start, end)
+        sine = math.sqrt(sum(axis * axis for axis in normal))
+        length = math.atan2(sine, sum(a * b for a, b in zip(start, end)))
+        if sine < 1e-12:
+            # The same point or antipodes: there is no single track, so keep to the ends.
+            normal, ahead, length = None, (0.0, 0.0, 0.0), 0.0
+        else:
+            normal = tuple(axis / sine for axis in normal)
+            # The unit vector a quarter turn along the track from its start.
+            ahead = _cross(normal, start)
+        width, margin = width_km / EARTH_RADIUS_KM, _chord(width_km)
+        low, high = _arc_box(start, ahead, length, margin)
+        low = [min(low[axis], end[axis] - margin) for axis in range(3)]
+        high = [max(high[axis], end[axis] + margin) for axis in range(3)]
+        found = []
+        stack = [(0, len(self._points), 0)]
+        while stack:
+            start_slot, end_slot, depth = stack.pop()
+            if start_slot >= end_slot:
+                continue
+            middle = (start_slot + end_slot) // 2
+            point = self._points[middle]
+            axis = depth % 3
+            if low[axis] <= point[axis]:
+                stack.append((start_slot, middle, depth + 1))
+            if point[axis] <= high[axis]:
+                stack.append((middle + 1, end_slot, depth + 1))
+            if not all(low[i] <= point[i] <= high[i] for i in range(3)) \
+                    or kind is not None and not getattr(self.stations[middle], kind):
+                continue
+            along = math.atan2(sum(a * b for a, b in zip(point, ahead)),
+                               sum(a * b for a, b in zip(point, start)))
+            if normal and 0 <= along <= length:
+                off = abs(math.asin(max(-1.0, min(1.0, sum(
+                    a * b for a, b in zip(point, normal))))))
+            else:
+                # Past either end of the track the nearer end is the closest point.
+                to_start, to_end = _angle(point, start), _angle(point, end)
+                off, along = (to_start, 0.0) if to_start <= to_end else (to_end, length)
+            if off <= width:
+                found.append((along, off, middle))
+        return [(self.stations[slot], along * EARTH_RADIUS_KM, off * EARTH_RADIUS_KM)
+                for along, off, slot in sorted(found)]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_station_index() -> StationIndex:
+    """Gets the process wide StationIndex, loading settings.WEATHER_STATIONS["PATH"] on first use.
+
+    A missing or unreadable catalogue is logged and leaves the index empty, so
+    coordinate lookups fall back to asking CheckWX for the nearest station.
+
+    Returns:
+        StationIndex: The shared station index.
+    """
+
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                config = {**DEFAULT_CONFIG, **getattr(settings, "WEATHER_STATIONS", {})}
+                try:
+                    _index = StationIndex.load(config["PATH"])
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Couldn't load the station catalogue from %s: %s",
+                                   config["PATH"], e)
+                    _index = StationIndex()
+    return _index
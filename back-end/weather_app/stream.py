@@ -0,0 +1,158 @@
+"""Server-Sent Events of the latest METARs and TAFs of a set of stations.
+
+A stream sends the cached report of each station when it opens, then a new event only
+when a station's report changes. It looks at the shared cache every POLL_INTERVAL
+seconds, which catches reports refreshed by any worker, and is woken straight away by
+the reports_fetched signal when this worker fetches one. Streams end after
+MAX_DURATION seconds and the browser's EventSource reconnects after RETRY
+milliseconds, so no connection outlives a deploy for long.
+
+Classes:
+    ReportWatchers
+    EventStreamRenderer
+
+Methods:
+    format_event(event, data) -> str
+    areport_events(stations, config) -> AsyncIterator[str]
+"""
+
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator
+import orjson
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+from .reports import station_id
+from .services import apeek_reports
+
+DEFAULT_CONFIG = {
+    "POLL_INTERVAL": 5,
+    "HEARTBEAT": 15,
+    "MAX_DURATION": 3600,
+    "RETRY": 5000,
+}
+
+
+class ReportWatchers:
+    """The open streams of this worker and the stations each one watches.
+
+    Methods:
+        watch(codes) -> Iterator[asyncio.Event]
+        notify(sender, reports, **kwargs) -> None
+    """
+
+    def __init__(self) -> None:
+        self._watchers: dict[int, tuple[asyncio.AbstractEventLoop, asyncio.Event, set]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def watch(self, codes: set[str]) -> Iterator[asyncio.Event]:
+        """Registers a stream for as long as the block runs.
+
+        Args:
+            codes (set[str]): The ICAO codes the stream watches.
+
+        Returns:
+            Iterator[asyncio.Event]: The event set when one of the stations has a new
+            report.
+        """
+
+        event = asyncio.Event()
+        with self._lock:
+            self._watchers[id(event)] = (asyncio.get_running_loop(), event, set(codes))
+        try:
+            yield event
+        finally:
+            with self._lock:
+                self._watchers.pop(id(event), None)
+
+    def notify(self, sender: str, reports: list[str], **kwargs) -> None:
+        """Wakes the streams watching the stations of a reports_fetched signal.
+
+        It may be called from any thread.
+
+        Args:
+            sender (str): "metar" or "taf".
+            reports (list[str]): The new raw reports.
+        """
+
+        stations = {station_id(raw) for raw in reports}
+        with self._lock:
+            watchers = list(self._watchers.values())
+        for loop, event, codes in watchers:
+            if codes & stations:
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    # The stream's loop has closed since it was registered.
+                    pass
+
+
+watchers = ReportWatchers()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Renders a response for an EventSource, such as an error, as a single event."""
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        return format_event("error", data).encode()
+
+
+def format_event(event: str, data) -> str:
+    """Formats a Server-Sent Event with its data as JSON."""
+
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+async def areport_events(stations: dict[str, list[str]],
+                         config: dict | None = None) -> AsyncIterator[str]:
+    """Streams the reports of the stations as they change.
+
+    Args:
+        stations (dict[str, list[str]]): The ICAO codes to watch, keyed by "metar"
+        and/or "taf".
+        config (dict | None): Overrides of DEFAULT_CONFIG and settings.WEATHER_STREAM.
+
+    Returns:
+        AsyncIterator[str]: The formatted events, each a "metar" or "taf" event with
+        the "station", "raw" report and the "observed_at" time, and comment lines to
+        keep the connection open while nothing changes.
+    """
+
+    config = {**DEFAULT_CONFIG, **getattr(settings, "WEATHER_STREAM", {}), **(config or {})}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + float(config["MAX_DURATION"])
+    quiet_since, sent = loop.time(), {}
+    yield f"retry: {int(config['RETRY'])}\n\n"
+    with watchers.watch({code for codes in stations.values() for code in codes}) as event:
+        while loop.time() < deadline:
+            event.clear()
+            for kind, codes in stations.items():
+                entries = (await apeek_reports(kind, codes)).entries
+                for code in codes:
+                    entry = entries.get(code)
+                    if entry is None or sent.get((kind, code)) == entry["raw"]:
+                        continue
+                    sent[(kind, code)] = entry["raw"]
+                    quiet_since = loop.time()
+                    observed = entry.get("observed_at")
+                    yield format_event(kind, {
+                        "station": code, "raw": entry["raw"],
+                        "observed_at": None if observed is None else
+                        datetime.fromtimestamp(observed, timezone.utc).isoformat(),
+                    })
+            if loop.time() - quiet_since >= float(config["HEARTBEAT"]):
+                quiet_since = loop.time()
+                yield ": keep-alive\n\n"
+            try:
+                await asyncio.wait_for(
+                    event.wait(),
+                    max(0, min(float(config["POLL_INTERVAL"]), deadline - loop.time())))
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,519 @@
+"""A decoder that turns raw TAF text into forecast periods indexed by time.
+
+A TAF is split at its change groups into the base forecast and its FM, BECMG, TEMPO and
+PROB periods, each with its validity resolved to UTC datetimes. The weather groups of a
+period are read by the METAR decoder's tokenizer, so both decoders share one grammar.
+
+The decoded TAF keeps two time indexes, so briefing questions are answered by searching
+them rather than by reading the report again:
+
+- The timeline: the base and FM periods with each completed BECMG applied, which never
+  overlap and are found by bisecting their start times.
+- An IntervalIndex of the TEMPO, PROB and in-progress BECMG periods, which may overlap
+  each other and the timeline.
+
+Classes:
+    Conditions
+    ForecastPeriod
+    Outlook
+    IntervalIndex
+    Taf
+
+Methods:
+    decode_taf(raw, now) -> Taf
+    get_taf(raw, now) -> Taf
+    resolve_time(value, after) -> datetime | None
+"""
+
+import bisect
+import functools
+import re
+from datetime import date, datetime, timedelta, timezone
+from .metar import (
+    CEILING_COVERS,
+    Metar,
+    _Record,
+    _read_tokens,
+    flight_category,
+)
+from .reports import REPORT_PREFIXES, _resolve_day, report_time, taf_validity
+
+CHANGE_PATTERN = re.compile(r"FM(\d\d)(\d\d)(\d\d)|(BECMG|TEMPO)|PROB(30|40)")
+PERIOD_PATTERN = re.compile(r"(\d\d)(\d\d)/(\d\d)(\d\d)")
+WIND_SHEAR_PATTERN = re.compile(r"WS\d{3}/\d{3}\d\d\d?KT")
+TIME_PATTERN = re.compile(r"(?:(\d\d))?(\d\d)(\d\d)Z")
+
+
+class Conditions(_Record):
+    """The weather forecast for a period.
+
+    An element a change group doesn't mention is None, meaning it's carried over from
+    the conditions the group changes.
+
+    Attributes:
+        wind: Wind | None
+            The surface wind.
+        visibility: Visibility | None
+            The prevailing visibility.
+        weather: list[WeatherGroup] | None
+            The forecast weather; an empty list for NSW (no significant weather).
+        sky: list[SkyLayer] | None
+            The sky layers, lowest first.
+        wind_shear: str | None
+            The low level wind shear group, e.g. WS020/27045KT.
+        unparsed: list[str]
+            The groups the decoder didn't recognize.
+
+    Methods:
+        ceiling_ft() -> int | None
+        flight_category() -> str | None
+        updated(changes) -> Conditions
+    """
+
+    __slots__ = ("wind", "visibility", "weather", "sky", "wind_shear", "unparsed")
+
+    def __init__(self, wind=None, visibility=None, weather=None, sky=None,
+                 wind_shear: str | None = None, unparsed: list[str] | None = None) -> None:
+        self.wind = wind
+        self.visibility = visibility
+        self.weather = weather
+        self.sky = sky
+        self.wind_shear = wind_shear
+        self.unparsed = unparsed or []
+
+    def ceiling_ft(self) -> int | None:
+        """Gets the height of the lowest broken, overcast or obscured layer."""
+
+        return min((layer.height_ft for layer in self.sky or ()
+                    if layer.cover in CEILING_COVERS and layer.height_ft is not None),
+                   default=None)
+
+    def flight_category(self) -> str | None:
+        """Gets the flight category the ceiling and visibility put the forecast in."""
+
+        return flight_category(self.ceiling_ft(),
+                               self.visibility.statute_miles if self.visibility else None)
+
+    def updated(self, changes: "Conditions") -> "Conditions":
+        """Gets these conditions with the elements a change group forecasts replaced."""
+
+        return Conditions(
+            *(getattr(changes, name) if getattr(changes, name) is not None
+              else getattr(self, name)
+              for name in ("wind", "visibility", "weather", "sky", "wind_shear")))
+
+
+class ForecastPeriod(_Record):
+    """A period of a TAF, from the base forecast or one of its change groups.
+
+    Attributes:
+        kind: str
+            "BASE", "FM", "BECMG", "TEMPO" or "PROB".
+        probability: int | None
+            30 or 40 for PROB and PROB TEMPO periods.
+        start: datetime
+            The UTC start of the period.
+        end: datetime
+            The UTC end of the period, exclusive.
+        conditions: Conditions
+            The forecast conditions. For BECMG, TEMPO and PROB periods only the
+            elements that change are set.
+    """
+
+    __slots__ = ("kind", "probability", "start", "end", "conditions")
+
+    def __init__(self, kind: str, start: datetime, end: datetime,
+                 conditions: Conditions, probability: int | None = None) -> None:
+        self.kind = kind
+        self.probability = probability
+        self.start = start
+        self.end = end
+        self.conditions = conditions
+
+
+class Outlook(_Record):
+    """The answer to a point in time or time window query on a TAF.
+
+    Attributes:
+        start: datetime
+            The UTC start of the queried window.
+        end: datetime
+            The UTC end of the queried window; the same as start for a point in time.
+        flight_category: str | None
+            The category of the worst conditions.
+        worst: Conditions
+            The worst of each element forecast in the window: the lowest visibility and
+            ceiling, the strongest wind, every weather group and any wind shear.
+        prevailing: list[ForecastPeriod]
+            The timeline periods in the window, with completed BECMG changes applied.
+        changes: list[ForecastPeriod]
+            The TEMPO, PROB and in-progress BECMG periods in the window.
+    """
+
+    __slots__ = ("start", "end", "flight_category", "worst", "prevailing", "changes")
+
+    def __init__(self, start: datetime, end: datetime, prevailing: list[ForecastPeriod],
+                 changes: list[ForecastPeriod]) -> None:
+        self.start = start
+        self.end = end
+        self.prevailing = prevailing
+        self.changes = changes
+        self.worst = _worst([period.conditions for period in prevailing + changes])
+        self.flight_category = self.worst.flight_category()
+
+
+def _worst(forecasts: list[Conditions]) -> Conditions:
+    """Combines forecasts into the worst of each of their elements."""
+
+    winds = [forecast.wind for forecast in forecasts if forecast.wind is not None]
+    visibilities = [forecast.visibility for forecast in forecasts
+                    if forecast.visibility is not None]
+    ceilings = [layer for forecast in forecasts for layer in forecast.sky or ()
+                if layer.cover in CEILING_COVERS and layer.height_ft is not None]
+    weather = []
+    for forecast in forecasts:
+        weather += [group for group in forecast.weather or () if group not in weather]
+    return Conditions(
+        max(winds, key=lambda wind: wind.peak_knots) if winds else None,
+        min(visibilities, key=lambda visibility: visibility.statute_miles)
+        if visibilities else None,
+        weather,
+        [min(ceilings, key=lambda layer: layer.height_ft)] if ceilings else [],
+        next((forecast.wind_shear for forecast in forecasts if forecast.wind_shear), None))
+
+
+class IntervalIndex:
+    """Half-open time intervals held as an implicit, augmented binary search tree.
+
+    The intervals are sorted by start, so each subtree is a slice whose middle is the
+    node. Every node also keeps the latest end in its subtree, so a query skips a
+    subtree that ends before the window and, past a node starting after the window,
+    everything to its right: a query costs O(log n + k) for k results.
+
+    Attributes:
+        items: list
+            The indexed objects, sorted by start.
+
+    Methods:
+        overlapping(start, end) -> list
+    """
+
+    def __init__(self, items: list = (), start=lambda item: item.start,
+                 end=lambda item: item.end) -> None:
+        self.items = sorted(items, key=start)
+        self._starts = [start(item) for item in self.items]
+        self._ends = [end(item) for item in self.items]
+        self._latest = list(self._ends)
+        self._augment(0, len(self.items))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _augment(self, start: int, end: int):
+        """Stores the latest end of the subtree items[start:end] on its middle node."""
+
+        if start >= end:
+            return None
+        middle = (start + end) // 2
+        for child in (self._augment(start, middle), self._augment(middle + 1, end)):
+            if child is not None and child > self._latest[middle]:
+                self._latest[middle] = child
+        return self._latest[middle]
+
+    def overlapping(self, start, end) -> list:
+        """Gets the items whose interval overlaps a window.
+
+        Args:
+            start (datetime): The start of the window.
+            end (datetime): The end of the window, or start itself for a point in time.
+
+        Returns:
+            list: The items starting at or before end and ending after start, by start.
+        """
+
+        found = []
+        stack = [(0, len(self.items))]
+        while stack:
+            low, high = stack.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            if self._latest[middle] <= start:
+                continue
+            stack.append((low, middle))
+            if self._starts[middle] <= end:
+                if self._ends[middle] > start:
+                    found.append(middle)
+                stack.append((middle + 1, high))
+        return [self.items[slot] for slot in sorted(found)]
+
+
+class Taf(_Record):
+    """A decoded TAF.
+
+    Attributes:
+        raw: str
+            The report as received.
+        station: str | None
+            The ICAO code.
+        modifier: str | None
+            "AMD" for an amended or "COR" for a corrected forecast.
+        issued: datetime | None
+            The UTC time the forecast was issued.
+        valid_from: datetime | None
+            The UTC start of the forecast's validity.
+        valid_to: datetime | None
+            The UTC end of the forecast's validity.
+        periods: list[ForecastPeriod]
+            The base forecast and change groups in the order they're written.
+        remarks: str
+            Everything after RMK.
+        unparsed: list[str]
+            The groups the decoder didn't recognize outside of a period.
+
+    Methods:
+        conditions_at(time) -> Outlook | None
+        worst_between(start, end) -> Outlook | None
+    """
+
+    __slots__ = ("raw", "station", "modifier", "issued", "valid_from", "valid_to", "periods",
+                 "remarks", "unparsed", "_timeline", "_starts", "_changes")
+
+    def __init__(self, raw: str, station: str | None = None) -> None:
+        self.raw = raw
+        self.station = station
+        self.modifier = self.issued = self.valid_from = self.valid_to = None
+        self.periods = []
+        self.remarks = ""
+        self.unparsed = []
+        self._index()
+
+    def _index(self) -> None:
+        """Builds the timeline and the interval index of the change periods."""
+
+        prevailing = [period for period in self.periods if period.kind in ("BASE", "FM")]
+        becoming = [period for period in self.periods if period.kind == "BECMG"]
+        # A BECMG change is complete at the end of its period and then lasts until the
+        # next FM group, so the timeline is split at FM starts and BECMG ends.
+        bounds = sorted({period.start for period in prevailing}
+                        | {period.end for period in becoming
+                           if self.valid_from < period.end < self.valid_to})
+        self._timeline = []
+        for start, end in zip(bounds, bounds[1:] + [self.valid_to]):
+            governing = max((period for period in prevailing if period.start <= start),
+                            key=lambda period: period.start, default=None)
+            if governing is None:
+                continue
+            conditions = governing.conditions
+            for change in becoming:
+                if governing.start <= change.start and change.end <= start:
+                    conditions = conditions.updated(change.conditions)
+            self._timeline.append(ForecastPeriod(governing.kind, start, end, conditions))
+        self._starts = [period.start for period in self._timeline]
+        self._changes = IntervalIndex(
+            [period for period in self.periods if period.kind in ("BECMG", "TEMPO", "PROB")])
+
+    def _prevailing(self, start: datetime, end: datetime) -> list[ForecastPeriod]:
+        first = max(bisect.bisect_right(self._starts, start) - 1, 0)
+        last = bisect.bisect_right(self._starts, end)
+        return [period for period in self._timeline[first:last] if period.end > start]
+
+    def conditions_at(self, time: datetime) -> Outlook | None:
+        """Gets the forecast at a point in time.
+
+        Args:
+            time (datetime): The aware UTC time.
+
+        Returns:
+            Outlook | None: The prevailing conditions and the changes in progress at
+            that time, or None if the TAF isn't valid then.
+        """
+
+        if not self._timeline or not self.valid_from <= time < self.valid_to:
+            return None
+        return Outlook(time, time, self._prevailing(time, time),
+                       self._changes.overlapping(time, time))
+
+    def worst_between(self, start: datetime, end: datetime) -> Outlook | None:
+        """Gets the worst forecast conditions within a time window.
+
+        Args:
+            start (datetime): The aware UTC start of the window, e.g. a takeoff time.
+            end (datetime): The aware UTC end of the window, e.g. an arrival time.
+
+        Returns:
+            Outlook | None: The conditions of the part of the window the TAF covers,
+            or None if it covers none of it.
+        """
+
+        if end < start:
+            start, end = end, start
+        if not self._timeline or end < self.valid_from or start >= self.valid_to:
+            return None
+        start, end = max(start, self.valid_from), min(end, self.valid_to)
+        return Outlook(start, end, self._prevailing(start, end),
+                       self._changes.overlapping(start, end))
+
+
+def _conditions(tokens: list[str]) -> Conditions:
+    """Reads a period's weather groups with the METAR tokenizer."""
+
+    conditions = Conditions()
+    groups = []
+    for token in tokens:
+        if token == "NSW":
+            conditions.weather = []
+        elif WIND_SHEAR_PATTERN.fullmatch(token):
+            conditions.wind_shear = token
+        else:
+            groups.append(token)
+    if groups:
+        scratch = Metar("")
+        _read_tokens(scratch, " ".join(groups) + " ")
+        conditions.wind = scratch.wind
+        conditions.visibility = scratch.visibility
+        conditions.weather = scratch.weather or conditions.weather
+        conditions.sky = scratch.sky or None
+        conditions.unparsed = scratch.unparsed
+    return conditions
+
+
+def _period_time(day: str, hour: str, minute: str, valid_from: datetime) -> datetime | None:
+    """Resolves a DDHH(MM) group of a period, which falls within about a day of valid_from."""
+
+    return _resolve_day(int(day), int(hour), int(minute), valid_from + timedelta(days=1))
+
+
+def _sections(tokens: list[str]) -> list[tuple[str, int | None, re.Match | None, list[str]]]:
+    """Splits the groups after the valid period at each change group.
+
+    Returns:
+        list[tuple[str, int | None, re.Match | None, list[str]]]: The kind, probability,
+        change group match and weather groups of each section, the base forecast first.
+    """
+
+    sections = [("BASE", None, None, [])]
+    for token in tokens:
+        change = CHANGE_PATTERN.fullmatch(token)
+        kind, probability, _, groups = sections[-1]
+        if change is None:
+            groups.append(token)
+        elif token == "TEMPO" and kind == "PROB" and not groups:
+            sections[-1] = ("TEMPO", probability, change, groups)
+        elif change[1]:
+            sections.append(("FM", None, change, []))
+        else:
+            sections.append((change[4] or "PROB",
+                             int(change[5]) if change[5] else None, change, []))
+    return sections
+
+
+def decode_taf(raw: str, now: datetime | None = None) -> Taf:
+    """Decodes a raw TAF.
+
+    Args:
+        raw (str): The raw report, e.g. "TAF KSVN 011720Z 0118/0224 18008KT P6SM SCT040
+            FM020000 20012KT P6SM BKN050".
+        now (datetime | None): The current UTC time, which gives the report's month
+            and year; defaults to datetime.now(timezone.utc).
+
+    Returns:
+        Taf: The decoded report. A report without a valid period has no periods, and
+        groups that couldn't be read are kept as unparsed.
+    """
+
+    now = now or datetime.now(timezone.utc)
+    tokens = raw.split()
+    taf = Taf(raw)
+    if "RMK" in tokens:
+        split = tokens.index("RMK")
+        tokens, taf.remarks = tokens[:split], " ".join(tokens[split + 1:])
+    position = 0
+    while position < len(tokens) and tokens[position] in REPORT_PREFIXES:
+        if tokens[position] in ("AMD", "COR"):
+            taf.modifier = tokens[position]
+        position += 1
+    taf.station = tokens[position] if position < len(tokens) else None
+    taf.issued = report_time(raw, now)
+    validity = taf_validity(raw, now)
+    while position < len(tokens) and not PERIOD_PATTERN.fullmatch(tokens[position]):
+        position += 1
+    if validity is None or position == len(tokens):
+        taf.unparsed = tokens[1:]
+        return taf
+    taf.valid_from, taf.valid_to = validity
+    for kind, probability, change, groups in _sections(tokens[position + 1:]):
+        if kind == "BASE":
+            start, end = taf.valid_from, taf.valid_to
+        elif kind == "FM":
+            start, end = _period_time(*change.group(1, 2, 3), taf.valid_from), taf.valid_to
+        elif groups and PERIOD_PATTERN.fullmatch(groups[0]):
+            period = PERIOD_PATTERN.fullmatch(groups.pop(0))
+            start = _period_time(*period.group(1, 2), "00", taf.valid_from)
+            end = _period_time(*period.group(3, 4), "00", taf.valid_from)
+        else:
+            start = end = None
+        if start is None or end is None:
+            taf.unparsed += [change[0], *groups]
+            continue
+        taf.periods.append(ForecastPeriod(kind, start, end, _conditions(groups), probability))
+    # The base forecast and each FM period last until the next FM period starts.
+    prevailing = [period for period in taf.periods if period.kind in ("BASE", "FM")]
+    for period, following in zip(prevailing, prevailing[1:]):
+        period.end = following.start
+    taf._index()
+    return taf
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_taf(raw: str, day: date) -> Taf:
+    return decode_taf(raw, datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc))
+
+
+def get_taf(raw: str, now: datetime | None = None) -> Taf:
+    """Gets a decoded TAF, decoding each report once and reusing it for every query.
+
+    Reports only carry days of the month, which are resolved against the current
+    date, so a decoded report is reused for the rest of the UTC day.
+
+    Args:
+        raw (str): The raw TAF text.
+        now (datetime | None): The current UTC time.
+
+    Returns:
+        Taf: The shared decoded report, which must not be changed.
+    """
+
+    return _cached_taf(raw, (now or datetime.now(timezone.utc)).date())
+
+
+def resolve_time(value: str, after: datetime) -> datetime | None:
+    """Reads a requested time as an ISO 8601 datetime, DDHHMMZ or HHMMZ.
+
+    Args:
+        value (str): The time, e.g. "2024-05-01T14:30Z", "011430Z" or "1430Z". ISO
+            datetimes without an offset are taken as UTC.
+        after (datetime): The time a day-of-month or time-of-day is the next one after,
+            usually the start of a TAF's validity.
+
+    Returns:
+        datetime | None: The aware UTC time, or None if the value can't be read.
+    """
+
+    value = value.strip().upper()
+    match = TIME_PATTERN.fullmatch(value)
+    if match is None:
+        try:
+            time = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if time.tzinfo is None:
+            return time.replace(tzinfo=timezone.utc)
+        return time.astimezone(timezone.utc)
+    day, hour, minute = match.groups()
+    if int(hour) > 23 or int(minute) > 59:
+        return None
+    if day is not None:
+        return _resolve_day(int(day), int(hour), int(minute), after + timedelta(days=1))
+    time = after.replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+    return time if time >= after else time + timedelta(days=1)
@@ -0,0 +1,18 @@
+from django.urls import path
+from .views import (
+    A_airport_weather,
+    Cache_stats,
+    Flight_categories,
+    Nearest_stations,
+    Weather_changes,
+    Weather_stream,
+)
+
+urlpatterns = [
+    path('airports/<str:icao>/', A_airport_weather.as_view(), name="a_airport_weather"),
+    path('cache-stats/', Cache_stats.as_view(), name="cache_stats"),
+    path('stations/nearest/', Nearest_stations.as_view(), name="nearest_stations"),
+    path('categories/', Flight_categories.as_view(), name="flight_categories"),
+    path('stream/', Weather_stream.as_view(), name="weather_stream"),
+    path('changes/', Weather_changes.as_view(), name="weather_changes"),
+]
@@ -0,0 +1,532 @@
+"""Views that serve combined weather and report on the shared weather infrastructure.
+
+Classes:
+    A_airport_weather
+    Cache_stats
+    Nearest_stations
+    Flight_categories
+    Weather_stream
+    Weather_changes
+
+Methods:
+    set_cache_headers(response, *lookups) -> Response
+    report_validators(variant, *lookups) -> tuple[str | None, int | None]
+    set_validators(response, variant, *lookups) -> Response
+    not_modified(request, variant, *lookups) -> HttpResponse | None
+    parse_coordinate(lat, lon) -> tuple[float, float] | None
+    wants_decoded(request) -> bool
+    anearest_report_response(request, kind, lat, lon) -> HttpResponse | None
+    asaved_places(user, kind) -> list[tuple[str, str, list[tuple[str, float | None]]]]
+"""
+
+import asyncio
+import hashlib
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_410_GONE,
+    HTTP_502_BAD_GATEWAY,
+)
+from user_app.views import TokenReq, AsyncTokenReq
+from .cache import MetarCache, TafCache
+from .changes import changes_since, decode_cursor, encode_cursor, has_expired, head_id
+from .categories import category_table
+from .client import METERED_PROVIDERS
+from .metar import decode_metar
+from .quota import QuotaGovernor
+from .renderers import FastJSONRenderer
+from .services import (
+    split_codes,
+    acached_reports,
+    afetch_misses,
+    aget_nearest_report,
+    aget_first_reports,
+    nearest_stations,
+    metar_cache,
+    Lookup,
+    UNAVAILABLE,
+    INVALID,
+)
+from .stations import get_station_index
+from .stream import EventStreamRenderer, areport_events
+
+
+def set_cache_headers(response: Response, *lookups: Lookup) -> Response:
+    """Sets the cache age and staleness of the reports in a response as headers.
+
+    Args:
+        response (Response): The Response holding the reports.
+        lookups (Lookup): The METAR and/or TAF lookups the reports came from.
+
+    Returns:
+        Response: The Response with Age, X-Cache and X-Weather-Stale headers.
+    """
+
+    # Every ReportCache reads the same entry fields, so either one can age them.
+    ages = [metar_cache.age(entry) for lookup in lookups for entry in lookup.entries.values()]
+    response['Age'] = str(max(ages, default=0))
+    response['X-Cache'] = "MISS" if any(lookup.misses for lookup in lookups) else "HIT"
+    response['X-Weather-Stale'] = str(any(lookup.stale for lookup in lookups)).lower()
+    return response
+
+
+def report_validators(variant: str, *lookups: Lookup) -> tuple[str | None, int | None]:
+    """Builds the ETag and Last-Modified time of a response made of lookups' reports.
+
+    The ETag is a digest of each station with the observation or issue time of its
+    report and the time that text was first seen, which tells a correction apart from
+    the report it corrects, so it's built from the cache entries without reading the
+    reports or serializing the response.
+
+    Args:
+        variant (str): What the response holds and how, e.g. "metar" or "metar:decoded",
+        so each representation of the same reports gets its own ETag.
+        lookups (Lookup): The lookups the reports came from.
+
+    Returns:
+        tuple[str | None, int | None]: The quoted strong ETag and the newest observation
+        or issue time as a timestamp, or None and None if there are no reports.
+    """
+
+    entries = [entry for lookup in lookups for entry in lookup.entries.values()]
+    if not entries:
+        return None, None
+    parts = [variant]
+    for lookup in lookups:
+        parts += [f"{code}:{entry.get('observed_at')}:{entry['fetched_at']}"
+                  for code, entry in lookup.entries.items()]
+        parts += [f"{code}!{error}" for code, error in lookup.errors.items()]
+    digest = hashlib.blake2b("|".join(parts).encode(), digest_size=12).hexdigest()
+    modified = max(entry.get("observed_at") or entry["fetched_at"] for entry in entries)
+    return quote_etag(digest), int(modified)
+
+
+def set_validators(response: Response, variant: str, *lookups: Lookup) -> Response:
+    """Sets the ETag and Last-Modified headers of the reports in a response.
+
+    The response is marked for revalidation on every use, so polling browsers send
+    them back as If-None-Match and If-Modified-Since and get a 304 until a report
+    changes.
+
+    Args:
+        response (Response): The Response holding the reports.
+        variant (str): What the response holds and how, as given to report_validators.
+        lookups (Lookup): The lookups the reports came from.
+
+    Returns:
+        Response: The Response with ETag, Last-Modified and Cache-Control headers.
+    """
+
+    etag, modified = report_validators(variant, *lookups)
+    if etag is not None:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        response['Cache-Control'] = "private, no-cache"
+    return response
+
+
+def not_modified(request: HttpRequest, variant: str, *lookups: Lookup) -> HttpResponse | None:
+    """Answers a conditional request with a 304 when the client has the reports already.
+
+    Only cached reports are compared, so a lookup with misses always gets the full
+    response, and a 304 never waits on the provider.
+
+    Args:
+        request (HttpRequest): The request, with If-None-Match and/or If-Modified-Since.
+        variant (str): What the response holds and how, as given to report_validators.
+        lookups (Lookup): The lookups the reports would come from.
+
+    Returns:
+        HttpResponse | None: A 304 with the validators and cache headers, or None when
+        the full response has to be sent.
+    """
+
+    if any(lookup.misses for lookup in lookups):
+        return None
+    etag, modified = report_validators(variant, *lookups)
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        return None
+    return set_cache_headers(set_validators(response, variant, *lookups), *lookups)
+
+
+def wants_decoded(request: HttpRequest) -> bool:
+    """Checks whether the frontend asked for decoded reports with ?decoded=1."""
+
+    return request.query_params.get("decoded", "").lower() in ("1", "true", "yes")
+
+
+def parse_coordinate(lat: str, lon: str) -> tuple[float, float] | None:
+    """Reads a latitude and longitude from the URL.
+
+    Args:
+        lat (str): The latitude in decimal degrees.
+        lon (str): The longitude in decimal degrees.
+
+    Returns:
+        tuple[float, float] | None: The coordinate, or None if it isn't a valid one.
+    """
+
+    try:
+        latitude, longitude = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+async def anearest_report_response(request: HttpRequest, kind: str, lat: float,
+                                   lon: float) -> HttpResponse | None:
+    """Answers a coordinate with the report of the nearest catalogued station.
+
+    Args:
+        request (HttpRequest): The request, which may be conditional or ask for
+        decoded reports.
+        kind (str): "metar" or "taf".
+        lat (float): The latitude in decimal degrees.
+        lon (float): The longitude in decimal degrees.
+
+    Returns:
+        HttpResponse | None: The report with the station's ICAO code and distance in
+        the X-Weather-Station and X-Station-Distance-Km headers, a 304 if the client
+        has that report already, a 502 if the provider is down, or None when no
+        catalogued station nearby has a report and the provider has to be asked for
+        the nearest station instead.
+    """
+
+    stations = nearest_stations(kind, lat, lon)
+    if not stations:
+        return None
+    code, lookup = await aget_nearest_report(kind, stations)
+    if code is None:
+        if UNAVAILABLE in lookup.errors.values():
+            return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+        return None
+    served = Lookup({code: lookup.entries[code]}, {}, [], [])
+    variant = f"{kind}:decoded" if wants_decoded(request) else kind
+    response = not_modified(request, variant, served) or set_validators(
+        Response(lookup.entries[code]['raw'], status=HTTP_200_OK), variant, served)
+    response['X-Weather-Station'] = code
+    response['X-Station-Distance-Km'] = \
+        f"{next(distance for station, distance in stations if station.icao == code):.1f}"
+    return set_cache_headers(response, lookup)
+
+
+async def asaved_places(user, kind: str) -> list[tuple[str, str, list[tuple[str, float | None]]]]:
+    """Gets the User's Airports then Named Locations with the stations that can report for them.
+
+    Args:
+        user (User): The User whose places to get.
+        kind (str): "metar" or "taf", the reports the stations have to issue.
+
+    Returns:
+        list[tuple[str, str, list[tuple[str, float | None]]]]: The name, "airport" or
+        "named_location", and the ICAO codes to choose from with their distances in
+        kilometres, nearest first, of each place. An Airport only has its own code,
+        with no distance.
+    """
+
+    airports = await sync_to_async(list)(
+        user.airports.order_by("icao_code").values_list("icao_code", "name"))
+    locations = await sync_to_async(list)(
+        user.named_locations.order_by("city").values_list(
+            "city", "country", "latitude", "longitude"))
+    places = [(name, "airport", [(code.upper(), None)]) for code, name in airports]
+    places += [(f"{city}, {country}", "named_location",
+                [(station.icao, distance) for station, distance
+                 in nearest_stations(kind, float(lat), float(lon))])
+               for city, country, lat, lon in locations]
+    return places
+
+
+class A_airport_weather(AsyncTokenReq):
+    """The view that holds the method to get the METARs and TAFs of Airports together.
+
+    Extends:
+        AsyncTokenReq (class): The class that enables the async view with proper
+        authentication and permissions.
+
+    Methods:
+        get(request, icao) -> Response
+    """
+
+    async def get(self, request: HttpRequest, icao: str) -> Response:
+        """Gets the latest METAR and TAF of one or more Airports.
+
+        The METAR and TAF lookups go upstream concurrently. Stale reports are served
+        right away and flagged with the X-Weather-Stale header. A conditional request
+        for reports that are all cached and unchanged gets a 304.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication.
+            icao (str): One or more comma delimited ICAO codes.
+
+        Returns:
+            Response: The METAR and TAF per ICAO code and proper HTTP status code.
+        """
+
+        codes = split_codes(icao)
+        metars, tafs = await asyncio.gather(acached_reports("metar", codes),
+                                            acached_reports("taf", codes))
+        unchanged = not_modified(request, "weather", metars, tafs)
+        if unchanged is not None:
+            return unchanged
+        metars, tafs = await asyncio.gather(afetch_misses("metar", metars),
+                                            afetch_misses("taf", tafs))
+        client_response = {
+            code: {
+                "metar": metars.entries[code]['raw'] if code in metars.entries else None,
+                "taf": tafs.entries[code]['raw'] if code in tafs.entries else None,
+            }
+            for code in codes if code in metars.entries or code in tafs.entries
+        }
+        if not client_response:
+            if UNAVAILABLE in set(metars.errors.values()) | set(tafs.errors.values()):
+                return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+            if set(metars.errors.values()) | set(tafs.errors.values()) == {INVALID}:
+                return Response({'Error': INVALID}, status=HTTP_400_BAD_REQUEST)
+            return Response({'Error': 'That ICAO code does not match any results.'},
+                            status=HTTP_404_NOT_FOUND)
+        errors = {code: {"metar": metars.errors.get(code), "taf": tafs.errors.get(code)}
+                  for code in codes if code in metars.errors or code in tafs.errors}
+        if errors:
+            client_response['errors'] = errors
+        return set_validators(
+            set_cache_headers(Response(client_response, status=HTTP_200_OK), metars, tafs),
+            "weather", metars, tafs)
+
+
+class Cache_stats(TokenReq):
+    """The view that holds the method to get the weather cache and quota counters.
+
+    The counters are process-wide operational state, so only staff Users may see them.
+
+    Extends:
+        TokenReq (class): The class that enables the view with proper authentication
+        and permissions.
+
+    Attributes:
+        permission_classes
+
+    Methods:
+        get(request) -> Response
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: HttpRequest) -> Response:
+        """Gets the hit and miss counters of every weather report cache and the quota used.
+
+        Args:
+            request (HttpRequest): The request from a staff User with proper authentication.
+
+        Returns:
+            Response: The counters per report type, the "quota" usage per metered
+            provider and proper HTTP status code.
+        """
+
+        return Response({"metar": MetarCache().stats(), "taf": TafCache().stats(),
+                         "quota": {provider: QuotaGovernor(provider).usage()
+                                   for provider in METERED_PROVIDERS}},
+                        status=HTTP_200_OK)
+
+
+class Nearest_stations(TokenReq):
+    """The view that holds the method to find the reporting stations near a coordinate.
+
+    Extends:
+        TokenReq (class): The class that enables the view with proper authentication
+        and permissions.
+
+    Methods:
+        get(request) -> Response
+    """
+
+    def get(self, request: HttpRequest) -> Response:
+        """Gets the catalogued stations nearest to a coordinate.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication,
+            with "lat" and "lon" query parameters, and optionally "kind" ("metar" or
+            "taf") to only list stations issuing them and "k" (1-20, 5 by default).
+
+        Returns:
+            Response: The stations with their distances in kilometres, nearest first,
+            and proper HTTP status code.
+        """
+
+        coordinate = parse_coordinate(request.query_params.get("lat"),
+                                      request.query_params.get("lon"))
+        kind = request.query_params.get("kind") or None
+        k = request.query_params.get("k", "5")
+        if coordinate is None or kind not in (None, "metar", "taf") \
+                or not k.isdigit() or not 1 <= int(k) <= 20:
+            return Response(
+                {'Error': 'Send lat and lon in decimal degrees, kind as metar or taf, '
+                          'and k between 1 and 20.'},
+                status=HTTP_400_BAD_REQUEST)
+        stations = get_station_index().nearest(*coordinate, int(k), kind)
+        return Response([{**station._asdict(), "distance_km": round(distance, 1)}
+                         for station, distance in stations], status=HTTP_200_OK)
+
+
+class Flight_categories(AsyncTokenReq):
+    """The view that holds the method to get the flight category of every saved place.
+
+    Extends:
+        AsyncTokenReq (class): The class that enables the async view with proper
+        authentication and permissions.
+
+    Methods:
+        get(request) -> Response
+    """
+
+    columns = ["name", "type", "station", "distance_km", "ceiling_ft", "visibility_sm",
+               "flight_category"]
+
+    async def get(self, request: HttpRequest) -> Response:
+        """Gets the ceiling, visibility and flight category of the User's Airports and Named Locations.
+
+        Named Locations take the METAR of the nearest catalogued station that has one.
+        Every METAR comes from one combined lookup, and the categories are computed for
+        all of them at once.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication.
+
+        Returns:
+            Response: A table with a row per Airport then Named Location, in the order of
+            "columns", and proper HTTP status code.
+        """
+
+        places = await asaved_places(request.user, "metar")
+        codes, lookup = await aget_first_reports(
+            "metar", [[code for code, _ in stations] for _, _, stations in places])
+        if places and not lookup.entries and UNAVAILABLE in lookup.errors.values():
+            return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+        decoded = {code: decode_metar(entry['raw']) for code, entry in lookup.entries.items()}
+        table = category_table([decoded.get(code) for code in codes])
+        rows = []
+        for (name, place_type, stations), code, categories in zip(places, codes, table):
+            distance = dict(stations).get(code)
+            rows.append([name, place_type, code,
+                         None if distance is None else round(distance, 1), *categories])
+        client_response = {"columns": self.columns, "rows": rows}
+        if lookup.errors:
+            client_response["errors"] = lookup.errors
+        return set_cache_headers(Response(client_response, status=HTTP_200_OK), lookup)
+
+
+class Weather_stream(AsyncTokenReq):
+    """The view that holds the method to stream the reports of every saved place.
+
+    Extends:
+        AsyncTokenReq (class): The class that enables the async view with proper
+        authentication and permissions.
+
+    Attributes:
+        renderer_classes
+
+    Methods:
+        get(request) -> HttpResponse
+    """
+
+    renderer_classes = [FastJSONRenderer, EventStreamRenderer]
+
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        """Opens a Server-Sent Events stream of the METARs and TAFs of the User's places.
+
+        Each Airport streams its own reports and each Named Location those of the
+        nearest catalogued station that has them, resolved once when the stream opens.
+        The current reports are sent first, then an event whenever one changes. The
+        stream has to be served under ASGI.
+
+        Args:
+            request (HttpRequest): The request from the frontend's EventSource with
+            proper authentication.
+
+        Returns:
+            HttpResponse: The text/event-stream of "metar" and "taf" events, or a 404
+            when the User has no place with reports, and proper HTTP status code.
+        """
+
+        kinds = ("metar", "taf")
+        places = [await asaved_places(request.user, kind) for kind in kinds]
+        resolved = await asyncio.gather(*(
+            aget_first_reports(kind, [[code for code, _ in stations]
+                                      for _, _, stations in kind_places])
+            for kind, kind_places in zip(kinds, places)))
+        stations = {kind: list(dict.fromkeys(code for code in codes if code))
+                    for kind, (codes, _) in zip(kinds, resolved)}
+        if not any(stations.values()):
+            if any(UNAVAILABLE in lookup.errors.values() for _, lookup in resolved):
+                return Response({'Error': UNAVAILABLE}, status=HTTP_502_BAD_GATEWAY)
+            return Response({'Error': 'None of your Airports or Named Locations have reports.'},
+                            status=HTTP_404_NOT_FOUND)
+        response = StreamingHttpResponse(areport_events(stations),
+                                         content_type="text/event-stream")
+        response['Cache-Control'] = "no-cache"
+        response['X-Accel-Buffering'] = "no"
+        return response
+
+
+class Weather_changes(TokenReq):
+    """The view that holds the method to get the station reports changed since a cursor.
+
+    Extends:
+        TokenReq (class): The class that enables the view with proper authentication
+        and permissions.
+
+    Methods:
+        get(request) -> Response
+    """
+
+    def get(self, request: HttpRequest) -> Response:
+        """Gets the METARs and TAFs that changed after the cursor of the last poll.
+
+        Without a cursor only the current cursor is returned, to start polling from.
+
+        Args:
+            request (HttpRequest): The request from the frontend with proper authentication,
+            optionally with "since", the cursor of the last response, and "stations", comma
+            delimited ICAO codes to limit the changes to.
+
+        Returns:
+            Response: The new "cursor", the "changes" with their "kind", "station", "raw"
+            report and "observed_at" time, the latest per station in the order they
+            happened, whether there are "more" to read straight away, and proper HTTP
+            status code. An expired cursor gets a 410 with a new cursor to reload from.
+        """
+
+        now = timezone.now()
+        since = request.query_params.get("since")
+        stations = split_codes(request.query_params["stations"]) \
+            if request.query_params.get("stations") else None
+        if since is None:
+            return Response({"cursor": encode_cursor(head_id(now), now), "changes": [],
+                             "more": False}, status=HTTP_200_OK)
+        position = decode_cursor(since)
+        if position is None:
+            return Response({'Error': 'That cursor is not valid.'}, status=HTTP_400_BAD_REQUEST)
+        if has_expired(position[1], now):
+            return Response({'Error': 'That cursor has expired. Reload the reports and carry '
+                                      'on from this cursor.',
+                             "cursor": encode_cursor(head_id(now), now)}, status=HTTP_410_GONE)
+        changes, next_id, more = changes_since(position[0], stations, now)
+        return Response({
+            "cursor": encode_cursor(next_id, now),
+            "changes": [{"kind": change.kind, "station": change.station, "raw": change.raw,
+                         "observed_at": change.observed_at} for change in changes],
+            "more": more,
+        }, status=HTTP_200_OK)
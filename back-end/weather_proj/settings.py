@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from dotenv import dotenv_values
 
@@ -22,6 +23,7 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ["Age", "X-Cache", "X-Weather-Stale"]
 SESSION_COOKIE_SECURE = True
 SESSION_COOKIE_HTTPONLY = True
 
@@ -43,10 +45,14 @@ INSTALLED_APPS = [
     'coordinate_app',
     'taf_app',
     'metar_app',
+    'weather_app',
+    'history_app',
+    'dashboard_app',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'weather_app.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,7 +89,186 @@ DATABASES = {
     }
 }
 
-# ADD CACHE LAYER
+# Cache layer. Weather reports live in their own cache so they can be moved to a
+# shared backend; set REDIS_URL (requires the redis package) to share one cache
+# between every gunicorn worker.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "weather": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env.get("REDIS_URL"),
+    } if env.get("REDIS_URL") else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "weather",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
+WEATHER_CACHE_ALIAS = "weather"
+
+WEATHER_CACHE = {
+    # Seconds between a station's routine METAR observations.
+    "METAR_CYCLE": 3600,
+    # Seconds after the observation time before a new METAR reaches CheckWX.
+    "METAR_PUBLISH_DELAY": 300,
+    # Seconds between re-checks once a station's next METAR is overdue.
+    "METAR_POLL_INTERVAL": 120,
+    # Seconds between routine TAF issuances, and how long before the valid period a
+    # routine TAF is issued.
+    "TAF_CYCLE": 21600,
+    "TAF_ISSUE_LEAD": 2400,
+    # Seconds after issuance before a new TAF reaches CheckWX.
+    "TAF_PUBLISH_DELAY": 300,
+    # Seconds a cached TAF is served before it's re-checked for an AMD or COR.
+    "TAF_AMENDMENT_POLL": 600,
+    # Seconds an expired report is still served, flagged as stale, while it's refreshed
+    # or while the provider is down.
+    "MAX_STALE": 10800,
+    # Seconds a station the provider had no report for is answered "not found" locally.
+    "NEGATIVE_TTL": 900,
+}
+
+# Stops calling a provider after FAILURE_THRESHOLD failures in a row, then lets one
+# probe request through every RESET_TIMEOUT seconds until it answers again.
+WEATHER_BREAKER = {
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 30,
+    "PROBE_TIMEOUT": 15,
+}
+
+# The CheckWX plan's request caps, shared by every worker through the weather cache.
+# Background refreshes (stale reports, streams, the prewarmer) stop when only the
+# RESERVE share of either cap is left, keeping it for users' requests.
+WEATHER_QUOTA = {
+    "ENABLED": True,
+    "PER_MINUTE": int(env.get("WX_QUOTA_PER_MINUTE", 60)),
+    "PER_DAY": int(env.get("WX_QUOTA_PER_DAY", 2000)),
+    "RESERVE": 0.2,
+}
+
+# Coalescing of identical upstream fetches. A worker holds a lease in the weather
+# cache while it fetches, and other workers wait up to WAIT_TIMEOUT seconds for it.
+WEATHER_SINGLE_FLIGHT = {
+    "LEASE_TIMEOUT": 30,
+    "WAIT_TIMEOUT": 15,
+    "POLL_INTERVAL": 0.05,
+    "RESULT_TIMEOUT": 10,
+}
+
+# Background refresh of every stored airport's METAR and TAF (manage.py prewarm_weather).
+WEATHER_PREWARM = {
+    # Upstream calls the prewarmer may make in any minute, and stations per call.
+    "REQUESTS_PER_MINUTE": int(env.get("WX_PREWARM_BUDGET", 30)),
+    "BATCH_SIZE": 20,
+    # Seconds before a cache entry expires that it is refreshed.
+    "REFRESH_AHEAD": 180,
+    # Fraction by which the gaps between calls and between passes randomly vary.
+    "JITTER": 0.5,
+    # Seconds between passes over the stored airports.
+    "PASS_INTERVAL": 60,
+}
+
+# Storage of every new METAR and TAF fetched in the Observation and Forecast tables.
+# Rows are written BATCH_SIZE per INSERT, and batches of COPY_THRESHOLD rows or more
+# are streamed with COPY on PostgreSQL.
+WEATHER_HISTORY = {
+    "ENABLED": env.get("WX_HISTORY", "1") != "0",
+    "BATCH_SIZE": 1000,
+    "COPY_THRESHOLD": 5000,
+    "PARTITIONS_AHEAD": 3,
+    "RETENTION_MONTHS": int(env.get("WX_HISTORY_RETENTION", 3)),
+    "HOURLY_ROLLUP_DAYS": 90,
+    "LATE_HOURS": 2,
+}
+
+# Server-Sent Events of the reports of a User's saved places (/api/v1/weather/stream/).
+WEATHER_STREAM = {
+    # Seconds between looks at the shared cache for reports refreshed by other workers.
+    "POLL_INTERVAL": 5,
+    # Seconds of quiet after which a comment is sent to keep proxies from closing it.
+    "HEARTBEAT": 15,
+    # Seconds before a stream ends, and milliseconds before the browser reconnects.
+    "MAX_DURATION": 3600,
+    "RETRY": 5000,
+}
+
+# The append-only log of changed reports behind /api/v1/weather/changes/?since=<cursor>.
+# Changes are kept RETENTION_HOURS (pruned by maintain_weather_history), polls return
+# at most PAGE_SIZE of them, and changes younger than SETTLE_SECONDS wait for the next
+# poll so one committed late isn't skipped.
+WEATHER_CHANGES = {
+    "ENABLED": True,
+    "PAGE_SIZE": 500,
+    "RETENTION_HOURS": 48,
+    "SETTLE_SECONDS": 1,
+}
+
+# Brotli or gzip compression of JSON and MessagePack responses of at least MIN_SIZE
+# bytes, picked from the client's Accept-Encoding.
+WEATHER_COMPRESSION = {
+    "ENABLED": True,
+    "MIN_SIZE": 1024,
+    "BROTLI_QUALITY": 5,
+    "GZIP_LEVEL": 6,
+}
+
+# City lookups: the in-process LRU in front of the Geocode table, and how many seconds
+# a "city not found" answer is trusted before the provider is asked again.
+GEOCODE_CACHE = {
+    "LRU_SIZE": 2048,
+    "NEGATIVE_TTL": 7 * 86400,
+}
+
+# The offline city gazetteer, a GeoNames style cities file (e.g. cities15000.txt from
+# download.geonames.org) loaded when each worker starts. Cities it doesn't have fall
+# back to OpenWeatherMap.
+GAZETTEER = {
+    "PATH": env.get("GAZETTEER_PATH")
+    or os.environ.get("GAZETTEER_PATH", BASE_DIR / "coordinate_app" / "data" / "cities.txt"),
+    "INDEX_ALTERNATE_NAMES": True,
+    "PRELOAD": True,
+}
+
+# The catalogue of reporting stations that coordinate METAR/TAF lookups are resolved
+# against locally, so only the nearest stations' cached reports are fetched. NEAREST
+# stations within MAX_DISTANCE_KM are tried, nearest first, before asking CheckWX.
+# Airport lookups skip asking for METARs or TAFs of stations it says don't issue them.
+WEATHER_STATIONS = {
+    "PATH": env.get("STATIONS_PATH")
+    or os.environ.get("STATIONS_PATH", BASE_DIR / "weather_app" / "data" / "stations.csv"),
+    "NEAREST": 3,
+    "MAX_DISTANCE_KM": 150,
+    "PRELOAD": True,
+    # Whether the catalogue lists every station, so codes missing from it are answered
+    # "not found" without asking CheckWX. Leave off with the bundled sample.
+    "COMPLETE": env.get("STATIONS_COMPLETE", "0") == "1",
+    # How far either side of a flight's great-circle track route weather looks for stations.
+    "CORRIDOR_KM": int(env.get("ROUTE_CORRIDOR_KM", 50)),
+}
+
+# Upstream weather providers. The API keys are read once here at startup rather than
+# on every request.
+CHECK_WX_KEY = env.get("CHECK_WX_KEY") or os.environ.get("CHECK_WX_KEY", "")
+OPENWX_KEY = env.get("OPENWX_KEY") or os.environ.get("OPENWX_KEY", "")
+
+WEATHER_CLIENT = {
+    # Point both at a local stand-in (manage.py run_mock_upstream) for load testing.
+    "CHECKWX_BASE_URL": env.get("CHECKWX_BASE_URL")
+    or os.environ.get("CHECKWX_BASE_URL", "https://api.checkwx.com"),
+    "OPENWX_BASE_URL": env.get("OPENWX_BASE_URL")
+    or os.environ.get("OPENWX_BASE_URL", "https://api.openweathermap.org"),
+    # Seconds to wait for a connection and then for the response.
+    "CONNECT_TIMEOUT": float(env.get("WX_CONNECT_TIMEOUT", 3.05)),
+    "READ_TIMEOUT": float(env.get("WX_READ_TIMEOUT", 10)),
+    # Retries on connection errors and 5xx answers, with exponential backoff.
+    "MAX_RETRIES": int(env.get("WX_MAX_RETRIES", 2)),
+    "BACKOFF_FACTOR": float(env.get("WX_BACKOFF_FACTOR", 0.3)),
+    # Keep-alive connections held per provider host in each worker process.
+    "POOL_CONNECTIONS": 2,
+    "POOL_MAXSIZE": int(env.get("WX_POOL_MAXSIZE", 10)),
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,7 +288,14 @@ AUTH_PASSWORD_VALIDATORS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
-    ]
+    ],
+    # JSON is rendered with orjson; clients may ask for MessagePack with
+    # Accept: application/msgpack or ?format=msgpack.
+    'DEFAULT_RENDERER_CLASSES': [
+        'weather_app.renderers.FastJSONRenderer',
+        'weather_app.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 LANGUAGE_CODE = 'en-us'
@@ -11,5 +11,8 @@ urlpatterns = [
     path('api/v1/flights/', include('flight_app.urls')),
     path('api/v1/coordinates/', include('coordinate_app.urls')),
     path('api/v1/metars/', include('metar_app.urls')),
-    path('api/v1/tafs/', include('taf_app.urls'))
+    path('api/v1/tafs/', include('taf_app.urls')),
+    path('api/v1/weather/', include('weather_app.urls')),
+    path('api/v1/history/', include('history_app.urls')),
+    path('api/v1/dashboard/', include('dashboard_app.urls')),
 ]